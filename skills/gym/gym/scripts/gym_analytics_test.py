@@ -7,6 +7,7 @@ import shutil
 import subprocess
 import sys
 import tempfile
+import time
 import unittest
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -575,7 +576,7 @@ class TestSessionDuration(unittest.TestCase):
 
     def setUp(self):
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import session_duration
+        from gym_core import session_duration
         self.dur = session_duration
 
     def test_basic(self):
@@ -778,7 +779,7 @@ class TestGoalParsing(unittest.TestCase):
         """Should parse strength targets from plan.md."""
         # Import the function directly
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import parse_goals_from_plan
+        from gym_core import parse_goals_from_plan
         plan_text = """### Силовые targets (e1RM)
 | Lift | Сейчас | Цель (12 нед) | Прирост |
 |------|--------|---------------|---------|
@@ -797,14 +798,14 @@ class TestGoalParsing(unittest.TestCase):
     def test_parse_goals_empty(self):
         """Should return empty dict when no goals table."""
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import parse_goals_from_plan
+        from gym_core import parse_goals_from_plan
         goals = parse_goals_from_plan("No goals here")
         self.assertEqual(goals, {})
 
     def test_parse_goals_partial(self):
         """Should handle table with some unparseable rows."""
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import parse_goals_from_plan
+        from gym_core import parse_goals_from_plan
         plan_text = """### Силовые targets (e1RM)
 | Lift | Сейчас | Цель (12 нед) | Прирост |
 |------|--------|---------------|---------|
@@ -822,7 +823,7 @@ class TestGoalLineData(unittest.TestCase):
     def test_compute_goal_lines(self):
         """Should compute start/end points for goal lines."""
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import compute_goal_lines
+        from gym_core import compute_goal_lines
         goals = {"Squat": 170, "Bench": 110}
         start_date = datetime(2026, 1, 5)
         # start_values: current e1RM at start
@@ -837,7 +838,7 @@ class TestGoalLineData(unittest.TestCase):
     def test_compute_goal_lines_missing_start(self):
         """Should skip exercises with no starting value."""
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import compute_goal_lines
+        from gym_core import compute_goal_lines
         goals = {"Squat": 170, "Bench": 110}
         start_values = {"Squat": 160}  # no Bench
         lines = compute_goal_lines(goals, datetime(2026, 1, 5), start_values)
@@ -850,7 +851,7 @@ class TestE1RMEpley(unittest.TestCase):
 
     def setUp(self):
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import e1rm_epley
+        from gym_core import e1rm_epley
         self.e1rm = e1rm_epley
 
     def test_single_rep(self):
@@ -879,7 +880,7 @@ class TestBestE1RMForExercise(unittest.TestCase):
 
     def setUp(self):
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import best_e1rm_for_exercise
+        from gym_core import best_e1rm_for_exercise
         self.best = best_e1rm_for_exercise
 
     def test_empty_sets(self):
@@ -916,7 +917,7 @@ class TestNormalizeMatch(unittest.TestCase):
 
     def setUp(self):
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import normalize_match
+        from gym_core import normalize_match
         self.match = normalize_match
 
     def test_exact_match(self):
@@ -949,7 +950,7 @@ class TestWeekKey(unittest.TestCase):
 
     def setUp(self):
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import week_key
+        from gym_core import week_key
         self.wk = week_key
 
     def test_basic(self):
@@ -968,7 +969,7 @@ class TestWeekStart(unittest.TestCase):
 
     def setUp(self):
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import week_start
+        from gym_core import week_start
         self.ws = week_start
 
     def test_monday_returns_self(self):
@@ -987,7 +988,7 @@ class TestSessionDuration(unittest.TestCase):
 
     def setUp(self):
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import session_duration
+        from gym_core import session_duration
         self.dur = session_duration
 
     def test_basic(self):
@@ -1021,7 +1022,7 @@ class TestValidateTimeStr(unittest.TestCase):
 
     def setUp(self):
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import validate_time_str
+        from gym_core import validate_time_str
         self.v = validate_time_str
 
     def test_valid(self):
@@ -1047,7 +1048,7 @@ class TestComputeKPIs(unittest.TestCase):
 
     def setUp(self):
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import _compute_kpis
+        from gym_core import _compute_kpis
         self.kpis = _compute_kpis
 
     def test_empty(self):
@@ -1082,7 +1083,7 @@ class TestChartOrientation(unittest.TestCase):
 
     def setUp(self):
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import _chart_orientation
+        from gym_core import _chart_orientation
         self.orient = _chart_orientation
 
     def test_default_vertical(self):
@@ -1101,7 +1102,7 @@ class TestGoalsLoadAndGet(unittest.TestCase):
 
     def setUp(self):
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import load_goals, get_latest_goals, default_goals_path
+        from gym_core import load_goals, get_latest_goals, default_goals_path
         self.load = load_goals
         self.latest = get_latest_goals
         self.default_path = default_goals_path
@@ -1291,7 +1292,7 @@ class TestChartWithGoals(unittest.TestCase):
 # These tests import and call functions directly.
 
 sys.path.insert(0, str(Path(__file__).parent))
-import gym_analytics as ga
+import gym_core as ga
 from unittest.mock import patch, MagicMock
 from argparse import Namespace
 from io import StringIO
@@ -2119,7 +2120,7 @@ class TestDashboardLiftsFromGoals(unittest.TestCase):
     def test_lifts_from_goals_file(self):
         """When goals.json exists, its keys should determine which lifts are tracked."""
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import _get_tracked_lifts
+        from gym_core import _get_tracked_lifts
         with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
             json.dump([{"date_set": "2026-01-26", "target_date": "2026-04-19",
                         "goals": {"Squat": 170, "Bench Press (flat)": 110, "OHP": 70, "Seated Cable Row": 120}}], f)
@@ -2131,14 +2132,14 @@ class TestDashboardLiftsFromGoals(unittest.TestCase):
     def test_lifts_fallback_no_file(self):
         """Without goals file, should return default 4 lifts."""
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import _get_tracked_lifts
+        from gym_core import _get_tracked_lifts
         lifts = _get_tracked_lifts("/tmp/nonexistent_xyz.json")
         self.assertEqual(lifts, ["Squat", "Bench Press", "OHP", "Seated Cable Row"])
 
     def test_lifts_fallback_empty_goals(self):
         """Empty goals array should fallback to defaults."""
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import _get_tracked_lifts
+        from gym_core import _get_tracked_lifts
         with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
             json.dump([], f)
             f.flush()
@@ -2149,7 +2150,7 @@ class TestDashboardLiftsFromGoals(unittest.TestCase):
     def test_lifts_from_latest_goal_entry(self):
         """Should use the LAST entry in goals array."""
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import _get_tracked_lifts
+        from gym_core import _get_tracked_lifts
         with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
             json.dump([
                 {"date_set": "2026-01-01", "target_date": "2026-03-01",
@@ -2170,7 +2171,7 @@ class TestRolling14DayKPIs(unittest.TestCase):
 
     def setUp(self):
         sys.path.insert(0, str(Path(__file__).parent))
-        from gym_analytics import _compute_kpis
+        from gym_core import _compute_kpis
         self.kpis = _compute_kpis
 
     def test_current_window_14_days(self):
@@ -2328,5 +2329,2129 @@ class TestRolling14DayKPIs(unittest.TestCase):
         self.assertEqual(prev_cnt, 0)
 
 
+# ==================== Change 3: Persistent session index ====================
+
+def _age_files(d, seconds=10):
+    """Backdate every file in d so the index treats it as settled (not racy)."""
+    past = datetime.now().timestamp() - seconds
+    for name in os.listdir(d):
+        os.utime(os.path.join(d, name), (past, past))
+
+
+class TestSessionIndex(unittest.TestCase):
+    """load_sessions keeps parsed files in history/.gym-index and re-parses only changed ones."""
+
+    def _load_counting(self, d, **kwargs):
+        calls = []
+        real = ga._parse_session_file
+
+        def counting(f):
+            calls.append(f.name)
+            return real(f)
+
+        with patch.object(ga, "_parse_session_file", side_effect=counting):
+            sessions = ga.load_sessions(d, **kwargs)
+        return sessions, calls
+
+    def test_index_written(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            ga.load_sessions(d)
+            self.assertTrue(ga.index_path(d).exists())
+
+    def test_unchanged_files_not_reparsed(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            _age_files(d)
+            first = ga.load_sessions(d)
+            sessions, calls = self._load_counting(d)
+            self.assertEqual(calls, [])
+            self.assertEqual(sessions, first)
+
+    def test_changed_file_reparsed(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            _age_files(d)
+            ga.load_sessions(d)
+            changed = dict(SESS_D, notes="edited after indexing")
+            _write_sessions(Path(d), [changed])
+            sessions, calls = self._load_counting(d)
+            self.assertEqual(calls, ["2026-01-14.json"])
+            self.assertEqual(sessions[-1]["notes"], "edited after indexing")
+
+    def test_removed_file_dropped(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            _age_files(d)
+            ga.load_sessions(d)
+            os.unlink(os.path.join(d, "2026-01-07.json"))
+            sessions, calls = self._load_counting(d)
+            self.assertEqual(calls, [])
+            self.assertEqual([s["date"] for s in sessions], ["2026-01-05", "2026-01-12", "2026-01-14"])
+
+    def test_cached_bad_file_still_warns(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), [SESS_A])
+            with open(os.path.join(d, "2026-01-10.json"), "w") as f:
+                f.write("{bad json")
+            _age_files(d)
+            ga.load_sessions(d)
+            with patch("sys.stderr", new_callable=StringIO) as err:
+                sessions, calls = self._load_counting(d)
+            self.assertEqual(calls, [])
+            self.assertEqual(len(sessions), 1)
+            self.assertIn("skipping 2026-01-10.json", err.getvalue())
+
+    def test_corrupt_index_rebuilt(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            ga.index_path(d).write_text("{not an index")
+            self.assertEqual(len(ga.load_sessions(d)), 4)
+            raw = json.loads(ga.index_path(d).read_text())
+            self.assertEqual(len(raw["files"]), 4)
+
+    def test_recent_files_not_trusted(self):
+        """Files modified right before the index write are re-parsed (same-tick rewrites)."""
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), [SESS_A])
+            ga.load_sessions(d)
+            _, calls = self._load_counting(d)
+            self.assertEqual(calls, ["2026-01-05.json"])
+
+    def test_no_index(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            self.assertEqual(len(ga.load_sessions(d, use_index=False)), 4)
+            self.assertFalse(ga.index_path(d).exists())
+
+    def test_index_ignored_by_validate(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            ga.load_sessions(d)
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_validate(None, _make_args(history_dir=d))
+            self.assertIn("All 4 files valid", out.getvalue())
+
+    def test_index_command(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            out, _, _ = run_cmd("index", d, "--rebuild", "--json")
+            stats = json.loads(out)
+            self.assertEqual(stats["sessions"], 4)
+            self.assertEqual(stats["reparsed"], 4)
+            self.assertTrue(stats["index_written"])
+
+
+# ==================== Change 4: Vectorized set engine ====================
+
+class TestSetTable(unittest.TestCase):
+    """SetTable must agree with the scalar helpers it replaces."""
+
+    def setUp(self):
+        self.table = ga.SetTable(ALL_SESS)
+
+    def test_shapes(self):
+        self.assertEqual(len(self.table.ordinal), 4)
+        self.assertEqual(len(self.table.occ_session), 12)
+        self.assertEqual(len(self.table.weight), 23)
+
+    def test_occurrence_best_matches_scalar(self):
+        i = 0
+        for s in ALL_SESS:
+            for ex in s["actual"]:
+                self.assertEqual(self.table.best_value(i), ga.best_e1rm_for_exercise(ex))
+                i += 1
+
+    def test_best_value_keeps_int_for_single_rep(self):
+        table = ga.SetTable([_session("2026-01-01", [_ex("Squat", "legs", [_s(140, 1)])])])
+        self.assertIsInstance(table.best_value(0), int)
+
+    def test_latest_e1rm(self):
+        result = self.table.latest_e1rm()
+        self.assertEqual(list(result), ["Squat", "Bench Press", "Seated Cable Row", "OHP",
+                                        "Lateral Raise", "Bicep Curl"])
+        self.assertEqual(result["Squat"]["date"], "2026-01-12")
+        self.assertNotIn("Pull-ups", result)
+
+    def test_weekly_volume(self):
+        weeks = self.table.weekly_volume()
+        self.assertEqual([w["week"] for w in weeks], ["2026-W02", "2026-W03"])
+        self.assertEqual(weeks[0], {"week": "2026-W02", "week_start": "2026-01-05",
+                                    "legs": 5, "chest": 2, "back": 4, "shoulders": 2})
+
+    def test_session_sets(self):
+        self.assertEqual(self.table.session_sets().tolist(), [7, 6, 5, 5])
+
+    def test_lift_series_first_match_per_session(self):
+        sessions = [_session("2026-01-05", [_ex("Squat", "legs", [_s(0, 8)]),
+                                            _ex("Back Squat", "legs", [_s(100, 5)])])]
+        # First matching exercise has no weight -> session contributes no point
+        self.assertEqual(ga.SetTable(sessions).lift_series("Squat"), ([], []))
+
+    def test_lift_series(self):
+        dates, values = self.table.lift_series("Squat")
+        self.assertEqual(dates, [datetime(2026, 1, 5), datetime(2026, 1, 7), datetime(2026, 1, 12)])
+        self.assertEqual(values, [102.0, 106.7, 107.7])
+
+    def test_progress_best_set(self):
+        entries = self.table.progress_entries("Squat")
+        self.assertEqual((entries[0]["best_weight"], entries[0]["best_reps"]), (80, 8))
+        self.assertEqual(entries[0]["num_sets"], 3)
+
+    def test_empty(self):
+        table = ga.SetTable([])
+        self.assertEqual(table.latest_e1rm(), {})
+        self.assertEqual(table.weekly_volume(), [])
+        self.assertEqual(table.lift_series("Squat"), ([], []))
+
+    def test_sessions_without_actual(self):
+        table = ga.SetTable([{"date": "2026-01-05"}])
+        self.assertEqual(table.weekly_volume(), [{"week": "2026-W02", "week_start": "2026-01-05"}])
+        self.assertEqual(table.session_sets().tolist(), [0])
+
+
+# ==================== Change 5: Precompiled exercise-name resolver ====================
+
+class TestExerciseResolver(unittest.TestCase):
+    def test_same_results_as_legacy_scan(self):
+        from gym_bench import legacy_normalize_match
+        names = set(ga.SHORT_NAMES) | set(ga.SHORT_NAMES.values())
+        for canonical, aliases in ga.EXERCISE_ALIASES.items():
+            names |= {canonical, canonical.title(), *aliases, *(a.upper() for a in aliases)}
+        names |= {"Deadlift", "Row", "Press", "Bicep Curl", ""}
+        resolver = ga.ExerciseResolver()
+        for n in names:
+            for t in names:
+                self.assertEqual(resolver.matches(n, t), legacy_normalize_match(n, t), (n, t))
+
+    def test_memoized(self):
+        resolver = ga.ExerciseResolver()
+        resolver.matches("Barbell Back Squat", "Squat")
+        with patch.object(resolver, "_key", side_effect=AssertionError("not memoized")):
+            self.assertTrue(resolver.matches("Barbell Back Squat", "Squat"))
+
+    def test_canonical(self):
+        resolver = ga.ExerciseResolver()
+        self.assertEqual(resolver.canonical("Military Press"), "ohp")
+        self.assertEqual(resolver.canonical("Cable Row"), "seated cable row")
+        self.assertEqual(resolver.canonical("Leg Curl"), "leg curl")
+
+    def test_short_names_with_goal_overrides(self):
+        with tempfile.TemporaryDirectory() as d:
+            gp = os.path.join(d, "goals.json")
+            with open(gp, "w") as f:
+                json.dump([{"target_date": "2026-04-01",
+                            "goals": {"Seated Cable Row": {"target": 120, "short": "Cable"}}}], f)
+            resolver = ga.build_resolver(gp)
+        self.assertEqual(resolver.short("Seated Cable Row"), "Cable")
+        self.assertEqual(resolver.short("Bench Press (flat)"), "Bench")
+        self.assertEqual(resolver.short("Unknown Lift", "fallback"), "fallback")
+
+    def test_normalize_match_uses_resolver(self):
+        self.assertTrue(ga.normalize_match("Pendlay Row", "Barbell Row"))
+        self.assertFalse(ga.normalize_match("Pendlay Row", "Seated Cable Row"))
+
+
+# ==================== Change 6: Daemon mode ====================
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self._warm = ga._WARM
+        ga._WARM = {}
+
+    def tearDown(self):
+        ga._WARM = self._warm
+
+    def test_run_request(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            resp = ga._run_request({"argv": ["e1rm", d, "--json"], "id": 7})
+        self.assertEqual(resp["id"], 7)
+        self.assertEqual(resp["rc"], 0)
+        self.assertIn("Squat", json.loads(resp["stdout"]))
+
+    def test_run_request_error_exit(self):
+        resp = ga._run_request({"argv": ["e1rm", "/tmp/nonexistent_xyz_abc"]})
+        self.assertEqual(resp["rc"], 1)
+        self.assertIn("Directory not found", resp["stderr"])
+
+    def test_run_request_relative_to_cwd(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.makedirs(os.path.join(d, "history"))
+            _write_sessions(Path(d) / "history", ALL_SESS)
+            resp = ga._run_request({"argv": ["summary", "history", "--json"], "cwd": d})
+        self.assertEqual(json.loads(resp["stdout"])["date"], "2026-01-14")
+
+    def test_sessions_cached_until_dir_changes(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), [SESS_A])
+            ga._run_request({"argv": ["summary", d]})
+            with patch.object(ga, "load_sessions", side_effect=AssertionError("reloaded")):
+                self.assertEqual(ga._run_request({"argv": ["summary", d]})["rc"], 0)
+            _write_sessions(Path(d), [SESS_B])
+            resp = ga._run_request({"argv": ["summary", d, "--json"]})
+        self.assertEqual(json.loads(resp["stdout"])["date"], "2026-01-07")
+
+    def test_changed_dir_drops_stale_windows(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), [SESS_A])
+            ga._warm_sessions(d, last_n=1)
+            ga._warm_sessions(d, last_n=2)
+            self.assertEqual(len(ga._WARM), 2)
+            _write_sessions(Path(d), [SESS_B])
+            ga._warm_sessions(d, last_n=3)
+        self.assertEqual([k[3] for k in ga._WARM], [(("last_n", 3),)])
+
+    def test_warm_cache_bounded_lru(self):
+        with tempfile.TemporaryDirectory() as d, patch.object(ga, "WARM_MAX_ENTRIES", 3):
+            for i in range(4):
+                os.makedirs(os.path.join(d, str(i)))
+                _write_sessions(Path(d, str(i)), [SESS_A])
+                ga._warm_sessions(os.path.join(d, str(i)))
+                if i == 2:
+                    ga._warm_sessions(os.path.join(d, "0"))  # used again: outlives "1"
+            cached = [os.path.basename(k[1]) for k in ga._WARM]
+        self.assertEqual(cached, ["2", "0", "3"])
+
+    def test_cached_warnings_replayed(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), [SESS_A])
+            with open(os.path.join(d, "2026-01-10.json"), "w") as f:
+                f.write("{bad")
+            ga._run_request({"argv": ["summary", d]})
+            resp = ga._run_request({"argv": ["summary", d]})
+        self.assertIn("skipping 2026-01-10.json", resp["stderr"])
+
+    def test_goals_cached_and_not_shared(self):
+        with tempfile.TemporaryDirectory() as d:
+            gp = os.path.join(d, "goals.json")
+            with open(gp, "w") as f:
+                json.dump([{"target_date": "2026-04-01", "goals": {"Squat": 170}}], f)
+            ga.load_goals(gp).append({"mutated": True})
+            self.assertEqual(len(ga.load_goals(gp)), 1)
+
+    def test_serve_stdio(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            stdin = StringIO("\n".join([
+                json.dumps({"cmd": "ping", "id": 1}),
+                "not json",
+                json.dumps({"argv": ["volume", d, "--json"], "id": 2}),
+                json.dumps({"cmd": "shutdown"}),
+                json.dumps({"argv": ["volume", d], "id": 3}),
+            ]) + "\n")
+            stdout = StringIO()
+            with patch.object(ga, "_warm_up"):
+                ga.serve_stdio(stdin, stdout)
+        responses = [json.loads(l) for l in stdout.getvalue().splitlines()]
+        self.assertEqual(len(responses), 4)  # nothing after shutdown
+        self.assertTrue(responses[0]["ok"])
+        self.assertEqual(responses[1]["rc"], 2)
+        self.assertEqual(responses[2]["id"], 2)
+        self.assertIsInstance(json.loads(responses[2]["stdout"]), list)
+
+    def test_socket_round_trip(self):
+        import threading
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            sock = os.path.join(d, "g.sock")
+            t = threading.Thread(target=ga.serve_socket, args=(sock,), daemon=True)
+            with patch.object(ga, "_warm_up"):
+                t.start()
+                for _ in range(100):
+                    if os.path.exists(sock):
+                        break
+                    threading.Event().wait(0.02)
+                resp = ga._client_request(sock, {"argv": ["e1rm", d, "--json"]}, timeout=10)
+                self.assertIn("Squat", json.loads(resp["stdout"]))
+                self.assertTrue(ga._client_request(sock, {"cmd": "shutdown"}, timeout=10)["ok"])
+                t.join(5)
+            self.assertFalse(os.path.exists(sock))
+
+
+class TestDaemonClient(unittest.TestCase):
+    def test_falls_back_without_daemon(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            env = dict(os.environ, GYM_ANALYTICS_SOCKET=os.path.join(d, "missing.sock"))
+            result = subprocess.run([sys.executable, SCRIPT, "e1rm", d, "--json"],
+                                    capture_output=True, text=True, timeout=30, env=env)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("Squat", json.loads(result.stdout))
+
+    def test_forwards_to_daemon(self):
+        with patch.dict(os.environ, {"GYM_ANALYTICS_SOCKET": "/tmp/x.sock"}), \
+                patch.object(ga, "_client_request", return_value={"rc": 3, "stdout": "hi\n", "stderr": ""}) as req, \
+                patch('sys.argv', ['gym_analytics.py', 'e1rm', 'rel/dir']), \
+                patch('sys.stdout', new_callable=StringIO) as out:
+            with self.assertRaises(SystemExit) as cm:
+                ga.main()
+        self.assertEqual(cm.exception.code, 3)
+        self.assertEqual(out.getvalue(), "hi\n")
+        self.assertEqual(req.call_args[0][1]["argv"], ["e1rm", "rel/dir"])
+        self.assertEqual(req.call_args[0][1]["cwd"], os.getcwd())
+
+    def _run_hung(self, d, *args):
+        """Run the CLI against a socket that accepts requests but never answers."""
+        import socket
+        sock = os.path.join(d, "hung.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as srv:
+            srv.bind(sock)
+            srv.listen(1)
+            env = dict(os.environ, GYM_ANALYTICS_SOCKET=sock, GYM_DAEMON_TIMEOUT="0.3")
+            return subprocess.run([sys.executable, SCRIPT, *args], capture_output=True, text=True,
+                                  timeout=30, env=env)
+
+    def test_hung_daemon_falls_back(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            result = self._run_hung(d, "e1rm", d, "--json")
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("Squat", json.loads(result.stdout))
+        self.assertIn("did not answer within 0.3s; running in-process", result.stderr)
+
+    def test_hung_daemon_log_not_rerun(self):
+        with tempfile.TemporaryDirectory() as d:
+            result = self._run_hung(d, "log", d, json.dumps(SESS_A))
+            self.assertFalse(os.path.exists(os.path.join(d, f"{SESS_A['date']}.json")))
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("not re-running log in-process", result.stderr)
+        self.assertFalse(ga._adds_data(["goals", "list"]))
+        self.assertTrue(ga._adds_data(["goals", "add", "--goal-json", "{}"]))
+
+    def test_daemon_survives_client_timeout(self):
+        import threading
+        run_request = ga._run_request
+
+        def slow(req):
+            time.sleep(0.5)
+            return run_request(req)
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            sock = os.path.join(d, "g.sock")
+            t = threading.Thread(target=ga.serve_socket, args=(sock,), daemon=True)
+            with patch.object(ga, "_warm_up"), patch.object(ga, "_run_request", side_effect=slow):
+                t.start()
+                for _ in range(100):
+                    if os.path.exists(sock):
+                        break
+                    threading.Event().wait(0.02)
+                with self.assertRaises(TimeoutError):
+                    ga._client_request(sock, {"argv": ["e1rm", d, "--json"]}, timeout=0.1)
+                resp = ga._client_request(sock, {"argv": ["e1rm", d, "--json"]}, timeout=10)
+                self.assertIn("Squat", json.loads(resp["stdout"]))
+                self.assertTrue(ga._client_request(sock, {"cmd": "shutdown"}, timeout=10)["ok"])
+                t.join(5)
+            self.assertFalse(t.is_alive())
+
+
+# ==================== Change 7: Chart render cache ====================
+
+class TestChartRenderCache(unittest.TestCase):
+    def _render(self, d, sessions, **kwargs):
+        out_path = os.path.join(d, kwargs.pop("name", "chart.png"))
+        args = _make_args(output=out_path, history_dir=d, cache_dir=os.path.join(d, "cache"), **kwargs)
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            ga.cmd_chart_e1rm(sessions, args)
+        return out_path, out.getvalue()
+
+    def _stats(self, d):
+        return json.loads(Path(d, "cache", ga.CHART_CACHE_STATS).read_text())
+
+    def test_miss_then_hit(self):
+        with tempfile.TemporaryDirectory() as d:
+            path, out = self._render(d, ALL_SESS)
+            self.assertIn("cache miss", out)
+            first = Path(path).read_bytes()
+            os.unlink(path)
+            with patch.object(ga, "_compute_kpis", side_effect=AssertionError("re-rendered")):
+                path, out = self._render(d, ALL_SESS)
+            self.assertIn("cache hit", out)
+            self.assertEqual(Path(path).read_bytes(), first)
+            self.assertEqual(self._stats(d), {"hits": 1, "misses": 1})
+
+    def test_changed_inputs_miss(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._render(d, ALL_SESS)
+            self._render(d, ALL_SESS[:3])
+            self._render(d, ALL_SESS, horizontal=True)
+            self._render(d, ALL_SESS, lifts="Squat")
+            self._render(d, ALL_SESS, planned='{"Squat": 120}')
+            self.assertEqual(self._stats(d), {"hits": 0, "misses": 5})
+
+    def test_goals_change_misses(self):
+        with tempfile.TemporaryDirectory() as d:
+            gp = os.path.join(d, "goals.json")
+            with open(gp, "w") as f:
+                json.dump([{"target_date": "2026-04-05", "goals": {"Squat": 170}}], f)
+            self._render(d, ALL_SESS, goals_file=gp)
+            with open(gp, "w") as f:
+                json.dump([{"target_date": "2026-04-05", "goals": {"Squat": 180}}], f)
+            _, out = self._render(d, ALL_SESS, goals_file=gp)
+            self.assertIn("cache miss", out)
+
+    def test_cache_dir_holds_only_final_files(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._render(d, ALL_SESS)
+            files = sorted(os.listdir(os.path.join(d, "cache")))
+            self.assertEqual(len(files), 2)
+            self.assertEqual(files[-1], ga.CHART_CACHE_STATS)
+            self.assertTrue(files[0].endswith(".png"))
+
+    def test_no_cache_dir_unchanged(self):
+        with tempfile.TemporaryDirectory() as d:
+            out_path = os.path.join(d, "chart.png")
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_chart_e1rm(ALL_SESS, _make_args(output=out_path, history_dir=d))
+            self.assertEqual(out.getvalue().strip(), f"Chart saved to {out_path}")
+
+
+
+# ==================== Change 8: Lazy startup ====================
+
+class TestLazyStartup(unittest.TestCase):
+    """Text commands must not pay for numpy/matplotlib; only the requested subparser is built."""
+
+    def _run(self, *argv):
+        env = dict(os.environ, GYM_ANALYTICS_SOCKET=os.path.join(tempfile.gettempdir(), "no-such-gym.sock"))
+        code = ("import sys, runpy; sys.argv = ['gym_analytics.py'] + sys.argv[1:]\n"
+                "try:\n    runpy.run_path(%r, run_name='__main__')\n"
+                "finally:\n    print(sorted(m for m in ('numpy', 'matplotlib') if m in sys.modules), file=sys.stderr)"
+                % SCRIPT)
+        return subprocess.run([sys.executable, "-c", code, *argv], capture_output=True, text=True, env=env)
+
+    def test_summary_does_not_import_heavy_modules(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            r = self._run("summary", d)
+            self.assertEqual(r.returncode, 0, r.stderr)
+            self.assertTrue(r.stderr.strip().endswith("[]"), r.stderr)
+
+    def test_profile_startup_breakdown(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            r = self._run("summary", d, "--profile-startup")
+            self.assertEqual(r.returncode, 0, r.stderr)
+            for phase in ("imports", "build parser", "load sessions", "command", "total"):
+                self.assertIn(phase, r.stderr)
+            self.assertIn("heavy modules loaded: none", r.stderr)
+            self.assertNotIn("startup profile", r.stdout)
+
+    def test_profile_startup_survives_error_exit(self):
+        with tempfile.TemporaryDirectory() as d:
+            r = self._run("summary", os.path.join(d, "missing"), "--profile-startup")
+            self.assertEqual(r.returncode, 1)
+            self.assertIn("startup profile", r.stderr)
+
+    def test_build_parser_registers_only_requested_command(self):
+        parser = ga._build_parser("summary")
+        choices = parser._subparsers._group_actions[0].choices
+        self.assertEqual(list(choices), ["summary"])
+        self.assertEqual(len(ga._build_parser()._subparsers._group_actions[0].choices), len(ga.SUBCOMMANDS))
+
+    def test_unknown_command_lists_all_choices(self):
+        with patch('sys.stderr', new_callable=StringIO) as err:
+            with self.assertRaises(SystemExit):
+                ga.main(["bogus"])
+        self.assertIn("chart-volume", err.getvalue())
+
+
+
+# ==================== Change 9: NDJSON store ====================
+
+import gym_store
+
+
+class TestNdjsonStore(unittest.TestCase):
+    """load_sessions, log, validate, migrate and compact on history/sessions.ndjson."""
+
+    def _migrated(self, d, remove=True):
+        _write_sessions(Path(d), ALL_SESS)
+        with patch('sys.stdout', new_callable=StringIO):
+            ga.cmd_migrate(_make_args(history_dir=d, remove=remove))
+
+    def test_migrate_round_trip(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            before = ga.load_sessions(d, use_index=False)
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_migrate(_make_args(history_dir=d, remove=True, json=True))
+            result = json.loads(out.getvalue())
+            self.assertEqual(result["migrated"], len(ALL_SESS))
+            self.assertEqual(result["removed_files"], len(ALL_SESS))
+            self.assertEqual(list(Path(d).glob("*.json")), [])
+            self.assertEqual(ga.load_sessions(d), before)
+
+    def test_migrate_stores_legacy_files_as_written(self):
+        with tempfile.TemporaryDirectory() as d:
+            legacy = {"date": "2026-01-05", "exercises": SESS_A["actual"]}
+            Path(d, "2026-01-05.json").write_text(json.dumps(legacy))
+            with patch('sys.stdout', new_callable=StringIO):
+                ga.cmd_migrate(_make_args(history_dir=d, remove=True))
+            self.assertEqual(gym_store.read_sessions(d)[0], [legacy])
+            self.assertEqual(ga.load_sessions(d)[0]["actual"], SESS_A["actual"])
+
+    def test_migrate_keeps_files_without_remove(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._migrated(d, remove=False)
+            self.assertEqual(len(list(Path(d).glob("*.json"))), len(ALL_SESS))
+            self.assertEqual(len(gym_store.read_sessions(d)[0]), len(ALL_SESS))
+
+    def test_day_file_overrides_store(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._migrated(d)
+            last = dict(ALL_SESS[-1], notes="edited")
+            _write_sessions(Path(d), [last])
+            self.assertEqual(ga.load_sessions(d)[-1]["notes"], "edited")
+
+    def test_log_appends_to_store(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._migrated(d)
+            new = _session("2026-03-01", [{"name": "Squat", "sets": [{"reps": 5, "weight_kg": 150}]}])
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_log(_make_args(history_dir=d, source=json.dumps(new)))
+            self.assertIn(gym_store.STORE_FILENAME, out.getvalue())
+            self.assertFalse(os.path.exists(os.path.join(d, "2026-03-01.json")))
+            self.assertEqual(ga.load_sessions(d)[-1]["date"], "2026-03-01")
+
+    def test_last_n_reads_tail(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._migrated(d)
+            with patch.object(gym_store, "read_sessions", side_effect=AssertionError("full read")):
+                tail = ga.load_sessions(d, last_n=1)
+            self.assertEqual(tail, [ga.load_sessions(d)[-1]])
+
+    def test_summary_from_store(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            with patch('sys.stdout', new_callable=StringIO) as plain:
+                ga.main(["summary", d, "--json"])
+            with patch('sys.stdout', new_callable=StringIO):
+                ga.main(["migrate", d, "--remove"])
+            with patch('sys.stdout', new_callable=StringIO) as stored:
+                ga.main(["summary", d, "--json"])
+            self.assertEqual(json.loads(stored.getvalue())["date"], json.loads(plain.getvalue())["date"])
+
+    def test_validate_store_records(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._migrated(d)
+            gym_store.append_session(d, {"date": "2026-03-01", "actual": [], "start_time": "25:99"})
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                with self.assertRaises(SystemExit):
+                    ga.cmd_validate(None, _make_args(history_dir=d, json=True))
+            result = json.loads(out.getvalue())
+            self.assertEqual(result["store_records"], len(ALL_SESS) + 1)
+            self.assertEqual((result["valid_count"], result["valid_store_records"]), (0, len(ALL_SESS)))
+            self.assertEqual(result["errors"][0]["error"], "Invalid start_time: 25:99 (expected HH:MM)")
+
+    def test_validate_counts_files_and_records_apart(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._migrated(d)
+            _write_sessions(Path(d), [_session("2026-03-02", [_ex("Squat", "legs", [_s(100, 5)])])])
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_validate(None, _make_args(history_dir=d, json=False))
+            self.assertEqual(out.getvalue(), f"All 1 files and {len(ALL_SESS)} store records valid ✓\n")
+
+    def test_compact_command(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._migrated(d)
+            gym_store.append_session(d, dict(ALL_SESS[-1], notes="v2"))
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_compact(_make_args(history_dir=d, json=True))
+            stats = json.loads(out.getvalue())
+            self.assertEqual(stats["superseded"], 1)
+            self.assertLess(stats["bytes_after"], stats["bytes_before"])
+            self.assertEqual(ga.load_sessions(d)[-1]["notes"], "v2")
+
+    def test_compact_without_store(self):
+        with tempfile.TemporaryDirectory() as d:
+            with patch('sys.stderr', new_callable=StringIO):
+                with self.assertRaises(SystemExit):
+                    ga.cmd_compact(_make_args(history_dir=d))
+
+
+
+# ==================== Change 10: Windowed loads ====================
+
+class TestLoadWindow(unittest.TestCase):
+    """since/until/last_n skip day files by name; commands ask for the narrowest window."""
+
+    def _load_counting(self, d, **window):
+        calls = []
+        real = ga._parse_session_file
+
+        def counting(f):
+            calls.append(f.name)
+            return real(f)
+
+        with patch.object(ga, "_parse_session_file", side_effect=counting):
+            sessions = ga.load_sessions(d, use_index=False, **window)
+        return sessions, calls
+
+    def test_since_until_skip_files(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            sessions, calls = self._load_counting(d, since="2026-01-07", until="2026-01-12")
+            self.assertEqual([s["date"] for s in sessions], ["2026-01-07", "2026-01-12"])
+            self.assertEqual(calls, ["2026-01-07.json", "2026-01-12.json"])
+
+    def test_last_n_opens_only_newest(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            sessions, calls = self._load_counting(d, last_n=2)
+            self.assertEqual([s["date"] for s in sessions], ["2026-01-12", "2026-01-14"])
+            self.assertEqual(calls, ["2026-01-14.json", "2026-01-12.json"])
+
+    def test_last_n_skips_past_bad_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            Path(d, "2026-01-20.json").write_text("{broken")
+            with patch('sys.stderr', new_callable=StringIO):
+                sessions = ga.load_sessions(d, last_n=1)
+            self.assertEqual(sessions[0]["date"], "2026-01-14")
+
+    def test_undated_filename_still_filtered_by_content(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            Path(d, "imported.json").write_text(json.dumps(_session("2026-01-13", [])))
+            Path(d, "old.json").write_text(json.dumps(_session("2025-06-01", [])))
+            sessions, calls = self._load_counting(d, since="2026-01-10")
+            self.assertEqual(sorted(s["date"] for s in sessions), ["2026-01-12", "2026-01-13", "2026-01-14"])
+            self.assertIn("old.json", calls)
+
+    def test_window_keeps_index_entries(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            _age_files(d)
+            ga.load_sessions(d)
+            with patch.object(ga, "INDEX_BYPASS_FILES", 0):
+                ga.load_sessions(d, since="2026-01-12")
+            _, cached = ga._read_index(d)
+            self.assertEqual(len(cached), len(ALL_SESS))
+
+    def test_store_window(self):
+        with tempfile.TemporaryDirectory() as d:
+            gym_store.write_store(d, ALL_SESS)
+            sessions = ga.load_sessions(d, since="2026-01-06", until="2026-01-12")
+            self.assertEqual([s["date"] for s in sessions], ["2026-01-07", "2026-01-12"])
+
+    def test_session_windows(self):
+        self.assertEqual(ga._session_window(Namespace(command="summary"), "."), {"last_n": 1})
+        args = Namespace(command="compare", date1="2026-01-14", date2="2026-01-05")
+        self.assertEqual(ga._session_window(args, "."), {"since": "2026-01-05", "until": "2026-01-14"})
+        self.assertEqual(ga._session_window(Namespace(command="e1rm"), "."), {})
+
+    def test_chart_current_period_window(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS + [_session("2025-10-01", [])])
+            args = Namespace(command="chart-e1rm", period="current")
+            self.assertEqual(ga._session_window(args, d), {"since": "2025-12-03"})
+
+    def test_compare_via_main(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.main(["compare", d, "2026-01-14", "2026-01-05", "--json"])
+            self.assertEqual(json.loads(out.getvalue())["date1"], "2026-01-14")
+
+
+
+# ==================== Change 11: Batch mode ====================
+
+class TestBatch(unittest.TestCase):
+    """batch: many history dirs from a manifest or glob, one JSON document or per-athlete files."""
+
+    def _workspace(self, root, name, sessions=ALL_SESS):
+        hist = Path(root, name, "health", "gym", "history")
+        hist.mkdir(parents=True)
+        _write_sessions(hist, sessions)
+        return str(hist)
+
+    def _batch(self, argv):
+        with patch('sys.stdout', new_callable=StringIO) as out, patch('sys.stderr', new_callable=StringIO):
+            try:
+                ga.main(["batch"] + argv)
+                code = 0
+            except SystemExit as e:
+                code = e.code
+        return code, out.getvalue()
+
+    def test_athlete_id(self):
+        self.assertEqual(ga._athlete_id("/srv/alice/health/gym/history"), "alice")
+        self.assertEqual(ga._athlete_id("/data/bob-history"), "bob-history")
+
+    def test_manifest_formats(self):
+        with tempfile.TemporaryDirectory() as d:
+            Path(d, "m.json").write_text(json.dumps(["a/history", {"history": "/abs/h", "id": "x", "goals_file": "g.json"}]))
+            Path(d, "m.txt").write_text("# athletes\na/history\n\n/abs/h\n")
+            js = ga._read_manifest(os.path.join(d, "m.json"))
+            self.assertEqual(js[0]["history_dir"], os.path.join(d, "a/history"))
+            self.assertEqual(js[1], {"id": "x", "history_dir": "/abs/h", "goals_file": os.path.join(d, "g.json")})
+            txt = ga._read_manifest(os.path.join(d, "m.txt"))
+            self.assertEqual([a["history_dir"] for a in txt], [os.path.join(d, "a/history"), "/abs/h"])
+
+    def test_duplicate_ids_get_suffix(self):
+        with tempfile.TemporaryDirectory() as d:
+            h = self._workspace(d, "alice")
+            Path(d, "m.json").write_text(json.dumps([h, h]))
+            athletes = ga._batch_athletes(Namespace(manifest=os.path.join(d, "m.json"), glob=None))
+            self.assertEqual([a["id"] for a in athletes], ["alice", "alice-2"])
+            self.assertTrue(athletes[0]["goals_file"].endswith(os.path.join("gym", "goals.json")))
+
+    def test_combined_document_matches_single_commands(self):
+        with tempfile.TemporaryDirectory() as d:
+            h = self._workspace(d, "alice")
+            self._workspace(d, "bob", ALL_SESS[:2])
+            code, out = self._batch(["--glob", os.path.join(d, "*", "health", "gym", "history")])
+            self.assertEqual(code, 0)
+            doc = json.loads(out)
+            self.assertEqual([a["id"] for a in doc["athletes"]], ["alice", "bob"])
+            with patch('sys.stdout', new_callable=StringIO) as single:
+                ga.cmd_e1rm(ga.load_sessions(h), _make_args(json=True))
+            self.assertEqual(doc["athletes"][0]["e1rm"], json.loads(single.getvalue()))
+            self.assertLessEqual({"adherence_pct", "hard_sets"}, set(doc["athletes"][0]["kpis"]))
+
+    def test_sections_and_out_dir(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._workspace(d, "alice")
+            out_dir = os.path.join(d, "out")
+            code, out = self._batch(["--glob", os.path.join(d, "*", "health", "gym", "history"),
+                                     "--sections", "volume", "--out-dir", out_dir])
+            self.assertEqual(code, 0)
+            report = json.loads(Path(out_dir, "alice.json").read_text())
+            self.assertIn("volume", report)
+            self.assertNotIn("e1rm", report)
+            self.assertIn("alice", out)
+
+    def test_missing_dir_reported_and_exit_1(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._workspace(d, "alice")
+            Path(d, "m.json").write_text(json.dumps(["alice/health/gym/history", "nobody/history"]))
+            out_file = os.path.join(d, "digest.json")
+            code, _ = self._batch(["--manifest", os.path.join(d, "m.json"), "--out", out_file])
+            self.assertEqual(code, 1)
+            doc = json.loads(Path(out_file).read_text())
+            self.assertEqual(doc["failed"], 1)
+            self.assertIn("Directory not found", doc["athletes"][1]["error"])
+            self.assertIn("e1rm", doc["athletes"][0])
+
+    def test_unknown_section(self):
+        with tempfile.TemporaryDirectory() as d:
+            code, _ = self._batch(["--glob", d, "--sections", "bogus"])
+            self.assertEqual(code, 1)
+
+    def test_charts_rendered_in_pool(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._workspace(d, "alice")
+            self._workspace(d, "bob")
+            charts = os.path.join(d, "charts")
+            code, out = self._batch(["--glob", os.path.join(d, "*", "health", "gym", "history"),
+                                     "--sections", "e1rm", "--charts-dir", charts, "--workers", "2"])
+            self.assertEqual(code, 0)
+            self.assertEqual(sorted(os.listdir(charts)),
+                             ["alice-e1rm.png", "alice-volume.png", "bob-e1rm.png", "bob-volume.png"])
+            self.assertEqual(json.loads(out)["athletes"][1]["charts"]["volume"]["path"],
+                             os.path.join(charts, "bob-volume.png"))
+
+
+
+# ==================== Change 12: Multi-chart pipeline ====================
+
+class TestChartsCommand(unittest.TestCase):
+    """charts: several kinds/orientations from one load, per-chart timings."""
+
+    def _charts(self, d, out_dir, **kwargs):
+        defaults = dict(history_dir=d, output_dir=out_dir, kinds="e1rm,volume", orientations="vertical",
+                        format="png", workers=1, no_goals=False, cache_dir=None, planned=None)
+        defaults.update(kwargs)
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            ga.cmd_charts(ALL_SESS, _make_args(**defaults))
+        return out.getvalue()
+
+    def test_renders_every_combination(self):
+        with tempfile.TemporaryDirectory() as d:
+            out_dir = os.path.join(d, "charts")
+            out = self._charts(d, out_dir, orientations="vertical,horizontal")
+            self.assertEqual(sorted(os.listdir(out_dir)), ["e1rm-horizontal.png", "e1rm-vertical.png",
+                                                           "volume-horizontal.png", "volume-vertical.png"])
+            self.assertIn("Rendered 4/4 chart(s)", out)
+
+    def test_json_timings(self):
+        with tempfile.TemporaryDirectory() as d:
+            out = self._charts(d, d, kinds="volume", json=True)
+            doc = json.loads(out)
+            self.assertEqual(len(doc["charts"]), 1)
+            self.assertEqual(doc["charts"][0]["path"], os.path.join(d, "volume-vertical.png"))
+            self.assertGreater(doc["charts"][0]["render_s"], 0)
+            self.assertGreaterEqual(doc["total_s"], doc["charts"][0]["render_s"])
+
+    def test_tables_built_once_per_kind(self):
+        with tempfile.TemporaryDirectory() as d:
+            real = ga.SetTable
+            with patch.object(ga, "SetTable", side_effect=lambda *a, **k: real(*a, **k)) as built:
+                self._charts(d, d, orientations="vertical,horizontal")
+            self.assertEqual(built.call_count, 2)
+
+    def test_same_pixels_as_single_command(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._charts(d, d, kinds="volume")
+            single = os.path.join(d, "single.png")
+            with patch('sys.stdout', new_callable=StringIO):
+                ga.cmd_chart_volume(ALL_SESS, _make_args(output=single))
+            self.assertEqual(Path(single).read_bytes(), Path(d, "volume-vertical.png").read_bytes())
+
+    def test_unknown_kind(self):
+        with tempfile.TemporaryDirectory() as d:
+            with patch('sys.stderr', new_callable=StringIO) as err:
+                with self.assertRaises(SystemExit):
+                    self._charts(d, d, kinds="pie")
+            self.assertIn("pie", err.getvalue())
+
+    def test_process_pool(self):
+        with tempfile.TemporaryDirectory() as d:
+            doc = json.loads(self._charts(d, d, workers=2, json=True))
+            self.assertEqual([c["error"] for c in doc["charts"]], [None, None])
+            self.assertTrue(os.path.exists(os.path.join(d, "e1rm-vertical.png")))
+
+    def test_period_sessions(self):
+        sessions = [_session("2025-10-01", [])] + ALL_SESS
+        self.assertEqual(ga._period_sessions(sessions, "current"), ALL_SESS)
+        self.assertEqual(ga._period_sessions(sessions, "all"), sessions)
+
+
+
+# ==================== Change 13: Rolling-window KPIs ====================
+
+class TestKpisCommand(unittest.TestCase):
+    """kpis --window/--compare on the prefix-sum engine."""
+
+    def _kpis(self, sessions, **kwargs):
+        defaults = dict(history_dir="/nonexistent", window="14", compare="previous", end=None, json=True)
+        defaults.update(kwargs)
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            ga.cmd_kpis(sessions, _make_args(**defaults))
+        return json.loads(out.getvalue()) if defaults["json"] else out.getvalue()
+
+    def test_matches_compute_kpis(self):
+        table = ga.SetTable(ALL_SESS)
+        lift_data = ga._lift_data(table, ["Squat", "Bench Press", "OHP", "Seated Cable Row"])
+        adherence, avg, avg_change, volume, vol_change, cur, prev = ga._compute_kpis(ALL_SESS, lift_data, table)
+        w = self._kpis(ALL_SESS)["windows"][0]
+        self.assertEqual((w["current"]["adherence_pct"], w["current"]["avg_e1rm"], w["change"]["avg_e1rm"],
+                          w["current"]["hard_sets"], w["change"]["hard_sets"], w["current"]["sessions"],
+                          w["previous"]["sessions"]),
+                         (adherence, avg, avg_change, volume, vol_change, cur, prev))
+
+    def test_multiple_windows(self):
+        doc = self._kpis(ALL_SESS, window="7,14,28")
+        self.assertEqual([w["days"] for w in doc["windows"]], [7, 14, 28])
+        self.assertEqual(doc["end"], "2026-01-14")
+        self.assertEqual(doc["windows"][2]["current"]["sessions"], 4)
+        self.assertEqual(doc["windows"][0]["current"]["start"], "2026-01-08")
+
+    def test_compare_none_and_range(self):
+        self.assertNotIn("previous", self._kpis(ALL_SESS, compare="none")["windows"][0])
+        w = self._kpis(ALL_SESS, window="7", compare="2026-01-05:2026-01-07")["windows"][0]
+        self.assertEqual(w["previous"]["sessions"], 2)
+        self.assertEqual(w["change"]["sessions"], 0)
+
+    def test_text_output(self):
+        out = self._kpis(ALL_SESS, json=False, window="7,14")
+        self.assertIn("KPIs to 2026-01-14", out)
+        self.assertIn("14d  sessions 4", out)
+
+    def test_invalid_options(self):
+        for kwargs in ({"window": "0"}, {"window": "x"}, {"compare": "2026-01-07:2026-01-05"}, {"compare": "bad"}):
+            with patch('sys.stderr', new_callable=StringIO):
+                with self.assertRaises(SystemExit):
+                    self._kpis(ALL_SESS, **kwargs)
+
+    def test_load_window(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            args = Namespace(command="kpis", window="7", compare="previous", end=None)
+            self.assertEqual(ga._session_window(args, d), {"since": "2026-01-01", "until": "2026-01-14"})
+            args = Namespace(command="kpis", window="7", compare="none", end="2026-01-10")
+            self.assertEqual(ga._session_window(args, d), {"since": "2026-01-04", "until": "2026-01-10"})
+
+    def test_malformed_end(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            _, err, rc = run_cmd("kpis", d, "--end", "bad", expect_fail=True)
+            self.assertEqual(rc, 1)
+            self.assertIn("Invalid --end date: bad", err)
+            self.assertNotIn("Traceback", err)
+            with self.assertRaisesRegex(ga.AnalyticsError, "Invalid --end date: bad"):
+                ga.kpi_windows(d, end="bad")
+
+    def test_impossible_end(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            _, err, rc = run_cmd("kpis", d, "--end", "2024-02-30", expect_fail=True)
+            self.assertEqual(rc, 1)
+            self.assertIn("Invalid --end date: 2024-02-30", err)
+            self.assertNotIn("Traceback", err)
+            with self.assertRaisesRegex(ga.AnalyticsError, "Invalid --end date"):
+                ga.kpi_windows(ALL_SESS, end="2024-02-30")
+
+
+
+# ==================== Change 14: Session records ====================
+
+class TestSessionRecords(unittest.TestCase):
+    """Loaded sessions carry their date fields; plain dicts hit a per-date cache."""
+
+    def test_record_fields(self):
+        rec = ga.make_record(dict(SESS_C))
+        self.assertIsInstance(rec, ga.SessionRecord)
+        self.assertEqual(rec.day, datetime(2026, 1, 12))
+        self.assertEqual(rec.ordinal, datetime(2026, 1, 12).toordinal())
+        self.assertEqual((rec.week, rec.week_start), (ga.week_key("2026-01-12"), "2026-01-12"))
+        self.assertEqual(ga.date_fields(rec), ga.date_fields(SESS_C))
+
+    def test_record_behaves_like_dict(self):
+        rec = ga.make_record(json.loads(json.dumps(SESS_A)))
+        self.assertEqual(rec, SESS_A)
+        self.assertEqual(json.loads(json.dumps(rec)), SESS_A)
+        self.assertFalse(hasattr(rec, "__dict__"))
+        import pickle
+        again = pickle.loads(pickle.dumps(rec))
+        self.assertEqual((again, again.ordinal), (rec, rec.ordinal))
+
+    def test_unparseable_date_stays_plain(self):
+        raw = {"date": "2026-13-45", "actual": []}
+        self.assertIs(ga.make_record(raw), raw)
+
+    def test_names_interned(self):
+        a = ga.make_record(json.loads(json.dumps(SESS_A)))
+        c = ga.make_record(json.loads(json.dumps(SESS_C)))
+        self.assertIs(a["actual"][0]["name"], c["actual"][0]["name"])
+
+    def test_load_sessions_returns_records(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            for use_index in (True, True, False):
+                sessions = ga.load_sessions(d, use_index=use_index)
+                self.assertTrue(all(type(s) is ga.SessionRecord for s in sessions))
+                self.assertEqual(sessions, ALL_SESS)
+            gym_store.write_store(d, [_session("2026-02-01", [])])
+            self.assertIs(type(ga.load_sessions(d)[-1]), ga.SessionRecord)
+
+    def test_dates_parsed_once(self):
+        ga._date_fields.cache_clear()
+        sessions = [ga.make_record(dict(s)) for s in ALL_SESS]
+        misses = ga._date_fields.cache_info().misses
+        ga.SetTable(sessions)
+        ga._period_sessions(sessions, "current")
+        ga._compute_kpis(sessions, {})
+        ga.SetTable(ALL_SESS)
+        self.assertEqual(ga._date_fields.cache_info().misses, misses)
+
+
+# ==================== Change 15: Benchmark suite ====================
+
+class TestBenchSuite(unittest.TestCase):
+    def test_generator_deterministic(self):
+        import gym_bench
+        opts = dict(seed=3, years=0.5, sessions_per_week=4, legacy_fraction=0.5)
+        self.assertEqual(gym_bench.generate_history(**opts), gym_bench.generate_history(**opts))
+        self.assertNotEqual(gym_bench.generate_history(seed=1, sessions=10),
+                            gym_bench.generate_history(seed=2, sessions=10))
+
+    def test_generator_options(self):
+        import gym_bench
+        history = gym_bench.generate_history(years=1, sessions_per_week=4, sets=(3, 3),
+                                             variants=False, legacy_fraction=0.25)
+        self.assertEqual(len(history), 208)
+        first = datetime.strptime(history[0]["date"], "%Y-%m-%d")
+        last = datetime.strptime(history[-1]["date"], "%Y-%m-%d")
+        self.assertAlmostEqual(len(history) / ((last - first).days / 7), 4, delta=0.1)
+        legacy = [s for s in history if "exercises" in s]
+        self.assertEqual(len(legacy), 52)
+        self.assertTrue(all("actual" not in s for s in legacy))
+        for s in history:
+            for ex in s.get("actual") or s["exercises"]:
+                self.assertNotIn(ex["name"], gym_bench.VARIANTS)
+                self.assertEqual(len(ex["sets"]), 3)
+
+    def test_legacy_sessions_load(self):
+        import gym_bench
+        history = gym_bench.generate_history(sessions=12, legacy_fraction=0.5)
+        with tempfile.TemporaryDirectory() as d:
+            gym_bench.write_history(d, history)
+            sessions = ga.load_sessions(d)
+        self.assertEqual(len(sessions), 12)
+        self.assertTrue(all(s["actual"] for s in sessions))
+
+    def test_compare_results(self):
+        import gym_bench
+        base = {"results": [{"name": "e1rm", "median_ms": 100}, {"name": "summary", "median_ms": 2},
+                            {"name": "gone", "median_ms": 5}]}
+        new = {"results": [{"name": "e1rm", "median_ms": 130}, {"name": "summary", "median_ms": 4},
+                           {"name": "added", "median_ms": 5}]}
+        rows = {r["name"]: r for r in gym_bench.compare_results(base, new, threshold=0.2, min_ms=5)}
+        self.assertEqual(set(rows), {"e1rm", "summary"})
+        self.assertTrue(rows["e1rm"]["regression"])
+        self.assertEqual(rows["e1rm"]["change_pct"], 30.0)
+        self.assertFalse(rows["summary"]["regression"])  # +100% but only 2 ms
+
+    def test_suite_runs_commands(self):
+        import gym_bench
+        result = gym_bench.bench_suite(years=0.2, repeat=1, only={"summary", "log", "migrate", "live-done"})
+        self.assertEqual([r["name"] for r in result["results"]], ["summary", "log", "migrate", "live-done"])
+        self.assertTrue(all(r["exit_code"] == 0 for r in result["results"]), result["results"])
+        self.assertEqual(result["sessions"], 31)
+        self.assertEqual(result["cpus"], os.cpu_count())
+
+
+# ==================== Change 16: Tracing ====================
+
+class TestTrace(unittest.TestCase):
+    def _main(self, *argv, env=None):
+        with patch.dict(os.environ, env or {}), \
+                patch('sys.stdout', new_callable=StringIO), patch('sys.stderr', new_callable=StringIO) as err:
+            try:
+                ga.main(list(argv))
+            except SystemExit:
+                pass
+        return err.getvalue()
+
+    def test_disabled_is_noop(self):
+        self.assertIsNone(ga._TRACER)
+        self.assertIs(ga.trace_span("load"), ga._NULL_SPAN)
+        with ga.trace_span("load") as span:
+            span.set(sessions=1)
+        ga.trace_phase("compute")
+        self.assertIsNone(ga._TRACER)
+
+    def test_phases_close_at_span_end(self):
+        tracer = ga.Tracer(time.perf_counter())
+        with patch.object(ga, "_TRACER", tracer):
+            with ga.trace_span("cmd"):
+                ga.trace_phase("compute")
+                with ga.trace_span("inner"):
+                    pass
+                ga.trace_phase("output", rows=3)
+            ga.trace_phase("after")
+        root = tracer.finish()
+        cmd, after = root.children
+        self.assertEqual([c.name for c in cmd.children], ["compute", "output"])
+        self.assertEqual([c.name for c in cmd.children[0].children], ["inner"])
+        self.assertEqual(cmd.children[1].attrs, {"rows": 3})
+        self.assertEqual(after.name, "after")
+        for span in (cmd, *cmd.children, after):
+            self.assertIsNotNone(span.end)
+            self.assertLessEqual(span.start, span.end)
+        self.assertLessEqual(cmd.children[0].end, cmd.children[1].start)
+
+    def test_trace_tree_on_stderr(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            err = self._main("e1rm", d, "--json", "--trace")
+        self.assertIn("trace (ms):", err)
+        for name in ("startup", "parse args", "e1rm", "load", "day files", "compute", "output"):
+            self.assertRegex(err, rf"\n\s+{name}\s+\d")
+        self.assertIsNone(ga._TRACER)
+
+    def test_env_json_to_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            out = os.path.join(d, "trace.json")
+            err = self._main("summary", d, env={ga.TRACE_ENV: "json", ga.TRACE_OUT_ENV: out})
+            tree = json.loads(Path(out).read_text())
+        self.assertNotIn("trace", err)
+        cmd = next(c for c in tree["children"] if c["name"] == "summary")
+        load = cmd["children"][0]
+        self.assertEqual(load["name"], "load")
+        self.assertEqual(load["attrs"]["last_n"], 1)
+        self.assertEqual([c["name"] for c in cmd["children"][1:]], ["compute", "output"])
+
+    def test_chrome_trace_events(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            err = self._main("volume", d, "--trace=chrome")
+        events = json.loads(err)["traceEvents"]
+        self.assertEqual(events[0]["name"], "total")
+        self.assertTrue(all(e["ph"] == "X" and e["dur"] >= 0 for e in events))
+        self.assertIn("compute", [e["name"] for e in events])
+
+    def test_trace_survives_error_exit(self):
+        with tempfile.TemporaryDirectory() as d:
+            err = self._main("summary", os.path.join(d, "missing"), "--trace")
+        self.assertIn("Directory not found", err)
+        self.assertIn("trace (ms):", err)
+        self.assertIsNone(ga._TRACER)
+
+    def test_daemon_argv_carries_env(self):
+        with patch.dict(os.environ, {ga.TRACE_ENV: "1", ga.TRACE_OUT_ENV: "t.json"}):
+            argv = ga._trace_argv(["e1rm", "h"])
+        self.assertEqual(argv[:3], ["e1rm", "h", "--trace=tree"])
+        self.assertEqual(argv[3:], ["--trace-out", os.path.abspath("t.json")])
+        with patch.dict(os.environ, {ga.TRACE_ENV: "json"}):
+            self.assertEqual(ga._trace_argv(["e1rm", "h", "--trace"]), ["e1rm", "h", "--trace"])
+        with patch.dict(os.environ, {ga.TRACE_ENV: "0"}):
+            self.assertEqual(ga._trace_argv(["e1rm", "h"]), ["e1rm", "h"])
+
+
+# ==================== Change 17: Fast chart renderer ====================
+
+class TestFastRenderer(unittest.TestCase):
+    """chart-e1rm --renderer fast: Pillow drawing of the same dashboard."""
+
+    def _render(self, d, sessions=ALL_SESS, **kwargs):
+        out_path = os.path.join(d, kwargs.pop("name", "chart.png"))
+        args = _make_args(output=out_path, history_dir=d, renderer="fast", **kwargs)
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            ga.cmd_chart_e1rm(sessions, args)
+        return out_path, out.getvalue()
+
+    def test_vertical_png(self):
+        from PIL import Image
+        with tempfile.TemporaryDirectory() as d:
+            gp = os.path.join(d, "goals.json")
+            with open(gp, "w") as f:
+                json.dump([{"date_set": "2026-01-05", "target_date": "2026-04-05",
+                            "goals": {"Squat": 170}}], f)
+            path, out = self._render(d, goals_file=gp, planned='{"Squat": 120}')
+            self.assertEqual(out.strip(), f"Chart saved to {path}")
+            with Image.open(path) as img:
+                self.assertEqual(img.format, "PNG")
+                self.assertEqual(img.size, (1290, 2796))
+
+    def test_horizontal_and_jpeg(self):
+        from PIL import Image
+        with tempfile.TemporaryDirectory() as d:
+            path, _ = self._render(d, horizontal=True, name="chart.jpg")
+            with Image.open(path) as img:
+                self.assertEqual(img.format, "JPEG")
+                self.assertGreater(img.width, img.height)
+
+    def test_unsupported_format_exits(self):
+        with tempfile.TemporaryDirectory() as d:
+            with patch('sys.stderr', new_callable=StringIO), self.assertRaises(SystemExit):
+                self._render(d, name="chart.svg")
+
+    def test_return_fig_stays_on_matplotlib(self):
+        with tempfile.TemporaryDirectory() as d:
+            args = _make_args(output=os.path.join(d, "c.png"), history_dir=d, renderer="fast", _return_fig=True)
+            fig, ax = ga.cmd_chart_e1rm(ALL_SESS, args)
+            self.assertTrue(ax.get_lines())
+            import matplotlib.pyplot as plt
+            plt.close(fig)
+
+    def test_cache_keyed_by_renderer(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = os.path.join(d, "cache")
+            self._render(d, cache_dir=cache)
+            _, out = self._render(d, cache_dir=cache)
+            self.assertIn("cache hit", out)
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_chart_e1rm(ALL_SESS, _make_args(output=os.path.join(d, "m.png"), history_dir=d,
+                                                       cache_dir=cache, renderer="matplotlib"))
+            self.assertIn("cache miss", out.getvalue())
+
+    def test_missing_pillow_exits(self):
+        with tempfile.TemporaryDirectory() as d:
+            with patch.dict(sys.modules, {"gym_render": None}), \
+                    patch('sys.stderr', new_callable=StringIO) as err, self.assertRaises(SystemExit):
+                self._render(d)
+            self.assertIn("Pillow", err.getvalue())
+
+    def test_charts_passes_renderer(self):
+        with tempfile.TemporaryDirectory() as d:
+            with patch.object(ga, "_chart_e1rm_fast", wraps=ga._chart_e1rm_fast) as fast, \
+                    patch('sys.stdout', new_callable=StringIO):
+                ga.cmd_charts(ALL_SESS, _make_args(history_dir=d, output_dir=d, kinds="e1rm",
+                                                   orientations="vertical", format="png", workers=1,
+                                                   no_goals=True, cache_dir=None, planned=None,
+                                                   renderer="fast"))
+            self.assertEqual(fast.call_count, 1)
+            self.assertTrue(os.path.exists(os.path.join(d, "e1rm-vertical.png")))
+
+    def test_cli_flag(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            out_path = os.path.join(d, "chart.png")
+            run_cmd("chart-e1rm", d, out_path, "--renderer", "fast")
+            self.assertGreater(os.path.getsize(out_path), 1000)
+
+
+
+# ==================== Change 18: Compact chart encoding ====================
+
+class TestChartEncoding(unittest.TestCase):
+    """--optimize / --quality / --max-bytes re-encode charts through gym_encode."""
+
+    def _render(self, d, name, cmd=ga.cmd_chart_e1rm, **kwargs):
+        out_path = os.path.join(d, name)
+        args = _make_args(output=out_path, history_dir=d, no_goals=True, **kwargs)
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            cmd(ALL_SESS, args)
+        return out_path, out.getvalue()
+
+    def test_no_options_unchanged(self):
+        self.assertIsNone(ga._chart_encoding(_make_args(output="c.png")))
+        with tempfile.TemporaryDirectory() as d:
+            path, out = self._render(d, "chart.png")
+            self.assertEqual(out.strip(), f"Chart saved to {path}")
+
+    def test_optimized_png_is_palette_and_reported(self):
+        from PIL import Image
+        with tempfile.TemporaryDirectory() as d:
+            plain, _ = self._render(d, "plain.png")
+            path, out = self._render(d, "chart.png", optimize=True)
+            self.assertLess(os.path.getsize(path), os.path.getsize(plain))
+            with Image.open(path) as img:
+                self.assertEqual((img.mode, img.size), ("P", (1290, 2796)))
+            self.assertRegex(out, r"\(png [\d.]+ KB, 256 colors, encoded in \d+ ms\)")
+
+    def test_max_bytes_webp(self):
+        from PIL import Image
+        with tempfile.TemporaryDirectory() as d:
+            path, out = self._render(d, "chart.webp", max_bytes="60k", horizontal=True)
+            self.assertLessEqual(os.path.getsize(path), 60 * 1024)
+            with Image.open(path) as img:
+                self.assertEqual(img.format, "WEBP")
+            self.assertNotIn("over --max-bytes", out)
+
+    def test_fast_renderer_jpeg_quality(self):
+        from PIL import Image
+        with tempfile.TemporaryDirectory() as d:
+            path, out = self._render(d, "chart.jpg", renderer="fast", quality=40)
+            with Image.open(path) as img:
+                self.assertEqual(img.format, "JPEG")
+            self.assertIn("quality 40", out)
+
+    def test_chart_volume(self):
+        with tempfile.TemporaryDirectory() as d:
+            path, out = self._render(d, "vol.webp", cmd=ga.cmd_chart_volume, quality=50)
+            self.assertIn("webp", out)
+            self.assertGreater(os.path.getsize(path), 0)
+
+    def test_bad_options_exit(self):
+        for kwargs in ({"output": "c.svg", "optimize": True}, {"output": "c.png", "max_bytes": "lots"},
+                       {"output": "c.jpg", "quality": 101}):
+            with patch('sys.stderr', new_callable=StringIO), self.assertRaises(SystemExit):
+                ga._chart_encoding(_make_args(**kwargs))
+
+    def test_cache_keyed_by_encoding(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = os.path.join(d, "cache")
+            _, out = self._render(d, "c.png", cache_dir=cache, optimize=True)
+            self.assertIn("256 colors, encoded in", out)
+            self.assertIn("cache miss", out)
+            _, out = self._render(d, "c.png", cache_dir=cache, optimize=True)
+            self.assertIn("cache hit", out)
+            _, out = self._render(d, "c.png", cache_dir=cache)
+            self.assertIn("cache miss", out)
+
+    def test_charts_passes_options_and_reports_bytes(self):
+        with tempfile.TemporaryDirectory() as d:
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_charts(ALL_SESS, _make_args(history_dir=d, output_dir=d, kinds="e1rm,volume",
+                                                   orientations="horizontal", format="webp", workers=1,
+                                                   no_goals=True, cache_dir=None, planned=None,
+                                                   max_bytes="80k", json=True))
+            charts = json.loads(out.getvalue())["charts"]
+            for c in charts:
+                self.assertIsNone(c["error"])
+                self.assertEqual(c["bytes"], os.path.getsize(c["path"]))
+                self.assertLessEqual(c["bytes"], 80 * 1024)
+
+    def test_cli_flags(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            out_path = os.path.join(d, "chart.webp")
+            stdout, _, _ = run_cmd("chart-e1rm", d, out_path, "--optimize", "--max-bytes", "100k")
+            self.assertIn("webp", stdout)
+            self.assertLessEqual(os.path.getsize(out_path), 100 * 1024)
+
+
+
+# ==================== Change 19: Session analysis cache ====================
+
+class TestSessionAnalysis(unittest.TestCase):
+    """analyze: per-session analysis computed incrementally and stored in the history."""
+
+    GOALS = [{"date_set": "2026-01-05", "target_date": "2026-03-30", "goals": {"Squat": 120}}]
+
+    def _analyze(self, d, **kwargs):
+        args = _make_args(history_dir=d, force=False, **kwargs)
+        with patch('sys.stdout', new_callable=StringIO) as out:
+            ga.cmd_analyze(ga.load_sessions(d), args)
+        return out.getvalue()
+
+    def _read(self, d, date):
+        with open(os.path.join(d, f"{date}.json")) as f:
+            return json.load(f)
+
+    def test_deltas_and_week_volume(self):
+        (_, a, _), (_, b, _), (_, c, _), _ = ga.analyze_sessions(ALL_SESS)
+        self.assertEqual(a["e1rm"]["Squat"], 102.0)
+        self.assertEqual(a["e1rm_delta"]["Squat"]["trend"], "new")
+        self.assertEqual(b["e1rm_delta"]["Squat"],
+                         {"previous": 102.0, "current": 106.67, "delta": 4.67, "trend": "↑", "sessions_at_current": 1})
+        self.assertNotIn("Pull-ups", b["e1rm"])  # bodyweight only
+        self.assertEqual(b["volume_sets"], {"shoulders": 2, "back": 2, "legs": 2})
+        self.assertEqual(b["volume_week_total"], {"legs": 5, "chest": 2, "back": 4, "shoulders": 2})
+        self.assertEqual(c["volume_week_total"], {"legs": 2, "chest": 2, "back": 1})  # new ISO week
+
+    def test_sessions_at_current(self):
+        sessions = [_session(d, [_ex("Squat", "legs", [_s(100, 5)])]) for d in ("2026-01-05", "2026-01-07", "2026-01-09")]
+        last = ga.analyze_sessions(sessions)[-1][1]["e1rm_delta"]["Squat"]
+        self.assertEqual((last["trend"], last["delta"], last["sessions_at_current"]), ("→", 0, 3))
+
+    def test_goal_progress(self):
+        results = ga.analyze_sessions(ALL_SESS, goals=self.GOALS)
+        c = results[2][1]["goal_progress"]["Squat"]
+        self.assertEqual(c, {"start": 102.0, "current": 107.67, "target": 120, "remaining_weeks": 11.0,
+                             "needed_per_week": 1.12, "status": "on_track"})
+        # No squat on D: progress carries the latest value forward
+        self.assertEqual(results[3][1]["goal_progress"]["Squat"]["current"], 107.67)
+        behind = ga.analyze_sessions(ALL_SESS, goals=[dict(self.GOALS[0], goals={"Squat": 200})])
+        self.assertEqual(behind[2][1]["goal_progress"]["Squat"]["status"], "behind")
+
+    def test_plan_adherence(self):
+        s = _session("2026-01-05", [_ex("Squat", "legs", [_s(100, 5)])],
+                     planned=[{"name": "Squat"}, {"name": "Bench Press"}])
+        self.assertEqual(ga.analyze_sessions([s])[0][1]["plan_adherence"], 0.5)
+
+    def test_incremental_writes_and_keeps_manual_keys(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            out = self._analyze(d)
+            self.assertIn("4 updated (4 day file(s)", out)
+            self.assertIn("0 updated", self._analyze(d))
+
+            data = self._read(d, "2026-01-12")
+            self.assertEqual(data["analysis"]["e1rm"]["Squat"], 107.67)
+            data["analysis"]["notes"] = "kept"
+            data["actual"][0]["sets"][0]["weight_kg"] = 90
+            Path(d, "2026-01-12.json").write_text(json.dumps(data))
+            before = Path(d, "2026-01-14.json").stat().st_mtime_ns
+            out = self._analyze(d, json=True)
+            self.assertEqual(json.loads(out)["updated"], 1)
+            data = self._read(d, "2026-01-12")
+            self.assertEqual(data["analysis"]["notes"], "kept")
+            self.assertEqual(data["analysis"]["e1rm"]["Squat"], 114.0)
+            self.assertEqual(Path(d, "2026-01-14.json").stat().st_mtime_ns, before)
+
+    def test_change_propagates_to_dependent_sessions(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            self._analyze(d)
+            data = self._read(d, "2026-01-05")
+            data["actual"][0]["sets"] = [_s(100, 5)]
+            Path(d, "2026-01-05.json").write_text(json.dumps(data))
+            # A changed; B's squat delta depends on A; C's on B only
+            self.assertEqual(json.loads(self._analyze(d, json=True))["updated"], 2)
+            self.assertEqual(self._read(d, "2026-01-07")["analysis"]["e1rm_delta"]["Squat"]["previous"], 116.67)
+
+    def test_legacy_exercises_key_preserved(self):
+        with tempfile.TemporaryDirectory() as d:
+            legacy = {"date": "2026-01-05", "exercises": SESS_A["actual"]}
+            Path(d, "2026-01-05.json").write_text(json.dumps(legacy))
+            self._analyze(d)
+            data = self._read(d, "2026-01-05")
+            self.assertNotIn("actual", data)
+            self.assertEqual(data["analysis"]["e1rm"]["Squat"], 102.0)
+
+    def test_store_sessions(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            with patch('sys.stdout', new_callable=StringIO):
+                ga.cmd_migrate(_make_args(history_dir=d, remove=True))
+            self.assertIn("4 store record(s)", self._analyze(d))
+            sessions = ga.load_sessions(d)
+            self.assertTrue(all(ga.cached_analysis(s) for s in sessions))
+            self.assertIn("0 updated", self._analyze(d))
+
+    def test_summary_reads_stored_analysis(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            self._analyze(d, goals_file=None)
+            last = ga.load_sessions(d, last_n=1)
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_summary(last, _make_args(json=True))
+            result = json.loads(out.getvalue())
+            self.assertEqual(result["analysis"]["e1rm_delta"]["OHP"]["previous"], 53.33)
+            self.assertEqual(result["analysis"]["volume_week_total"]["shoulders"], 3)
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_summary(last, _make_args())
+            self.assertIn("e1RM: OHP 56.7 ↑ +3.3", out.getvalue())
+            self.assertIn("Week sets: legs 2", out.getvalue())
+            # Edited exercises without a re-run: the stored analysis is not shown
+            last[0]["actual"][0]["sets"][0]["reps"] = 12
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_summary(last, _make_args(json=True))
+            self.assertNotIn("analysis", json.loads(out.getvalue()))
+
+    def test_progress_and_compare_from_stored_analysis(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            sessions = ga.load_sessions(d)
+            expected = ga.SetTable(sessions).progress_entries("Squat")
+            self._analyze(d)
+            sessions = ga.load_sessions(d)
+            with patch.object(ga, "SetTable") as table, patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_progress(sessions, _make_args(exercise="Squat", json=True))
+            table.assert_not_called()
+            self.assertEqual(json.loads(out.getvalue()), expected)
+            with patch('sys.stdout', new_callable=StringIO) as out:
+                ga.cmd_compare(sessions, _make_args(date1="2026-01-05", date2="2026-01-07", json=True))
+            squat = next(e for e in json.loads(out.getvalue())["exercises"] if e["name"] == "Squat")
+            self.assertEqual((squat["e1rm_1"], squat["e1rm_2"], squat["e1rm_diff"]), (102.0, 106.67, 4.67))
+
+    def test_progress_falls_back_without_analysis(self):
+        with patch.object(ga, "SetTable", wraps=ga.SetTable) as table, patch('sys.stdout', new_callable=StringIO):
+            ga.cmd_progress(ALL_SESS, _make_args(exercise="Squat"))
+        table.assert_called_once()
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            stdout, _, _ = run_cmd("analyze", d)
+            self.assertIn("Analyzed 4 session(s): 4 updated", stdout)
+            # --force recomputes everything but only rewrites sessions whose analysis differs
+            stdout, _, _ = run_cmd("analyze", d, "--force", "--json")
+            self.assertEqual(json.loads(stdout)["updated"], 0)
+
+
+
+# ==================== Change 20: Watch mode ====================
+
+class _FakeWatcher:
+    """Replays batches of event names; each read() pops one batch (empty = timeout)."""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.reads = 0
+
+    def read(self, timeout):
+        self.reads += 1
+        return set(self.batches.pop(0)) if self.batches else set()
+
+
+class TestWatch(unittest.TestCase):
+    """watch: debounced change detection and incremental output refresh."""
+
+    def _watch(self, d, out, edits, **kwargs):
+        """Run cmd_watch (polling) in a thread; apply each edit once the previous update printed."""
+        import threading
+        args = _make_args(history_dir=d, out_dir=out, outputs="kpis,e1rm", window="14", format="png",
+                          debounce=0.05, poll=0.02, max_updates=len(edits) + 1, no_index=False,
+                          no_goals=True, cache_dir=None, planned=None, renderer="matplotlib", json=True)
+        vars(args).update(kwargs)
+        buf = StringIO()
+        with patch('sys.stdout', buf), patch.object(ga, "_WARM", None):
+            t = threading.Thread(target=ga.cmd_watch, args=(args,))
+            t.start()
+            for i, edit in enumerate(edits, 1):
+                deadline = time.time() + 20
+                while buf.getvalue().count("\n") < i and time.time() < deadline:
+                    time.sleep(0.02)
+                time.sleep(0.05)
+                edit()
+            t.join(30)
+        self.assertFalse(t.is_alive())
+        return [json.loads(line) for line in buf.getvalue().splitlines()]
+
+    def _edit(self, path, fn):
+        def edit():
+            data = json.loads(Path(path).read_text())
+            fn(data)
+            Path(path).write_text(json.dumps(data))
+        return edit
+
+    def test_updates_outputs_on_change(self):
+        with tempfile.TemporaryDirectory() as d, tempfile.TemporaryDirectory() as out:
+            _write_sessions(Path(d), ALL_SESS)
+            last = os.path.join(d, "2026-01-14.json")
+            bump = self._edit(last, lambda s: s["actual"][0]["sets"].append(_s(45, 8)))
+            reports = self._watch(d, out, [bump])
+            self.assertEqual([o["status"] for o in reports[0]["outputs"]], ["written", "rendered"])
+            self.assertEqual(reports[1]["changed"], ["2026-01-14.json"])
+            self.assertEqual([o["status"] for o in reports[1]["outputs"]], ["written", "rendered"])
+            kpis = json.loads(Path(out, "kpis.json").read_text())
+            self.assertEqual(kpis["end"], "2026-01-14")
+            self.assertTrue(os.path.exists(os.path.join(out, "e1rm-vertical.png")))
+
+    def test_notes_only_change_skips_outputs(self):
+        with tempfile.TemporaryDirectory() as d, tempfile.TemporaryDirectory() as out:
+            _write_sessions(Path(d), ALL_SESS)
+            note = self._edit(os.path.join(d, "2026-01-14.json"), lambda s: s.update(notes="felt good"))
+            reports = self._watch(d, out, [note])
+            self.assertEqual([o["status"] for o in reports[1]["outputs"]], ["skipped", "skipped"])
+
+    def test_change_before_kpi_window_skips_kpis(self):
+        with tempfile.TemporaryDirectory() as d, tempfile.TemporaryDirectory() as out:
+            _write_sessions(Path(d), ALL_SESS + [_session("2026-03-02", [_ex("Squat", "legs", [_s(90, 5)])])])
+            old = self._edit(os.path.join(d, "2026-01-05.json"), lambda s: s["actual"].pop())
+            reports = self._watch(d, out, [old])
+            self.assertEqual({o["name"]: o["status"] for o in reports[1]["outputs"]},
+                             {"kpis": "skipped", "e1rm": "rendered"})
+
+    def test_analysis_output(self):
+        with tempfile.TemporaryDirectory() as d, tempfile.TemporaryDirectory() as out:
+            _write_sessions(Path(d), ALL_SESS)
+            reports = self._watch(d, out, [], outputs="analysis")
+            self.assertEqual(reports[0]["outputs"][0]["status"], "4 updated")
+            self.assertTrue(all(ga.cached_analysis(s) for s in ga.load_sessions(d)))
+
+    def test_collect_changes_debounces(self):
+        watcher = _FakeWatcher([{"a.json"}, {"b.json"}, set(), {"c.json"}])
+        self.assertEqual(ga._collect_changes(watcher, 0.01), {"a.json", "b.json"})
+        self.assertEqual(ga._collect_changes(watcher, 0.01), {"c.json"})
+
+    def test_collect_changes_is_bounded(self):
+        class Busy:
+            def read(self, timeout):
+                time.sleep(0.005)
+                return {"x.json"}
+        t0 = time.monotonic()
+        ga._collect_changes(Busy(), 0.02)
+        self.assertLess(time.monotonic() - t0, 0.02 * ga.WATCH_MAX_DELAY + 0.05)
+
+    def test_poller_filters_names(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), [SESS_A])
+            poller = ga._Poller(d, 0.01)
+            Path(d, ".gym-index").write_text("{}")
+            Path(d, ".2026-01-05.json.1.tmp").write_text("{}")
+            Path(d, "2026-01-05.json").write_text(json.dumps(SESS_B))
+            self.assertEqual(poller.read(0.01), {"2026-01-05.json"})
+            self.assertEqual(poller.read(0.01), set())
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux-only")
+    def test_inotify(self):
+        with tempfile.TemporaryDirectory() as d:
+            watcher, mode = ga._open_watcher(d)
+            try:
+                self.assertEqual(mode, "inotify")
+                self.assertEqual(watcher.read(0.01), set())
+                tmp = Path(d, ".2026-01-05.json.9.tmp")
+                tmp.write_text("{}")
+                os.replace(tmp, Path(d, "2026-01-05.json"))
+                Path(d, "notes.txt").write_text("x")
+                self.assertEqual(ga._collect_changes(watcher, 0.05), {"2026-01-05.json"})
+            finally:
+                watcher.close()
+
+    def test_bad_outputs_exit(self):
+        with tempfile.TemporaryDirectory() as d:
+            args = _make_args(history_dir=d, out_dir=d, outputs="kpis,pdf", debounce=0.1, poll=None)
+            with patch('sys.stderr', new_callable=StringIO) as err, self.assertRaises(SystemExit):
+                ga.cmd_watch(args)
+            self.assertIn("pdf", err.getvalue())
+
+    def test_not_forwarded_to_daemon(self):
+        with tempfile.TemporaryDirectory() as d:
+            with patch.object(ga, "_try_daemon") as daemon, patch.object(ga, "cmd_watch") as watch, \
+                    patch.object(sys, "argv", ["gym_analytics.py", "watch", d, d]):
+                ga.main()
+            daemon.assert_not_called()
+            watch.assert_called_once()
+
+
+# ==================== Change 21: SQLite query layer ====================
+
+class TestSqliteQueries(unittest.TestCase):
+    """db sync / query / --from-db: the SQLite mirror of the history."""
+
+    def test_db_sync_and_info(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            out, _, _ = run_cmd("db", "sync", d, "--json")
+            result = json.loads(out)
+            self.assertEqual((result["sessions"], result["reparsed"], result["errors"]), (4, 4, 0))
+            self.assertEqual(result["tables"]["exercises"], 12)
+            self.assertTrue(os.path.isfile(os.path.join(d, ".gym.sqlite")))
+            out, _, _ = run_cmd("db", "info", d)
+            self.assertIn("4 sessions, 12 exercises", out)
+
+    def test_info_without_db_fails(self):
+        with tempfile.TemporaryDirectory() as d:
+            _, err, rc = run_cmd("db", "info", d, expect_fail=True)
+            self.assertEqual(rc, 1)
+            self.assertIn("db sync", err)
+
+    def test_from_db_matches_session_commands(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            db = os.path.join(d, "mirror.sqlite")
+            for argv in (["e1rm", d], ["volume", d], ["progress", d, "Squat"], ["progress", d, "bench"]):
+                expected, _, _ = run_cmd(*argv, "--json")
+                served, _, _ = run_cmd(*argv, "--json", "--from-db", "--db", db)
+                self.assertEqual(json.loads(served), json.loads(expected), argv)
+
+    def test_query_reports(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            out, _, _ = run_cmd("query", d, "top-sets", "--exercise", "squat", "--limit", "3", "--json")
+            rows = json.loads(out)
+            self.assertEqual([(r["date"], r["weight_kg"], r["reps"], r["e1rm"]) for r in rows],
+                             [("2026-01-12", 85, 8, 107.7), ("2026-01-12", 85, 8, 107.7), ("2026-01-07", 80, 10, 106.7)])
+            out, _, _ = run_cmd("query", d, "weekly-sets", "--muscle-group", "back")
+            self.assertIn("2026-W02", out)
+            self.assertIn("week_start", out.splitlines()[0])
+            out, _, _ = run_cmd("query", d, "sql", "SELECT COUNT(*) AS n FROM sets", "--json")
+            self.assertEqual(json.loads(out), [{"n": 23}])
+
+    def test_query_errors(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            _, err, rc = run_cmd("query", d, "weekly-sets", "--max-rpe", "8", expect_fail=True)
+            self.assertEqual(rc, 1)
+            self.assertIn("does not take --max-rpe", err)
+            _, err, _ = run_cmd("query", d, "sql", "DELETE FROM sessions", expect_fail=True)
+            self.assertIn("readonly", err)
+            _, err, _ = run_cmd("query", d, "sql", expect_fail=True)
+            self.assertIn("needs a statement", err)
+
+
+# ==================== Change 22: Atomic, locked session writes ====================
+
+class TestDurableLog(unittest.TestCase):
+    """log / goals add / analyze write through gym_store's atomic, locked writes."""
+
+    def test_log_compact_and_atomic(self):
+        with tempfile.TemporaryDirectory() as d:
+            run_cmd("log", d, json.dumps(SESS_A), "--compact", "--fsync")
+            raw = Path(d, "2026-01-05.json").read_text()
+            self.assertNotIn("\n", raw)
+            self.assertEqual(json.loads(raw)["date"], "2026-01-05")
+            run_cmd("log", d, json.dumps(SESS_B))
+            self.assertTrue(Path(d, "2026-01-07.json").read_text().startswith("{\n  "))
+            self.assertEqual(sorted(os.listdir(d)), [".gym.lock", "2026-01-05.json", "2026-01-07.json"])
+
+    def test_log_failed_write_keeps_previous_session(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), [SESS_A])
+            before = Path(d, "2026-01-05.json").read_text()
+            changed = dict(SESS_A, notes="rewritten")
+            with patch("gym_store.os.replace", side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    ga.cmd_log(_make_args(history_dir=d, source=json.dumps(changed)))
+            self.assertEqual(Path(d, "2026-01-05.json").read_text(), before)
+            self.assertEqual(sorted(os.listdir(d)), [".gym.lock", "2026-01-05.json"])
+
+    def test_analyze_keeps_compact_files_compact(self):
+        with tempfile.TemporaryDirectory() as d:
+            run_cmd("log", d, json.dumps(SESS_A), "--compact")
+            run_cmd("analyze", d)
+            raw = Path(d, "2026-01-05.json").read_text()
+            self.assertNotIn("\n", raw)
+            self.assertIn("analysis", json.loads(raw))
+
+    def test_goals_add_atomic(self):
+        with tempfile.TemporaryDirectory() as d:
+            goals = os.path.join(d, "goals.json")
+            for target in (100, 110):
+                run_cmd("goals", "add", "--goals-file", goals,
+                        "--goal-json", json.dumps({"goals": {"Squat": target}, "target_date": "2026-06-01"}))
+            with open(goals) as f:
+                self.assertEqual([g["goals"]["Squat"] for g in json.load(f)], [100, 110])
+            self.assertFalse([n for n in os.listdir(d) if n.endswith(".tmp")])
+
+    def test_store_env_forwarded_as_flags(self):
+        with patch.dict(os.environ, {"GYM_COMPACT_JSON": "1", "GYM_FSYNC": "1"}):
+            self.assertEqual(ga._store_argv(["log", "h", "{}"]), ["log", "h", "{}", "--compact", "--fsync"])
+            self.assertEqual(ga._store_argv(["analyze", "h", "--fsync"]), ["analyze", "h", "--fsync"])
+            self.assertEqual(ga._store_argv(["e1rm", "h"]), ["e1rm", "h"])
+        with patch.dict(os.environ, {"GYM_COMPACT_JSON": "0"}):
+            os.environ.pop("GYM_FSYNC", None)
+            self.assertEqual(ga._store_argv(["log", "h", "{}"]), ["log", "h", "{}"])
+
+    def test_daemon_ignores_its_own_store_env(self):
+        with tempfile.TemporaryDirectory() as d, patch.dict(os.environ, {"GYM_COMPACT_JSON": "1"}):
+            resp = ga._run_request({"argv": ["log", d, json.dumps(SESS_A)]})
+            self.assertEqual(resp["rc"], 0, resp["stderr"])
+            self.assertTrue(Path(d, "2026-01-05.json").read_text().startswith("{\n  "))
+            self.assertEqual(os.environ["GYM_COMPACT_JSON"], "1")  # restored after the request
+
+    def test_log_through_daemon_uses_client_env(self):
+        import threading
+        with tempfile.TemporaryDirectory() as d:
+            hist = os.path.join(d, "history")
+            os.makedirs(hist)
+            sock = os.path.join(d, "g.sock")
+            t = threading.Thread(target=ga.serve_socket, args=(sock,), daemon=True)
+            with patch.object(ga, "_warm_up"), patch.object(ga, "_run_request", wraps=ga._run_request) as served:
+                t.start()
+                for _ in range(100):
+                    if os.path.exists(sock):
+                        break
+                    threading.Event().wait(0.02)
+                with patch.dict(os.environ, {"GYM_ANALYTICS_SOCKET": sock, "GYM_COMPACT_JSON": "1"}), \
+                        patch('sys.argv', ['gym_analytics.py', 'log', hist, json.dumps(SESS_A)]), \
+                        patch('sys.stdout', new_callable=StringIO), self.assertRaises(SystemExit) as cm:
+                    ga.main()
+                self.assertEqual(cm.exception.code, 0)
+                self.assertIn("--compact", served.call_args[0][0]["argv"])
+                ga._client_request(sock, {"cmd": "shutdown"}, timeout=10)
+                t.join(5)
+            self.assertNotIn("\n", Path(hist, "2026-01-05.json").read_text())
+
+    def test_fsync_flag_on_writers(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), [SESS_A])
+            with patch("gym_store.os.fsync") as fsync:
+                ga.cmd_analyze(ga.load_sessions(d), _make_args(history_dir=d, force=False, fsync=True))
+            self.assertTrue(fsync.called)
+
+
+# ==================== Change 23: Parallel, cached validation ====================
+
+class TestValidateAllErrors(unittest.TestCase):
+    """validate reports every error per file, in parallel chunks, with a content-hash cache."""
+
+    BAD = {"date": "2026-01-06", "start_time": "25:00", "planned": "x",
+           "actual": [{"name": "Squat", "sets": [], "end_time": "ab:cd"}, "oops"]}
+
+    def _write_bad(self, d):
+        Path(d, "2026-01-05.json").write_text(json.dumps(self.BAD))
+
+    def test_session_errors_collects_everything(self):
+        errors = ga.session_errors(self.BAD, "2026-01-05.json")
+        self.assertEqual(errors, [
+            "Invalid start_time: 25:00 (expected HH:MM)",
+            "Invalid planned: x (expected list)",
+            "Invalid end_time in exercise 'Squat': ab:cd (expected HH:MM)",
+            "Invalid value in exercise 2: oops (expected object)",
+            "Filename/date mismatch: file=2026-01-05.json, date=2026-01-06",
+        ])
+        self.assertEqual(ga.session_errors({"actual": []}), ["Missing field: date"])
+        self.assertEqual(ga.session_errors(SESS_A, "2026-01-05.json"), [])
+
+    def test_json_lists_each_error(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), [SESS_B])
+            self._write_bad(d)
+            out, _, rc = run_cmd("validate", d, "--json", expect_fail=True)
+            result = json.loads(out)
+            self.assertEqual(rc, 1)
+            self.assertEqual((result["files"], result["valid_count"]), (2, 1))
+            self.assertEqual([e["file"] for e in result["errors"]], ["2026-01-05.json"] * 5)
+
+    def test_stream_ndjson(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), [SESS_B, SESS_C])
+            self._write_bad(d)
+            out, _, rc = run_cmd("validate", d, "--stream", expect_fail=True)
+            lines = [json.loads(line) for line in out.splitlines()]
+            self.assertEqual(rc, 1)
+            self.assertEqual([l.get("file") for l in lines],
+                             ["2026-01-05.json", "2026-01-07.json", "2026-01-12.json", None])
+            self.assertEqual(len(lines[0]["errors"]), 5)
+            self.assertTrue(lines[1]["valid"])
+            self.assertEqual(lines[-1], {"valid": False, "files": 3, "valid_count": 2, "cached": 0,
+                                         "summary": True, "error_count": 5})
+
+    def test_cache_skips_unchanged_files(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            self._write_bad(d)
+            run_cmd("validate", d, "--json", expect_fail=True)
+            self.assertTrue(Path(d, ga.VALIDATE_FILENAME).exists())
+            with patch("gym_core._validate_chunk", side_effect=AssertionError("re-checked")):
+                with patch('sys.stdout', new_callable=StringIO) as out:
+                    with self.assertRaises(SystemExit):
+                        ga.cmd_validate(None, _make_args(history_dir=d, json=True))
+            result = json.loads(out.getvalue())
+            self.assertEqual((result["cached"], len(result["errors"])), (4, 5))
+
+            # Fixing the bad file re-checks only that file
+            Path(d, "2026-01-05.json").write_text(json.dumps(SESS_A))
+            out, _, rc = run_cmd("validate", d, "--json")
+            result = json.loads(out)
+            self.assertEqual((rc, result["cached"], result["valid"]), (0, 3, True))
+            cache = json.loads(Path(d, ga.VALIDATE_FILENAME).read_text())
+            self.assertEqual(sorted(cache["files"]), [f"{s['date']}.json" for s in ALL_SESS])
+
+    def test_no_cache_leaves_dir_alone(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            run_cmd("validate", d, "--no-cache")
+            self.assertFalse(Path(d, ga.VALIDATE_FILENAME).exists())
+
+    def test_pool_matches_in_process(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            self._write_bad(d)
+            Path(d, "2026-01-20.json").write_text("{bad")
+            files = sorted(Path(d).glob("*.json"))
+            serial = list(ga._iter_file_errors(files, workers=1))
+            with patch("gym_core.VALIDATE_CHUNK", 2), patch("os.cpu_count", return_value=2):
+                pooled = list(ga._iter_file_errors(files, workers=2))
+            self.assertEqual(pooled, serial)
+            self.assertEqual([len(errors) for _, errors, _ in serial], [5, 0, 0, 0, 1])
+            self.assertTrue(serial[-1][1][0].startswith("Invalid JSON"))
+
+
+# ==================== Change 24: Compiled session schema ====================
+
+import gym_schema
+
+
+class TestSchemaEntryPoints(unittest.TestCase):
+    """log and validate check sessions against the same compiled schema (gym_schema.py)."""
+
+    BAD = {"date": "2026-01-05", "start_time": "7pm",
+           "actual": [{"name": "Squat", "sets": [{"reps": 5, "weight_kg": "heavy"}]}]}
+
+    def test_log_reports_every_error(self):
+        with tempfile.TemporaryDirectory() as d:
+            _, err, rc = run_cmd("log", d, json.dumps(self.BAD), expect_fail=True)
+            self.assertEqual(rc, 1)
+            self.assertIn("Invalid start_time: 7pm (expected HH:MM)", err)
+            self.assertIn("Invalid weight_kg in exercise 'Squat' set 1: heavy (expected number)", err)
+            self.assertEqual(os.listdir(d), [])
+
+    def test_log_rejects_non_object(self):
+        with tempfile.TemporaryDirectory() as d:
+            _, err, rc = run_cmd("log", d, "[1, 2]", expect_fail=True)
+            self.assertEqual(rc, 1)
+            self.assertIn("expected object", err)
+
+    def test_validate_and_log_agree(self):
+        with tempfile.TemporaryDirectory() as d:
+            Path(d, "2026-01-05.json").write_text(json.dumps(self.BAD))
+            out, _, _ = run_cmd("validate", d, "--json", expect_fail=True)
+            self.assertEqual([e["error"] for e in json.loads(out)["errors"]],
+                             gym_schema.validate_session(self.BAD))
+
+
+
+# ==================== Change 25: Library API ====================
+
+class TestLibraryApi(unittest.TestCase):
+    """The API functions return what the commands print with --json, and raise instead of exiting."""
+
+    def test_results_match_cli_json(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            cases = [
+                (ga.latest_e1rm, (), ("e1rm",)),
+                (ga.weekly_volume, (), ("volume",)),
+                (ga.lift_progress, ("Squat",), ("progress", "Squat")),
+                (ga.session_summary, (), ("summary",)),
+                (ga.compare_sessions, ("2026-01-05", "2026-01-14"), ("compare", "2026-01-05", "2026-01-14")),
+                (ga.kpi_windows, ([7, 14],), ("kpis", "--window", "7,14")),
+            ]
+            for fn, extra, argv in cases:
+                out, _, _ = run_cmd(argv[0], d, *argv[1:], "--json")
+                self.assertEqual(fn(d, *extra), json.loads(out), fn.__name__)
+
+    def test_accepts_loaded_sessions(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            sessions = ga.load_sessions(d, use_index=False)
+            self.assertEqual(ga.latest_e1rm(sessions), ga.latest_e1rm(d))
+            self.assertEqual(ga.session_summary(sessions)["date"], "2026-01-14")
+            self.assertEqual(ga.kpi_windows(sessions, "7", compare=None)["windows"][0]["days"], 7)
+
+    def test_errors_raise(self):
+        with tempfile.TemporaryDirectory() as d:
+            with self.assertRaisesRegex(ga.AnalyticsError, "No session data found"):
+                ga.latest_e1rm(d)
+            with self.assertRaisesRegex(ga.AnalyticsError, "Directory not found"):
+                ga.weekly_volume(os.path.join(d, "missing"))
+            _write_sessions(Path(d), ALL_SESS)
+            with self.assertRaisesRegex(ga.AnalyticsError, "'Deadlift' not found"):
+                ga.lift_progress(d, "Deadlift")
+            with self.assertRaisesRegex(ga.AnalyticsError, "No session found for 2026-01-06"):
+                ga.compare_sessions(d, "2026-01-06", "2026-01-14")
+            with self.assertRaisesRegex(ga.AnalyticsError, "Invalid --window"):
+                ga.kpi_windows(d, [0])
+            # The commands still report the same errors on stderr with exit 1
+            _, err, rc = run_cmd("progress", d, "Deadlift", expect_fail=True)
+            self.assertEqual((rc, err.strip()), (1, "Error: Exercise 'Deadlift' not found in history"))
+
+    def test_goals(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "goals.json")
+            with self.assertRaisesRegex(ga.AnalyticsError, "No goals found"):
+                ga.current_goals(path)
+            with self.assertRaisesRegex(ga.AnalyticsError, "Missing 'target_date'"):
+                ga.add_goal(path, {"goals": {"Squat": 120}})
+            goals = ga.add_goal(path, {"goals": {"Squat": 120}, "target_date": "2026-06-01"})
+            ga.add_goal(path, '{"goals": {"Squat": 130}, "target_date": "2026-09-01"}')
+            self.assertEqual(len(goals), 1)
+            self.assertEqual(ga.current_goals(path)["goals"], {"Squat": 130})
+            self.assertEqual(ga.list_goals(path), json.loads(Path(path).read_text()))
+
+    def test_daemon_call(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            resp, running = ga._handle_line(json.dumps(
+                {"call": "lift_progress", "args": {"history": d, "exercise": "OHP"}, "id": 3}))
+            self.assertTrue(running)
+            self.assertEqual((resp["id"], resp["ok"]), (3, True))
+            self.assertEqual(resp["result"], ga.lift_progress(d, "OHP"))
+            resp, _ = ga._handle_line(json.dumps({"call": "compare_sessions",
+                                                  "args": {"history": d, "date1": "2026-01-01", "date2": "2026-01-05"}}))
+            self.assertEqual((resp["ok"], resp["error"]), (False, "No session found for 2026-01-01"))
+            resp, _ = ga._handle_line(json.dumps({"call": "cmd_e1rm", "args": {}}))
+            self.assertFalse(resp["ok"])
+            self.assertIn("Unknown call", resp["error"])
+
+
+
+# ==================== Change 26: Mesocycle periods ====================
+
+class TestMesocyclePeriods(unittest.TestCase):
+    """--period and `mesocycles` follow program.json and the programs/ archive next to it."""
+
+    def _workspace(self, d):
+        hist = os.path.join(d, "history")
+        os.makedirs(hist)
+        os.makedirs(os.path.join(d, "programs"))
+        _write_sessions(Path(hist), ALL_SESS)
+        Path(d, "programs", "intro.json").write_text(json.dumps(
+            {"name": "Intro", "start_date": "2025-12-01", "end_date": "2026-01-06", "days": {"A": {}, "B": {}}}))
+        Path(d, "program.json").write_text(json.dumps(
+            {"name": "Block 2", "mesocycle": 2, "start_date": "2026-01-07", "end_date": "2026-02-15",
+             "deload_week": 6, "days": {"A": {}, "B": {}, "C": {}}}))
+        return hist
+
+    def test_period_sessions(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._workspace(d)
+            prog = os.path.join(d, "program.json")
+            dates = lambda period: [s["date"] for s in ga._period_sessions(ALL_SESS, period, prog)]
+            self.assertEqual(dates("current"), ["2026-01-07", "2026-01-12", "2026-01-14"])
+            self.assertEqual(dates("previous"), ["2026-01-05"])
+            self.assertEqual(dates("intro"), ["2026-01-05"])
+            self.assertEqual(dates("2"), dates("current"))
+            with self.assertRaisesRegex(ga.AnalyticsError, "Unknown --period: base .*Intro, Block 2"):
+                dates("base")
+
+    def test_session_window(self):
+        with tempfile.TemporaryDirectory() as d:
+            hist = self._workspace(d)
+            args = Namespace(command="chart-e1rm", period="previous")
+            self.assertEqual(ga._session_window(args, hist), {"since": "2025-12-01", "until": "2026-01-06"})
+
+    def test_chart_previous_period(self):
+        with tempfile.TemporaryDirectory() as d:
+            hist = self._workspace(d)
+            out = os.path.join(d, "e1rm.png")
+            run_cmd("chart-e1rm", hist, out, "--period", "previous")
+            self.assertTrue(os.path.exists(out))
+            _, err, rc = run_cmd("chart-e1rm", hist, out, "--period", "base", expect_fail=True)
+            self.assertEqual(rc, 1)
+            self.assertIn("Unknown --period: base", err)
+
+    def test_mesocycles_command(self):
+        with tempfile.TemporaryDirectory() as d:
+            hist = self._workspace(d)
+            out, _, _ = run_cmd("mesocycles", hist, "--json")
+            result = json.loads(out)
+            self.assertEqual(result, ga.mesocycle_report(hist))
+            intro, block = result["mesocycles"]
+            self.assertEqual((intro["sessions"], intro["complete"]), (1, True))
+            self.assertEqual((block["sessions"], block["complete"], block["end"]), (3, False, "2026-02-15"))
+            self.assertEqual(block["deload"]["start"], "2026-02-11")
+            current = ga.mesocycle_report(hist, period="current")["mesocycles"]
+            self.assertEqual([m["name"] for m in current], ["Block 2"])
+            text, _, _ = run_cmd("mesocycles", hist)
+            self.assertIn("Block 2", text)
+            self.assertIn("(in progress)", text)
+
+    def test_without_program(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            with self.assertRaisesRegex(ga.AnalyticsError, "No mesocycles found"):
+                ga.mesocycle_report(d, program_file=os.path.join(d, "none.json"))
+            # current keeps the 6-week fallback
+            self.assertEqual(ga._period_sessions(ALL_SESS, "current", os.path.join(d, "none.json")), ALL_SESS)
+
+
+# ==================== Change 27: Downsampled e1RM series ====================
+
+def _long_history(n=400, start="2023-01-02"):
+    """n sessions every 3 days with a noisy, rising Squat and Bench Press."""
+    import random
+    rng = random.Random(7)
+    day = datetime.strptime(start, "%Y-%m-%d")
+    sessions = []
+    for i in range(n):
+        sessions.append(_session((day + timedelta(days=3 * i)).strftime("%Y-%m-%d"), [
+            _ex("Squat", "legs", [_s(100 + i * 0.1 + rng.randint(-5, 5), 5)]),
+            _ex("Bench Press", "chest", [_s(70 + i * 0.05 + rng.randint(-3, 3), 5)]),
+        ]))
+    return sessions
+
+
+class TestDownsampledSeries(unittest.TestCase):
+    """chart-e1rm --resolution / --max-points / --trend over a long history."""
+
+    SESSIONS = _long_history()
+
+    def _lines(self, **kwargs):
+        import matplotlib.pyplot as plt
+        with tempfile.TemporaryDirectory() as d:
+            args = _make_args(output=os.path.join(d, "c.png"), history_dir=d, lifts="Squat,Bench Press",
+                              no_goals=True, _return_fig=True, **kwargs)
+            fig, ax = ga.cmd_chart_e1rm(self.SESSIONS, args)
+        lines = [(list(l.get_xdata()), list(l.get_ydata()), l.get_alpha()) for l in ax.get_lines()]
+        plt.close(fig)
+        return lines
+
+    def test_resolutions_bound_points(self):
+        raw = ga._lift_data(ga.SetTable(self.SESSIONS), ["Squat"])["Squat"]
+        counts = {r: len(self._lines(resolution=r)[0][0]) for r in ("session", "weekly", "lttb", "auto")}
+        self.assertEqual(counts["session"], 400)
+        self.assertEqual(counts["lttb"], 150)
+        self.assertLessEqual(counts["auto"], 150)
+        self.assertLess(counts["weekly"], 400)
+        self.assertEqual(len(self._lines(resolution="lttb", max_points=40)[0][0]), 40)
+        # The last drawn point is the latest session (the badge reads it)
+        xs, ys, _ = self._lines(resolution="weekly")[0]
+        self.assertEqual((xs[-1], ys[-1]), (raw[0][-1], raw[1][-1]))
+
+    def test_trend_lines(self):
+        lines = self._lines(resolution="weekly", trend=28)
+        self.assertEqual(len(lines), 4)  # data + trend per lift
+        (xs, ys, _), (txs, tys, alpha) = lines[:2]
+        self.assertEqual((txs, alpha), (xs, 0.5))
+        # The EMA is smoother than the weekly bests it follows
+        import numpy as np
+        self.assertLess(np.std(np.diff(tys)), np.std(np.diff(ys)))
+
+    def test_fast_renderer_and_cache_key(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = os.path.join(d, "cache")
+            for resolution, expected in (("weekly", "cache miss"), ("lttb", "cache miss"), ("weekly", "cache hit")):
+                with patch('sys.stdout', new_callable=StringIO) as out:
+                    ga.cmd_chart_e1rm(self.SESSIONS, _make_args(
+                        output=os.path.join(d, "c.png"), history_dir=d, no_goals=True, cache_dir=cache,
+                        renderer="fast", resolution=resolution, trend=14))
+                self.assertIn(expected, out.getvalue())
+
+    def test_bad_options_exit(self):
+        with tempfile.TemporaryDirectory() as d:
+            _write_sessions(Path(d), ALL_SESS)
+            _, err, rc = run_cmd("chart-e1rm", d, os.path.join(d, "c.png"), "--max-points", "2", expect_fail=True)
+            self.assertEqual(rc, 1)
+            self.assertIn("--max-points must be at least 3", err)
+            _, _, rc = run_cmd("chart-e1rm", d, os.path.join(d, "c.png"), "--resolution", "daily", expect_fail=True)
+            self.assertNotEqual(rc, 0)
+
+    def test_watch_series_follow_changed_days(self):
+        sessions = [dict(s) for s in self.SESSIONS[:60]]
+        lifts = ["Squat", "Bench Press"]
+        state = ga._WatchState()
+        state.update_series(sessions, lifts, "/nonexistent/goals.json")
+        # Edit one day, delete another, add a new one
+        sessions[10] = _session(sessions[10]["date"], [_ex("Squat", "legs", [_s(200, 1)])])
+        removed = sessions.pop(20)["date"]
+        sessions.append(_session("2023-07-01", [_ex("Bench Press", "chest", [_s(90, 3)])]))
+        state.series_pending |= {sessions[10]["date"], removed, "2023-07-01"}
+        state.update_series(sessions, lifts, "/nonexistent/goals.json")
+        self.assertEqual(state.lift_data(lifts), ga._lift_data(ga.SetTable(sessions), lifts))
+        self.assertEqual(state.series_pending, set())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""Benchmarks for the gym scripts on deterministic synthetic histories.
+
+Usage:
+    gym_bench.py resolver [--sessions N] [--seed N]
+        ExerciseResolver vs the original normalize_match scan
+
+    gym_bench.py window [--sizes N,N,...] [--repeat N] [--seed N]
+        summary / 28-day KPI latency, full load vs windowed load_sessions,
+        for growing history lengths (should stay flat when windowed)
+
+    gym_bench.py schema [--sessions N] [--repeat N] [--seed N]
+        Compiled session-schema validator vs the hand-rolled checks it
+        replaced, per session over a synthetic history (planned + timestamps)
+
+    gym_bench.py gen <history_dir> [history options]
+        Write a synthetic history as YYYY-MM-DD.json day files
+
+    gym_bench.py suite [history options] [--repeat N] [--only a,b] [--out F]
+                       [--baseline F] [--threshold X]
+        Wall time of every gym_analytics.py and workout_live.py command, one
+        fresh process per run, on a synthetic history (exit 1 on regression
+        against --baseline)
+
+    gym_bench.py compare <base.json> <new.json> [--threshold X] [--min-ms N] [--json]
+        Per-command change between two suite results; exit 1 on regression
+
+History options: --years Y --sessions-per-week N --exercises N --sets MIN-MAX
+--no-variants --legacy-fraction F --seed N. The same options always produce
+the same history. `serve` is not timed (it does not exit).
+
+Results are printed as JSON.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+import gym_core as ga
+
+
+# ---- Synthetic history ----
+
+# (name, muscle_group, base weight kg) — includes spelling variants the resolver must fold
+EXERCISES = [
+    ("Squat", "legs", 100),
+    ("Barbell Back Squat", "legs", 100),
+    ("Bench Press (flat)", "chest", 75),
+    ("Flat Bench", "chest", 75),
+    ("OHP", "shoulders", 45),
+    ("Overhead Press", "shoulders", 45),
+    ("Seated Cable Row", "back", 70),
+    ("Cable Row", "back", 70),
+    ("RDL", "legs", 110),
+    ("Wide Grip Pull-ups (weighted)", "back", 10),
+    ("Lateral Raise", "shoulders", 10),
+    ("Hanging Leg Raise", "abs", 0),
+]
+
+
+# Spelling variants of canonical EXERCISES entries (dropped when variants=False)
+VARIANTS = {"Barbell Back Squat", "Flat Bench", "Overhead Press", "Cable Row"}
+
+
+def generate_history(sessions=500, seed=0, start=date(2020, 1, 6), exercises_per_session=5,
+                     sessions_per_week=None, years=None, sets=(2, 4), variants=True,
+                     legacy_fraction=0.0):
+    """Deterministic list of session dicts with slow progression.
+
+    Sessions are one every 2-3 days by default, or evenly spaced at
+    sessions_per_week. `years` overrides `sessions` (years * 52 weeks).
+    `sets` is the (min, max) working sets per exercise. With variants=False
+    only canonical names are used. `legacy_fraction` of the sessions store
+    their exercises under the legacy "exercises" key instead of "actual".
+    """
+    if years is not None:
+        sessions = round(years * 52 * (sessions_per_week or 3))
+    pool = EXERCISES if variants else [e for e in EXERCISES if e[0] not in VARIANTS]
+    rng = random.Random(seed)
+    result = []
+    day = start
+    for i in range(sessions):
+        actual = []
+        for name, mg, base in rng.sample(pool, exercises_per_session):
+            weight = round(base * (1 + i / 2000) / 2.5) * 2.5 if base else 0
+            ex_sets = [{"reps": rng.choice([6, 8, 10, 12]), "weight_kg": weight}
+                       for _ in range(rng.randint(*sets))]
+            actual.append({"name": name, "muscle_group": mg, "sets": ex_sets})
+        legacy = int((i + 1) * legacy_fraction) > int(i * legacy_fraction)
+        result.append({"date": day.isoformat(), "day": "ABC"[i % 3],
+                       "exercises" if legacy else "actual": actual})
+        if sessions_per_week:
+            day = start + timedelta(days=(i + 1) * 7 // sessions_per_week)
+        else:
+            day += timedelta(days=rng.choice([2, 2, 3]))
+    return result
+
+
+def write_history(history_dir, sessions):
+    """Write sessions as YYYY-MM-DD.json day files."""
+    for s in sessions:
+        (Path(history_dir) / f"{s['date']}.json").write_text(json.dumps(s, indent=2))
+
+
+def _best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(best * 1000, 2)
+
+
+# ---- Benchmarks ----
+
+def legacy_normalize_match(name, target):
+    """normalize_match as it was before ExerciseResolver (alias table rebuilt per call)."""
+    nl, tl = name.lower(), target.lower()
+    if nl == tl or tl in nl or nl in tl:
+        return True
+    aliases = {
+        "bench press": ["bench", "flat bench", "incline bench", "decline bench press"],
+        "squat": ["barbell squat", "barbell back squat", "back squat"],
+        "ohp": ["overhead press", "standing press", "military press"],
+        "seated cable row": ["seated row", "cable row"],
+        "barbell row": ["bent over row", "pendlay row"],
+    }
+    for canonical, names in aliases.items():
+        all_names = [canonical] + names
+        if tl in all_names and nl in all_names:
+            return True
+    return False
+
+
+def bench_resolver(sessions=10000, seed=0):
+    """Match every tracked lift against every exercise of every session, both ways."""
+    history = generate_history(sessions, seed)
+    lifts = ["Squat", "Bench Press", "OHP", "Seated Cable Row", "Deadlift"]
+    pairs = [(ex["name"], lift) for lift in lifts for s in history for ex in s["actual"]]
+
+    t0 = time.perf_counter()
+    legacy = [legacy_normalize_match(n, t) for n, t in pairs]
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    resolver = ga.ExerciseResolver()
+    fast = [resolver.matches(n, t) for n, t in pairs]
+    resolver_s = time.perf_counter() - t0
+
+    return {
+        "benchmark": "resolver",
+        "sessions": sessions,
+        "calls": len(pairs),
+        "legacy_s": round(legacy_s, 4),
+        "resolver_s": round(resolver_s, 4),
+        "speedup": round(legacy_s / resolver_s, 1) if resolver_s else None,
+        "mismatches": sum(a != b for a, b in zip(legacy, fast)),
+    }
+
+
+def bench_window(sizes=(250, 1000, 4000), repeat=5, seed=0):
+    """summary and KPI latency per history length, full history vs the narrowest window."""
+    rows = []
+    for n in sizes:
+        history = generate_history(n, seed)
+        with tempfile.TemporaryDirectory() as d:
+            write_history(d, history)
+            ga.load_sessions(d)  # build the index, as a real history dir would have
+            latest = datetime.strptime(history[-1]["date"], "%Y-%m-%d")
+            kpi_since = (latest - timedelta(days=27)).strftime("%Y-%m-%d")
+
+            def summary(**window):
+                ga.session_summary(ga.load_sessions(d, **window))
+
+            def kpis(**window):
+                ga._compute_kpis(ga.load_sessions(d, **window), {})
+
+            rows.append({
+                "sessions": n,
+                "summary_full_ms": _best_ms(summary, repeat),
+                "summary_window_ms": _best_ms(lambda: summary(last_n=1), repeat),
+                "kpi_full_ms": _best_ms(kpis, repeat),
+                "kpi_window_ms": _best_ms(lambda: kpis(since=kpi_since), repeat),
+            })
+    return {"benchmark": "window", "repeat": repeat, "results": rows}
+
+
+def legacy_session_errors(data):
+    """validate's hand-rolled checks as they were before gym_schema (first error per section)."""
+    errors = []
+    if "date" not in data:
+        return ["Missing field: date"]
+    if "actual" not in data and "exercises" not in data:
+        return ["Missing field: actual (or exercises)"]
+    try:
+        datetime.strptime(data["date"], "%Y-%m-%d")
+    except (TypeError, ValueError):
+        errors.append(f"Invalid date: {data['date']}")
+    for field in ("start_time", "end_time"):
+        val = data.get(field)
+        if val is not None and not ga.validate_time_str(val):
+            errors.append(f"Invalid {field}: {val}")
+    for ex in data.get("actual", data.get("exercises", [])):
+        for field in ("start_time", "end_time"):
+            val = ex.get(field)
+            if val is not None and not ga.validate_time_str(val):
+                errors.append(f"Invalid {field} in exercise '{ex.get('name', '?')}': {val}")
+    planned = data.get("planned")
+    if planned is not None:
+        if not isinstance(planned, list):
+            errors.append("planned must be a list")
+        else:
+            errors += [f"planned[{i}]: missing 'name'" for i, p in enumerate(planned)
+                       if not isinstance(p, dict) or "name" not in p]
+    return errors
+
+
+def bench_schema(sessions=5000, repeat=5, seed=0):
+    """Per-session validation cost: compiled gym_schema walk vs the legacy hand-rolled checks."""
+    import gym_schema
+    history = generate_history(sessions, seed)
+    for i, s in enumerate(history):
+        s["start_time"], s["end_time"] = "18:00", "19:10"
+        s["planned"] = [{"name": ex["name"], "muscle_group": ex["muscle_group"],
+                         "sets": [{"reps": st["reps"], "weight_kg": st["weight_kg"]} for st in ex["sets"]]}
+                        for ex in s["actual"]]
+        if i % 100 == 0:  # a few broken sessions so error paths are timed too
+            s["start_time"] = "25:00"
+            s["actual"][0]["sets"][0]["reps"] = "eight"
+
+    def run(check):
+        return [check(s) for s in history]
+
+    compiled_ms = _best_ms(lambda: run(gym_schema.validate_session), repeat)
+    legacy_ms = _best_ms(lambda: run(legacy_session_errors), repeat)
+    compiled, legacy = run(gym_schema.validate_session), run(legacy_session_errors)
+    return {
+        "benchmark": "schema",
+        "sessions": sessions,
+        "sets": sum(len(ex["sets"]) for s in history for ex in s["actual"]),
+        "compiled_ms": compiled_ms,
+        "legacy_ms": legacy_ms,
+        "compiled_us_per_session": round(compiled_ms * 1000 / sessions, 2),
+        "legacy_us_per_session": round(legacy_ms * 1000 / sessions, 2),
+        "invalid_compiled": sum(bool(e) for e in compiled),
+        "invalid_legacy": sum(bool(e) for e in legacy),
+    }
+
+
+# ---- Command suite ----
+
+# One timed CLI run each: (name, script, argv). Placeholders are filled from the
+# workspace built by _suite_workspace. Order matters: read-only commands run
+# before the ones that touch the history (log rewrites the newest day file).
+SUITE_CASES = [
+    ("e1rm", "gym_analytics.py", ["e1rm", "{history}", "--json"]),
+    ("volume", "gym_analytics.py", ["volume", "{history}", "--json"]),
+    ("progress", "gym_analytics.py", ["progress", "{history}", "Squat", "--json"]),
+    ("summary", "gym_analytics.py", ["summary", "{history}", "--json"]),
+    ("compare", "gym_analytics.py", ["compare", "{history}", "{first}", "{last}", "--json"]),
+    ("kpis", "gym_analytics.py", ["kpis", "{history}", "--window", "7,28", "--json"]),
+    ("chart-e1rm", "gym_analytics.py", ["chart-e1rm", "{history}", "{work}/e1rm.png", "--goals-file", "{goals}"]),
+    ("chart-volume", "gym_analytics.py", ["chart-volume", "{history}", "{work}/volume.png"]),
+    ("charts", "gym_analytics.py", ["charts", "{history}", "{work}/charts"]),
+    ("batch", "gym_analytics.py", ["batch", "--glob", "{history}", "--out", "{work}/batch.json"]),
+    ("goals", "gym_analytics.py", ["goals", "list", "--goals-file", "{goals}"]),
+    ("validate", "gym_analytics.py", ["validate", "{history}", "--json"]),
+    ("index", "gym_analytics.py", ["index", "{history}"]),
+    ("log", "gym_analytics.py", ["log", "{history}", "{work}/last.json"]),
+    ("migrate", "gym_analytics.py", ["migrate", "{store}"]),
+    ("compact", "gym_analytics.py", ["compact", "{store}"]),
+    ("live-init", "workout_live.py", ["init", "{live}", "{program}", "A", "--force"]),
+    ("live-status", "workout_live.py", ["status", "{live}"]),
+    ("live-log", "workout_live.py", ["log", "{live}", '{{"name": "OHP", "reps": 10, "weight_kg": 45, "num_sets": 3}}']),
+    ("live-done", "workout_live.py", ["done", "{live}"]),
+    ("live-lifts", "workout_live.py", ["lifts", "{live}"]),
+    ("live-remove", "workout_live.py", ["remove", "{live}", "Squat"]),
+]
+
+
+def _suite_workspace(root, history):
+    """Write the history plus goals/program/session fixtures. Returns the placeholder map."""
+    root = Path(root)
+    hist = root / "history"
+    hist.mkdir()
+    write_history(hist, history)
+    ga.load_sessions(str(hist))  # build the index, as a real history dir would have
+    work = root / "work"
+    work.mkdir()
+    (work / "last.json").write_text(json.dumps(history[-1], indent=2))
+    target = (datetime.strptime(history[-1]["date"], "%Y-%m-%d") + timedelta(weeks=12)).strftime("%Y-%m-%d")
+    (root / "goals.json").write_text(json.dumps([
+        {"date_set": history[-1]["date"], "target_date": target,
+         "goals": {"Squat": 140, "Bench Press": 100, "OHP": 60, "Seated Cable Row": 90}}]))
+    program = {"days": {
+        "A": {"name": "A", "exercises": [
+            {"name": "Squat", "muscle_group": "legs", "sets": [{"reps": 5, "weight_kg": 100}] * 3},
+            {"name": "OHP", "muscle_group": "shoulders", "sets": [{"reps": 8, "weight_kg": 45}] * 3},
+            {"name": "Seated Cable Row", "muscle_group": "back", "sets": [{"reps": 10, "weight_kg": 70}] * 3},
+        ]}}}
+    (root / "program.json").write_text(json.dumps(program))
+    live_dir = root / "live"
+    live_dir.mkdir()
+    return {"history": str(hist), "work": str(work), "store": str(root / "store"),
+            "goals": str(root / "goals.json"), "program": str(root / "program.json"),
+            "live": str(live_dir / f"{history[-1]['date']}.json"),
+            "first": history[0]["date"], "last": history[-1]["date"]}
+
+
+def _live_fixture(program):
+    """Session state every live-* case starts from: plan loaded, first exercise done."""
+    planned = json.loads(Path(program).read_text())["days"]["A"]["exercises"]
+    return {"date": "", "day": "A", "planned": planned, "actual": [dict(planned[0])]}
+
+
+def _suite_setup(name, paths):
+    """Reset state a case mutates so every repeat measures the same work (untimed)."""
+    if name == "migrate":
+        shutil.rmtree(paths["store"], ignore_errors=True)
+        shutil.copytree(paths["history"], paths["store"])
+    elif name.startswith("live-") and name != "live-init":
+        session = _live_fixture(paths["program"])
+        session["date"] = paths["last"]
+        Path(paths["live"]).write_text(json.dumps(session, indent=2))
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR,
+                             capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def bench_suite(years=1.0, sessions_per_week=3, repeat=3, seed=0, only=None, **history_opts):
+    """Wall time of every CLI command (fresh process each run) on one synthetic history.
+
+    Each result has min/median ms over `repeat` runs and the exit code of the last run.
+    """
+    history = generate_history(seed=seed, years=years, sessions_per_week=sessions_per_week,
+                               **history_opts)
+    env = dict(os.environ, MPLBACKEND="Agg")
+    env[ga.SOCKET_ENV] = "/nonexistent/gym-bench.sock"  # never forward to a running daemon
+    cases = [c for c in SUITE_CASES if only is None or c[0] in only]
+    rows = []
+    with tempfile.TemporaryDirectory() as root:
+        paths = _suite_workspace(root, history)
+        for name, script, argv in cases:
+            cmd = [sys.executable, str(SCRIPTS_DIR / script)] + [a.format(**paths) for a in argv]
+            times = []
+            for _ in range(repeat):
+                _suite_setup(name, paths)
+                t0 = time.perf_counter()
+                proc = subprocess.run(cmd, env=env, capture_output=True)
+                times.append((time.perf_counter() - t0) * 1000)
+            rows.append({"name": name, "min_ms": round(min(times), 2),
+                         "median_ms": round(statistics.median(times), 2),
+                         "exit_code": proc.returncode})
+    return {
+        "benchmark": "suite",
+        "sessions": len(history),
+        "years": years,
+        "sessions_per_week": sessions_per_week,
+        "repeat": repeat,
+        "seed": seed,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "revision": _git_revision(),
+        "results": rows,
+    }
+
+
+def compare_results(base, new, threshold=0.2, min_ms=5.0, key="median_ms"):
+    """Per-command change between two suite results.
+
+    A command regresses when it got slower by more than `threshold` (fraction)
+    and by more than `min_ms`, so sub-millisecond noise is not flagged.
+    """
+    old = {r["name"]: r for r in base["results"]}
+    rows = []
+    for r in new["results"]:
+        if r["name"] not in old:
+            continue
+        before, after = old[r["name"]][key], r[key]
+        delta = after - before
+        rows.append({
+            "name": r["name"],
+            "base_ms": before,
+            "new_ms": after,
+            "change_pct": round(delta / before * 100, 1) if before else None,
+            "regression": delta > min_ms and delta > before * threshold,
+        })
+    return rows
+
+
+def _print_comparison(rows):
+    for r in rows:
+        pct = "n/a" if r["change_pct"] is None else f"{r['change_pct']:+.1f}%"
+        flag = "  REGRESSION" if r["regression"] else ""
+        print(f"{r['name']:<14} {r['base_ms']:>9.1f} -> {r['new_ms']:>9.1f} ms  {pct:>8}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gym scripts benchmarks")
+    sub = parser.add_subparsers(dest="command")
+    p = sub.add_parser("resolver")
+    p.add_argument("--sessions", type=int, default=10000)
+    p.add_argument("--seed", type=int, default=0)
+    p = sub.add_parser("schema")
+    p.add_argument("--sessions", type=int, default=5000)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p = sub.add_parser("window")
+    p.add_argument("--sizes", type=str, default="250,1000,4000", help="Comma-separated history lengths")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    for name in ("gen", "suite"):
+        p = sub.add_parser(name)
+        if name == "gen":
+            p.add_argument("history_dir")
+        p.add_argument("--years", type=float, default=1.0)
+        p.add_argument("--sessions-per-week", type=int, default=3, dest="sessions_per_week")
+        p.add_argument("--exercises", type=int, default=5, help="Exercises per session")
+        p.add_argument("--sets", type=str, default="2-4", help="Working sets per exercise, MIN-MAX")
+        p.add_argument("--no-variants", action="store_true", dest="no_variants",
+                       help="Only canonical exercise names")
+        p.add_argument("--legacy-fraction", type=float, default=0.0, dest="legacy_fraction",
+                       help="Fraction of sessions using the legacy \"exercises\" key")
+        p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--only", type=str, default=None, help="Comma-separated case names")
+    p.add_argument("--out", type=str, default=None, help="Also write the results JSON here")
+    p.add_argument("--baseline", type=str, default=None, help="Compare against this earlier suite JSON")
+    p.add_argument("--threshold", type=float, default=0.2, help="Regression threshold as a fraction (default: 0.2)")
+    p = sub.add_parser("compare")
+    p.add_argument("base")
+    p.add_argument("new")
+    p.add_argument("--threshold", type=float, default=0.2)
+    p.add_argument("--min-ms", type=float, default=5.0, dest="min_ms")
+    p.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.command in ("gen", "suite"):
+        lo, _, hi = args.sets.partition("-")
+        history_opts = {"exercises_per_session": args.exercises, "sets": (int(lo), int(hi or lo)),
+                        "variants": not args.no_variants, "legacy_fraction": args.legacy_fraction}
+
+    if args.command == "resolver":
+        print(json.dumps(bench_resolver(args.sessions, args.seed), indent=2))
+    elif args.command == "schema":
+        print(json.dumps(bench_schema(args.sessions, args.repeat, args.seed), indent=2))
+    elif args.command == "window":
+        sizes = [int(x) for x in args.sizes.split(",")]
+        print(json.dumps(bench_window(sizes, args.repeat, args.seed), indent=2))
+    elif args.command == "gen":
+        history = generate_history(seed=args.seed, years=args.years,
+                                   sessions_per_week=args.sessions_per_week, **history_opts)
+        Path(args.history_dir).mkdir(parents=True, exist_ok=True)
+        write_history(args.history_dir, history)
+        print(f"Wrote {len(history)} sessions to {args.history_dir}")
+    elif args.command == "suite":
+        only = set(args.only.split(",")) if args.only else None
+        result = bench_suite(args.years, args.sessions_per_week, args.repeat, args.seed, only, **history_opts)
+        if args.out:
+            Path(args.out).write_text(json.dumps(result, indent=2))
+        print(json.dumps(result, indent=2))
+        if args.baseline:
+            rows = compare_results(json.loads(Path(args.baseline).read_text()), result, args.threshold)
+            _print_comparison(rows)
+            if any(r["regression"] for r in rows):
+                sys.exit(1)
+    elif args.command == "compare":
+        base = json.loads(Path(args.base).read_text())
+        new = json.loads(Path(args.new).read_text())
+        rows = compare_results(base, new, args.threshold, args.min_ms)
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        else:
+            _print_comparison(rows)
+        if any(r["regression"] for r in rows):
+            sys.exit(1)
+    else:
+        parser.print_help()
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
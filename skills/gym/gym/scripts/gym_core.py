@@ -0,0 +1,4427 @@
+#!/usr/bin/env python3
+"""Commands, session loading, daemon and library API behind gym_analytics.py.
+
+gym_analytics.py is the entry script and documents the commands. The code
+lives in this module so Python reuses its cached bytecode instead of
+compiling some 4,000 lines on every invocation.
+"""
+
+import sys
+import time
+
+_T_MODULE = time.perf_counter()
+_CPU_AT_IMPORT = time.process_time()  # interpreter start-up + gym_analytics.py + loading this module
+
+import argparse
+import functools
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import gym_store
+
+_T_IMPORTED = time.perf_counter()
+
+
+# ---- Constants ----
+
+SHORT_NAMES = {
+    "Squat": "Squat",
+    "Barbell Squat": "Squat",
+    "Squat (lighter)": "Squat (light)",
+    "Bench Press (flat)": "Bench",
+    "Bench Press": "Bench",
+    "Bench Press (decline)": "Decline Bench",
+    "OHP": "OHP",
+    "Seated Cable Row": "Row",
+    "Barbell Row": "Row",
+    "RDL": "RDL",
+    "Barbell Curl": "Curl",
+    "Incline DB Curl": "Inc. Curl",
+    "Hammer Curl": "Hammer Curl",
+    "Wide Grip Pull-ups (weighted)": "Pull-ups",
+    "Pull-ups (weighted)": "Pull-ups",
+    "Dips (weighted)": "Dips",
+    "Lateral Raise": "Lat. Raise",
+    "Face Pull": "Face Pull",
+    "Leg Curl": "Leg Curl",
+    "Hanging Leg Raise": "HLR",
+    "Cable Crunch": "Cable Crunch",
+    "Tricep Pushdown": "Tri. Push",
+}
+
+# Lowercased canonical name -> lowercased aliases (see ExerciseResolver)
+EXERCISE_ALIASES = {
+    "bench press": ["bench", "flat bench", "incline bench", "decline bench press"],
+    "squat": ["barbell squat", "barbell back squat", "back squat"],
+    "ohp": ["overhead press", "standing press", "military press"],
+    "seated cable row": ["seated row", "cable row"],
+    "barbell row": ["bent over row", "pendlay row"],
+}
+
+# ---- Helpers ----
+
+def e1rm_epley(weight, reps):
+    if reps <= 0 or weight <= 0:
+        return 0
+    if reps == 1:
+        return weight
+    return weight * (1 + reps / 30)
+
+
+def best_e1rm_for_exercise(ex):
+    best = 0
+    for s in ex.get("sets", []):
+        w = s.get("weight_kg", 0) or 0
+        r = s.get("reps", 0) or 0
+        e = e1rm_epley(w, r)
+        if e > best:
+            best = e
+    return best
+
+
+def _read_session_file(f):
+    """Parse one session file as written. Returns (session, None) or (None, error)."""
+    try:
+        data = json.loads(f.read_text())
+        if "date" not in data:
+            raise ValueError("missing date")
+        return data, None
+    except (json.JSONDecodeError, ValueError) as e:
+        return None, str(e)
+
+
+def _parse_session_file(f):
+    """Parse and normalize one session file. Returns (session, None) or (None, error)."""
+    data, error = _read_session_file(f)
+    # Normalize: support both "actual" and legacy "exercises" key
+    if data is not None and "actual" not in data and "exercises" in data:
+        data["actual"] = data["exercises"]
+    return data, error
+
+
+def load_sessions(history_dir, use_index=True, since=None, until=None, last_n=None):
+    """Load all valid YYYY-MM-DD.json files, sorted by date. Warn on bad files.
+
+    Parsed files are kept in the session index (see INDEX_FILENAME), so only
+    files whose mtime/size changed since the last run are re-parsed.
+
+    Records from the NDJSON store (gym_store.STORE_FILENAME) are merged in; a
+    day file wins over a store record for the same date.
+
+    since/until ("YYYY-MM-DD", inclusive) and last_n bound the result. Day
+    files outside the window are skipped by filename without being opened,
+    and only the matching tail of the store is read.
+    """
+    with trace_span("day files") as span:
+        sessions, stats = _load_indexed(history_dir, use_index=use_index, since=since, until=until, last_n=last_n)
+        span.set(**{k: v for k, v in stats.items() if v})
+    if gym_store.has_store(history_dir):
+        with trace_span("store"):
+            sessions = _merge_store(history_dir, sessions, since, until, last_n)
+    if since is not None or until is not None:
+        # Files not named by date could not be skipped up front
+        sessions = [s for s in sessions if _in_window(s["date"], since, until)]
+    if last_n is not None:
+        sessions = sessions[-last_n:] if last_n > 0 else []
+    return sessions
+
+
+def _in_window(date_str, since=None, until=None):
+    return (since is None or date_str >= since) and (until is None or date_str <= until)
+
+
+def _filename_date(name):
+    """The date of a YYYY-MM-DD.json filename, or None for any other name."""
+    stem = name[:-5] if name.endswith(".json") else ""
+    if len(stem) == 10 and stem[4] == stem[7] == "-" and (stem[:4] + stem[5:7] + stem[8:]).isdigit():
+        return stem
+    return None
+
+
+def _merge_store(history_dir, file_sessions, since=None, until=None, last_n=None):
+    """Day-file sessions merged over the store's records, sorted by date."""
+    if since is None and until is None and last_n is None:
+        stored, errors = gym_store.read_sessions(history_dir)
+    else:
+        stored, errors = gym_store.tail_sessions(history_dir, last_n, since=since, until=until)
+    for where, error in errors:
+        print(f"Warning: skipping {where}: {error}", file=sys.stderr)
+    by_date = {}
+    for s in stored:
+        if "actual" not in s and "exercises" in s:
+            s["actual"] = s["exercises"]
+        by_date[s["date"]] = make_record(s)
+    for s in file_sessions:
+        by_date[s["date"]] = s
+    return [by_date[d] for d in sorted(by_date)]
+
+
+# ---- Session index ----
+#
+# One compact JSON file inside the history dir, stored column-wise:
+#   {"version": 1, "written_ns": ..., "files": [...], "mtime_ns": [...],
+#    "size": [...], "sessions": [...], "errors": [...]}
+# Row i describes history/files[i]. An entry is reused only when mtime_ns and
+# size still match and the file was not modified within INDEX_RACY_NS of the
+# index write (same-tick rewrites keep mtime and can keep size).
+
+INDEX_FILENAME = ".gym-index"
+INDEX_VERSION = 1
+INDEX_RACY_NS = 2_000_000_000
+INDEX_BYPASS_FILES = 32  # windowed loads touching at most this many files skip the index
+
+
+def index_path(history_dir):
+    """Path of the session index for a history dir."""
+    return Path(history_dir) / INDEX_FILENAME
+
+
+def _read_index(history_dir):
+    """Read the index. Returns (written_ns, {filename: (mtime_ns, size, session, error)})."""
+    try:
+        raw = json.loads(index_path(history_dir).read_text())
+        if raw.get("version") != INDEX_VERSION:
+            return 0, {}
+        rows = zip(raw["files"], raw["mtime_ns"], raw["size"], raw["sessions"], raw["errors"])
+        return raw["written_ns"], {name: (m, sz, sess, err) for name, m, sz, sess, err in rows}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return 0, {}
+
+
+def _write_index(history_dir, entries):
+    """Write the index atomically. Silently skipped if the dir is read-only."""
+    names = sorted(entries)
+    raw = {
+        "version": INDEX_VERSION,
+        "written_ns": time.time_ns(),
+        "files": names,
+        "mtime_ns": [entries[n][0] for n in names],
+        "size": [entries[n][1] for n in names],
+        "sessions": [entries[n][2] for n in names],
+        "errors": [entries[n][3] for n in names],
+    }
+    path = index_path(history_dir)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp.write_text(json.dumps(raw, separators=(",", ":"), ensure_ascii=False))
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+def _load_indexed(history_dir, use_index=True, rebuild=False, since=None, until=None, last_n=None):
+    """Load sessions through the index. Returns (sessions, stats).
+
+    since/until/last_n skip date-named files by filename (stats["skipped"]);
+    their index entries are carried over untouched.
+    """
+    stats = {"files": 0, "sessions": 0, "errors": 0, "reparsed": 0, "skipped": 0, "index_written": False}
+    p = Path(history_dir)
+    if not p.exists():
+        return [], stats
+
+    # Plain names, not Paths: sorting thousands of Path objects costs more than the index read
+    with os.scandir(p) as it:
+        names = sorted(e.name for e in it if e.name.endswith(".json"))
+    dates = {name: _filename_date(name) for name in names}
+    todo = [n for n in names if dates[n] is None or _in_window(dates[n], since, until)]
+    wanted = len(todo)
+    if last_n is not None:
+        # Newest first, so the scan can stop once last_n dated sessions are found
+        undated = [n for n in todo if dates[n] is None]
+        todo = undated + [n for n in reversed(todo) if dates[n]]
+        wanted = min(wanted, len(undated) + last_n)
+    if wanted <= INDEX_BYPASS_FILES and wanted < len(names):
+        # A handful of files parse faster than the whole index loads
+        use_index = False
+    written_ns, cached = _read_index(p) if use_index and not rebuild else (0, {})
+    entries = {}
+    parsed = {}
+    found = 0
+    dirty = rebuild
+    for name in todo:
+        if last_n is not None and dates[name] and found >= last_n:
+            break
+        f = p / name
+        try:
+            st = f.stat()
+        except OSError:
+            continue
+        hit = cached.get(f.name)
+        fresh = (hit is not None and hit[0] == st.st_mtime_ns and hit[1] == st.st_size
+                 and st.st_mtime_ns < written_ns - INDEX_RACY_NS)
+        if fresh:
+            session, error = hit[2], hit[3]
+        else:
+            session, error = _parse_session_file(f)
+            stats["reparsed"] += 1
+            changed = hit is None or tuple(hit) != (st.st_mtime_ns, st.st_size, session, error)
+            # Unchanged but racy: rewrite once the file is old enough to be trusted
+            settled = time.time_ns() - st.st_mtime_ns > INDEX_RACY_NS
+            if changed or settled:
+                dirty = True
+        entries[f.name] = (st.st_mtime_ns, st.st_size, session, error)
+        stats["files"] += 1
+        if error is not None:
+            stats["errors"] += 1
+            print(f"Warning: skipping {f.name}: {error}", file=sys.stderr)
+        else:
+            parsed[f.name] = make_record(session)
+            found += dates[f.name] is not None
+
+    for name in names:
+        if name not in entries:
+            stats["skipped"] += 1
+            if name in cached:
+                entries[name] = cached[name]
+    sessions = [parsed[name] for name in sorted(parsed)]
+    stats["sessions"] = len(sessions)
+    if use_index and (dirty or set(entries) != set(cached)):
+        _write_index(p, entries)
+        stats["index_written"] = True
+    return sessions, stats
+
+
+class ExerciseResolver:
+    """Exercise-name matching and short names, built once per run.
+
+    Each raw name is lowercased once and mapped to a canonical id: its alias
+    group from EXERCISE_ALIASES, or its own lowercased name. Match results
+    are memoized per (name, target) pair, so the lift × session × exercise
+    loops in the commands reduce to dict lookups. Matching keeps the
+    normalize_match semantics: equal, substring either way, or same alias group.
+    """
+
+    def __init__(self, aliases=None, short_names=None):
+        self._groups = {}  # lowercased alias -> frozenset of canonical names
+        for canonical, names in (EXERCISE_ALIASES if aliases is None else aliases).items():
+            for n in [canonical] + names:
+                self._groups[n] = self._groups.get(n, frozenset()) | {canonical}
+        self._short_names = dict(SHORT_NAMES if short_names is None else short_names)
+        self._keys = {}
+        self._matches = {}
+
+    def _key(self, name):
+        key = self._keys.get(name)
+        if key is None:
+            lower = name.lower()
+            key = self._keys[name] = (lower, self._groups.get(lower, frozenset()))
+        return key
+
+    def canonical(self, name):
+        """Canonical id: alias-group name if the name is a known alias, else its lowercase form."""
+        lower, groups = self._key(name)
+        return min(groups) if groups else lower
+
+    def matches(self, name, target):
+        """True if name and target refer to the same exercise (memoized)."""
+        pair = (name, target)
+        hit = self._matches.get(pair)
+        if hit is None:
+            nl, ng = self._key(name)
+            tl, tg = self._key(target)
+            hit = self._matches[pair] = nl == tl or tl in nl or nl in tl or bool(ng & tg)
+        return hit
+
+    def short(self, name, default=None):
+        """Display name from SHORT_NAMES / goals.json overrides."""
+        return self._short_names.get(name, default)
+
+
+def build_resolver(goals_path=None):
+    """Resolver with goals.json short-name overrides applied."""
+    return ExerciseResolver(short_names=_get_short_names(goals_path))
+
+
+def normalize_match(name, target):
+    """True if two exercise names refer to the same lift (see ExerciseResolver)."""
+    return _DEFAULT_RESOLVER.matches(name, target)
+
+
+def week_key(date_str):
+    """ISO week key from date string."""
+    return _date_fields(date_str)[2]
+
+
+def week_start(date_str):
+    return _date_fields(date_str)[3]
+
+
+# ---- Session records ----
+#
+# Everything derived from a session's "date" is computed once: loaded sessions
+# are SessionRecords carrying the parsed fields, and plain dicts (tests, ad-hoc
+# callers) go through a per-date-string cache instead of strptime every time.
+
+@functools.lru_cache(maxsize=None)
+def _date_fields(date_str):
+    """(midnight datetime, ordinal, ISO week key, week start) for a YYYY-MM-DD string."""
+    if len(date_str) == 10 and date_str[4] == date_str[7] == "-":
+        d = datetime.fromisoformat(date_str)  # strptime's first call imports _strptime/calendar (~3 ms)
+    else:
+        d = datetime.strptime(date_str, "%Y-%m-%d")
+    iso = d.isocalendar()
+    return d, d.toordinal(), f"{iso[0]}-W{iso[1]:02d}", (d - timedelta(days=d.weekday())).strftime("%Y-%m-%d")
+
+
+class SessionRecord(dict):
+    """A loaded session: the raw dict plus its date fields, parsed once at load time.
+
+    Reads, compares and serializes exactly like the dict it was built from.
+    `day` is a midnight datetime (what the chart code plots against).
+    """
+
+    __slots__ = ("day", "ordinal", "week", "week_start")
+
+
+def make_record(data):
+    """SessionRecord for a parsed session; the dict itself if its date does not parse."""
+    try:
+        fields = _date_fields(data["date"])
+    except (KeyError, TypeError, ValueError):
+        return data
+    rec = SessionRecord(data)
+    rec.day, rec.ordinal, rec.week, rec.week_start = fields
+    # Names and muscle groups repeat across thousands of sessions; share one string each
+    for key in ("actual", "planned"):
+        for ex in rec.get(key) or ():
+            if isinstance(ex, dict):
+                for field in ("name", "muscle_group"):
+                    if isinstance(ex.get(field), str):
+                        ex[field] = sys.intern(ex[field])
+    return rec
+
+
+def date_fields(session):
+    """(day, ordinal, week key, week start) of a session dict or SessionRecord."""
+    if type(session) is SessionRecord:
+        return session.day, session.ordinal, session.week, session.week_start
+    return _date_fields(session["date"])
+
+
+def session_day(session):
+    """Midnight datetime of a session's date."""
+    return date_fields(session)[0]
+
+
+
+
+
+def validate_time_str(t):
+    """Validate HH:MM time string. Returns True if valid."""
+    import gym_schema
+    return gym_schema.is_time(t)
+
+
+def session_duration(session):
+    """Compute duration in minutes from top-level start_time/end_time. Returns (start, end, minutes) or None."""
+    start = session.get("start_time")
+    end = session.get("end_time")
+    if not start or not end:
+        return None
+    if not validate_time_str(start) or not validate_time_str(end):
+        return None
+    sh, sm = start.split(":")
+    eh, em = end.split(":")
+    start_min = int(sh) * 60 + int(sm)
+    end_min = int(eh) * 60 + int(em)
+    dur = end_min - start_min
+    if dur < 0:
+        dur += 24 * 60  # crosses midnight
+    return (start, end, dur)
+
+
+def validate_planned(planned):
+    """Validate planned exercises array. Returns list of error strings."""
+    import gym_schema
+    return gym_schema.validate_planned(planned)
+
+
+def parse_goals_from_plan(plan_text):
+    """Parse strength targets from plan.md text. Returns {exercise: goal_e1rm}."""
+    import re
+    goals = {}
+    in_targets = False
+    for line in plan_text.split("\n"):
+        if "Силовые targets" in line:
+            in_targets = True
+            continue
+        if in_targets and line.startswith("|") and "---" not in line and "Lift" not in line:
+            parts = [p.strip() for p in line.split("|") if p.strip()]
+            if len(parts) >= 3:
+                name = parts[0]
+                goal_str = parts[2]
+                # Extract number from goal like "~170", "~110"
+                m = re.search(r'~?(\d+(?:\.\d+)?)', goal_str)
+                if m:
+                    # Simplify name: "Bench (flat)" -> "Bench"
+                    simple_name = re.sub(r'\s*\(.*\)', '', name).strip()
+                    goals[simple_name] = float(m.group(1))
+                    if goals[simple_name] == int(goals[simple_name]):
+                        goals[simple_name] = int(goals[simple_name])
+        elif in_targets and not line.startswith("|") and line.strip() and not line.startswith("#"):
+            break
+    return goals
+
+
+def compute_goal_lines(goals, start_date, start_values, weeks=12):
+    """Compute goal line data for plotting. Returns {exercise: {start_date, end_date, start_value, end_value}}."""
+    lines = {}
+    end_date = start_date + timedelta(weeks=weeks)
+    for name, goal in goals.items():
+        if name in start_values:
+            lines[name] = {
+                "start_date": start_date,
+                "end_date": end_date,
+                "start_value": start_values[name],
+                "end_value": goal,
+            }
+    return lines
+
+
+def load_goals(goals_path):
+    """Load goals from goals.json. Returns list of goal entries."""
+    p = Path(goals_path)
+    if not p.exists():
+        return []
+    if _WARM is not None:
+        try:
+            st = p.stat()
+        except OSError:
+            return []
+        key = ("goals", str(p.resolve()))
+        sig = (st.st_mtime_ns, st.st_size)
+        hit = _warm_get(key)
+        if hit is None or hit[0] != sig:
+            hit = _warm_put(key, sig, _read_goals(p))
+        return list(hit[1])
+    return _read_goals(p)
+
+
+def _read_goals(p):
+    try:
+        return json.loads(p.read_text())
+    except (json.JSONDecodeError, ValueError):
+        return []
+
+
+def get_latest_goals(goals_path):
+    """Get the latest goal entry from goals.json. Returns dict or None."""
+    goals = load_goals(goals_path)
+    if not goals:
+        return None
+    return goals[-1]
+
+
+def default_goals_path(history_dir):
+    """Derive default goals.json path from history dir (sibling file)."""
+    return str(Path(history_dir).parent / "goals.json")
+
+
+def _goal_target(val):
+    """Extract numeric target from goal value (supports int/float or {"target": N})."""
+    if isinstance(val, dict):
+        return val.get("target", 0)
+    return val
+
+
+def _goal_short(name, val):
+    """Extract short name from goal value, fallback to exercise name."""
+    if isinstance(val, dict) and val.get("short"):
+        return val["short"]
+    return name
+
+
+def _get_tracked_lifts(goals_path):
+    """Get tracked lift names from goals.json, or fallback to defaults."""
+    DEFAULT_LIFTS = ["Squat", "Bench Press", "OHP", "Seated Cable Row"]
+    if not goals_path:
+        return DEFAULT_LIFTS
+    latest = get_latest_goals(goals_path)
+    if not latest or not latest.get("goals"):
+        return DEFAULT_LIFTS
+    return list(latest["goals"].keys())
+
+
+PROGRAM_ARCHIVE_DIR = "programs"  # past program.json files, next to program.json
+CURRENT_PERIOD_WEEKS = 6  # --period current when no program covers the latest session
+
+
+def default_program_path(history_dir):
+    """Derive default program.json path from history dir (sibling file)."""
+    return str(Path(history_dir).parent / "program.json")
+
+
+def _program_path(args, history_dir=None):
+    return getattr(args, "program", None) or default_program_path(history_dir or args.history_dir)
+
+
+def load_periods(program_path):
+    """gym_periods.PeriodIndex of program.json and its programs/ archive (empty if neither exists)."""
+    import gym_periods
+    if not program_path:
+        return gym_periods.PeriodIndex([])
+    archive = Path(program_path).parent / PROGRAM_ARCHIVE_DIR
+    key = sig = None
+    if _WARM is not None:
+        files = [Path(program_path)] + (sorted(archive.glob("*.json")) if archive.is_dir() else [])
+        key = ("periods", str(Path(program_path).resolve()))
+        sig = tuple((str(f), f.stat().st_mtime_ns, f.stat().st_size) for f in files if f.is_file())
+        hit = _warm_get(key)
+        if hit is not None and hit[0] == sig:
+            return hit[1]
+    mesocycles, warnings = gym_periods.load_programs(program_path, archive)
+    for warning in warnings:
+        print(f"Warning: skipping program {warning}", file=sys.stderr)
+    index = gym_periods.PeriodIndex(mesocycles)
+    if key is not None:
+        _warm_put(key, sig, index)
+    return index
+
+
+def _resolve_period(index, period, latest):
+    """Mesocycle index of a --period (not "all") seen from the latest session day; AnalyticsError if none."""
+    i = index.resolve(period, latest)
+    if i is not None:
+        return i
+    if period == "current":
+        raise AnalyticsError(f"No mesocycle covers {datetime.fromordinal(latest).strftime('%Y-%m-%d')}")
+    if period == "previous":
+        raise AnalyticsError("No previous mesocycle (program.json / programs/*.json)")
+    names = ", ".join(index.names()) or "none defined"
+    raise AnalyticsError(f"Unknown --period: {period} (expected all, current, previous or a program name: {names})")
+
+
+def _period_range(period, program_path, latest):
+    """(since, until) dates of a --period seen from the latest session day (ordinal), or None for all.
+
+    current without a program covering the latest session keeps the last
+    CURRENT_PERIOD_WEEKS weeks (until None).
+    """
+    if period == "all":
+        return None
+    index = load_periods(program_path)
+    if period == "current" and index.find(latest) is None:
+        return datetime.fromordinal(latest - CURRENT_PERIOD_WEEKS * 7).strftime("%Y-%m-%d"), None
+    start, end = index.bounds(_resolve_period(index, period, latest), latest)
+    return datetime.fromordinal(start).strftime("%Y-%m-%d"), datetime.fromordinal(end).strftime("%Y-%m-%d")
+
+
+def _get_short_names(goals_path):
+    """Get {full_name: short_name} mapping. Merges SHORT_NAMES with goals.json overrides."""
+    result = dict(SHORT_NAMES)  # Start with hardcoded defaults
+    if goals_path:
+        latest = get_latest_goals(goals_path)
+        if latest and latest.get("goals"):
+            for name, val in latest["goals"].items():
+                result[name] = _goal_short(name, val)
+    return result
+
+
+_DEFAULT_RESOLVER = ExerciseResolver()
+
+
+def err_exit(msg):
+    print(f"Error: {msg}", file=sys.stderr)
+    sys.exit(1)
+
+
+# ---- Tracing ----
+#
+# --trace[=tree|json|chrome] (or GYM_TRACE=1|tree|json|chrome) records a span
+# tree for one command: startup, argument parsing, then the command span with
+# its load / compute / render / save / output phases. trace_span() nests with
+# `with`; trace_phase() ends the previous phase of the enclosing span and starts
+# the next, so long command bodies need no re-indenting. With tracing off both
+# return after one global lookup.
+
+TRACE_ENV = "GYM_TRACE"
+TRACE_OUT_ENV = "GYM_TRACE_OUT"
+TRACE_FORMATS = ("tree", "json", "chrome")
+_TRACER = None
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children", "phase", "_tracer")
+
+    def __init__(self, tracer, name, attrs, phase=False):
+        self._tracer, self.name, self.attrs, self.phase = tracer, name, attrs, phase
+        self.start = self.end = None
+        self.children = []
+
+    def __enter__(self):
+        stack = self._tracer.stack
+        stack[-1].children.append(self)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._tracer.close(self, time.perf_counter())
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """Span tree for one command run."""
+
+    def __init__(self, start):
+        self.root = Span(self, "total", {})
+        self.root.start = start
+        self.stack = [self.root]
+
+    def add(self, name, start, end, **attrs):
+        """Record an already finished span under the current one."""
+        span = Span(self, name, attrs)
+        span.start, span.end = start, end
+        self.stack[-1].children.append(span)
+
+    def phase(self, name, attrs):
+        now = time.perf_counter()
+        if self.stack[-1].phase:
+            self.close(self.stack[-1], now)
+        span = Span(self, name, attrs, phase=True)
+        self.stack[-1].children.append(span)
+        self.stack.append(span)
+        span.start = now
+
+    def close(self, span, now):
+        """End span and anything still open inside it (phases, spans left by an exit)."""
+        while span in self.stack:
+            self.stack.pop().end = now
+
+    def finish(self):
+        self.close(self.root, time.perf_counter())
+        return self.root
+
+
+def trace_span(name, **attrs):
+    """Context manager timing a named span (no-op unless tracing)."""
+    if _TRACER is None:
+        return _NULL_SPAN
+    return Span(_TRACER, name, attrs)
+
+
+def trace_phase(name, **attrs):
+    """End the current phase of the enclosing span and start `name`."""
+    if _TRACER is not None:
+        _TRACER.phase(name, attrs)
+
+
+def _trace_dict(span, t0):
+    return {"name": span.name,
+            "start_ms": round((span.start - t0) * 1000, 3),
+            "ms": round((span.end - span.start) * 1000, 3),
+            **({"attrs": span.attrs} if span.attrs else {}),
+            "children": [_trace_dict(c, t0) for c in span.children]}
+
+
+def _trace_events(span, t0, pid):
+    """Chrome trace-event "complete" events (chrome://tracing, Perfetto)."""
+    yield {"name": span.name, "ph": "X", "pid": pid, "tid": 0,
+           "ts": round((span.start - t0) * 1e6, 1), "dur": round((span.end - span.start) * 1e6, 1),
+           "args": span.attrs}
+    for c in span.children:
+        yield from _trace_events(c, t0, pid)
+
+
+def format_trace(root, fmt="tree"):
+    """Render a finished span tree as text, nested JSON or Chrome trace-event JSON."""
+    if fmt == "json":
+        return json.dumps(_trace_dict(root, root.start), indent=2)
+    if fmt == "chrome":
+        return json.dumps({"traceEvents": list(_trace_events(root, root.start, os.getpid())),
+                           "displayTimeUnit": "ms"})
+    lines = ["trace (ms):"]
+
+    def walk(span, depth):
+        label = "  " * depth + span.name
+        attrs = "  ".join(f"{k}={v}" for k, v in span.attrs.items())
+        lines.append(f"  {label:<36} {(span.end - span.start) * 1000:9.2f}  {attrs}".rstrip())
+        for c in span.children:
+            walk(c, depth + 1)
+
+    walk(root, 0)
+    return "\n".join(lines)
+
+
+def _trace_mode(args):
+    """Trace format requested by --trace or $GYM_TRACE, or None."""
+    mode = getattr(args, "trace", None) or os.environ.get(TRACE_ENV, "").strip().lower() or None
+    if mode in (None, "0", "false", "no", "off"):
+        return None
+    return mode if mode in TRACE_FORMATS else "tree"
+
+
+def _write_trace(root, mode, out=None):
+    text = format_trace(root, mode)
+    if out:
+        Path(out).write_text(text + "\n")
+    else:
+        print(text, file=sys.stderr)
+
+
+# ---- Vectorized set engine ----
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        err_exit("numpy not installed")
+    return np
+
+
+class SetTable:
+    """Sessions flattened once into NumPy columns.
+
+    Three levels, each pointing at the level above:
+        sessions     ordinal, week id
+        occurrences  one per entry in "actual": session, name id, muscle-group id, set count
+        sets         one per set: occurrence, weight, reps
+    Names, muscle groups and ISO weeks are interned into id lists.
+    """
+
+    def __init__(self, sessions, resolver=None):
+        np = _numpy()
+        self.sessions = sessions
+        self.resolver = resolver or _DEFAULT_RESOLVER
+        self.names, self.muscle_groups, self.weeks, self.week_starts = [], [], [], []
+        name_ids, mg_ids, week_ids = {}, {}, {}
+        ordinals, sess_week = [], []
+        occ_session, occ_name, occ_mg, occ_nsets = [], [], [], []
+        set_occ, weights, reps, scores = [], [], [], []
+        self.set_refs = []
+
+        for si, s in enumerate(sessions):
+            _, ordinal, wk, wk_start = date_fields(s)
+            ordinals.append(ordinal)
+            if wk not in week_ids:
+                week_ids[wk] = len(self.weeks)
+                self.weeks.append(wk)
+                self.week_starts.append(wk_start)
+            sess_week.append(week_ids[wk])
+            for ex in s.get("actual", []):
+                name = ex.get("name", "")
+                mg = ex.get("muscle_group", "unknown")
+                if name not in name_ids:
+                    name_ids[name] = len(self.names)
+                    self.names.append(name)
+                if mg not in mg_ids:
+                    mg_ids[mg] = len(self.muscle_groups)
+                    self.muscle_groups.append(mg)
+                oi = len(occ_session)
+                sets = ex.get("sets", [])
+                occ_session.append(si)
+                occ_name.append(name_ids[name])
+                occ_mg.append(mg_ids[mg])
+                occ_nsets.append(len(sets))
+                for st in sets:
+                    w = st.get("weight_kg", 0) or 0
+                    r = st.get("reps", 0) or 0
+                    set_occ.append(oi)
+                    weights.append(w)
+                    reps.append(r)
+                    scores.append(w * r)
+                    self.set_refs.append(st)
+
+        self.ordinal = np.array(ordinals, dtype=np.int64)
+        self.session_week = np.array(sess_week, dtype=np.int64)
+        self.occ_session = np.array(occ_session, dtype=np.int64)
+        self.occ_name = np.array(occ_name, dtype=np.int64)
+        self.occ_mg = np.array(occ_mg, dtype=np.int64)
+        self.occ_nsets = np.array(occ_nsets, dtype=np.int64)
+        self.set_occ = np.array(set_occ, dtype=np.int64)
+        self.weight = np.array(weights, dtype=np.float64)
+        self.reps = np.array(reps, dtype=np.float64)
+
+        # Epley per set, same rules as e1rm_epley
+        w, r = self.weight, self.reps
+        e1rm = np.where(r == 1, w, w * (1 + r / 30))
+        e1rm[(r <= 0) | (w <= 0)] = 0
+        self.set_e1rm = e1rm
+
+        # Best e1RM per occurrence (0 when no weighted set), as best_e1rm_for_exercise
+        self.occ_best = np.zeros(len(occ_session))
+        np.maximum.at(self.occ_best, self.set_occ, e1rm)
+
+        # Per occurrence: first set with the best e1RM, first set with max weight*reps (-1 if no sets)
+        self.occ_e1rm_set = self._first_argmax(e1rm)
+        self.occ_best_set = self._first_argmax(np.array(scores, dtype=np.float64))
+
+    def _first_argmax(self, values):
+        """Index of the first set holding the per-occurrence max of values (-1 for no sets)."""
+        np = _numpy()
+        result = np.full(len(self.occ_session), -1, dtype=np.int64)
+        if len(values):
+            boundary = np.r_[False, self.set_occ[1:] != self.set_occ[:-1]]
+            starts = np.flatnonzero(np.r_[True, boundary[1:]])
+            gmax = np.maximum.reduceat(values, starts)
+            idx = np.arange(len(values))
+            first = np.minimum.reduceat(np.where(values == gmax[np.cumsum(boundary)], idx, len(values)), starts)
+            result[self.set_occ[starts]] = first
+        return result
+
+    def best_value(self, oi):
+        """Best e1RM of occurrence oi as a plain number, typed like best_e1rm_for_exercise."""
+        if self.occ_best[oi] <= 0:
+            return 0
+        st = self.set_refs[self.occ_e1rm_set[oi]]
+        return e1rm_epley(st.get("weight_kg", 0) or 0, st.get("reps", 0) or 0)
+
+    def name_mask(self, target):
+        """Boolean mask over interned names matching target (normalize_match semantics)."""
+        np = _numpy()
+        return np.array([self.resolver.matches(n, target) for n in self.names], dtype=bool)
+
+    def latest_e1rm(self):
+        """{name: {"e1rm", "date"}} from the latest session with a weighted set, ordered by first appearance."""
+        np = _numpy()
+        pos = np.flatnonzero(self.occ_best > 0)
+        names = self.occ_name[pos]
+        uniq, first = np.unique(names, return_index=True)
+        _, last_rev = np.unique(names[::-1], return_index=True)
+        last = len(names) - 1 - last_rev
+        result = {}
+        for k in np.argsort(first, kind="stable"):
+            oi = pos[last[k]]
+            result[self.names[uniq[k]]] = {
+                "e1rm": round(self.best_value(oi), 2),
+                "date": self.sessions[self.occ_session[oi]]["date"],
+            }
+        return result
+
+    def weekly_volume(self):
+        """Hard sets per ISO week and muscle group, sorted by week.
+
+        Returns [{"week", "week_start", <mg>: sets, ...}], muscle groups in first-seen order.
+        """
+        np = _numpy()
+        n_mg = max(len(self.muscle_groups), 1)
+        keys = self.session_week[self.occ_session] * n_mg + self.occ_mg
+        uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        totals = np.bincount(inverse, weights=self.occ_nsets, minlength=len(uniq))
+        weeks = {wk: {"week": wk, "week_start": self.week_starts[i]} for i, wk in enumerate(self.weeks)}
+        for k in np.argsort(first, kind="stable"):
+            wid, mid = divmod(int(uniq[k]), n_mg)
+            weeks[self.weeks[wid]][self.muscle_groups[mid]] = int(totals[k])
+        return [weeks[k] for k in sorted(weeks)]
+
+    def session_sets(self):
+        """Total sets per session (array aligned with sessions)."""
+        np = _numpy()
+        return np.bincount(self.occ_session, weights=self.occ_nsets,
+                           minlength=len(self.sessions)).astype(np.int64)
+
+    def lift_series(self, lift):
+        """(dates, values) for one lift: first matching exercise per session with e1RM > 0."""
+        np = _numpy()
+        occ = np.flatnonzero(self.name_mask(lift)[self.occ_name])
+        _, first = np.unique(self.occ_session[occ], return_index=True)
+        occ = occ[first]
+        occ = occ[self.occ_best[occ] > 0]
+        dates = [datetime.fromordinal(int(o)) for o in self.ordinal[self.occ_session[occ]]]
+        values = [round(self.best_value(oi), 1) for oi in occ]
+        return dates, values
+
+    def progress_entries(self, target):
+        """Per-session progress rows for every exercise matching target."""
+        np = _numpy()
+        entries = []
+        for oi in np.flatnonzero(self.name_mask(target)[self.occ_name]):
+            bi = self.occ_best_set[oi]
+            best_set = self.set_refs[bi] if bi >= 0 else {}
+            entries.append({
+                "date": self.sessions[self.occ_session[oi]]["date"],
+                "exercise": self.names[self.occ_name[oi]],
+                "e1rm": round(self.best_value(oi), 2),
+                "best_weight": best_set.get("weight_kg", 0),
+                "best_reps": best_set.get("reps", 0),
+                "num_sets": int(self.occ_nsets[oi]),
+            })
+        return entries
+
+
+# ---- Session analysis cache ----
+#
+# `analyze` stores the computed part of the `analysis` object described in
+# references/analytics.md inside each session: e1rm, e1rm_delta, volume_sets,
+# volume_week_total, goal_progress and plan_adherence. Hand-written keys
+# (strengths, notes, next_session_adjustments, ...) are never touched.
+#
+# Sessions are walked in date order by a SessionAnalyzer holding the running
+# state (last e1RM and sessions-at-current per exercise, this week's set
+# totals, goal baselines). analysis["computed"] = {"version", "actual", "basis"}
+# hashes the session's exercises and the session plus the slice of state it
+# was computed from. While "basis" matches, the stored analysis is reused and
+# the state advances from it, so only new or changed sessions (and later ones
+# whose inputs they change) are recomputed and written back.
+#
+# summary, compare and progress read stored values when "actual" still
+# matches the session. History-dependent fields (deltas, week totals, goal
+# progress) are as of the last `analyze` run.
+
+ANALYSIS_VERSION = 1
+ANALYSIS_KEYS = ("e1rm", "e1rm_delta", "volume_sets", "volume_week_total", "goal_progress", "plan_adherence")
+TREND_EPS = 0.05  # kg; smaller e1RM changes count as "→"
+
+
+def _digest(obj):
+    import hashlib
+    blob = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def cached_analysis(session):
+    """The session's stored analysis if it was computed from its current exercises, else None."""
+    analysis = session.get("analysis")
+    computed = analysis.get("computed") if isinstance(analysis, dict) else None
+    if not isinstance(computed, dict) or computed.get("version") != ANALYSIS_VERSION:
+        return None
+    if computed.get("actual") != _digest(session.get("actual", [])):
+        return None
+    return analysis
+
+
+def session_e1rm(session):
+    """{exercise: best e1RM} for exercises with a weighted set (max over repeated names), 2 dp."""
+    result = {}
+    for ex in session.get("actual", []):
+        value = round(best_e1rm_for_exercise(ex), 2)
+        name = ex.get("name", "")
+        if value > 0 and value > result.get(name, 0):
+            result[name] = value
+    return result
+
+
+class SessionAnalyzer:
+    """Running state of the analysis walk. Feed sessions in date order via step()."""
+
+    def __init__(self, resolver=None, goals=()):
+        self.resolver = resolver or _DEFAULT_RESOLVER
+        self.goals = sorted((g for g in goals or () if isinstance(g, dict) and g.get("date_set")
+                             and isinstance(g.get("goals"), dict)), key=lambda g: str(g["date_set"]))
+        self.lifts = list(dict.fromkeys(lift for g in self.goals for lift in g["goals"]))
+        self.last = {}  # canonical exercise -> [e1rm, sessions at that value]
+        self.week = (None, {})  # (ISO week, {muscle group: sets so far})
+        self.goal_current = {}  # goal lift -> latest e1RM
+        self.active = None  # index of the goals entry in effect
+        self.baseline = {}  # goal lift -> e1RM when the active entry took effect
+
+    def _active_goal(self, date_str):
+        active = None
+        for i, g in enumerate(self.goals):
+            if str(g["date_set"]) <= date_str:
+                active = i
+        return active
+
+    def _goal_values(self, e1rm):
+        """{goal lift: e1RM} from the first matching exercise of a session."""
+        values = {}
+        for lift in self.lifts:
+            for name, value in e1rm.items():
+                if self.resolver.matches(name, lift):
+                    values[lift] = value
+                    break
+        return values
+
+    def basis(self, session, e1rm):
+        """The state this session's analysis depends on (hashed into computed.basis)."""
+        active = self._active_goal(session["date"])
+        entry = self.goals[active] if active is not None else None
+        baseline = self.baseline if active == self.active else self.goal_current
+        wk = date_fields(session)[2]
+        return {
+            "previous": {name: self.last.get(self.resolver.canonical(name)) for name in e1rm},
+            "week": self.week[1] if self.week[0] == wk else {},
+            "goals": entry,
+            "goal_start": {lift: baseline.get(lift) for lift in entry["goals"]} if entry else {},
+            "goal_current": {lift: self.goal_current.get(lift) for lift in entry["goals"]} if entry else {},
+        }
+
+    def compute(self, session, e1rm, basis):
+        """The computed analysis fields for one session."""
+        deltas = {}
+        for name, current in e1rm.items():
+            prev = basis["previous"][name]
+            if prev is None:
+                deltas[name] = {"previous": None, "current": current, "delta": None, "trend": "new",
+                                "sessions_at_current": 1}
+                continue
+            previous, count = prev
+            delta = round(current - previous, 2)
+            trend = "↑" if delta > TREND_EPS else "↓" if delta < -TREND_EPS else "→"
+            deltas[name] = {"previous": previous, "current": current, "delta": delta, "trend": trend,
+                            "sessions_at_current": count + 1 if trend == "→" else 1}
+
+        volume = {}
+        for ex in session.get("actual", []):
+            mg = ex.get("muscle_group", "unknown")
+            volume[mg] = volume.get(mg, 0) + len(ex.get("sets", []))
+        week_total = dict(basis["week"])
+        for mg, n in volume.items():
+            week_total[mg] = week_total.get(mg, 0) + n
+
+        analysis = {"e1rm": e1rm, "e1rm_delta": deltas, "volume_sets": volume, "volume_week_total": week_total,
+                    "goal_progress": self._goal_progress(session, e1rm, basis)}
+        planned = session.get("planned")
+        if isinstance(planned, list) and planned:
+            names = [ex.get("name", "") for ex in session.get("actual", [])]
+            hit = sum(1 for p in planned
+                      if any(self.resolver.matches(n, p.get("name", "")) for n in names))
+            analysis["plan_adherence"] = round(hit / len(planned), 2)
+        return analysis
+
+    def _goal_progress(self, session, e1rm, basis):
+        entry = basis["goals"]
+        if not entry:
+            return {}
+        day = session_day(session)
+        set_day = datetime.strptime(str(entry["date_set"])[:10], "%Y-%m-%d")
+        if entry.get("target_date"):
+            end = datetime.strptime(str(entry["target_date"])[:10], "%Y-%m-%d")
+        else:
+            end = set_day + timedelta(weeks=12)
+        values = self._goal_values(e1rm)
+        progress = {}
+        for lift, val in entry["goals"].items():
+            current = values.get(lift, basis["goal_current"][lift])
+            target = _goal_target(val)
+            if current is None or not target:
+                continue
+            start = basis["goal_start"][lift]
+            start = current if start is None else start
+            remaining = round((end - day).days / 7, 1)
+            if current >= target:
+                status = "achieved"
+            elif remaining <= 0:
+                status = "overdue"
+            else:
+                span = max((end - set_day).days, 1)
+                expected = start + (target - start) * max((day - set_day).days, 0) / span
+                status = "on_track" if current >= expected - TREND_EPS else "behind"
+            progress[lift] = {
+                "start": start, "current": current, "target": target, "remaining_weeks": remaining,
+                "needed_per_week": round((target - current) / remaining, 2) if remaining > 0 and current < target else 0,
+                "status": status,
+            }
+        return progress
+
+    def advance(self, session, analysis):
+        """Move the state past a session, from its (stored or fresh) analysis."""
+        e1rm = analysis.get("e1rm", {})
+        deltas = analysis.get("e1rm_delta", {})
+        for name, value in e1rm.items():
+            self.last[self.resolver.canonical(name)] = [value, deltas.get(name, {}).get("sessions_at_current", 1)]
+        self.week = (date_fields(session)[2], dict(analysis.get("volume_week_total", {})))
+        active = self._active_goal(session["date"])
+        if active != self.active:
+            self.active, self.baseline = active, dict(self.goal_current)
+        self.goal_current.update(self._goal_values(e1rm))
+        if active is not None:
+            for lift in self.goals[active]["goals"]:
+                if lift not in self.baseline and lift in self.goal_current:
+                    self.baseline[lift] = self.goal_current[lift]
+
+    def step(self, session, force=False):
+        """(analysis, changed) for the next session: the stored one if its basis still matches."""
+        e1rm = session_e1rm(session)
+        basis = self.basis(session, e1rm)
+        key = _digest([{k: v for k, v in session.items() if k != "analysis"}, basis])
+        stored = session.get("analysis") if isinstance(session.get("analysis"), dict) else {}
+        computed = stored.get("computed") or {}
+        if not force and computed.get("version") == ANALYSIS_VERSION and computed.get("basis") == key:
+            analysis, changed = stored, False
+        else:
+            fresh = self.compute(session, e1rm, basis)
+            analysis = {k: v for k, v in stored.items() if k not in ANALYSIS_KEYS}
+            analysis.update(fresh)
+            analysis["computed"] = {"version": ANALYSIS_VERSION, "actual": _digest(session.get("actual", [])),
+                                    "basis": key}
+            changed = analysis != stored
+        self.advance(session, analysis)
+        return analysis, changed
+
+
+def analyze_sessions(sessions, resolver=None, goals=(), force=False):
+    """Walk sessions in date order. Returns [(session, analysis, changed)]."""
+    run = SessionAnalyzer(resolver, goals)
+    return [(s, *run.step(s, force)) for s in sessions]
+
+
+def _write_analyses(history_dir, updates, fsync=None):
+    """Store updated analyses. Day files are rewritten in place; store sessions go in one append/rewrite.
+
+    updates: [(session, analysis)]. Returns {"files", "store", "skipped"} counts.
+    fsync None follows $GYM_FSYNC (gym_store).
+    """
+    counts = {"files": 0, "store": 0, "skipped": 0}
+    stored = None
+    store_updates = []
+    # One lock and one fsync batch for all day files, instead of one per file
+    with gym_store.locked(history_dir), gym_store.WriteBatch(fsync) as batch:
+        for session, analysis in updates:
+            path = Path(history_dir) / f"{session['date']}.json"
+            if path.exists():
+                raw = path.read_text()
+                data = json.loads(raw)  # raw file: keeps a legacy "exercises" key as written
+                data["analysis"] = analysis
+                batch.write(path, gym_store.dump_json(data, compact=not raw.startswith("{\n")))
+                counts["files"] += 1
+                continue
+            if stored is None:
+                records, _ = gym_store.read_sessions(history_dir) if gym_store.has_store(history_dir) else ([], [])
+                stored = {s["date"]: s for s in records}
+            record = stored.get(session["date"])
+            if record is None:
+                counts["skipped"] += 1  # file not named by its date
+                continue
+            store_updates.append({**record, "analysis": analysis})
+        if len(store_updates) == 1:
+            gym_store.append_session(history_dir, store_updates[0], fsync)
+        elif store_updates:
+            gym_store.compact(history_dir, extra=store_updates, fsync=fsync)
+    counts["store"] = len(store_updates)
+    return counts
+
+
+# ---- SQLite mirror ----
+#
+# gym_db.py keeps history/.gym.sqlite in sync with the session files; the
+# derived columns (e1RM, best set, ISO week, canonical names) come from here so
+# the database agrees with SetTable. `db sync` / `query` use it directly, and
+# e1rm / volume / progress --from-db answer from it without loading sessions.
+
+def _planned_sets(planned_ex):
+    """Planned set count: a "sets" list or number, else the N of "NxR" in sets_reps."""
+    sets = planned_ex.get("sets")
+    if isinstance(sets, list):
+        return len(sets)
+    if isinstance(sets, int):
+        return sets
+    head = str(planned_ex.get("sets_reps", "")).lower().partition("x")[0].strip()
+    return int(head) if head.isdigit() else None
+
+
+def _db_session_rows(session, resolver=None):
+    """gym_db rows for one session, derived with the same rules as SetTable."""
+    resolver = resolver or _DEFAULT_RESOLVER
+    try:
+        _, _, week, start = _date_fields(session["date"])
+    except (TypeError, ValueError):
+        week = start = None
+    duration = session_duration(session)
+    cols = {"week": week, "week_start": start, "day": session.get("day"),
+            "duration_min": duration[2] if duration else None}
+
+    exercises = []
+    actual = session.get("actual", session.get("exercises")) or []
+    for ex in actual:
+        name = ex.get("name", "")
+        sets, best, best_set, best_score = [], 0, {}, None
+        for st in ex.get("sets", []):
+            w = st.get("weight_kg", 0) or 0
+            r = st.get("reps", 0) or 0
+            e = e1rm_epley(w, r)
+            sets.append({"weight_kg": st.get("weight_kg"), "reps": st.get("reps"), "rpe": st.get("rpe"), "e1rm": e})
+            if e > best:
+                best = e
+            if best_score is None or w * r > best_score:
+                best_score, best_set = w * r, st
+        exercises.append(({
+            "name": name, "name_key": name.lower(), "canonical": resolver.canonical(name),
+            "muscle_group": ex.get("muscle_group", "unknown"), "n_sets": len(sets), "best_e1rm": best,
+            "best_weight": best_set.get("weight_kg", 0), "best_reps": best_set.get("reps", 0),
+        }, sets))
+
+    planned = []
+    for p in session.get("planned") or []:
+        if not isinstance(p, dict):
+            continue
+        name = p.get("name", "")
+        mg = p.get("muscle_group")
+        if mg is None:
+            # Planned entries often omit the muscle group; borrow it from the logged exercise
+            mg = next((ex.get("muscle_group", "unknown") for ex in actual
+                       if resolver.matches(ex.get("name", ""), name)), "unknown")
+        planned.append({"name": name, "canonical": resolver.canonical(name), "muscle_group": mg,
+                        "n_sets": _planned_sets(p)})
+    return cols, exercises, planned
+
+
+def _db_goal_rows(entries, resolver=None):
+    """gym_db goal rows: one per lift per goals.json entry (entry numbered from 1, as in `goals list`)."""
+    resolver = resolver or _DEFAULT_RESOLVER
+    rows = []
+    for i, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            continue
+        for lift, val in (entry.get("goals") or {}).items():
+            rows.append({"entry": i, "date_set": entry.get("date_set"), "target_date": entry.get("target_date"),
+                         "lift": lift, "lift_key": lift.lower(), "canonical": resolver.canonical(lift),
+                         "target": _goal_target(val)})
+    return rows
+
+
+def _db_path(args):
+    import gym_db
+    return args.db or str(gym_db.db_path(args.history_dir))
+
+
+def _sync_db(args, rebuild=False):
+    """Open the history's database and bring it up to date. Returns (connection, sync stats)."""
+    import gym_db
+    import sqlite3
+    history_dir = args.history_dir
+    if not os.path.isdir(history_dir):
+        err_exit(f"Directory not found: {history_dir}")
+    with trace_span("db sync") as span:
+        try:
+            conn = gym_db.connect(_db_path(args))
+            stats = gym_db.sync(conn, history_dir, _parse_session_file, _db_session_rows,
+                                goals_path=args.goals_file or default_goals_path(history_dir),
+                                goal_rows=_db_goal_rows, rebuild=rebuild)
+        except sqlite3.Error as e:
+            err_exit(f"Database error ({_db_path(args)}): {e}")
+        span.set(reparsed=stats["reparsed"], store_sessions=stats["store_sessions"], sessions=stats["sessions"])
+    for where, error in stats["errors"]:
+        print(f"Warning: skipping {where}: {error}", file=sys.stderr)
+    return conn, stats
+
+
+def _print_rows(columns, rows, as_json):
+    """Query results as JSON objects or an aligned text table."""
+    if as_json:
+        print(json.dumps([dict(zip(columns, r)) for r in rows], indent=2, ensure_ascii=False))
+        return
+    cells = [["-" if v is None else str(v) for v in r] for r in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)).rstrip())
+    print("  ".join("-" * w for w in widths))
+    for r in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(r, widths)).rstrip())
+
+
+def _run_from_db(args):
+    """e1rm / volume / progress answered from the SQLite mirror (--from-db)."""
+    import gym_db
+    conn, stats = _sync_db(args)
+    if not stats["sessions"]:
+        err_exit("No session data found")
+    trace_phase("compute")
+    if args.command == "e1rm":
+        _print_e1rm(gym_db.latest_e1rm(conn), args)
+    elif args.command == "volume":
+        _print_volume(gym_db.weekly_volume(conn), args)
+    else:
+        names = [n for n in gym_db.exercise_names(conn) if _DEFAULT_RESOLVER.matches(n, args.exercise)]
+        _print_progress(gym_db.progress_entries(conn, names), args)
+    conn.close()
+
+
+# ---- Library API ----
+#
+# In-process entry points for callers that would otherwise spawn the CLI and
+# parse its stdout (the daemon, batch jobs, tests). Each returns the
+# JSON-ready value its command prints with --json and raises AnalyticsError
+# where the command would print "Error: ..." and exit 1. Nothing is printed
+# apart from load_sessions' warnings about unreadable files on stderr.
+#
+# `history` is a history dir, read with the same narrow window the command
+# uses (from the daemon's warm cache while serving), or a list of sessions
+# that is used as is. The cmd_* functions below only format these results.
+
+class AnalyticsError(Exception):
+    """A question the history cannot answer (no data, unknown date or lift, bad option)."""
+
+
+def _sessions(history, required=True, **window):
+    """Sessions of a history dir (windowed load) or an already loaded session list."""
+    if isinstance(history, (str, os.PathLike)):
+        if not os.path.isdir(history):
+            raise AnalyticsError(f"Directory not found: {history}")
+        history = _warm_sessions(os.fspath(history), **window)
+    if required and not history:
+        raise AnalyticsError("No session data found")
+    return history
+
+
+def latest_e1rm(history):
+    """{exercise: {"e1rm", "date", ...}} — best e1RM from the latest session of each weighted exercise."""
+    sessions = _sessions(history)
+    trace_phase("compute")
+    exercises = SetTable(sessions).latest_e1rm()
+    if not exercises:
+        raise AnalyticsError("No exercises with weight data found")
+    return exercises
+
+
+def weekly_volume(history):
+    """[{"week", "week_start", <muscle_group>: hard sets, ...}] in week order."""
+    sessions = _sessions(history)
+    trace_phase("compute")
+    return SetTable(sessions).weekly_volume()
+
+
+def lift_progress(history, exercise):
+    """[{"date", "exercise", "e1rm", "best_weight", "best_reps", "num_sets"}] for every session of a lift."""
+    sessions = _sessions(history)
+    trace_phase("compute")
+    entries = _progress_from_analysis(sessions, exercise)
+    if entries is None:
+        entries = SetTable(sessions).progress_entries(exercise)
+    if not entries:
+        raise AnalyticsError(f"Exercise '{exercise}' not found in history")
+    return entries
+
+
+def session_summary(history):
+    """The latest session: exercises, sets, muscles, duration, stored analysis and plan vs actual."""
+    s = _sessions(history, last_n=1)[-1]
+    trace_phase("compute")
+    total_sets = sum(len(ex.get("sets", [])) for ex in s.get("actual", []))
+    muscles = list(dict.fromkeys(ex.get("muscle_group", "unknown") for ex in s.get("actual", [])))
+
+    result = {
+        "date": s["date"],
+        "day": s.get("day", ""),
+        "duration_min": s.get("duration_min"),
+        "exercises": [ex["name"] for ex in s.get("actual", [])],
+        "total_sets": total_sets,
+        "muscle_groups": muscles,
+        "plan_adherence": s.get("plan_adherence", "unknown"),
+        "notes": s.get("notes", ""),
+    }
+
+    # Stored analysis (see `analyze`), if it is current for this session
+    analysis = cached_analysis(s)
+    if analysis:
+        result["analysis"] = {k: analysis[k] for k in ANALYSIS_KEYS if k in analysis}
+
+    # Add duration info from start_time/end_time
+    td = session_duration(s)
+    if td:
+        result["started_at"] = td[0]
+        result["ended_at"] = td[1]
+        result["computed_duration_min"] = td[2]
+
+    # Plan vs actual comparison
+    planned = s.get("planned")
+    if planned:
+        comparison = []
+        actual_map = {ex["name"]: ex for ex in s.get("actual", [])}
+        for p in planned:
+            pname = p["name"]
+            # Find matching actual exercise
+            actual = None
+            for aname, aex in actual_map.items():
+                if normalize_match(aname, pname):
+                    actual = aex
+                    break
+            entry = {"name": pname, "planned": p.get("sets_reps", ""), "planned_weight": p.get("weight_kg", "")}
+            if actual:
+                sets = actual.get("sets", [])
+                actual_sets = len(sets)
+                actual_reps = [st.get("reps", 0) for st in sets]
+                actual_weights = [st.get("weight_kg", 0) for st in sets]
+                entry["actual"] = f"{actual_sets}x{actual_reps[0] if actual_reps else '?'}"
+                entry["actual_weight"] = max(actual_weights) if actual_weights else 0
+                entry["completed"] = True
+            else:
+                entry["actual"] = "skipped"
+                entry["actual_weight"] = 0
+                entry["completed"] = False
+            comparison.append(entry)
+        result["plan_comparison"] = comparison
+    return result
+
+
+def compare_sessions(history, date1, date2):
+    """{"date1", "date2", "exercises": [{"name", "e1rm_1", "e1rm_2", "e1rm_diff", "sets_1", "sets_2"}]}."""
+    first, second = sorted((date1, date2))
+    sessions = _sessions(history, required=False, since=first, until=second)
+    trace_phase("compute")
+    s1 = next((s for s in sessions if s["date"] == date1), None)
+    s2 = next((s for s in sessions if s["date"] == date2), None)
+
+    if not s1:
+        raise AnalyticsError(f"No session found for {date1}")
+    if not s2:
+        raise AnalyticsError(f"No session found for {date2}")
+
+    # Build exercise comparison (e1RMs from the stored analysis when it is current)
+    a1, a2 = cached_analysis(s1), cached_analysis(s2)
+    exercises = {}
+    for ex in s1.get("actual", []):
+        name = ex["name"]
+        e1rm = a1["e1rm"].get(name, 0) if a1 else best_e1rm_for_exercise(ex)
+        exercises[name] = {"name": name, "e1rm_1": e1rm, "e1rm_2": 0, "sets_1": len(ex.get("sets", [])), "sets_2": 0}
+    for ex in s2.get("actual", []):
+        name = ex["name"]
+        if name not in exercises:
+            exercises[name] = {"name": name, "e1rm_1": 0, "e1rm_2": 0, "sets_1": 0, "sets_2": 0}
+        exercises[name]["e1rm_2"] = a2["e1rm"].get(name, 0) if a2 else best_e1rm_for_exercise(ex)
+        exercises[name]["sets_2"] = len(ex.get("sets", []))
+
+    for v in exercises.values():
+        v["e1rm_diff"] = round(v["e1rm_2"] - v["e1rm_1"], 2)
+
+    return {
+        "date1": date1, "date2": date2,
+        "exercises": list(exercises.values()),
+    }
+
+
+def _kpi_window(history_dir, windows, compare, end=None, use_index=True):
+    """load_sessions bounds covering the KPI windows (and reference periods) ending at end."""
+    if end is not None:
+        end = _parse_end(end)
+    else:
+        latest = _warm_sessions(history_dir, use_index, last_n=1)
+        if not latest:
+            return {}
+        end = date_fields(latest[-1])[1]
+    start = end - max(windows) * (2 if compare == "previous" else 1) + 1
+    if isinstance(compare, tuple):
+        start, end = min(start, compare[0]), max(end, compare[1])
+    return {"since": datetime.fromordinal(start).strftime("%Y-%m-%d"),
+            "until": datetime.fromordinal(end).strftime("%Y-%m-%d")}
+
+
+def kpi_windows(history, windows=(14,), compare="previous", end=None, lifts=None, goals_file=None):
+    """Rolling-window KPIs for each window length, compared with a reference period.
+
+    windows: day counts (or "7,14,28"); compare: "previous" (the same-length
+    window before), None / "none", or a "START:END" / (start, end) date range;
+    end: last day, default the latest session; lifts: default the goals'
+    tracked lifts (goals_file defaults to the history dir's goals.json).
+    Returns {"end", "lifts", "windows": [{"days", "current", ["previous", "change"]}]}.
+    """
+    windows = _parse_windows(windows)
+    compare = _parse_compare(compare)
+    window = {}
+    if isinstance(history, (str, os.PathLike)):
+        goals_file = goals_file or default_goals_path(history)
+        if os.path.isdir(history):
+            window = _kpi_window(os.fspath(history), windows, compare, end)
+    sessions = _sessions(history, **window)
+    trace_phase("compute")
+    if isinstance(lifts, str):
+        lifts = [l.strip() for l in lifts.split(",") if l.strip()]
+    lifts = lifts or _get_tracked_lifts(goals_file)
+
+    table = SetTable(sessions, build_resolver(goals_file))
+    engine = rolling_kpis(table, _lift_data(table, lifts))
+    end = _parse_end(end) if end else engine.last
+
+    result = {"end": datetime.fromordinal(end).strftime("%Y-%m-%d"), "lifts": lifts, "windows": []}
+    for days in windows:
+        current = engine.trailing(days, end)
+        if compare is None:
+            entry = {"current": engine.window(*current)}
+        else:
+            previous = compare if compare != "previous" else engine.trailing(days, current[0] - 1)
+            entry = engine.compare(current, previous)
+        result["windows"].append({"days": days, **entry})
+    return result
+
+
+def mesocycle_report(history, period="all", program_file=None, lifts=None, goals_file=None):
+    """Per-mesocycle aggregates for the weekly review, up to the latest session.
+
+    Mesocycles come from program_file (default: the history dir's sibling
+    program.json) and the programs/ archive next to it; period limits the
+    report to one of them ("current", "previous" or a program name).
+    Returns {"as_of", "lifts", "mesocycles": [{"name", "start", "end",
+    "sessions", "adherence_pct", "hard_sets", "avg_e1rm", "lifts", ["deload"], ...}]}.
+    """
+    import gym_periods
+    if isinstance(history, (str, os.PathLike)):
+        program_file = program_file or default_program_path(history)
+        goals_file = goals_file or default_goals_path(history)
+    sessions = _sessions(history)
+    index = load_periods(program_file)
+    if not len(index):
+        raise AnalyticsError("No mesocycles found (program.json or programs/*.json with start_date/end_date)")
+    trace_phase("compute", mesocycles=len(index))
+    as_of = date_fields(sessions[-1])[1]
+    selected = None if period == "all" else [_resolve_period(index, period, as_of)]
+    if isinstance(lifts, str):
+        lifts = [l.strip() for l in lifts.split(",") if l.strip()]
+    lifts = lifts or _get_tracked_lifts(goals_file)
+
+    # One table and one RollingKpis for every mesocycle
+    table = SetTable(sessions, build_resolver(goals_file))
+    engine = rolling_kpis(table, _lift_data(table, lifts))
+    return {"as_of": datetime.fromordinal(as_of).strftime("%Y-%m-%d"), "lifts": lifts,
+            "mesocycles": gym_periods.report(index, engine, as_of, selected)}
+
+
+def list_goals(goals_file):
+    """Every goal entry of goals.json, oldest first."""
+    goals = load_goals(goals_file)
+    if not goals:
+        raise AnalyticsError("No goals found")
+    return goals
+
+
+def current_goals(goals_file):
+    """The latest goal entry of goals.json."""
+    latest = get_latest_goals(goals_file)
+    if not latest:
+        raise AnalyticsError("No goals found")
+    return latest
+
+
+def add_goal(goals_file, entry, fsync=None):
+    """Append a goal entry (dict or JSON text) to goals.json. Returns all goal entries.
+
+    fsync None follows $GYM_FSYNC (gym_store).
+    """
+    if isinstance(entry, str):
+        try:
+            entry = json.loads(entry)
+        except json.JSONDecodeError as e:
+            raise AnalyticsError(f"Invalid JSON: {e}") from None
+    # Validate required fields
+    if not isinstance(entry, dict) or "goals" not in entry:
+        raise AnalyticsError("Missing 'goals' field")
+    if "target_date" not in entry:
+        raise AnalyticsError("Missing 'target_date' field")
+    entry = dict(entry)
+    if "date_set" not in entry:
+        entry["date_set"] = datetime.now().strftime("%Y-%m-%d")
+
+    with gym_store.locked(Path(goals_file).parent):
+        goals = _read_goals(Path(goals_file)) if Path(goals_file).exists() else []
+        goals.append(entry)
+        gym_store.atomic_write(goals_file, gym_store.dump_json(goals, compact=False), fsync)
+    return goals
+
+
+# Served to daemon clients as {"call": name, "args": {...}} (see "Daemon")
+API = {fn.__name__: fn for fn in (latest_e1rm, weekly_volume, lift_progress, session_summary,
+                                  compare_sessions, kpi_windows, mesocycle_report,
+                                  list_goals, current_goals, add_goal)}
+
+
+def _cli(cmd):
+    """cmd_* wrapper: an AnalyticsError becomes "Error: ..." on stderr and exit 1."""
+    @functools.wraps(cmd)
+    def run(*args):
+        try:
+            return cmd(*args)
+        except AnalyticsError as e:
+            err_exit(str(e))
+    return run
+
+
+# ---- Commands ----
+
+@_cli
+def cmd_e1rm(sessions, args):
+    # For each exercise, find the best e1RM from the most recent session it appears in
+    _print_e1rm(latest_e1rm(sessions), args)
+
+
+def _print_e1rm(exercises, args):
+    if not exercises:
+        err_exit("No exercises with weight data found")
+
+    trace_phase("output")
+    if args.json:
+        print(json.dumps(exercises, indent=2))
+    else:
+        print(f"{'Exercise':<30} {'e1RM (kg)':>10} {'Date':>12}")
+        print("-" * 54)
+        for name, info in sorted(exercises.items()):
+            print(f"{name:<30} {info['e1rm']:>10.1f} {info['date']:>12}")
+
+
+@_cli
+def cmd_volume(sessions, args):
+    _print_volume(weekly_volume(sessions), args)
+
+
+def _print_volume(result, args):
+    trace_phase("output")
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        # Collect all muscle groups
+        all_mg = sorted({k for w in result for k in w if k not in ("week", "week_start")})
+        header = f"{'Week':<12}" + "".join(f"{mg:>12}" for mg in all_mg)
+        print(header)
+        print("-" * len(header))
+        for w in result:
+            row = f"{w['week']:<12}" + "".join(f"{w.get(mg, 0):>12}" for mg in all_mg)
+            print(row)
+
+
+@_cli
+def cmd_progress(sessions, args):
+    _print_progress(lift_progress(sessions, args.exercise), args)
+
+
+def _print_progress(entries, args):
+    target = args.exercise
+    if not entries:
+        err_exit(f"Exercise '{target}' not found in history")
+
+    trace_phase("output")
+    if args.json:
+        print(json.dumps(entries, indent=2))
+    else:
+        print(f"Progress: {target}")
+        print(f"{'Date':<12} {'Exercise':<25} {'Best Set':>12} {'e1RM':>10} {'Sets':>6}")
+        print("-" * 67)
+        for e in entries:
+            bs = f"{e['best_weight']}x{e['best_reps']}"
+            print(f"{e['date']:<12} {e['exercise']:<25} {bs:>12} {e['e1rm']:>10.1f} {e['num_sets']:>6}")
+
+
+def _progress_from_analysis(sessions, target):
+    """SetTable.progress_entries from stored analyses (no NumPy), or None if any session's cache is stale."""
+    entries = []
+    for s in sessions:
+        analysis = cached_analysis(s)
+        if analysis is None:
+            return None
+        names = [ex.get("name", "") for ex in s.get("actual", [])]
+        for ex in s.get("actual", []):
+            name = ex.get("name", "")
+            if not normalize_match(name, target):
+                continue
+            sets = ex.get("sets", [])
+            best_set = max(sets, key=lambda st: (st.get("weight_kg", 0) or 0) * (st.get("reps", 0) or 0), default={})
+            # The stored e1rm is per name; a name logged twice in one session needs its own value
+            e1rm = analysis["e1rm"].get(name, 0) if names.count(name) == 1 else round(best_e1rm_for_exercise(ex), 2)
+            entries.append({
+                "date": s["date"],
+                "exercise": name,
+                "e1rm": e1rm,
+                "best_weight": best_set.get("weight_kg", 0),
+                "best_reps": best_set.get("reps", 0),
+                "num_sets": len(sets),
+            })
+    return entries
+
+
+def _print_analysis(analysis):
+    """Text lines for the stored analysis fields shown by summary."""
+    parts = []
+    for name, d in analysis.get("e1rm_delta", {}).items():
+        if d["trend"] == "new":
+            parts.append(f"{name} {d['current']:.1f} (new)")
+        elif d["trend"] == "→":
+            parts.append(f"{name} {d['current']:.1f} → ({d['sessions_at_current']} sessions)")
+        else:
+            parts.append(f"{name} {d['current']:.1f} {d['trend']} {d['delta']:+.1f}")
+    if parts:
+        print(f"e1RM: {', '.join(parts)}")
+    week = analysis.get("volume_week_total")
+    if week:
+        print(f"Week sets: {', '.join(f'{mg} {n}' for mg, n in week.items())}")
+    goals = analysis.get("goal_progress")
+    if goals:
+        print("Goals: " + ", ".join(f"{lift} {g['current']:.1f}/{g['target']} {g['status']} ({g['needed_per_week']:+.2f}/wk)"
+                                    for lift, g in goals.items()))
+
+
+@_cli
+def cmd_summary(sessions, args):
+    result = session_summary(sessions)
+
+    trace_phase("output")
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"Session: {result['date']} (Day {result['day']})")
+        if result["duration_min"]:
+            print(f"Duration: {result['duration_min']} min")
+        print(f"Adherence: {result['plan_adherence']}")
+        print(f"Total sets: {result['total_sets']}")
+        print(f"Muscles: {', '.join(result['muscle_groups'])}")
+        if "analysis" in result:
+            _print_analysis(result["analysis"])
+        if "plan_comparison" in result:
+            print(f"\nPlan vs Actual:")
+            for c in result["plan_comparison"]:
+                status = "✓" if c.get("completed") else "✗"
+                print(f"  {status} {c['name']}: planned {c['planned']} @ {c['planned_weight']}kg → actual {c['actual']} @ {c['actual_weight']}kg")
+        else:
+            print(f"\nExercises:")
+            for ex in sessions[-1].get("actual", []):
+                sets_str = ", ".join(
+                    f"{st.get('weight_kg', 'BW')}x{st.get('reps', '?')}" for st in ex.get("sets", [])
+                )
+                print(f"  {ex['name']}: {sets_str}")
+        if result["notes"]:
+            print(f"\nNotes: {result['notes']}")
+
+
+@_cli
+def cmd_compare(sessions, args):
+    date1, date2 = args.date1, args.date2
+    result = compare_sessions(sessions, date1, date2)
+
+    trace_phase("output")
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"Compare: {date1} vs {date2}")
+        print(f"{'Exercise':<25} {'e1RM 1':>8} {'e1RM 2':>8} {'Diff':>8} {'Sets':>10}")
+        print("-" * 61)
+        for e in result["exercises"]:
+            diff = f"{e['e1rm_diff']:+.1f}" if e["e1rm_diff"] != 0 else "="
+            sets = f"{e['sets_1']} → {e['sets_2']}"
+            print(f"{e['name']:<25} {e['e1rm_1']:>8.1f} {e['e1rm_2']:>8.1f} {diff:>8} {sets:>10}")
+
+
+@_cli
+def cmd_goals(args):
+    """Manage strength goals."""
+    goals_path = args.goals_file
+    subcmd = args.goals_command
+
+    if subcmd == "list":
+        goals = list_goals(goals_path)
+        if args.json:
+            print(json.dumps(goals, indent=2))
+        else:
+            for i, entry in enumerate(goals):
+                print(f"Goal set #{i+1} — {entry.get('date_set', '?')} → {entry.get('target_date', '?')}")
+                if entry.get('note'):
+                    print(f"  Note: {entry['note']}")
+                for name, val in entry.get('goals', {}).items():
+                    print(f"  {name}: {_goal_target(val)} e1RM")
+                print()
+
+    elif subcmd == "current":
+        latest = current_goals(goals_path)
+        if args.json:
+            print(json.dumps(latest, indent=2))
+        else:
+            print(f"Current goals ({latest.get('date_set', '?')} → {latest.get('target_date', '?')})")
+            if latest.get('note'):
+                print(f"Note: {latest['note']}")
+            for name, val in latest.get('goals', {}).items():
+                print(f"  {name}: {_goal_target(val)} e1RM")
+
+    elif subcmd == "add":
+        if not args.goal_json:
+            err_exit("--json argument required for 'goals add'")
+        goals = add_goal(goals_path, args.goal_json, _fsync_arg(args))
+        print(f"Goal added. Total: {len(goals)} goal set(s)")
+
+    else:
+        err_exit(f"Unknown goals subcommand: {subcmd}. Use list, add, or current.")
+
+
+# ---- Chart render cache ----
+#
+# --cache-dir DIR keeps rendered charts as DIR/<sha256>.<ext>. The key covers
+# every input of the render (sessions after period filtering, latest goals,
+# plan text, lifts, options, output format, renderer, encoding) plus a fingerprint
+# of this script, gym_render.py and gym_encode.py, so code changes invalidate old
+# entries.
+# DIR/stats.json counts hits/misses.
+
+CHART_CACHE_STATS = "stats.json"
+
+
+def _code_fingerprint():
+    import hashlib
+    digest = hashlib.sha256(Path(__file__).read_bytes())
+    for helper in ("gym_render.py", "gym_encode.py"):
+        path = Path(__file__).with_name(helper)
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _chart_cache_key(kind, payload):
+    import hashlib
+    doc = {"kind": kind, "code": _code_fingerprint(), **payload}
+    blob = json.dumps(doc, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _atomic_copy(src, dst):
+    """Copy src over dst via a temp file + rename, so readers never see a partial file."""
+    import shutil
+    dst = Path(dst)
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _chart_cache_record(cache_dir, hit):
+    """Bump hit/miss counters in cache_dir/stats.json. Returns the updated counts."""
+    path = Path(cache_dir) / CHART_CACHE_STATS
+    try:
+        stats = json.loads(path.read_text())
+    except (OSError, ValueError):
+        stats = {}
+    stats = {"hits": stats.get("hits", 0), "misses": stats.get("misses", 0)}
+    stats["hits" if hit else "misses"] += 1
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(stats))
+    os.replace(tmp, path)
+    return stats
+
+
+def _chart_cache_report(output, hit, stats, detail=None):
+    state = "hit" if hit else "miss"
+    detail = f"{detail}; " if detail else ""
+    print(f"Chart saved to {output} ({detail}cache {state}; {stats['hits']} hits / {stats['misses']} misses)")
+
+
+def _chart_orientation(args):
+    if args.horizontal:
+        return "horizontal"
+    return "vertical"  # default
+
+
+# ---- Chart encoding ----
+#
+# --optimize / --quality N / --max-bytes N re-encode charts through gym_encode
+# (Pillow) for messaging delivery: palette-quantized PNG, WebP or JPEG by the
+# output extension, with quality stepped down until the file fits --max-bytes.
+# Without any of them charts are written exactly as before.
+
+def _chart_encoding(args):
+    """{optimize, quality, max_bytes} when any encoding option is set, else None. Exits on bad values."""
+    optimize = getattr(args, 'optimize', False)
+    quality = getattr(args, 'quality', None)
+    max_bytes = getattr(args, 'max_bytes', None)
+    if not (optimize or quality or max_bytes):
+        return None
+    try:
+        import gym_encode
+    except ImportError:
+        err_exit("Pillow not installed (needed for --optimize/--quality/--max-bytes)")
+    if quality is not None and not 1 <= quality <= 100:
+        err_exit(f"--quality must be 1-100, got {quality}")
+    try:
+        gym_encode.image_format(args.output)
+        max_bytes = gym_encode.parse_size(max_bytes) if max_bytes else None
+    except ValueError as e:
+        err_exit(str(e))
+    return {"optimize": bool(optimize), "quality": quality, "max_bytes": max_bytes}
+
+
+def _encode_chart(image, target, encoding):
+    """Write a Pillow image through gym_encode. Returns the encode info for the save report."""
+    import gym_encode
+    with trace_span("encode", format=Path(target).suffix.lstrip(".")) as span:
+        info = gym_encode.save(image, target, **encoding)
+        span.set(bytes=info["bytes"], attempts=info["attempts"])
+    return info
+
+
+def _savefig(plt, target, encoding, **kwargs):
+    """plt.savefig + close, re-encoded through gym_encode when encoding options are set."""
+    if encoding is None:
+        plt.savefig(target, **kwargs)
+        plt.close()
+        return None
+    import gym_encode
+    image = gym_encode.from_figure(plt.gcf(), **kwargs)
+    plt.close()
+    return _encode_chart(image, target, encoding)
+
+
+def draw_goal_lines(ax, goals, start_date, end_date, start_values, colors=None):
+    """Draw dashed goal lines on a chart from start_value to goal_value.
+    
+    Args:
+        ax: matplotlib axes
+        goals: {exercise_name: target_e1rm}
+        start_date: datetime
+        end_date: datetime  
+        start_values: {exercise_name: current_e1rm}
+        colors: {exercise_name: color_string} or None for gray
+    """
+    for name, target in goals.items():
+        if name not in start_values:
+            continue
+        start_val = start_values[name]
+        c = (colors or {}).get(name, '#888888')
+        ax.plot([start_date, end_date], [start_val, target],
+                '--', color=c, alpha=0.4, linewidth=1.5, zorder=1)
+        ax.plot(end_date, target, marker='D', color=c, alpha=0.6,
+                markersize=8, zorder=1)
+
+
+def _compute_kpis(sessions, lift_data, table=None):
+    """Compute KPIs using rolling 14-day windows.
+    
+    Args:
+        sessions: list of session dicts
+        lift_data: {lift_name: (dates_as_datetime, values)} from chart data collection
+        table: SetTable already built for sessions (optional)
+    Returns:
+        (adherence_pct, avg_e1rm, avg_e1rm_change, volume, volume_change,
+         current_session_count, prev_session_count)
+    """
+    if not sessions:
+        return 0, 0, 0, 0, 0, 0, 0
+
+    table = table or SetTable(sessions)
+    engine = rolling_kpis(table, lift_data)
+    latest = int(table.ordinal[-1])
+    result = engine.compare((latest - 13, latest), (latest - 27, latest - 14))  # last 14 days vs the 14 before
+    cur, prev, change = result["current"], result["previous"], result["change"]
+    return (cur["adherence_pct"], cur["avg_e1rm"], change["avg_e1rm"], cur["hard_sets"],
+            change["hard_sets"], cur["sessions"], prev["sessions"])
+
+
+def rolling_kpis(table, lift_data):
+    """gym_kpis.RollingKpis over a SetTable and {lift: (datetimes, values)}."""
+    import gym_kpis
+    series = {name: ([d.toordinal() for d in dates], values) for name, (dates, values) in lift_data.items()}
+    return gym_kpis.RollingKpis(table.ordinal.tolist(), table.session_sets().tolist(), series)
+
+
+def _chart_lifts(args, goals_path):
+    """chart-e1rm lifts: --lifts, else the lifts tracked in goals.json."""
+    if args.lifts:
+        return [l.strip() for l in args.lifts.split(",")]
+    return _get_tracked_lifts(goals_path)
+
+
+def _lift_data(table, lifts):
+    """{lift: (dates, values)} for the lifts that have data in table."""
+    lift_data = {}
+    for lift in lifts:
+        dates, values = table.lift_series(lift)
+        if dates:
+            lift_data[lift] = (dates, values)
+    return lift_data
+
+
+def kpi_report(sessions, goals_path=None, table=None):
+    """_compute_kpis for the tracked lifts of goals_path, as a JSON-ready dict."""
+    table = table or SetTable(sessions, build_resolver(goals_path))
+    lift_data = _lift_data(table, _get_tracked_lifts(goals_path))
+    adherence, avg_e1rm, avg_change, volume, vol_change, cur, prev = _compute_kpis(sessions, lift_data, table)
+    return {
+        "window_days": 14,
+        "adherence_pct": adherence,
+        "avg_e1rm": avg_e1rm,
+        "avg_e1rm_change": avg_change,
+        "hard_sets": volume,
+        "hard_sets_change": vol_change,
+        "sessions": cur,
+        "prev_sessions": prev,
+    }
+
+
+def _period_sessions(sessions, period, program_path=None):
+    """Sessions of the chart period: the mesocycle a --period names (see _period_range), or all."""
+    if period == "all" or not sessions:
+        return sessions
+    since, until = _period_range(period, program_path, date_fields(sessions[-1])[1])
+    return [s for s in sessions if since <= s["date"] and (until is None or s["date"] <= until)]
+
+
+def _parse_windows(text):
+    """"7,14,28" (or a list of day counts) -> [7, 14, 28]; AnalyticsError on anything but positive day counts."""
+    try:
+        windows = [int(x) for x in (text.split(",") if isinstance(text, str) else text) if str(x).strip()]
+    except (TypeError, ValueError):
+        windows = []
+    if not windows or min(windows) < 1:
+        raise AnalyticsError(f"Invalid --window: {text} (expected day counts like 7,14,28)")
+    return windows
+
+
+def _parse_compare(text):
+    """--compare value -> "previous", None, or a (start, end) ordinal range."""
+    if text is None or text in ("previous", "none"):
+        return None if text in (None, "none") else text
+    try:
+        parts = text.split(":") if isinstance(text, str) else text
+        start, end = (datetime.strptime(x, "%Y-%m-%d").toordinal() for x in parts)
+    except (TypeError, ValueError):
+        raise AnalyticsError(f"Invalid --compare: {text} (expected previous, none or YYYY-MM-DD:YYYY-MM-DD)") from None
+    if end < start:
+        raise AnalyticsError(f"Invalid --compare: {text} (end before start)")
+    return start, end
+
+
+def _parse_end(text):
+    """--end value -> day ordinal."""
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        raise AnalyticsError(f"Invalid --end date: {text} (expected YYYY-MM-DD)") from None
+
+
+@_cli
+def cmd_kpis(sessions, args):
+    """Rolling-window KPIs for one or more window lengths, each compared with a reference period."""
+    result = kpi_windows(sessions, args.window, args.compare, args.end, args.lifts,
+                         args.goals_file or default_goals_path(args.history_dir))
+    lifts, compare = result["lifts"], _parse_compare(args.compare)
+
+    trace_phase("output")
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"KPIs to {result['end']} (lifts: {', '.join(lifts)})")
+    for w in result["windows"]:
+        cur, change = w["current"], w.get("change")
+        delta = (lambda k: f" ({change[k]:+g})") if change else (lambda k: "")
+        print(f"  {w['days']:>3}d  sessions {cur['sessions']}{delta('sessions')}  "
+              f"adherence {cur['adherence_pct']}%  hard sets {cur['hard_sets']}{delta('hard_sets')}  "
+              f"avg e1RM {cur['avg_e1rm']}{delta('avg_e1rm')}")
+    if compare not in (None, "previous"):
+        prev = result["windows"][0]["previous"]
+        print(f"  compared with {prev['start']} → {prev['end']}")
+
+
+@_cli
+def cmd_mesocycles(sessions, args):
+    """Sessions, adherence, hard sets and avg e1RM per mesocycle of program.json and its archive."""
+    result = mesocycle_report(sessions, args.period, _program_path(args), args.lifts,
+                              args.goals_file or default_goals_path(args.history_dir))
+
+    trace_phase("output")
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"Mesocycles to {result['as_of']} (lifts: {', '.join(result['lifts'])})")
+    for m in result["mesocycles"]:
+        status = "" if m["complete"] else "  (in progress)"
+        print(f"  {m['name']:<24} {m['start']} → {m['end']}{status}")
+        line = (f"    sessions {m['sessions']}  adherence {m['adherence_pct']}%  "
+                f"hard sets {m['hard_sets']}  avg e1RM {m['avg_e1rm']}")
+        if "deload" in m:
+            d = m["deload"]
+            line += f"  deload {d['start']}: {d['sessions']} sessions, {d['hard_sets']} sets"
+        print(line)
+
+
+# -- e1RM dashboard (shared by the matplotlib and the fast Pillow renderer) --
+
+DASHBOARD_BG = '#0d1117'
+DASHBOARD_COLORS = ['#4FC3F7', '#EF5350', '#66BB6A', '#FFA726', '#AB47BC', '#26C6DA', '#FF7043', '#9CCC65', '#5C6BC0', '#FFCA28', '#8D6E63', '#78909C']
+CURRENT_BAND = '#4FC3F7'
+PREV_BAND = '#FFA726'
+CHART_RENDERERS = ("matplotlib", "fast")
+CHART_RESOLUTIONS = ("auto", "session", "weekly", "lttb")  # gym_series.RESOLUTIONS, without importing numpy
+
+
+def _plot_series(lift_data, args):
+    """{lift: (dates, values, trend)} to draw: each series downsampled by --resolution /
+    --max-points (gym_series.py), trend its --trend EMA at the drawn dates or None.
+
+    Badges, KPIs, goal lines and planned points keep using the full lift_data;
+    every resolution keeps the last point, so they still line up.
+    """
+    np = _numpy()
+    import gym_series
+    resolution = getattr(args, 'resolution', None) or "auto"
+    max_points = getattr(args, 'max_points', None) or gym_series.MAX_POINTS
+    halflife = getattr(args, 'trend', None) or 0
+    plot = {}
+    for lift, (dates, values) in lift_data.items():
+        days = np.array([d.toordinal() for d in dates], dtype=np.int64)
+        d, v = gym_series.downsample(days, values, resolution, max_points)
+        trend = None
+        if halflife > 0:
+            smooth = gym_series.ema(days, values, halflife)
+            trend = np.round(smooth[np.searchsorted(days, d, side="right") - 1], 1).tolist()
+        plot[lift] = ([datetime.fromordinal(int(o)) for o in d], v.tolist(), trend)
+    return plot
+
+
+def _dashboard_kpis(sessions, lift_data, table):
+    """KPI header of the vertical dashboard: values, colors and delta arrows."""
+    adherence, avg_e1rm, avg_change, volume, vol_change, cur_cnt, prev_cnt = _compute_kpis(sessions, lift_data, table)
+    show_delta = cur_cnt >= 3 and prev_cnt >= 3
+
+    # Adherence color
+    if adherence >= 90:
+        adh_color = '#66BB6A'
+    elif adherence >= 60:
+        adh_color = '#FFA726'
+    else:
+        adh_color = '#EF5350'
+
+    def delta(change):
+        arrow = '▲' if change > 0 else ('▼' if change < 0 else '—')
+        color = '#66BB6A' if change > 0 else ('#EF5350' if change < 0 else '#999999')
+        return arrow, abs(change), color
+
+    result = {"adherence": adherence, "adherence_color": adh_color, "avg_e1rm": avg_e1rm,
+              "show_delta": show_delta, "adherence_delta": None, "e1rm_delta": None}
+    if show_delta:
+        adh_prev = min(100, round(prev_cnt / (14 / 7 * 3) * 100))
+        result["adherence_delta"] = delta(adherence - adh_prev)
+        result["e1rm_delta"] = delta(avg_change)
+    return result
+
+
+def _dashboard_goal_lines(args, goals_path, sessions, lift_data, resolver):
+    """Goal projections as [(color, (start_date, start_val), (target_date, target_val))].
+
+    From the latest goals.json entry (lift colors), else from a legacy --plan (gray).
+    """
+    lines = []
+    skip_goals = getattr(args, 'no_goals', False)
+    latest_goals = get_latest_goals(goals_path) if not skip_goals else None
+    if latest_goals and sessions:
+        goal_targets = latest_goals.get("goals", {})
+        target_date_str = latest_goals.get("target_date")
+        if goal_targets and target_date_str:
+            target_date = datetime.strptime(target_date_str, "%Y-%m-%d")
+            # For each goal, find matching lift and draw line from first data point to target
+            for gname, goal_val in goal_targets.items():
+                target_val = _goal_target(goal_val)
+                matched_lift = None
+                matched_color = '#888888'
+                for i, lname in enumerate(lift_data.keys()):
+                    if resolver.matches(lname, gname):
+                        matched_lift = lname
+                        matched_color = DASHBOARD_COLORS[i % len(DASHBOARD_COLORS)]
+                        break
+                if not matched_lift or matched_lift not in lift_data:
+                    continue
+                dates, values = lift_data[matched_lift]
+                if not dates:
+                    continue
+                # Line from first data point to goal target at target_date
+                lines.append((matched_color, (dates[0], values[0]), (target_date, target_val)))
+
+    # Also support legacy --plan flag
+    elif hasattr(args, 'plan') and args.plan and os.path.isfile(args.plan):
+        plan_text = Path(args.plan).read_text()
+        goals = parse_goals_from_plan(plan_text)
+        filtered_goals = {}
+        for gname, target in goals.items():
+            for lname in lift_data:
+                if resolver.matches(lname, gname):
+                    filtered_goals[gname] = (target, lname)
+                    break
+        if filtered_goals and sessions:
+            first_date = session_day(sessions[0])
+            start_values = {}
+            for gname in filtered_goals:
+                for s in sessions[:1]:
+                    for ex in s.get("actual", []):
+                        if resolver.matches(ex["name"], gname):
+                            e = best_e1rm_for_exercise(ex)
+                            if e > 0:
+                                start_values[gname] = e
+                            break
+            for gname, (target, _) in filtered_goals.items():
+                if gname not in start_values:
+                    continue
+                end_date = first_date + timedelta(weeks=12)
+                lines.append(('#888888', (first_date, start_values[gname]), (end_date, target)))
+    return lines
+
+
+def _dashboard_planned(args, sessions, lift_data, resolver):
+    """Planned e1RM points as [(color, (last_date, last_val), (planned_date, planned_e1rm))]."""
+    # Find sessions that have "planned" but no "actual" (pre-workout state)
+    # Also support --planned JSON override for manual use
+    planned_points = {}  # {lift_name: (date, e1rm)}
+
+    # Auto-detect from sessions: if a session has planned exercises but no actual
+    for s in sessions:
+        has_actual = bool(s.get("actual"))
+        has_planned = bool(s.get("planned"))
+        if has_planned and not has_actual:
+            s_date = session_day(s)
+            for p in s["planned"]:
+                pname = p.get("name", "")
+                pe1rm = 0
+                # Try nested sets first (session format from workout_live.py init)
+                if p.get("sets"):
+                    pe1rm = best_e1rm_for_exercise(p)
+                else:
+                    # Legacy flat format: weight_kg + target_reps at top level
+                    pw = p.get("weight_kg", 0)
+                    preps = p.get("target_reps", p.get("reps", 0))
+                    if pw and preps:
+                        pe1rm = e1rm_epley(pw, preps)
+                if pe1rm > 0:
+                    planned_points[pname] = (s_date, round(pe1rm, 1))
+
+    # Override with --planned JSON if provided
+    planned_json = getattr(args, 'planned', None)
+    if planned_json:
+        try:
+            planned_data = json.loads(planned_json)
+        except json.JSONDecodeError:
+            planned_data = {}
+        if planned_data:
+            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            for pname, p_e1rm in planned_data.items():
+                planned_points[pname] = (today, p_e1rm)
+
+    result = []
+    for pname, (p_date, p_e1rm) in planned_points.items():
+        matched_lift = None
+        matched_color = '#888888'
+        for i, lname in enumerate(lift_data.keys()):
+            if resolver.matches(lname, pname):
+                matched_lift = lname
+                matched_color = DASHBOARD_COLORS[i % len(DASHBOARD_COLORS)]
+                break
+        if matched_lift and matched_lift in lift_data:
+            dates, values = lift_data[matched_lift]
+            if dates and values:
+                result.append((matched_color, (dates[-1], values[-1]), (p_date, p_e1rm)))
+    return result
+
+
+def _dashboard_bands(sessions):
+    """(current 14 days, previous 14 days) as ((start, end), (start, end)) datetimes, or None."""
+    if not sessions:
+        return None
+    latest = session_day(sessions[-1])
+    cur_start = latest - timedelta(days=13)
+    prv_end = cur_start - timedelta(days=1)
+    return (cur_start, latest), (prv_end - timedelta(days=13), prv_end)
+
+
+def _save_chart(args, cached, cache_dir, render, encoding=None):
+    """Write a chart via render(target), publishing through the render cache when enabled.
+
+    render returns the gym_encode info dict (or None), reported after the path.
+    """
+    if cached is not None:
+        # Render into the cache first; publish with renames so no reader sees a partial PNG
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        target = cached.with_name(f".{cached.stem}.{os.getpid()}.tmp{cached.suffix}")
+    else:
+        target = args.output
+    info = render(target)
+    detail = None
+    if info is not None:
+        import gym_encode
+        detail = gym_encode.describe(info, encoding and encoding["max_bytes"])
+    if cached is None:
+        print(f"Chart saved to {args.output}" + (f" ({detail})" if detail else ""))
+        return
+    os.replace(target, cached)
+    _atomic_copy(cached, args.output)
+    _chart_cache_report(args.output, False, _chart_cache_record(cache_dir, False), detail)
+
+
+def _chart_e1rm_fast(sessions, args, lift_data, plot, table, resolver, goals_path, orientation, cached, cache_dir,
+                     encoding=None):
+    """chart-e1rm through gym_render (Pillow): same dashboard, no matplotlib layout pass."""
+    try:
+        import gym_render
+    except ImportError:
+        err_exit("Pillow not installed (needed for --renderer fast)")
+    trace_phase("layout")
+    series = [{"name": name, "label": resolver.short(name, name[:15]),
+               "color": DASHBOARD_COLORS[i % len(DASHBOARD_COLORS)], "dates": dates, "values": values,
+               "trend": trend}
+              for i, (name, (dates, values, trend)) in enumerate(plot.items())]
+    spec = {
+        "orientation": orientation,
+        "series": series,
+        "kpis": _dashboard_kpis(sessions, lift_data, table) if orientation == "vertical" else None,
+        "goal_lines": _dashboard_goal_lines(args, goals_path, sessions, lift_data, resolver),
+        "planned": _dashboard_planned(args, sessions, lift_data, resolver),
+        "bands": _dashboard_bands(sessions),
+    }
+    trace_phase("render")
+    image = gym_render.render_e1rm_dashboard(spec)
+    trace_phase("save")
+
+    def render(target):
+        if encoding is not None:
+            return _encode_chart(image, target, encoding)
+        try:
+            gym_render.save(image, target)
+        except ValueError as e:
+            err_exit(str(e))
+
+    _save_chart(args, cached, cache_dir, render, encoding)
+
+
+@_cli
+def cmd_chart_e1rm(sessions, args):
+    if not sessions:
+        err_exit("No session data found")
+
+    # Period filtering (unless the sessions were loaded for the period already)
+    period = getattr(args, 'period', 'all')
+    if not getattr(args, '_period_loaded', False):
+        sessions = _period_sessions(sessions, period, _program_path(args))
+        if not sessions:
+            err_exit(f"No sessions in --period {period}")
+
+    orientation = _chart_orientation(args)
+    goals_path = getattr(args, 'goals_file', None) or default_goals_path(args.history_dir)
+    lifts = _chart_lifts(args, goals_path)
+    resolution = getattr(args, 'resolution', None) or "auto"
+    max_points, trend = getattr(args, 'max_points', None), getattr(args, 'trend', None)
+    if max_points is not None and max_points < 3:
+        err_exit("--max-points must be at least 3")
+    if trend is not None and trend < 0:
+        err_exit("--trend must be a half-life in days (0 = off)")
+
+    # _return_fig (figure introspection) always goes through matplotlib
+    renderer = "matplotlib" if getattr(args, '_return_fig', False) else getattr(args, 'renderer', None) or "matplotlib"
+    encoding = None if getattr(args, '_return_fig', False) else _chart_encoding(args)
+    cache_dir = getattr(args, 'cache_dir', None)
+    if cache_dir and not getattr(args, '_return_fig', False):
+        trace_phase("cache")
+        planned_json = getattr(args, 'planned', None)
+        plan = getattr(args, 'plan', None)
+        cache_key = _chart_cache_key("chart-e1rm", {
+            "sessions": sessions,
+            "goals": get_latest_goals(goals_path),
+            "plan": Path(plan).read_text() if plan and os.path.isfile(plan) else None,
+            "lifts": lifts,
+            "period": period,
+            "orientation": orientation,
+            # Only when set, so default renders keep their existing cache entries
+            **({"resolution": [resolution, max_points, trend]}
+               if (resolution, max_points, trend) != ("auto", None, None) else {}),
+            "no_goals": getattr(args, 'no_goals', False),
+            # --planned points are drawn on today's date
+            "planned": [planned_json, datetime.now().strftime("%Y-%m-%d")] if planned_json else None,
+            "format": Path(args.output).suffix.lower(),
+            **({"renderer": renderer} if renderer != "matplotlib" else {}),
+            **({"encoding": encoding} if encoding else {}),
+        })
+        cached = Path(cache_dir) / f"{cache_key}{Path(args.output).suffix.lower()}"
+        if cached.exists():
+            trace_phase("save", cache="hit")
+            _atomic_copy(cached, args.output)
+            _chart_cache_report(args.output, True, _chart_cache_record(cache_dir, True))
+            return
+    else:
+        cached = None
+
+    resolver = build_resolver(goals_path)
+
+    # Collect data for all lifts
+    trace_phase("compute")
+    table = getattr(args, '_table', None) or SetTable(sessions, resolver)
+    # {name: (dates, values)}; watch passes them from its incrementally kept gym_series.SeriesStore
+    lift_data = getattr(args, '_lift_data', None)
+    if lift_data is None:
+        lift_data = _lift_data(table, lifts)
+    plot = _plot_series(lift_data, args)
+
+    if renderer == "fast":
+        _chart_e1rm_fast(sessions, args, lift_data, plot, table, resolver, goals_path, orientation, cached,
+                         cache_dir, encoding)
+        return
+
+    trace_phase("import")
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        import matplotlib.dates as mdates
+        from matplotlib.patches import FancyBboxPatch
+    except ImportError:
+        err_exit("matplotlib not installed")
+
+    # -- Dark dashboard palette --
+    BG = DASHBOARD_BG
+    COLORS = DASHBOARD_COLORS
+    GRID_C = 'white'
+    TICK_C = '#999999'
+
+    trace_phase("render", orientation=orientation)
+    if orientation == "vertical":
+        # iPhone Pro Max: 1290x2796 @ 150dpi
+        fig = plt.figure(figsize=(1290/150, 2796/150), dpi=150, facecolor=BG)
+
+        # Content zone: top ~82%, bottom ~13% for iOS safe areas
+        # KPI at top, then legend, then chart
+        ax = fig.add_axes([0.12, 0.13, 0.82, 0.52], facecolor=BG)
+
+        # -- KPI section --
+        with trace_span("kpis"):
+            kpis = _dashboard_kpis(sessions, lift_data, table)
+        adherence, avg_e1rm, show_delta = kpis["adherence"], kpis["avg_e1rm"], kpis["show_delta"]
+
+        # KPI text at top — HORIZONTAL layout (side by side) — slightly larger
+        fig.text(0.30, 0.83, f"{adherence}%", fontsize=60, fontweight='bold',
+                 color=kpis["adherence_color"], ha='center', va='center')
+        fig.text(0.30, 0.805, "adherence", fontsize=17, color='#555555', ha='center', va='center')
+        # Adherence delta
+        if show_delta:
+            adh_arrow, adh_change, adh_ch_color = kpis["adherence_delta"]
+            fig.text(0.30, 0.78, f"{adh_arrow} {adh_change}%", fontsize=27, fontweight='bold',
+                     color=adh_ch_color, ha='center', va='center')
+        else:
+            fig.text(0.245, 0.78, "▲▼ no", fontsize=20,
+                     color='#555555', ha='right', va='center')
+            fig.text(0.30, 0.78, " past ", fontsize=20, fontweight='bold',
+                     color=PREV_BAND, alpha=0.7, ha='center', va='center')
+            fig.text(0.355, 0.78, "data", fontsize=20,
+                     color='#555555', ha='left', va='center')
+
+        fig.text(0.72, 0.83, f"{avg_e1rm:.0f} kg", fontsize=60, fontweight='bold',
+                 color='white', ha='center', va='center')
+        fig.text(0.72, 0.805, "avg e1RM", fontsize=17, color='#555555', ha='center', va='center')
+        if show_delta:
+            change_arrow, avg_change, change_color = kpis["e1rm_delta"]
+            fig.text(0.72, 0.78, f"{change_arrow} {avg_change:.1f} kg", fontsize=27, fontweight='bold',
+                     color=change_color, ha='center', va='center')
+        else:
+            fig.text(0.665, 0.78, "▲▼ no", fontsize=20,
+                     color='#555555', ha='right', va='center')
+            fig.text(0.72, 0.78, " past ", fontsize=20, fontweight='bold',
+                     color=PREV_BAND, alpha=0.7, ha='center', va='center')
+            fig.text(0.775, 0.78, "data", fontsize=20,
+                     color='#555555', ha='left', va='center')
+
+        # -- Legend between KPI and chart (single row, 4 items) --
+        lift_names = list(lift_data.keys())
+        legend_y = 0.70
+        n_lifts = min(len(lift_names), 8)
+        # Build legend string centered: "● Squat   ● Bench   ● OHP   ● Row"
+        legend_items = []
+        legend_colors = []
+        for i, name in enumerate(lift_names[:n_lifts]):
+            short = resolver.short(name, name[:15])
+            legend_items.append(short)
+            legend_colors.append(COLORS[i % len(COLORS)])
+        # Evenly space across center
+        spacing = 1.0 / (n_lifts + 1)
+        for i, (label, c) in enumerate(zip(legend_items, legend_colors)):
+            x = spacing * (i + 1)
+            fig.text(x - 0.02, legend_y, '●', fontsize=22, color=c, ha='center', va='center')
+            fig.text(x + 0.01, legend_y, label, fontsize=17, fontweight='bold',
+                     color=c, ha='left', va='center')
+
+    else:
+        # Horizontal: simpler layout
+        fig = plt.figure(figsize=(12, 6), facecolor=BG)
+        ax = fig.add_axes([0.08, 0.15, 0.88, 0.75], facecolor=BG)
+
+    # -- Plot lines --
+    lift_names = list(lift_data.keys())
+    for i, (lift, (dates, values, trend)) in enumerate(plot.items()):
+        c = COLORS[i % len(COLORS)]
+        lw = 6 if orientation == "vertical" else 3
+        ms = 16 if orientation == "vertical" else 8
+        ax.plot(dates, values, 'o-', color=c, linewidth=lw, markersize=ms, zorder=3)
+        if trend:
+            ax.plot(dates, trend, '-', color=c, linewidth=lw / 2, alpha=0.5, zorder=2)
+
+        # Value badge: LEFT of last point
+        if values:
+            last_val = values[-1]
+            last_date = dates[-1]
+            badge_fs = 14 if orientation == "vertical" else 10
+            ax.annotate(
+                f" {last_val:.0f} ",
+                (last_date, last_val),
+                textcoords="offset points",
+                xytext=(20, 0) if orientation == "vertical" else (16, 0),
+                fontsize=badge_fs, fontweight='bold', color='white',
+                ha='left', va='center',
+                bbox=dict(boxstyle='round,pad=0.3', facecolor=c, edgecolor='none', alpha=0.9),
+                zorder=4,
+            )
+
+    # -- Goal lines from goals.json (or legacy --plan) --
+    for c, (x0, y0), (x1, y1) in _dashboard_goal_lines(args, goals_path, sessions, lift_data, resolver):
+        ax.plot([x0, x1], [y0, y1], '--', color=c, alpha=0.4, linewidth=1.5, zorder=1)
+        ax.plot(x1, y1, marker='D', color=c, alpha=0.6, markersize=8, zorder=1)
+
+    # -- Planned points (hollow markers) from session files / --planned --
+    for c, (last_date, last_val), (p_date, p_e1rm) in _dashboard_planned(args, sessions, lift_data, resolver):
+        ms_planned = 18 if orientation == "vertical" else 10
+        lw_planned = 3 if orientation == "vertical" else 2
+        # Dashed line from last actual to planned
+        ax.plot([last_date, p_date], [last_val, p_e1rm],
+                '--', color=c, alpha=0.5, linewidth=lw_planned, zorder=2)
+        # Hollow circle marker at planned point
+        ax.plot(p_date, p_e1rm, 'o', color=c,
+                markersize=ms_planned, markerfacecolor='none',
+                markeredgewidth=lw_planned, zorder=5)
+
+    # -- Window background bands --
+    bands = _dashboard_bands(sessions)
+    if bands:
+        (cur_start, latest), (prv_start, prv_end) = bands
+        ax.axvspan(cur_start, latest, alpha=0.07, color=CURRENT_BAND, zorder=0)
+        ax.axvspan(prv_start, prv_end, alpha=0.04, color=PREV_BAND, zorder=0)
+
+    # -- Axis styling --
+    ax.set_ylim(bottom=0)
+    ax.grid(True, alpha=0.06, linewidth=0.8, color=GRID_C)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    ax.tick_params(axis='both', colors=TICK_C, labelsize=15 if orientation == "vertical" else 11)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %d'))
+    fig.autofmt_xdate(rotation=0, ha='center')
+
+    # No Y-axis label (saves space)
+    ax.set_ylabel('')
+    ax.set_xlabel('')
+
+    # Subtle metric label below chart
+    ax.text(0.5, -0.06, 'e1RM (kg)', transform=ax.transAxes,
+            fontsize=18, color='white', alpha=0.35, ha='center', va='top',
+            fontfamily='monospace')
+    ax.text(0.32, -0.10, 'last 14 days', transform=ax.transAxes,
+            fontsize=13, color=CURRENT_BAND, alpha=0.5, ha='right', va='top')
+    ax.text(0.5, -0.10, ' vs ', transform=ax.transAxes,
+            fontsize=13, color='white', alpha=0.35, ha='center', va='top')
+    ax.text(0.68, -0.10, '14 days before', transform=ax.transAxes,
+            fontsize=13, color=PREV_BAND, alpha=0.5, ha='left', va='top')
+
+    # Horizontal mode: legend below chart
+    if orientation != "vertical":
+        legend_parts = []
+        for i, name in enumerate(lift_data.keys()):
+            c = COLORS[i % len(COLORS)]
+            legend_parts.append(ax.plot([], [], 'o-', color=c, linewidth=3, markersize=8, label=name)[0])
+        if legend_parts:
+            ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.12), ncol=len(legend_parts),
+                      frameon=False, fontsize=11,
+                      labelcolor='white')
+
+    if getattr(args, '_return_fig', False):
+        return fig, ax
+
+    trace_phase("save")
+
+    def render(target):
+        if orientation == "vertical":
+            return _savefig(plt, target, encoding, dpi=150, facecolor=BG)
+        return _savefig(plt, target, encoding, dpi=150, facecolor=BG, bbox_inches='tight')
+
+    _save_chart(args, cached, cache_dir, render, encoding)
+
+
+def cmd_chart_volume(sessions, args):
+    if not sessions:
+        err_exit("No session data found")
+
+    trace_phase("import")
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        err_exit("matplotlib not installed")
+
+    orientation = _chart_orientation(args)
+    encoding = _chart_encoding(args)
+
+    # Compute weekly volume per muscle group
+    trace_phase("compute")
+    table = getattr(args, '_table', None) or SetTable(sessions)
+    weeks = {w.pop("week"): w for w in table.weekly_volume()}
+    for w in weeks.values():
+        w.pop("week_start")
+
+    sorted_weeks = sorted(weeks.keys())
+    all_mg = sorted({mg for w in weeks.values() for mg in w})
+
+    trace_phase("render", orientation=orientation)
+    if orientation == "vertical":
+        fig, ax = plt.subplots(figsize=(6, 10))
+    else:
+        fig, ax = plt.subplots(figsize=(12, 6))
+
+    colors = ['#2196F3', '#F44336', '#4CAF50', '#FF9800', '#9C27B0', '#00BCD4', '#795548', '#607D8B']
+    np = _numpy()
+    x = np.arange(len(sorted_weeks))
+    width = 0.8 / max(len(all_mg), 1)
+
+    for i, mg in enumerate(all_mg):
+        vals = [weeks[w].get(mg, 0) for w in sorted_weeks]
+        ax.bar(x + i * width, vals, width, label=mg, color=colors[i % len(colors)])
+
+    ax.set_xticks(x + width * len(all_mg) / 2)
+    ax.set_xticklabels(sorted_weeks, rotation=45)
+    ax.set_title("Weekly Volume (Hard Sets) by Muscle Group", fontweight="bold")
+    ax.set_ylabel("Hard Sets")
+    ax.legend()
+    ax.grid(True, alpha=0.3, axis="y")
+    plt.tight_layout()
+    trace_phase("save")
+    _save_chart(args, None, None, lambda target: _savefig(plt, target, encoding, dpi=150, bbox_inches="tight"),
+                encoding)
+
+
+
+def cmd_log(args):
+    history_dir = args.history_dir
+    source = args.source
+
+    # Try as file first
+    trace_phase("validate")
+    data = None
+    if os.path.isfile(source):
+        try:
+            data = json.loads(Path(source).read_text())
+        except json.JSONDecodeError as e:
+            err_exit(f"Invalid JSON in file: {e}")
+    else:
+        try:
+            data = json.loads(source)
+        except json.JSONDecodeError:
+            err_exit("Invalid JSON string (and not a file path)")
+
+    import gym_schema
+    errors = gym_schema.validate_session(data)
+    if errors:
+        err_exit(errors[0] if len(errors) == 1 else "Invalid session:\n  " + "\n  ".join(errors))
+    # Support both "actual" and legacy "exercises"
+    if "actual" not in data:
+        data["actual"] = data["exercises"]
+
+    trace_phase("save")
+    out_path = os.path.join(history_dir, f"{data['date']}.json")
+    fsync = _fsync_arg(args)
+    try:
+        with gym_store.locked(history_dir):
+            if not os.path.exists(out_path) and gym_store.has_store(history_dir):
+                gym_store.append_session(history_dir, data, fsync=fsync)
+                print(f"Saved session {data['date']} to {gym_store.store_path(history_dir)}")
+                return
+            gym_store.atomic_write(out_path, gym_store.dump_json(data, compact=getattr(args, "compact", False) or None), fsync)
+    except TimeoutError as e:
+        err_exit(f"Could not save session: {e}")
+    print(f"Saved session to {out_path}")
+
+
+# ---- Validation ----
+#
+# session_errors() reports every problem of a session rather than the first,
+# using the compiled schema of gym_schema.py (shared with log and workout_live).
+# validate reads and hashes each day file, reuses the cached result of files
+# whose name and content hash are unchanged (VALIDATE_FILENAME, same dir as
+# the session index) and checks the rest in chunks, in a process pool once
+# there are enough of them to pay for the workers' start-up.
+
+VALIDATE_FILENAME = ".gym-validate"
+VALIDATE_VERSION = 4
+VALIDATE_CHUNK = 64
+VALIDATE_POOL_MIN = 512  # fewer files check faster in-process than a pool starts
+
+
+def session_errors(data, fname=None):
+    """Every validation error of one session document, as a list of strings (empty if valid).
+
+    Checks the compiled session schema (gym_schema.py); fname, when given,
+    must also match the session date (YYYY-MM-DD.json).
+    """
+    import gym_schema
+    errors = gym_schema.validate_session(data)
+    if fname is not None and isinstance(data, dict) and "date" in data and fname != f"{data['date']}.json":
+        errors.append(f"Filename/date mismatch: file={fname}, date={data['date']}")
+    return errors
+
+
+def _file_errors(name, raw):
+    try:
+        data = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return [f"Invalid JSON: {e}"]
+    return session_errors(data, name)
+
+
+def _validate_chunk(items):
+    """[(name, raw bytes)] -> [errors]; module-level so pool workers can run it."""
+    return [_file_errors(name, raw) for name, raw in items]
+
+
+def _read_validate_cache(history_dir):
+    """{filename: [content digest, errors]} from the last validate run, or {}."""
+    try:
+        raw = json.loads((Path(history_dir) / VALIDATE_FILENAME).read_text())
+        if raw.get("version") != VALIDATE_VERSION:
+            return {}
+        return {name: tuple(entry) for name, entry in raw["files"].items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def _write_validate_cache(history_dir, entries):
+    """Write the cache atomically. Silently skipped if the dir is read-only."""
+    data = json.dumps({"version": VALIDATE_VERSION, "files": entries},
+                      separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    try:
+        gym_store.atomic_write(Path(history_dir) / VALIDATE_FILENAME, data, fsync=False)
+    except OSError:
+        pass
+
+
+def _iter_file_errors(files, workers=None, cache=None):
+    """Yield (name, errors, cached) for each file, in order.
+
+    cache ({filename: (digest, errors)}) is updated in place with every
+    file's current digest and result.
+    """
+    import hashlib
+    todo, digests = [], {}
+    for f in files:
+        try:
+            raw = f.read_bytes()
+        except OSError as e:
+            digests[f.name] = None
+            todo.append((f.name, None, f"Unreadable: {e.strerror or e}"))
+            continue
+        digest = hashlib.sha256(raw).hexdigest()[:32]
+        digests[f.name] = digest
+        hit = cache.get(f.name) if cache is not None else None
+        if hit is None or hit[0] != digest:
+            todo.append((f.name, raw, None))
+
+    misses = [(name, raw) for name, raw, error in todo if error is None]
+    chunks = [misses[i:i + VALIDATE_CHUNK] for i in range(0, len(misses), VALIDATE_CHUNK)]
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(misses) >= VALIDATE_POOL_MIN else 1
+    workers = max(1, min(workers, os.cpu_count() or 1, len(chunks)))
+    pool = None
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_validate_chunk, chunks)
+    else:
+        results = map(_validate_chunk, chunks)
+    try:
+        pending = (errors for chunk in results for errors in chunk)
+        fresh = {name: error for name, _, error in todo}
+        for f in files:
+            name = f.name
+            if name not in fresh:
+                yield name, list(cache[name][1]), True
+                continue
+            errors = [fresh[name]] if fresh[name] is not None else next(pending)
+            if cache is not None and digests[name] is not None:
+                cache[name] = (digests[name], errors)
+            yield name, errors, False
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def cmd_validate(sessions_raw, args):
+    """Validate all JSONs in history dir, reporting every error of every file.
+
+    --stream prints one JSON line per file / store record as it is checked,
+    then a summary line; --json prints the same result as one document.
+    """
+    history_dir = args.history_dir
+    stream = getattr(args, "stream", False)
+    use_cache = not getattr(args, "no_cache", False)
+    trace_phase("load")
+    p = Path(history_dir)
+    files = sorted(p.glob("*.json"))
+    store_records = list(gym_store.iter_records(history_dir))
+
+    if not files and not store_records:
+        if args.json or stream:
+            print(json.dumps({"valid": False, "errors": ["No JSON files found"]}))
+        err_exit("No JSON files found")
+
+    trace_phase("validate", files=len(files), store_records=len(store_records))
+    errors = []
+    valid_count = valid_records = cached_count = 0
+    cache = _read_validate_cache(history_dir) if use_cache else None
+    before = dict(cache or {})
+
+    def report(where, errs, cached=False):
+        nonlocal cached_count
+        errors.extend({"file": where, "error": e} for e in errs)
+        cached_count += cached
+        if stream:
+            line = {"file": where, "valid": not errs, "errors": errs}
+            if cached:
+                line["cached"] = True
+            print(json.dumps(line, ensure_ascii=False), flush=True)
+
+    for name, errs, cached in _iter_file_errors(files, getattr(args, "workers", None), cache):
+        report(name, errs, cached)
+        valid_count += not errs
+
+    for lineno, _, data, error in store_records:
+        errs = [error] if error else session_errors(data)
+        report(f"{gym_store.STORE_FILENAME}:{lineno}", errs)
+        valid_records += not errs
+
+    if cache is not None:
+        current = {f.name for f in files}
+        entries = {name: entry for name, entry in cache.items() if name in current}
+        if entries != before:
+            _write_validate_cache(history_dir, entries)
+
+    trace_phase("output")
+    result = {"valid": len(errors) == 0, "files": len(files), "valid_count": valid_count}
+    if cache is not None:
+        result["cached"] = cached_count
+    if store_records:
+        result.update(store_records=len(store_records), valid_store_records=valid_records)
+    if stream:
+        result.update(summary=True, error_count=len(errors))
+        print(json.dumps(result), flush=True)
+    elif args.json:
+        result["errors"] = errors
+        print(json.dumps(result, indent=2))
+
+    if errors:
+        if not args.json and not stream:
+            for e in errors:
+                print(f"  ✗ {e['file']}: {e['error']}", file=sys.stderr)
+        sys.exit(1)
+    else:
+        if not args.json and not stream:
+            counts = [f"{valid_count} files"] if files else []
+            counts += [f"{valid_records} store records"] if store_records else []
+            print(f"All {' and '.join(counts)} valid ✓")
+
+
+def cmd_migrate(args):
+    """Fold per-day YYYY-MM-DD.json files into the NDJSON store."""
+    history_dir = args.history_dir
+    if not os.path.isdir(history_dir):
+        err_exit(f"Directory not found: {history_dir}")
+    removed = 0
+    # Locked throughout so a concurrent `log` cannot land in a day file that --remove then deletes
+    with gym_store.locked(history_dir):
+        trace_phase("load")
+        # As written, not load_sessions' normalized copies (no "actual" added to legacy "exercises" files)
+        day_files = []
+        with os.scandir(history_dir) as it:
+            names = sorted(e.name for e in it if e.name.endswith(".json"))
+        for name in names:
+            session, error = _read_session_file(Path(history_dir) / name)
+            if error is not None:
+                print(f"Warning: skipping {name}: {error}", file=sys.stderr)
+            else:
+                day_files.append(session)
+        trace_phase("save", sessions=len(day_files))
+        stats = gym_store.compact(history_dir, extra=day_files, fsync=_fsync_arg(args))
+        if args.remove:
+            migrated = {f"{s['date']}.json" for s in day_files}
+            for f in Path(history_dir).glob("*.json"):
+                if f.name in migrated:
+                    f.unlink()
+                    removed += 1
+            try:
+                index_path(history_dir).unlink()
+            except OSError:
+                pass
+    if stats["rejected"]:
+        print(f"Warning: moved {stats['rejected']} unreadable store line(s) to "
+              f"{gym_store.STORE_FILENAME}{gym_store.REJECTS_SUFFIX}", file=sys.stderr)
+
+    result = {"store": str(gym_store.store_path(history_dir)), "migrated": len(day_files),
+              "sessions": stats["sessions"], "removed_files": removed}
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"Migrated {result['migrated']} day file(s) into {result['store']} "
+              f"({result['sessions']} session(s)); removed {removed} file(s)")
+
+
+def cmd_compact(args):
+    """Drop superseded records from the NDJSON store."""
+    history_dir = args.history_dir
+    if not gym_store.has_store(history_dir):
+        err_exit(f"No {gym_store.STORE_FILENAME} in {history_dir} (run migrate first)")
+    before = gym_store.store_path(history_dir).stat().st_size
+    trace_phase("compact")
+    stats = gym_store.compact(history_dir, fsync=_fsync_arg(args))
+    stats["bytes_before"] = before
+    stats["bytes_after"] = gym_store.store_path(history_dir).stat().st_size
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        print(f"Compacted {stats['records']} record(s) into {stats['sessions']} session(s): "
+              f"{stats['superseded']} superseded, {stats['rejected']} rejected, "
+              f"{stats['bytes_before']} → {stats['bytes_after']} bytes")
+
+
+def cmd_index(args):
+    """Refresh (or rebuild) the session index and report what was re-parsed."""
+    history_dir = args.history_dir
+    if not os.path.isdir(history_dir):
+        err_exit(f"Directory not found: {history_dir}")
+    trace_phase("index")
+    _, stats = _load_indexed(history_dir, rebuild=args.rebuild)
+    stats["index"] = str(index_path(history_dir))
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        print(f"Indexed {stats['sessions']} session(s) from {stats['files']} file(s), "
+              f"re-parsed {stats['reparsed']}, errors {stats['errors']}")
+
+
+def cmd_analyze(sessions, args):
+    """Refresh the per-session analysis cache and write new/changed analyses into the history."""
+    if not sessions:
+        err_exit("No session data found")
+    goals_path = args.goals_file or default_goals_path(args.history_dir)
+    trace_phase("compute")
+    results = analyze_sessions(sessions, build_resolver(goals_path), load_goals(goals_path), force=args.force)
+    updates = [(s, analysis) for s, analysis, changed in results if changed]
+    trace_phase("save", updated=len(updates))
+    counts = _write_analyses(args.history_dir, updates, _fsync_arg(args)) if updates else {"files": 0, "store": 0, "skipped": 0}
+    if counts["skipped"]:
+        print(f"Warning: {counts['skipped']} session(s) not in a YYYY-MM-DD.json file or the store; "
+              f"analysis not saved", file=sys.stderr)
+
+    trace_phase("output")
+    result = {"sessions": len(results), "updated": len(updates), "cached": len(results) - len(updates), **counts}
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"Analyzed {result['sessions']} session(s): {result['updated']} updated "
+              f"({result['files']} day file(s), {result['store']} store record(s)), {result['cached']} cached")
+
+
+def cmd_db(args):
+    """Sync the SQLite mirror (`db sync`) or report what it holds (`db info`)."""
+    import gym_db
+    import sqlite3
+    path = _db_path(args)
+    if args.db_command == "sync":
+        trace_phase("sync")
+        conn, stats = _sync_db(args, rebuild=args.rebuild)
+    else:
+        try:
+            conn = gym_db.connect(path, readonly=True)
+        except (FileNotFoundError, sqlite3.Error) as e:
+            err_exit(str(e))
+        stats = {}
+    with conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'synced_ns'").fetchone()
+        result = {"db": path, "bytes": os.path.getsize(path), **stats,
+                  "errors": len(stats.get("errors", ())), "tables": gym_db.table_counts(conn),
+                  "synced": datetime.fromtimestamp(int(row[0]) / 1e9).isoformat(timespec="seconds") if row else None}
+    conn.close()
+    if args.db_command == "info":
+        for key in ("errors", "files", "reparsed", "removed", "store_sessions", "goals", "sessions"):
+            result.pop(key, None)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    elif args.db_command == "sync":
+        print(f"Synced {result['sessions']} session(s) into {path}: re-parsed {result['reparsed']} file(s), "
+              f"{result['store_sessions']} store record(s), removed {result['removed']}, errors {result['errors']}")
+    else:
+        tables = ", ".join(f"{n} {t}" for t, n in result["tables"].items())
+        print(f"{path}: {result['bytes']} bytes, synced {result['synced'] or 'never'}")
+        print(f"  {tables}")
+
+
+def cmd_query(args):
+    """Canned parameterized reports (or --sql) on the SQLite mirror, synced first unless --no-sync."""
+    import gym_db
+    import sqlite3
+    path = _db_path(args)
+    if not args.no_sync:
+        conn, _ = _sync_db(args)
+        conn.close()
+    trace_phase("query", report=args.report)
+    try:
+        if args.report == "sql":
+            if not args.sql:
+                err_exit("query sql needs a statement, e.g. query <dir> sql \"SELECT COUNT(*) FROM sessions\"")
+            columns, rows = gym_db.run_sql(path, args.sql)
+        elif args.sql:
+            err_exit(f"{args.report} takes filter options, not a SQL statement (use the sql report)")
+        else:
+            filters = {k: getattr(args, k) for k in ("since", "until", "weeks", "exercise", "muscle_group",
+                                                      "max_rpe", "min_reps", "max_reps", "limit")}
+            if args.exercise:
+                filters["exercise_key"] = args.exercise.lower()
+                filters["canonical"] = _DEFAULT_RESOLVER.canonical(args.exercise)
+            conn = gym_db.connect(path, readonly=True)
+            try:
+                columns, rows = gym_db.query(conn, args.report, **filters)
+            finally:
+                conn.close()
+    except ValueError as e:
+        err_exit(str(e))
+    except (FileNotFoundError, sqlite3.Error) as e:
+        err_exit(f"Query failed: {e}")
+
+    trace_phase("output", rows=len(rows))
+    _print_rows(columns, rows, args.json)
+
+
+# ---- Chart pipeline ----
+#
+# Chart jobs ({"key", "kind", "sessions", "args"}) render in-process, sharing
+# one matplotlib import and the prebuilt SetTables passed as `shared`, or in a
+# process pool. `charts` and `batch` both go through _render_charts.
+#
+# --renderer fast draws the e1RM dashboard with Pillow (gym_render.py) at the
+# matplotlib layout. --resolution auto|session|weekly|lttb bounds the points
+# per lift (auto: every session up to --max-points, else weekly bests, else
+# LTTB) and --trend DAYS adds an EMA line (gym_series.py).
+
+CHART_KINDS = {"e1rm": cmd_chart_e1rm, "volume": cmd_chart_volume}
+CHART_ORIENTATIONS = ("vertical", "horizontal")
+
+
+def _captured(fn, *fn_args):
+    """Run fn quietly. Returns (value, None) or (None, error message) if it exits."""
+    import contextlib
+    import io
+    err = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(err):
+            return fn(*fn_args), None
+    except SystemExit:
+        msg = err.getvalue().strip()
+        return None, msg[len("Error: "):] if msg.startswith("Error: ") else msg or "failed"
+
+
+def _render_chart_job(job, shared=None):
+    """Render one chart job (also the process-pool worker). Returns (key, path, error, seconds)."""
+    t0 = time.perf_counter()
+    chart_args = argparse.Namespace(**job["args"], **(shared or {}).get(job["kind"], {}))
+    with trace_span(f"chart-{job['kind']}", output=chart_args.output):
+        _, error = _captured(CHART_KINDS[job["kind"]], job["sessions"], chart_args)
+    return job["key"], None if error else chart_args.output, error, time.perf_counter() - t0
+
+
+def _render_charts(jobs, workers=1, shared=None):
+    """Render jobs in order; in a process pool when workers > 1 (shared is in-process only)."""
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    if workers == 1:
+        return [_render_chart_job(job, shared) for job in jobs]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_chart_job, jobs))
+
+
+def _chart_args(args, output, orientation, history_dir=None, goals_file=None):
+    """Namespace fields for one chart render, taken from the invoking command's args."""
+    return {
+        "history_dir": history_dir or args.history_dir, "output": output,
+        "goals_file": goals_file or getattr(args, "goals_file", None),
+        "vertical": orientation == "vertical", "horizontal": orientation == "horizontal",
+        "lifts": getattr(args, "lifts", None), "period": getattr(args, "period", "all"),
+        "program": getattr(args, "program", None),
+        "plan": getattr(args, "plan", None), "planned": getattr(args, "planned", None),
+        "no_goals": getattr(args, "no_goals", False), "cache_dir": getattr(args, "cache_dir", None),
+        "renderer": getattr(args, "renderer", "matplotlib"), "json": False,
+        "resolution": getattr(args, "resolution", "auto"), "max_points": getattr(args, "max_points", None),
+        "trend": getattr(args, "trend", None),
+        "optimize": getattr(args, "optimize", False), "quality": getattr(args, "quality", None),
+        "max_bytes": getattr(args, "max_bytes", None),
+    }
+
+
+def cmd_charts(sessions, args):
+    """Render several chart kinds/orientations from one loaded history, with per-chart timings."""
+    if not sessions:
+        err_exit("No session data found")
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    orientations = [o.strip() for o in args.orientations.split(",") if o.strip()]
+    bad = sorted(set(kinds) - set(CHART_KINDS)) + sorted(set(orientations) - set(CHART_ORIENTATIONS))
+    if bad:
+        err_exit(f"Unknown chart kind/orientation: {', '.join(bad)}")
+    ext = args.format.lstrip(".")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    jobs = [{"key": (kind, o), "kind": kind, "sessions": sessions,
+             "args": _chart_args(args, os.path.join(args.output_dir, f"{kind}-{o}.{ext}"), o)}
+            for kind in kinds for o in orientations]
+
+    trace_phase("compute")
+    shared = None
+    if (args.workers or 1) == 1:
+        # One SetTable per chart kind, reused by every orientation
+        goals_path = args.goals_file or default_goals_path(args.history_dir)
+        shared = {"volume": {"_table": SetTable(sessions)}}
+        if "e1rm" in kinds:
+            e1rm_sessions = _period_sessions(sessions, args.period, _program_path(args))
+            shared["e1rm"] = {"_table": SetTable(e1rm_sessions, build_resolver(goals_path))}
+
+    trace_phase("render", charts=len(jobs), workers=args.workers or 1)
+    t0 = time.perf_counter()
+    rendered = _render_charts(jobs, args.workers or 1, shared)
+    total = time.perf_counter() - t0
+
+    trace_phase("output")
+    results = [{"kind": kind, "orientation": o, "path": path, "error": error, "render_s": round(sec, 3),
+                "bytes": os.path.getsize(path) if path else None}
+               for (kind, o), path, error, sec in rendered]
+    failed = [r for r in results if r["error"]]
+    if args.json:
+        print(json.dumps({"charts": results, "total_s": round(total, 3)}, indent=2))
+    else:
+        for r in results:
+            if r["error"]:
+                print(f"✗ {r['kind']} {r['orientation']}: {r['error']}", file=sys.stderr)
+            else:
+                print(f"Chart saved to {r['path']} ({r['render_s']:.2f}s)")
+        print(f"Rendered {len(results) - len(failed)}/{len(results)} chart(s) in {total:.2f}s")
+    if failed:
+        sys.exit(1)
+
+
+# ---- Batch ----
+#
+# `batch` runs the weekly digest for many athletes in one process: a manifest
+# (or glob) lists history dirs, text sections are computed in-process and
+# chart renders are fanned out to a process pool.
+
+BATCH_SECTIONS = ("e1rm", "volume", "kpis")
+BATCH_CHARTS = ("e1rm", "volume")
+
+
+def _athlete_id(history_dir):
+    """<workspace> for <workspace>/health/gym/history, else the dir name."""
+    parts = Path(history_dir).resolve().parts
+    if len(parts) > 3 and parts[-3:] == ("health", "gym", "history"):
+        return parts[-4]
+    return parts[-1]
+
+
+def _read_manifest(path):
+    """Athletes from a manifest: a JSON list (paths or {"history", "id", "goals_file"})
+    or a text file with one history dir per line. Relative paths are manifest-relative."""
+    base = Path(path).parent
+    text = Path(path).read_text()
+    try:
+        raw = json.loads(text)
+    except json.JSONDecodeError:
+        raw = [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+    if not isinstance(raw, list):
+        err_exit(f"Manifest must be a list of history dirs: {path}")
+    athletes = []
+    for entry in raw:
+        if isinstance(entry, str):
+            entry = {"history": entry}
+        if not isinstance(entry, dict) or not (entry.get("history") or entry.get("history_dir")):
+            err_exit(f"Invalid manifest entry: {entry!r}")
+        hist = str(base / (entry.get("history") or entry["history_dir"]))
+        goals = entry.get("goals_file")
+        athletes.append({"id": entry.get("id"), "history_dir": hist,
+                         "goals_file": str(base / goals) if goals else None})
+    return athletes
+
+
+def _batch_athletes(args):
+    """Athlete entries from --manifest and/or --glob, with unique ids."""
+    athletes = []
+    if args.manifest:
+        athletes += _read_manifest(args.manifest)
+    if args.glob:
+        import glob
+        athletes += [{"id": None, "history_dir": d, "goals_file": None}
+                     for d in sorted(glob.glob(args.glob)) if os.path.isdir(d)]
+    seen = {}
+    for a in athletes:
+        base = a["id"] or _athlete_id(a["history_dir"])
+        seen[base] = seen.get(base, 0) + 1
+        a["id"] = base if seen[base] == 1 else f"{base}-{seen[base]}"
+        a["goals_file"] = a["goals_file"] or default_goals_path(a["history_dir"])
+    return athletes
+
+
+def _athlete_report(athlete, sections, use_index=True):
+    """Load one athlete's history and compute the text sections. Returns (report, sessions)."""
+    report = {"id": athlete["id"], "history_dir": athlete["history_dir"]}
+    if not os.path.isdir(athlete["history_dir"]):
+        report["error"] = f"Directory not found: {athlete['history_dir']}"
+        return report, []
+    trace_phase("load")
+    sessions, error = _captured(load_sessions, athlete["history_dir"], use_index)
+    if error or not sessions:
+        report["error"] = error or "No session data found"
+        return report, []
+    report["sessions"] = len(sessions)
+    report["latest"] = sessions[-1]["date"]
+    trace_phase("compute", sessions=len(sessions))
+    table = SetTable(sessions)
+    if "e1rm" in sections:
+        report["e1rm"] = table.latest_e1rm()
+    if "volume" in sections:
+        report["volume"] = table.weekly_volume()
+    if "kpis" in sections:
+        report["kpis"], error = _captured(kpi_report, sessions, athlete["goals_file"])
+        if error:
+            report.setdefault("errors", []).append(f"kpis: {error}")
+    return report, sessions
+
+
+def cmd_batch(args):
+    """Digest for many athletes: JSON sections per athlete plus charts rendered in a process pool."""
+    if not args.manifest and not args.glob:
+        err_exit("batch needs --manifest and/or --glob")
+    athletes = _batch_athletes(args)
+    if not athletes:
+        err_exit("No history dirs matched")
+    sections = [x.strip() for x in args.sections.split(",") if x.strip()]
+    unknown = sorted(set(sections) - set(BATCH_SECTIONS))
+    if unknown:
+        err_exit(f"Unknown batch section(s): {', '.join(unknown)} (choose from {', '.join(BATCH_SECTIONS)})")
+
+    reports, jobs = [], []
+    use_index = not args.no_index
+    for athlete in athletes:
+        with trace_span("athlete", id=athlete["id"]):
+            report, sessions = _athlete_report(athlete, sections, use_index)
+        reports.append(report)
+        if args.charts_dir and sessions:
+            for kind in BATCH_CHARTS:
+                output = os.path.join(args.charts_dir, f"{athlete['id']}-{kind}.png")
+                chart_args = _chart_args(args, output, _chart_orientation(args),
+                                         athlete["history_dir"], athlete["goals_file"])
+                chart_args.update(lifts=None, plan=None, planned=None, program=None)
+                jobs.append({"key": (athlete["id"], kind), "kind": kind, "sessions": sessions, "args": chart_args})
+
+    if jobs:
+        trace_phase("render", charts=len(jobs))
+        os.makedirs(args.charts_dir, exist_ok=True)
+        rendered = _render_charts(jobs, args.workers)
+        by_id = {r["id"]: r for r in reports}
+        for (athlete_id, kind), path, error, seconds in rendered:
+            report = by_id[athlete_id]
+            if error:
+                report.setdefault("errors", []).append(f"chart {kind}: {error}")
+            else:
+                report.setdefault("charts", {})[kind] = {"path": path, "render_s": round(seconds, 3)}
+
+    trace_phase("output")
+    failed = sum(1 for r in reports if "error" in r)
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+        for r in reports:
+            Path(args.out_dir, f"{r['id']}.json").write_text(json.dumps(r, indent=2, ensure_ascii=False))
+        for r in reports:
+            status = f"error: {r['error']}" if "error" in r else f"{r['sessions']} sessions, latest {r['latest']}"
+            print(f"{r['id']:<20} {status}")
+        print(f"Wrote {len(reports)} athlete file(s) to {args.out_dir}")
+    else:
+        doc = json.dumps({"athletes": reports, "count": len(reports), "failed": failed},
+                         indent=2, ensure_ascii=False)
+        if args.out:
+            Path(args.out).write_text(doc)
+            print(f"Wrote {len(reports)} athlete(s) to {args.out}")
+        else:
+            print(doc)
+    if failed:
+        sys.exit(1)
+
+
+# ---- Daemon ----
+#
+# `serve` keeps parsed sessions, goals.json and matplotlib resident and runs
+# CLI invocations in-process. Protocol: one JSON object per line,
+#   request:  {"argv": ["e1rm", "<dir>", "--json"], "cwd": "/abs/path", "id": 1}
+#             {"call": "kpi_windows", "args": {"history": "<dir>", "windows": [7, 28]}, "cwd": ..., "id": 2}
+#             {"cmd": "ping"} | {"cmd": "shutdown"}
+#   response: {"id": 1, "rc": 0, "stdout": "...", "stderr": "..."}
+#             {"id": 2, "ok": true, "result": ..., "stderr": ""} | {"id": 2, "ok": false, "error": "..."}
+# "call" runs a Library API function (see API) and returns its result as
+# JSON, so clients skip argument parsing and parsing the printed output.
+# Requests are served one at a time (commands chdir and share pyplot state).
+# Write settings from the environment ($GYM_COMPACT_JSON, $GYM_FSYNC) are the
+# client's: it forwards them as --compact / --fsync, and the daemon's own
+# values are unset while a request runs.
+# The client gives a daemon DAEMON_CONNECT_TIMEOUT to accept a request and
+# $GYM_DAEMON_TIMEOUT (DAEMON_TIMEOUT) seconds to answer, then runs the
+# command in-process. Commands that add data (log, goals add) are not re-run:
+# the daemon may still finish them, so they exit with an error instead.
+
+SOCKET_ENV = "GYM_ANALYTICS_SOCKET"
+TIMEOUT_ENV = "GYM_DAEMON_TIMEOUT"
+DAEMON_CONNECT_TIMEOUT = 1.0
+DAEMON_TIMEOUT = 30.0
+
+# Warm caches while serving: {("sessions", dir, use_index, window) | ("goals", path)
+# | ("periods", path): (signature, value)}, least recently used first. A changed
+# history dir drops its other session lists; WARM_MAX_ENTRIES bounds the rest
+# (many dirs under batch, a new window every session day).
+_WARM = None
+WARM_MAX_ENTRIES = 32
+
+
+def _warm_get(key):
+    hit = _WARM.pop(key, None)
+    if hit is not None:
+        _WARM[key] = hit  # now the most recently used
+    return hit
+
+
+def _warm_put(key, sig, value):
+    _WARM[key] = (sig, value)
+    while len(_WARM) > WARM_MAX_ENTRIES:
+        del _WARM[next(iter(_WARM))]
+    return _WARM[key]
+
+
+def default_socket_path():
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return os.path.join(runtime, "gym_analytics.sock")
+    return os.path.join("/tmp", f"gym_analytics-{os.getuid()}.sock")
+
+
+def _history_signature(history_dir):
+    """Cheap change detector for a history dir: (name, mtime_ns, size) of every session file."""
+    sig = []
+    with os.scandir(history_dir) as it:
+        for e in it:
+            if e.name.endswith(".json") or e.name == gym_store.STORE_FILENAME:
+                st = e.stat()
+                sig.append((e.name, st.st_mtime_ns, st.st_size))
+    return tuple(sorted(sig))
+
+
+def _warm_sessions(history_dir, use_index=True, **window):
+    """load_sessions, served from memory while the history dir is unchanged."""
+    if _WARM is None:
+        return load_sessions(history_dir, use_index=use_index, **window)
+    key = ("sessions", os.path.abspath(history_dir), use_index, tuple(sorted(window.items())))
+    sig = _history_signature(history_dir)
+    hit = _warm_get(key)
+    if hit is None or hit[0] != sig:
+        import contextlib
+        import io
+        # Lists of this dir from before the change are stale, whatever their window
+        for stale in [k for k, v in _WARM.items() if k[:3] == key[:3] and v[0] != sig]:
+            del _WARM[stale]
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            sessions = load_sessions(history_dir, use_index=use_index, **window)
+        hit = _warm_put(key, sig, (sessions, err.getvalue()))
+    sessions, warnings = hit[1]
+    sys.stderr.write(warnings)
+    return list(sessions)
+
+
+def _run_request(req):
+    """Run one protocol request in-process, capturing output and exit code."""
+    import contextlib
+    import io
+    out, err = io.StringIO(), io.StringIO()
+    rc = 0
+    cwd = os.getcwd()
+    # The client sends its write settings as flags (_store_argv); the daemon's own must not apply
+    saved_env = {name: os.environ.pop(name) for name in _STORE_ENV_FLAGS if name in os.environ}
+    try:
+        if req.get("cwd"):
+            os.chdir(req["cwd"])
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            main(list(req.get("argv", [])))
+    except SystemExit as e:
+        rc = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if isinstance(e.code, str):
+            err.write(e.code + "\n")
+    except Exception as e:  # keep the daemon alive; report like an uncaught error
+        err.write(f"Error: {type(e).__name__}: {e}\n")
+        rc = 1
+    finally:
+        os.chdir(cwd)
+        os.environ.update(saved_env)
+    return {"id": req.get("id"), "rc": rc, "stdout": out.getvalue(), "stderr": err.getvalue()}
+
+
+def _run_call(req):
+    """Run one Library API call in-process. Returns {"ok": true, "result"} or {"ok": false, "error"}."""
+    import contextlib
+    import io
+    name, kwargs = req.get("call"), req.get("args") or {}
+    resp = {"id": req.get("id"), "ok": False}
+    if name not in API:
+        resp["error"] = f"Unknown call: {name} (expected one of {', '.join(sorted(API))})"
+        return resp
+    if not isinstance(kwargs, dict):
+        resp["error"] = "args must be a JSON object"
+        return resp
+    err = io.StringIO()
+    cwd = os.getcwd()
+    try:
+        if req.get("cwd"):
+            os.chdir(req["cwd"])
+        with contextlib.redirect_stderr(err):
+            resp.update(ok=True, result=API[name](**kwargs))
+    except AnalyticsError as e:
+        resp["error"] = str(e)
+    except Exception as e:  # bad arguments or an unexpected failure; keep the daemon alive
+        resp["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        os.chdir(cwd)
+    resp["stderr"] = err.getvalue()
+    return resp
+
+
+def _handle_line(line):
+    """Decode one request line. Returns (response, keep_running)."""
+    try:
+        req = json.loads(line)
+        if not isinstance(req, dict):
+            raise ValueError("request must be a JSON object")
+    except ValueError as e:
+        return {"id": None, "rc": 2, "stdout": "", "stderr": f"Error: bad request: {e}\n"}, True
+    cmd = req.get("cmd")
+    if cmd == "ping":
+        return {"id": req.get("id"), "ok": True, "pid": os.getpid()}, True
+    if cmd == "shutdown":
+        return {"id": req.get("id"), "ok": True}, False
+    if "call" in req:
+        return _run_call(req), True
+    return _run_request(req), True
+
+
+def _warm_up():
+    """Enable caches and import matplotlib once (if installed)."""
+    global _WARM
+    _WARM = {}
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot  # noqa: F401
+        import matplotlib.dates  # noqa: F401
+    except ImportError:
+        pass
+
+
+def serve_stdio(stdin, stdout):
+    """Serve JSON-lines requests from stdin until EOF or shutdown."""
+    _warm_up()
+    for line in stdin:
+        if not line.strip():
+            continue
+        resp, running = _handle_line(line)
+        stdout.write(json.dumps(resp, ensure_ascii=False) + "\n")
+        stdout.flush()
+        if not running:
+            break
+
+
+def serve_socket(path):
+    """Serve JSON-lines requests on a Unix socket until a shutdown request."""
+    import socket
+    _warm_up()
+    if os.path.exists(path):
+        try:
+            alive = _client_request(path, {"cmd": "ping"}, timeout=DAEMON_CONNECT_TIMEOUT) is not None
+        except TimeoutError:
+            alive = True  # accepts but does not answer: still someone's socket
+        if alive:
+            err_exit(f"Daemon already running on {path}")
+        os.unlink(path)
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    srv.bind(path)
+    os.chmod(path, 0o600)
+    srv.listen(16)
+    running = True
+    try:
+        while running:
+            conn, _ = srv.accept()
+            try:
+                with conn, conn.makefile("rw", encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        resp, running = _handle_line(line)
+                        f.write(json.dumps(resp, ensure_ascii=False) + "\n")
+                        f.flush()
+                        if not running:
+                            break
+            except OSError:
+                pass  # the client gave up (timed out) before the answer was written
+    finally:
+        srv.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _daemon_timeout():
+    try:
+        return float(os.environ.get(TIMEOUT_ENV) or DAEMON_TIMEOUT)
+    except ValueError:
+        return DAEMON_TIMEOUT
+
+
+def _client_request(path, req, timeout=None):
+    """Send one request to a daemon. Returns the response, or None if unreachable.
+
+    Raises TimeoutError if the request was sent but no answer came within
+    timeout seconds (default: _daemon_timeout()).
+    """
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.settimeout(DAEMON_CONNECT_TIMEOUT)
+            sock.connect(path)
+            sock.sendall((json.dumps(req) + "\n").encode("utf-8"))
+        except OSError:
+            return None
+        sock.settimeout(_daemon_timeout() if timeout is None else timeout)
+        try:
+            with sock.makefile("r", encoding="utf-8") as f:
+                line = f.readline()
+        except TimeoutError:
+            raise TimeoutError(f"no answer from daemon on {path}") from None
+        except OSError:
+            return None
+    try:
+        return json.loads(line) if line else None
+    except ValueError:
+        return None
+
+
+def _adds_data(argv):
+    """True for commands that must not run twice (log appends a session, goals add a goal)."""
+    return bool(argv) and (argv[0] == "log" or argv[0] == "goals" and "add" in argv[1:])
+
+
+def _try_daemon(argv):
+    """Forward argv to a running daemon. Returns its exit code, or None to run in-process."""
+    path = os.environ.get(SOCKET_ENV)
+    if not path:
+        path = default_socket_path()
+        if not os.path.exists(path):
+            return None
+    try:
+        resp = _client_request(path, {"argv": argv, "cwd": os.getcwd()})
+    except TimeoutError:
+        if _adds_data(argv):
+            err_exit(f"Daemon on {path} did not answer within {_daemon_timeout():g}s; "
+                     f"not re-running {argv[0]} in-process (the daemon may still complete it)")
+        print(f"Warning: daemon on {path} did not answer within {_daemon_timeout():g}s; running in-process",
+              file=sys.stderr)
+        return None
+    if resp is None or "rc" not in resp:
+        return None
+    sys.stdout.write(resp.get("stdout", ""))
+    sys.stderr.write(resp.get("stderr", ""))
+    return resp["rc"]
+
+
+def cmd_serve(args):
+    if args.stdio:
+        serve_stdio(sys.stdin, sys.stdout)
+    else:
+        serve_socket(args.socket or os.environ.get(SOCKET_ENV) or default_socket_path())
+
+
+# ---- Watch ----
+#
+# `watch` keeps a history dir's derived outputs fresh while a workout is being
+# logged: OUT_DIR/kpis.json, OUT_DIR/<kind>-<orientation>.<ext> charts and,
+# with --outputs analysis, the per-session analysis cache. Changes are picked
+# up with inotify (Linux, via libc) or by polling _history_signature. Events
+# are debounced: an update runs once the dir has been quiet for --debounce
+# seconds, and never later than WATCH_MAX_DELAY debounce intervals after the
+# first event. Sessions come from the warm cache (only changed files are
+# re-parsed). kpis and charts are skipped when the changed files' exercises
+# are unchanged (notes, stored analysis) or all fall before the window the
+# output read last time; files are only rewritten when their content changes.
+
+WATCH_OUTPUTS = ("kpis", "e1rm", "volume", "analysis")
+WATCH_MAX_DELAY = 4  # debounce intervals
+_IN_EVENTS = 0x8 | 0x40 | 0x80 | 0x100 | 0x200  # CLOSE_WRITE | MOVED_FROM | MOVED_TO | CREATE | DELETE
+
+
+def _watched_name(name):
+    """Session files only: day files and the store, not the index or temp files."""
+    return not name.startswith(".") and (name.endswith(".json") or name == gym_store.STORE_FILENAME)
+
+
+class _Inotify:
+    """Minimal inotify watch on one directory through libc (Linux only)."""
+
+    def __init__(self, path):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if self._libc.inotify_add_watch(self.fd, os.fsencode(path), _IN_EVENTS) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+
+    def read(self, timeout):
+        """Names of watched files with events within timeout seconds (empty set on timeout)."""
+        import select
+        import struct
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        names, pos = set(), 0
+        while pos + 16 <= len(data):
+            _, _, _, length = struct.unpack_from("iIII", data, pos)
+            name = data[pos + 16:pos + 16 + length].split(b"\0", 1)[0].decode("utf-8", "replace")
+            pos += 16 + length
+            if _watched_name(name):
+                names.add(name)
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Poller:
+    """Fallback watcher: diff the history signature every `interval` seconds."""
+
+    def __init__(self, path, interval):
+        self.path, self.interval = path, interval
+        self.sig = {name: rest for name, *rest in _history_signature(path)}
+
+    def read(self, timeout):
+        time.sleep(min(timeout, self.interval) if timeout is not None else self.interval)
+        sig = {name: rest for name, *rest in _history_signature(self.path)}
+        changed = {n for n in sig.keys() | self.sig.keys() if sig.get(n) != self.sig.get(n)}
+        self.sig = sig
+        return {n for n in changed if _watched_name(n)}
+
+    def close(self):
+        pass
+
+
+def _open_watcher(path, poll=None):
+    """(watcher, mode): inotify unless polling was asked for or inotify is unavailable."""
+    if poll is None and sys.platform.startswith("linux"):
+        try:
+            return _Inotify(path), "inotify"
+        except (OSError, AttributeError):
+            pass
+    return _Poller(path, poll or 1.0), "polling"
+
+
+def _collect_changes(watcher, debounce, first_timeout=None):
+    """Block for a change, then gather events until quiet for debounce (bounded). Returns names."""
+    names = set()
+    while not names:
+        names = watcher.read(first_timeout)
+        if first_timeout is not None and not names:
+            return names
+    deadline = time.monotonic() + debounce * WATCH_MAX_DELAY
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return names
+        more = watcher.read(min(debounce, remaining))
+        if not more:
+            return names
+        names |= more
+
+
+def _write_if_changed(path, text):
+    """Atomically write text unless the file already holds it. Returns True if written."""
+    path = Path(path)
+    try:
+        if path.read_text() == text:
+            return False
+    except OSError:
+        pass
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+    return True
+
+
+class _WatchState:
+    """What the last update saw: per-output earliest session date read (None = whole
+    history), a digest of each session's exercises and the chart-e1rm lift series."""
+
+    def __init__(self):
+        self.since = {}
+        self.exercises = {}
+        self.wrote_history = False  # the last update saved analyses into the history dir
+        self.series = None  # gym_series.SeriesStore of the chart-e1rm lifts
+        self.series_key = None
+        self.series_pending = set()  # changed dates not yet applied to series
+
+    def update_series(self, sessions, lifts, goals_path):
+        """Bring the lift series up to date by re-reading the sessions of the changed days
+        only (every session on the first update, an undated change or other lifts/goals)."""
+        _numpy()
+        import gym_series
+        key = (tuple(lifts), _digest(load_goals(goals_path)))
+        dates, store = self.series_pending, self.series
+        if store is None or key != self.series_key or None in dates:
+            dates, store = None, gym_series.SeriesStore()
+        changed = sessions if dates is None else [s for s in sessions if s["date"] in dates]
+        points = {}
+        if changed:
+            table = SetTable(changed, build_resolver(goals_path))
+            for lift in lifts:
+                days, values = table.lift_series(lift)
+                points[lift] = ([d.toordinal() for d in days], values)
+        store.replace([] if dates is None else [_date_fields(d)[1] for d in dates], points)
+        # Only once applied: a failed update is retried with the same dates next time
+        self.series, self.series_key, self.series_pending = store, key, set()
+
+    def lift_data(self, lifts, start=None, end=None):
+        """chart-e1rm {lift: (dates, values)} between two day ordinals, as _lift_data."""
+        lift_data = {}
+        for lift in lifts:
+            days, values = self.series.series(lift, start, end)
+            if len(days):
+                lift_data[lift] = ([datetime.fromordinal(int(o)) for o in days], values.tolist())
+        return lift_data
+
+    def exercises_changed(self, sessions, dates):
+        """Refresh digests; True if a changed file added, removed or edited exercises."""
+        by_date = {s["date"]: s for s in sessions}
+        if not self.exercises or None in dates:
+            self.exercises = {d: _digest([s.get("actual"), s.get("planned")]) for d, s in by_date.items()}
+            return True
+        changed = False
+        for d in dates:
+            digest = _digest([by_date[d].get("actual"), by_date[d].get("planned")]) if d in by_date else None
+            changed |= self.exercises.get(d) != digest
+            self.exercises[d] = digest
+        return changed
+
+    def affected(self, name, changed_dates):
+        """True unless every changed session is older than what the output read last time."""
+        if name not in self.since or any(d is None for d in changed_dates):
+            return True
+        since = self.since[name]
+        return since is None or any(d >= since for d in changed_dates)
+
+
+def _watch_update(args, state, changed):
+    """Refresh the affected outputs once. Returns one report dict (see cmd_watch)."""
+    import contextlib
+    import io
+    t0 = time.perf_counter()
+    history_dir, use_index = args.history_dir, not args.no_index
+    dates = {_filename_date(n) for n in changed}
+    report = {"changed": sorted(changed), "outputs": []}
+    outputs = [o.strip() for o in args.outputs.split(",") if o.strip()]
+    sessions = _warm_sessions(history_dir, use_index)
+    goals_path = args.goals_file or default_goals_path(history_dir)
+    exercises_changed = state.exercises_changed(sessions, dates)
+
+    def run(name, path, fn, exercises_only=True):
+        if exercises_only and not exercises_changed or not state.affected(name, dates):
+            report["outputs"].append({"name": name, "path": path, "status": "skipped"})
+            return
+        t = time.perf_counter()
+        out, err = io.StringIO(), io.StringIO()
+        try:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                status, since = fn(out)
+        except SystemExit:
+            msg = err.getvalue().strip()
+            status, since = "error: " + (msg[len("Error: "):] if msg.startswith("Error: ") else msg or "failed"), None
+        except AnalyticsError as e:
+            status, since = f"error: {e}", None
+        state.since[name] = since
+        report["outputs"].append({"name": name, "path": path, "status": status,
+                                  "ms": round((time.perf_counter() - t) * 1000, 1)})
+
+    if "analysis" in outputs:
+        def analysis(out):
+            results = analyze_sessions(sessions, build_resolver(goals_path), load_goals(goals_path))
+            updates = [(s, a) for s, a, changed in results if changed]
+            if updates:
+                _write_analyses(history_dir, updates)
+                state.wrote_history = True
+            return (f"{len(updates)} updated" if updates else "unchanged"), None
+        run("analysis", history_dir, analysis, exercises_only=False)
+
+    if "kpis" in outputs:
+        def kpis(out):
+            windows = _parse_windows(args.window)
+            window = _kpi_window(history_dir, windows, "previous", use_index=use_index)
+            result = kpi_windows(_warm_sessions(history_dir, use_index, **window), windows,
+                                 lifts=args.lifts, goals_file=goals_path)
+            written = _write_if_changed(os.path.join(args.out_dir, "kpis.json"),
+                                        json.dumps(result, indent=2) + "\n")
+            return ("written" if written else "unchanged"), window.get("since")
+        run("kpis", os.path.join(args.out_dir, "kpis.json"), kpis)
+
+    orientation = "horizontal" if args.horizontal else "vertical"
+    shared_table = {}
+    state.series_pending |= dates  # applied when the e1rm chart next renders
+    for kind in (k for k in CHART_KINDS if k in outputs):
+        path = os.path.join(args.out_dir, f"{kind}-{orientation}.{args.format.lstrip('.')}")
+
+        def chart(out, kind=kind, path=path):
+            chart_args = argparse.Namespace(**_chart_args(args, path, orientation))
+            chart_sessions, since = sessions, None
+            if kind == "e1rm" and args.period != "all" and sessions:
+                chart_sessions = _period_sessions(sessions, args.period, _program_path(args))
+                chart_args._period_loaded = True
+                since = chart_sessions[0]["date"] if chart_sessions else None
+            if kind == "e1rm" and chart_sessions:
+                lifts = _chart_lifts(chart_args, goals_path)
+                state.update_series(sessions, lifts, goals_path)
+                chart_args._lift_data = state.lift_data(lifts, date_fields(chart_sessions[0])[1],
+                                                        date_fields(chart_sessions[-1])[1])
+            if kind == "volume":
+                chart_args._table = shared_table.setdefault("volume", SetTable(sessions))
+            CHART_KINDS[kind](chart_sessions, chart_args)
+            return "rendered", since
+        run(kind, path, chart)
+
+    report["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return report
+
+
+def _print_watch_report(report, as_json):
+    if as_json:
+        print(json.dumps(report, ensure_ascii=False), flush=True)
+        return
+    changed = ", ".join(report["changed"]) or "initial"
+    parts = [f"{o['name']} {o['status']}" + (f" ({o['ms']:.0f} ms)" if "ms" in o else "") for o in report["outputs"]]
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {changed}: {'; '.join(parts)} "
+          f"— {report['total_ms'] / 1000:.2f}s", flush=True)
+
+
+def cmd_watch(args):
+    """Re-render outputs whenever session files in the history dir change."""
+    global _WARM
+    history_dir = args.history_dir
+    if not os.path.isdir(history_dir):
+        err_exit(f"Directory not found: {history_dir}")
+    outputs = [o.strip() for o in args.outputs.split(",") if o.strip()]
+    bad = sorted(set(outputs) - set(WATCH_OUTPUTS))
+    if bad or not outputs:
+        err_exit(f"Unknown watch output(s): {', '.join(bad) or '(none)'}; choose from {', '.join(WATCH_OUTPUTS)}")
+    if args.debounce <= 0:
+        err_exit("--debounce must be positive")
+    os.makedirs(args.out_dir, exist_ok=True)
+    if _WARM is None:
+        _WARM = {}
+
+    watcher, mode = _open_watcher(history_dir, args.poll)
+    if not args.json:
+        print(f"Watching {history_dir} ({mode}, debounce {args.debounce:g}s) → {args.out_dir}: "
+              f"{', '.join(outputs)}", flush=True)
+    state = _WatchState()
+    last_sig = None
+    updates = 0
+    try:
+        changed = set()
+        while True:
+            # Skip wake-ups that leave the session files as the last update saw them,
+            # including the echo of our own analysis writes
+            sig = _history_signature(history_dir)
+            if sig != last_sig:
+                state.wrote_history = False
+                _print_watch_report(_watch_update(args, state, changed), args.json)
+                last_sig = _history_signature(history_dir) if state.wrote_history else sig
+                updates += 1
+                if args.max_updates and updates >= args.max_updates:
+                    return
+            changed = _collect_changes(watcher, args.debounce)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+# ---- CLI ----
+#
+# main() forwards to a daemon when $GYM_ANALYTICS_SOCKET (or the default
+# socket) answers, else runs in-process. Only the requested subcommand's parser
+# is built, text commands never import numpy or matplotlib, and
+# --profile-startup prints a per-phase timing breakdown to stderr.
+
+def _add_common(p):
+    p.add_argument("--json", action="store_true", help="JSON output")
+    p.add_argument("--vertical", action="store_true", help="Vertical (portrait) chart")
+    p.add_argument("--horizontal", action="store_true", help="Horizontal (landscape) chart")
+    p.add_argument("--lifts", type=str, default=None, help="Comma-separated lift names")
+    p.add_argument("--period", type=str, default="all",
+                   help="all, current or previous mesocycle, or a program name (from program.json + programs/)")
+    p.add_argument("--program", type=str, default=None,
+                   help="Path to program.json (default: next to the history dir; archive in its programs/)")
+    p.add_argument("--plan", type=str, default=None, help="Path to plan.md for goal lines")
+    p.add_argument("--goals-file", type=str, default=None, dest="goals_file",
+                   help="Path to goals.json")
+    p.add_argument("--no-goals", action="store_true", default=False, dest="no_goals",
+                   help="Disable goal projection lines on chart")
+    p.add_argument("--renderer", type=str, default="matplotlib", choices=CHART_RENDERERS,
+                   help="chart-e1rm backend: matplotlib, or fast (Pillow, fixed layout)")
+    p.add_argument("--resolution", type=str, default="auto", choices=CHART_RESOLUTIONS,
+                   help="chart-e1rm points per lift: every session, weekly best, lttb (shape-preserving "
+                        "downsampling to --max-points) or auto (session, then weekly, then lttb as needed)")
+    p.add_argument("--max-points", type=int, default=None, dest="max_points",
+                   help="chart-e1rm points per lift for --resolution auto/lttb (default: 150)")
+    p.add_argument("--trend", type=float, default=None,
+                   help="Overlay an EMA trend line per lift with this half-life in days (e.g. 28)")
+    p.add_argument("--optimize", action="store_true", default=False,
+                   help="Smaller chart files: palette-quantized PNG, optimized WebP/JPEG (by output extension)")
+    p.add_argument("--quality", type=int, default=None,
+                   help="WebP/JPEG quality 1-100 (default: 80 WebP, 85 JPEG)")
+    p.add_argument("--max-bytes", type=str, default=None, dest="max_bytes",
+                   help="Target chart file size, e.g. 150000 or 200k: steps quality/palette down until it fits")
+    p.add_argument("--cache-dir", type=str, default=None, dest="cache_dir",
+                   help="Reuse chart-e1rm renders from this dir when inputs are unchanged")
+    p.add_argument("--no-index", action="store_true", default=False, dest="no_index",
+                   help="Parse every session file instead of using the session index")
+    p.add_argument("--profile-startup", action="store_true", default=False, dest="profile_startup",
+                   help="Print a per-phase startup timing breakdown to stderr")
+    p.add_argument("--trace", nargs="?", const="tree", default=None, choices=TRACE_FORMATS,
+                   help=f"Print a span tree of load/compute/render/save timings to stderr (also ${TRACE_ENV})")
+    p.add_argument("--trace-out", type=str, default=None, dest="trace_out",
+                   help=f"Write the --trace output to this file instead (also ${TRACE_OUT_ENV})")
+    p.add_argument("--planned", type=str, default=None,
+                   help='JSON object of planned e1RM for today, e.g. \'{"OHP": 62, "RDL": 150}\'.'
+                        ' Shown as hollow markers on today\'s date with dashed line from last actual.')
+
+
+# Subcommand parser setup, registered lazily: main() only configures the
+# subparser for the command being run (all of them for help/usage errors).
+
+def _args_history(p):
+    p.add_argument("history_dir")
+    _add_common(p)
+
+
+def _add_fsync(p):
+    """--fsync for commands that write session, store or goals files."""
+    p.add_argument("--fsync", action="store_true",
+                   help=f"fsync written files and their directory before returning (also ${gym_store.FSYNC_ENV}=1)")
+
+
+def _fsync_arg(args):
+    """gym_store fsync argument: True with --fsync, else None ($GYM_FSYNC decides)."""
+    return True if getattr(args, "fsync", False) else None
+
+
+def _add_db(p, from_db=False):
+    if from_db:
+        p.add_argument("--from-db", action="store_true", dest="from_db",
+                       help="Answer from the SQLite mirror (synced first) instead of loading the sessions")
+    p.add_argument("--db", type=str, default=None, help="SQLite database path (default: <dir>/.gym.sqlite)")
+
+
+def _args_served(p):
+    p.add_argument("history_dir")
+    _add_db(p, from_db=True)
+    _add_common(p)
+
+
+def _args_progress(p):
+    p.add_argument("history_dir")
+    p.add_argument("exercise")
+    _add_db(p, from_db=True)
+    _add_common(p)
+
+
+def _args_compare(p):
+    p.add_argument("history_dir")
+    p.add_argument("date1")
+    p.add_argument("date2")
+    _add_common(p)
+
+
+def _args_chart(p):
+    p.add_argument("history_dir")
+    p.add_argument("output")
+    _add_common(p)
+
+
+def _args_log(p):
+    p.add_argument("history_dir")
+    p.add_argument("source")
+    p.add_argument("--compact", action="store_true",
+                   help=f"Save the day file without indentation (also ${gym_store.COMPACT_ENV}=1)")
+    _add_fsync(p)
+    _add_common(p)
+
+
+def _args_validate(p):
+    p.add_argument("history_dir")
+    p.add_argument("--workers", type=int, default=None,
+                   help=f"Check processes (default: CPU count from {VALIDATE_POOL_MIN} changed files, else in-process)")
+    p.add_argument("--no-cache", action="store_true", dest="no_cache",
+                   help=f"Re-check every file and leave {VALIDATE_FILENAME} alone")
+    p.add_argument("--stream", action="store_true",
+                   help="NDJSON: one line per file as it is checked, then a summary line")
+    _add_common(p)
+
+
+def _args_index(p):
+    p.add_argument("history_dir")
+    p.add_argument("--rebuild", action="store_true", help="Ignore the existing index and re-parse all files")
+    _add_common(p)
+
+
+def _args_analyze(p):
+    p.add_argument("history_dir")
+    p.add_argument("--force", action="store_true", help="Recompute every session, ignoring stored analyses")
+    _add_fsync(p)
+    _add_common(p)
+
+
+def _args_db(p):
+    p.add_argument("db_command", choices=["sync", "info"], help="sync: mirror the history; info: table sizes")
+    p.add_argument("history_dir")
+    p.add_argument("--rebuild", action="store_true", help="Drop the mirrored rows and re-read every file")
+    _add_db(p)
+    _add_common(p)
+
+
+def _args_query(p):
+    import gym_db
+    p.add_argument("history_dir")
+    p.add_argument("report", choices=[*gym_db.REPORTS, "sql"],
+                   help="; ".join(f"{name}: {spec[0]}" for name, spec in gym_db.REPORTS.items())
+                        + "; sql: one read-only SQL statement")
+    p.add_argument("sql", nargs="?", default=None, help="Statement for the sql report")
+    p.add_argument("--exercise", type=str, default=None, help="Exercise name (same matching as progress)")
+    p.add_argument("--muscle-group", type=str, default=None, dest="muscle_group")
+    p.add_argument("--since", type=str, default=None, help="First date, YYYY-MM-DD")
+    p.add_argument("--until", type=str, default=None, help="Last date, YYYY-MM-DD")
+    p.add_argument("--weeks", type=int, default=None, help="Only the last N weeks before the latest session")
+    p.add_argument("--max-rpe", type=float, default=None, dest="max_rpe", help="Sets at or below this RPE")
+    p.add_argument("--min-reps", type=int, default=None, dest="min_reps")
+    p.add_argument("--max-reps", type=int, default=None, dest="max_reps")
+    p.add_argument("--limit", type=int, default=None, help="Row cap (top-sets: 20)")
+    p.add_argument("--no-sync", action="store_true", dest="no_sync", help="Query the database as it is")
+    _add_db(p)
+    _add_common(p)
+
+
+def _args_migrate(p):
+    p.add_argument("history_dir")
+    p.add_argument("--remove", action="store_true", help="Delete day files once they are in the store")
+    _add_fsync(p)
+    _add_common(p)
+
+
+def _args_compact(p):
+    p.add_argument("history_dir")
+    _add_fsync(p)
+    _add_common(p)
+
+
+def _args_kpis(p):
+    p.add_argument("history_dir")
+    p.add_argument("--window", type=str, default="14", help="Comma-separated window lengths in days (default: 14)")
+    p.add_argument("--compare", type=str, default="previous",
+                   help="previous (same-length window before), none, or YYYY-MM-DD:YYYY-MM-DD")
+    p.add_argument("--end", type=str, default=None, help="Last day of the windows (default: latest session)")
+    _add_common(p)
+
+
+def _args_mesocycles(p):
+    p.add_argument("history_dir")
+    _add_common(p)
+
+
+def _args_charts(p):
+    p.add_argument("history_dir")
+    p.add_argument("output_dir")
+    p.add_argument("--kinds", type=str, default=",".join(CHART_KINDS),
+                   help=f"Comma-separated chart kinds (default: {','.join(CHART_KINDS)})")
+    p.add_argument("--orientations", type=str, default="vertical",
+                   help="Comma-separated: vertical,horizontal (default: vertical)")
+    p.add_argument("--format", type=str, default="png", help="Image format / extension (default: png)")
+    p.add_argument("--workers", type=int, default=1,
+                   help="Render processes; 1 renders in-process reusing loaded data (default: 1)")
+    _add_common(p)
+
+
+def _args_batch(p):
+    p.add_argument("--manifest", type=str, default=None,
+                   help="JSON list or one-per-line file of history dirs ({\"history\", \"id\", \"goals_file\"})")
+    p.add_argument("--glob", type=str, default=None, help="Glob of history dirs, e.g. '/srv/*/health/gym/history'")
+    p.add_argument("--sections", type=str, default=",".join(BATCH_SECTIONS),
+                   help=f"Comma-separated JSON sections (default: {','.join(BATCH_SECTIONS)})")
+    p.add_argument("--charts-dir", type=str, default=None, dest="charts_dir",
+                   help="Render <id>-e1rm.png and <id>-volume.png per athlete into this dir")
+    p.add_argument("--workers", type=int, default=None, help="Chart render processes (default: CPU count)")
+    p.add_argument("--out", type=str, default=None, help="Write the combined JSON document here")
+    p.add_argument("--out-dir", type=str, default=None, dest="out_dir", help="Write <id>.json per athlete here")
+    _add_common(p)
+
+
+def _args_serve(p):
+    p.add_argument("--socket", type=str, default=None,
+                   help=f"Unix socket path (default: ${SOCKET_ENV} or {default_socket_path()})")
+    p.add_argument("--stdio", action="store_true", help="Serve JSON-lines on stdin/stdout instead")
+    p.add_argument("--profile-startup", action="store_true", dest="profile_startup", help=argparse.SUPPRESS)
+
+
+def _args_watch(p):
+    p.add_argument("history_dir")
+    p.add_argument("out_dir")
+    p.add_argument("--outputs", type=str, default="kpis,e1rm",
+                   help=f"Comma-separated outputs to keep fresh: {', '.join(WATCH_OUTPUTS)} (default: kpis,e1rm)")
+    p.add_argument("--window", type=str, default="14", help="kpis.json window lengths in days (default: 14)")
+    p.add_argument("--format", type=str, default="png", help="Chart image format / extension (default: png)")
+    p.add_argument("--debounce", type=float, default=0.3,
+                   help=f"Seconds of quiet before updating (updates start at most {WATCH_MAX_DELAY}x this after a change)")
+    p.add_argument("--poll", type=float, default=None, help="Poll every N seconds instead of using inotify")
+    p.add_argument("--max-updates", type=int, default=0, dest="max_updates",
+                   help="Exit after N updates, counting the initial one (default: run until interrupted)")
+    _add_common(p)
+
+
+def _args_goals(p):
+    p.add_argument("goals_command", choices=["list", "add", "current"], help="Goals subcommand")
+    p.add_argument("--goal-json", type=str, default=None, dest="goal_json",
+                   help="JSON string for new goal entry (used with 'add')")
+    _add_fsync(p)
+    _add_common(p)
+
+
+SUBCOMMANDS = {
+    "e1rm": _args_served,
+    "volume": _args_served,
+    "progress": _args_progress,
+    "summary": _args_history,
+    "compare": _args_compare,
+    "chart-e1rm": _args_chart,
+    "chart-volume": _args_chart,
+    "log": _args_log,
+    "validate": _args_validate,
+    "index": _args_index,
+    "analyze": _args_analyze,
+    "db": _args_db,
+    "query": _args_query,
+    "migrate": _args_migrate,
+    "compact": _args_compact,
+    "kpis": _args_kpis,
+    "mesocycles": _args_mesocycles,
+    "charts": _args_charts,
+    "batch": _args_batch,
+    "serve": _args_serve,
+    "watch": _args_watch,
+    "goals": _args_goals,
+}
+
+# Modules that must stay out of the startup path of text commands
+HEAVY_MODULES = ("numpy", "matplotlib", "matplotlib.pyplot", "matplotlib.dates")
+
+
+def _build_parser(command=None):
+    parser = argparse.ArgumentParser(description="Gym analytics CLI")
+    sub = parser.add_subparsers(dest="command")
+    for name, configure in SUBCOMMANDS.items():
+        if command is None or name == command:
+            configure(sub.add_parser(name))
+    return parser
+
+
+def _print_startup_profile(marks):
+    """Per-phase startup timings (ms) to stderr, for --profile-startup."""
+    rows = [("startup cpu before module body", _CPU_AT_IMPORT * 1000),
+            ("imports", (_T_IMPORTED - _T_MODULE) * 1000),
+            ("module body", (marks[0][1] - _T_IMPORTED) * 1000)]
+    for (_, prev), (name, t) in zip(marks, marks[1:]):
+        rows.append((name, (t - prev) * 1000))
+    rows.append(("total since module start", (marks[-1][1] - _T_MODULE) * 1000))
+    print("startup profile (ms):", file=sys.stderr)
+    for name, ms in rows:
+        print(f"  {name:<32} {ms:8.2f}", file=sys.stderr)
+    heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+    print(f"  heavy modules loaded: {', '.join(heavy) or 'none'}", file=sys.stderr)
+
+
+def _trace_argv(argv):
+    """argv for the daemon, carrying $GYM_TRACE / $GYM_TRACE_OUT as flags (it has its own env)."""
+    mode = _trace_mode(None)
+    if mode and not any(a == "--trace" or a.startswith("--trace=") for a in argv):
+        argv = argv + [f"--trace={mode}"]
+        out = os.environ.get(TRACE_OUT_ENV)
+        if out and "--trace-out" not in argv:
+            argv += ["--trace-out", os.path.abspath(out)]
+    return argv
+
+
+# Write settings gym_store reads from the environment: (flag, commands that accept it)
+_STORE_ENV_FLAGS = {
+    gym_store.COMPACT_ENV: ("--compact", ("log",)),
+    gym_store.FSYNC_ENV: ("--fsync", ("log", "analyze", "migrate", "compact", "goals")),
+}
+
+
+def _store_argv(argv):
+    """argv for the daemon, carrying $GYM_COMPACT_JSON / $GYM_FSYNC as flags (the daemon
+    runs requests without its own values of them)."""
+    for name, (flag, commands) in _STORE_ENV_FLAGS.items():
+        if argv[0] in commands and flag not in argv and gym_store.env_flag(name):
+            argv = argv + [flag]
+    return argv
+
+
+def main(argv=None):
+    global _TRACER
+    if argv is None and _WARM is None:
+        argv = sys.argv[1:]
+        if argv and argv[0] not in ("serve", "watch"):
+            rc = _try_daemon(_store_argv(_trace_argv(argv)))
+            if rc is not None:
+                sys.exit(rc)
+
+    marks = [("main", time.perf_counter())]
+    command = argv[0] if argv and argv[0] in SUBCOMMANDS else None
+    parser = _build_parser(command)
+    marks.append(("build parser", time.perf_counter()))
+    args = parser.parse_args(argv)
+    marks.append(("parse args", time.perf_counter()))
+
+    if not args.command:
+        parser.print_help()
+        sys.exit(2)
+
+    trace = _trace_mode(args) if args.command not in ("serve", "watch") else None
+    if trace:
+        t_main = marks[0][1]
+        _TRACER = Tracer(_T_MODULE if _WARM is None else t_main)
+        if _WARM is None:
+            _TRACER.add("startup", _T_MODULE, t_main, imports_ms=round((_T_IMPORTED - _T_MODULE) * 1000, 2))
+        _TRACER.add("parse args", t_main, marks[-1][1])
+    try:
+        with trace_span(args.command):
+            _run_command(args, marks)
+    except AnalyticsError as e:
+        err_exit(str(e))
+    finally:
+        if getattr(args, "profile_startup", False):
+            marks.append(("command", time.perf_counter()))
+            _print_startup_profile(marks)
+        if trace:
+            root, _TRACER = _TRACER.finish(), None
+            _write_trace(root, trace, getattr(args, "trace_out", None) or os.environ.get(TRACE_OUT_ENV))
+
+
+def _session_window(args, history_dir, use_index=True):
+    """Narrowest load_sessions bounds a command needs (empty dict = full history)."""
+    if args.command == "summary":
+        return {"last_n": 1}
+    if args.command == "compare":
+        first, second = sorted((args.date1, args.date2))
+        return {"since": first, "until": second}
+    if args.command == "kpis":
+        return _kpi_window(history_dir, _parse_windows(args.window), _parse_compare(args.compare),
+                           args.end, use_index)
+    if args.command == "chart-e1rm" and getattr(args, "period", "all") != "all":
+        # Periods are anchored on the latest session
+        latest = _warm_sessions(history_dir, use_index, last_n=1)
+        if latest:
+            since, until = _period_range(args.period, _program_path(args, history_dir), date_fields(latest[-1])[1])
+            return {"since": since, **({"until": until} if until else {})}
+    return {}
+
+
+def _run_command(args, marks):
+    if args.command == "log":
+        cmd_log(args)
+        return
+
+    if args.command == "validate":
+        cmd_validate(None, args)
+        return
+
+    if args.command == "index":
+        cmd_index(args)
+        return
+
+    if args.command == "db":
+        cmd_db(args)
+        return
+
+    if args.command == "query":
+        cmd_query(args)
+        return
+
+    if getattr(args, "from_db", False):
+        _run_from_db(args)
+        return
+
+    if args.command == "migrate":
+        cmd_migrate(args)
+        return
+
+    if args.command == "compact":
+        cmd_compact(args)
+        return
+
+    if args.command == "batch":
+        cmd_batch(args)
+        return
+
+    if args.command == "serve":
+        cmd_serve(args)
+        return
+
+    if args.command == "watch":
+        cmd_watch(args)
+        return
+
+    if args.command == "goals":
+        if not args.goals_file:
+            err_exit("--goals-file is required for goals command")
+        cmd_goals(args)
+        return
+
+    history_dir = args.history_dir
+    if not os.path.isdir(history_dir):
+        err_exit(f"Directory not found: {history_dir}")
+
+    use_index = not args.no_index
+    with trace_span("load") as span:
+        window = _session_window(args, history_dir, use_index)
+        sessions = _warm_sessions(history_dir, use_index, **window)
+        if args.command == "chart-e1rm" and window:
+            args._period_loaded = True  # the window is the --period
+        span.set(sessions=len(sessions), **window)
+    marks.append(("load sessions", time.perf_counter()))
+
+    dispatch = {
+        "e1rm": cmd_e1rm,
+        "volume": cmd_volume,
+        "progress": cmd_progress,
+        "summary": cmd_summary,
+        "compare": cmd_compare,
+        "chart-e1rm": cmd_chart_e1rm,
+        "chart-volume": cmd_chart_volume,
+        "charts": cmd_charts,
+        "kpis": cmd_kpis,
+        "mesocycles": cmd_mesocycles,
+        "analyze": cmd_analyze,
+    }
+
+    dispatch[args.command](sessions, args)
+
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""SQLite mirror of a history dir for indexed, ad-hoc queries (`db sync`, `query`).
+
+`history/.gym.sqlite` holds the sessions flattened into indexed tables:
+
+    sessions   one row per date: source file, ISO week, week start, day label, duration, raw JSON
+    exercises  one per entry in "actual": name, canonical id, muscle group, set count, best set
+    sets       one per logged set: weight, reps, RPE, e1RM
+    planned    one per entry in "planned": name, canonical id, muscle group, planned set count
+    goals      one per lift per goals.json entry
+
+Sync is incremental, like the session index: a day file is re-read only when
+its mtime/size changed (or it was written within RACY_NS of the last sync),
+the store only when sessions.ndjson or a day file changed, and rows of deleted
+files are dropped. A day file wins over a store record for the same date.
+The caller supplies parsing and the derived columns (gym_core owns e1RM,
+ISO weeks and exercise matching), so this module only knows SQL.
+
+REPORTS are canned, parameterized queries that run on the indexes; run_sql()
+executes one ad-hoc statement on a read-only connection.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import gym_store
+
+DB_FILENAME = ".gym.sqlite"
+SCHEMA_VERSION = 1
+RACY_NS = 2_000_000_000
+GOALS_KEY = "goals:"
+
+# weight/reps/e1RM columns have no declared type on purpose: ints stay ints and
+# floats stay floats, so results serialize exactly like the JSON they came from.
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE files (name TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER);
+CREATE TABLE sessions (
+    date TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    week TEXT,
+    week_start TEXT,
+    day TEXT,
+    duration_min INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX sessions_source ON sessions(source);
+CREATE INDEX sessions_week ON sessions(week);
+CREATE TABLE exercises (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL REFERENCES sessions(date) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT,
+    name_key TEXT,
+    canonical TEXT,
+    muscle_group TEXT,
+    n_sets INTEGER,
+    best_e1rm,
+    best_weight,
+    best_reps
+);
+CREATE INDEX exercises_date ON exercises(date, position);
+CREATE INDEX exercises_canonical ON exercises(canonical, date);
+CREATE INDEX exercises_muscle_group ON exercises(muscle_group, date);
+CREATE TABLE sets (
+    exercise_id INTEGER NOT NULL REFERENCES exercises(id) ON DELETE CASCADE,
+    set_no INTEGER NOT NULL,
+    weight_kg,
+    reps,
+    rpe,
+    e1rm
+);
+CREATE INDEX sets_exercise ON sets(exercise_id);
+CREATE INDEX sets_e1rm ON sets(e1rm);
+CREATE TABLE planned (
+    date TEXT NOT NULL REFERENCES sessions(date) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT,
+    canonical TEXT,
+    muscle_group TEXT,
+    n_sets INTEGER
+);
+CREATE INDEX planned_date ON planned(date);
+CREATE INDEX planned_muscle_group ON planned(muscle_group, date);
+CREATE TABLE goals (
+    entry INTEGER NOT NULL,
+    date_set TEXT,
+    target_date TEXT,
+    lift TEXT,
+    lift_key TEXT,
+    canonical TEXT,
+    target
+);
+"""
+TABLES = ("meta", "files", "sessions", "exercises", "sets", "planned", "goals")
+
+
+def db_path(history_dir):
+    """Default database path for a history dir."""
+    return Path(history_dir) / DB_FILENAME
+
+
+def connect(path, readonly=False):
+    """Open the database (creating or upgrading the schema unless readonly). Rows are sqlite3.Row."""
+    if readonly:
+        if not Path(path).is_file():
+            raise FileNotFoundError(f"no database at {path} (run `db sync` first)")
+        conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        conn = sqlite3.connect(path)
+        _ensure_schema(conn)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def _ensure_schema(conn):
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    if row is not None and row[0] == str(SCHEMA_VERSION):
+        return
+    with conn:
+        for table in reversed(TABLES):
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.executescript(SCHEMA)
+        conn.execute("INSERT INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+
+
+# ---- Sync ----
+
+def _insert_session(conn, session, source, rows):
+    """Insert one session. rows = (session columns, [(exercise columns, [set columns])], [planned columns])."""
+    cols, exercises, planned = rows
+    conn.execute("DELETE FROM sessions WHERE date = ?", (session["date"],))
+    conn.execute(
+        "INSERT INTO sessions (date, source, week, week_start, day, duration_min, data)"
+        " VALUES (:date, :source, :week, :week_start, :day, :duration_min, :data)",
+        {**cols, "date": session["date"], "source": source,
+         "data": json.dumps(session, ensure_ascii=False, separators=(",", ":"))})
+    for position, (ex, sets) in enumerate(exercises):
+        cur = conn.execute(
+            "INSERT INTO exercises (date, position, name, name_key, canonical, muscle_group, n_sets,"
+            " best_e1rm, best_weight, best_reps) VALUES (:date, :position, :name, :name_key, :canonical,"
+            " :muscle_group, :n_sets, :best_e1rm, :best_weight, :best_reps)",
+            {**ex, "date": session["date"], "position": position})
+        conn.executemany(
+            "INSERT INTO sets (exercise_id, set_no, weight_kg, reps, rpe, e1rm)"
+            " VALUES (:exercise_id, :set_no, :weight_kg, :reps, :rpe, :e1rm)",
+            [{**st, "exercise_id": cur.lastrowid, "set_no": i + 1} for i, st in enumerate(sets)])
+    conn.executemany(
+        "INSERT INTO planned (date, position, name, canonical, muscle_group, n_sets)"
+        " VALUES (:date, :position, :name, :canonical, :muscle_group, :n_sets)",
+        [{**p, "date": session["date"], "position": i} for i, p in enumerate(planned)])
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def sync(conn, history_dir, parse_file, session_rows, goals_path=None, goal_rows=None, rebuild=False):
+    """Bring the database in line with history_dir. One transaction.
+
+    parse_file(path) -> (session, error); session_rows(session) -> the rows
+    _insert_session takes; goal_rows(entries) -> goal column dicts.
+    Returns stats: files, reparsed, removed, store_sessions, goals, sessions,
+    and errors as a list of (location, message).
+    """
+    p = Path(history_dir)
+    stats = {"files": 0, "reparsed": 0, "removed": 0, "store_sessions": 0, "goals": None,
+             "sessions": 0, "errors": []}
+    with conn:
+        if rebuild:
+            for table in ("goals", "planned", "sets", "exercises", "sessions", "files"):
+                conn.execute(f"DELETE FROM {table}")
+        row = conn.execute("SELECT value FROM meta WHERE key = 'synced_ns'").fetchone()
+        synced_ns = int(row[0]) if row and not rebuild else 0
+        known = {r[0]: (r[1], r[2]) for r in conn.execute("SELECT name, mtime_ns, size FROM files")}
+
+        def fresh(name, stat):
+            return known.get(name) == stat and stat[0] < synced_ns - RACY_NS
+
+        with os.scandir(p) as it:
+            on_disk = {e.name: (st.st_mtime_ns, st.st_size)
+                       for e in it if e.name.endswith(".json") for st in (e.stat(),)}
+        stats["files"] = len(on_disk)
+
+        day_keys = [n for n in known if n != gym_store.STORE_FILENAME and not n.startswith(GOALS_KEY)]
+        for name in day_keys:
+            if name not in on_disk:
+                conn.execute("DELETE FROM sessions WHERE source = ?", (name,))
+                conn.execute("DELETE FROM files WHERE name = ?", (name,))
+                stats["removed"] += 1
+        changed = [n for n in sorted(on_disk) if not fresh(n, on_disk[n])]
+        for name in changed:
+            conn.execute("DELETE FROM sessions WHERE source = ?", (name,))
+            session, error = parse_file(p / name)
+            stats["reparsed"] += 1
+            if error is not None:
+                stats["errors"].append((name, error))
+            else:
+                _insert_session(conn, session, name, session_rows(session))
+            conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (name, *on_disk[name]))
+
+        store = _stat(gym_store.store_path(p))
+        store_known = gym_store.STORE_FILENAME in known
+        if store is None:
+            if store_known:
+                conn.execute("DELETE FROM sessions WHERE source = ?", (gym_store.STORE_FILENAME,))
+                conn.execute("DELETE FROM files WHERE name = ?", (gym_store.STORE_FILENAME,))
+        elif changed or stats["removed"] or not fresh(gym_store.STORE_FILENAME, store):
+            # A changed day file can shadow or unshadow store dates, so re-merge the store too
+            stats["store_sessions"] = _sync_store(conn, p, session_rows, stats["errors"])
+            conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (gym_store.STORE_FILENAME, *store))
+
+        if goals_path is not None and goal_rows is not None:
+            key = GOALS_KEY + str(Path(goals_path).resolve())
+            goals = _stat(goals_path)
+            if goals is None or not fresh(key, goals):
+                conn.execute("DELETE FROM goals")
+                conn.execute(f"DELETE FROM files WHERE name LIKE '{GOALS_KEY}%'")
+                entries = []
+                if goals is not None:
+                    try:
+                        entries = json.loads(Path(goals_path).read_text())
+                    except (OSError, ValueError) as e:
+                        stats["errors"].append((str(goals_path), str(e)))
+                    conn.execute("INSERT INTO files VALUES (?, ?, ?)", (key, *goals))
+                rows = goal_rows(entries if isinstance(entries, list) else [])
+                conn.executemany(
+                    "INSERT INTO goals (entry, date_set, target_date, lift, lift_key, canonical, target)"
+                    " VALUES (:entry, :date_set, :target_date, :lift, :lift_key, :canonical, :target)", rows)
+                stats["goals"] = len(rows)
+
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('synced_ns', ?)", (str(time.time_ns()),))
+        stats["sessions"] = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    return stats
+
+
+def _sync_store(conn, history_dir, session_rows, errors):
+    """Re-merge store records: replace only dates whose record changed. Returns store sessions written."""
+    existing = {r[0]: (r[1], r[2]) for r in conn.execute("SELECT date, source, data FROM sessions")}
+    stored, store_errors = gym_store.read_sessions(history_dir)
+    errors.extend(store_errors)
+    live, written = set(), 0
+    for session in stored:
+        date = session["date"]
+        source, data = existing.get(date, (None, None))
+        if source not in (None, gym_store.STORE_FILENAME):
+            continue  # shadowed by a day file
+        live.add(date)
+        if data != json.dumps(session, ensure_ascii=False, separators=(",", ":")):
+            _insert_session(conn, session, gym_store.STORE_FILENAME, session_rows(session))
+            written += 1
+    for date, (source, _) in existing.items():
+        if source == gym_store.STORE_FILENAME and date not in live:
+            conn.execute("DELETE FROM sessions WHERE date = ?", (date,))
+    return written
+
+
+def table_counts(conn):
+    """{table: rows} for the data tables."""
+    return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+            for t in ("sessions", "exercises", "sets", "planned", "goals")}
+
+
+# ---- Queries ----
+#
+# Filters shared by the reports (None = unset):
+#   since, until  inclusive YYYY-MM-DD bounds on the session date
+#   weeks         only the last N weeks, counted back from the latest session
+#   exercise      name to match (canonical id, or substring either way of the
+#                 lowercased name) — pass exercise_key and canonical with it
+#   muscle_group  exact muscle group
+#   max_rpe, min_reps, max_reps   set-level bounds (sets without RPE never match max_rpe)
+#   limit         row cap
+
+_EXERCISE_MATCH = ("({e}.canonical = :canonical OR instr({e}.name_key, :exercise_key) > 0"
+                   " OR instr(:exercise_key, {e}.name_key) > 0)")
+
+
+def _where(filters, e="e", date="s.date"):
+    clauses = []
+    if filters.get("since"):
+        clauses.append(f"{date} >= :since")
+    if filters.get("until"):
+        clauses.append(f"{date} <= :until")
+    if filters.get("weeks"):
+        clauses.append(f"{date} > date((SELECT MAX(date) FROM sessions), :weeks_back)")
+    if filters.get("exercise"):
+        clauses.append(_EXERCISE_MATCH.format(e=e))
+    if filters.get("muscle_group"):
+        clauses.append(f"{e}.muscle_group = :muscle_group")
+    if filters.get("max_rpe") is not None:
+        clauses.append("st.rpe <= :max_rpe")
+    if filters.get("min_reps") is not None:
+        clauses.append("st.reps >= :min_reps")
+    if filters.get("max_reps") is not None:
+        clauses.append("st.reps <= :max_reps")
+    return " AND ".join(clauses) or "1"
+
+
+_SET_ROWS = """
+    FROM sets st JOIN exercises e ON e.id = st.exercise_id JOIN sessions s ON s.date = e.date
+    WHERE st.e1rm > 0 AND {where}"""
+
+_DATES = ("since", "until", "weeks")
+_SETS = ("exercise", "muscle_group", "max_rpe", "min_reps", "max_reps")
+
+# name -> (description, accepted filters, required filters, SQL builder)
+REPORTS = {
+    "top-sets": (
+        "Heaviest sets by e1RM",
+        _DATES + _SETS + ("limit",), (),
+        lambda f: "SELECT s.date, e.name AS exercise, st.weight_kg, st.reps, st.rpe, ROUND(st.e1rm, 1) AS e1rm"
+                  + _SET_ROWS.format(where=_where(f)) + " ORDER BY st.e1rm DESC, s.date LIMIT :limit"),
+    "best-sets": (
+        "Best set per exercise by e1RM",
+        _DATES + _SETS + ("limit",), (),
+        lambda f: "SELECT exercise, date, weight_kg, reps, rpe, ROUND(e1rm, 1) AS e1rm FROM ("
+                  " SELECT e.canonical, e.name AS exercise, s.date, st.weight_kg, st.reps, st.rpe, st.e1rm,"
+                  " ROW_NUMBER() OVER (PARTITION BY e.canonical ORDER BY st.e1rm DESC, s.date) AS rank"
+                  + _SET_ROWS.format(where=_where(f)) + ") WHERE rank = 1 ORDER BY e1rm DESC LIMIT :limit"),
+    "e1rm-history": (
+        "Best e1RM per session for one exercise",
+        _DATES + ("exercise",), ("exercise",),
+        lambda f: "SELECT e.date, e.name AS exercise, ROUND(MAX(e.best_e1rm), 1) AS e1rm, SUM(e.n_sets) AS sets"
+                  " FROM exercises e WHERE e.best_e1rm > 0 AND " + _where(f, date="e.date")
+                  + " GROUP BY e.date ORDER BY e.date"),
+    "weekly-sets": (
+        "Hard sets per ISO week and muscle group vs planned sets",
+        _DATES + ("muscle_group",), (),
+        lambda f: "SELECT week, week_start, muscle_group, SUM(done) AS sets, SUM(plan) AS planned FROM ("
+                  " SELECT s.week, s.week_start, e.muscle_group, e.n_sets AS done, 0 AS plan"
+                  " FROM exercises e JOIN sessions s ON s.date = e.date WHERE " + _where(f) +
+                  " UNION ALL SELECT s.week, s.week_start, p.muscle_group, 0, p.n_sets"
+                  " FROM planned p JOIN sessions s ON s.date = p.date WHERE " + _where(f, e="p") +
+                  ") WHERE week IS NOT NULL GROUP BY week, muscle_group ORDER BY week, muscle_group"),
+    "exercises": (
+        "Every exercise: sessions, sets, last date, best e1RM",
+        _DATES + ("muscle_group", "limit"), (),
+        lambda f: "SELECT e.name AS exercise, e.muscle_group, COUNT(*) AS sessions, SUM(e.n_sets) AS sets,"
+                  " MAX(e.date) AS last, ROUND(MAX(e.best_e1rm), 1) AS best_e1rm"
+                  " FROM exercises e WHERE " + _where(f, date="e.date") +
+                  " GROUP BY e.name ORDER BY sessions DESC, exercise LIMIT :limit"),
+    "goals": (
+        "goals.json targets with the best e1RM logged since each goal was set",
+        (), (),
+        lambda f: "SELECT entry, date_set, target_date, lift, target, ROUND(best, 1) AS best,"
+                  " ROUND(target - best, 1) AS remaining FROM ("
+                  " SELECT g.rowid AS rid, g.*, (SELECT MAX(e.best_e1rm) FROM exercises e"
+                  " WHERE (e.canonical = g.canonical OR instr(e.name_key, g.lift_key) > 0"
+                  " OR instr(g.lift_key, e.name_key) > 0)"
+                  " AND (g.date_set IS NULL OR e.date >= g.date_set)) AS best FROM goals g"
+                  ") ORDER BY entry, rid"),
+}
+
+
+DEFAULT_LIMITS = {"top-sets": 20}
+
+
+def query(conn, report, **filters):
+    """Run a canned report. Returns (columns, rows as tuples).
+
+    Raises ValueError for an unknown report, a filter it does not take or a missing required one.
+    """
+    if report not in REPORTS:
+        raise ValueError(f"unknown report {report!r} (use {', '.join(REPORTS)})")
+    _, accepted, required, build = REPORTS[report]
+    given = {k for k, v in filters.items() if v is not None and k not in ("canonical", "exercise_key")}
+    extra = sorted(given - set(accepted))
+    if extra:
+        raise ValueError(f"{report} does not take {', '.join('--' + k.replace('_', '-') for k in extra)}")
+    missing = [k for k in required if k not in given]
+    if missing:
+        raise ValueError(f"{report} needs {', '.join('--' + k.replace('_', '-') for k in missing)}")
+    params = dict(filters)
+    if params.get("limit") is None:
+        params["limit"] = DEFAULT_LIMITS.get(report, -1)  # -1: no limit
+    if params.get("weeks"):
+        params["weeks_back"] = f"-{int(params['weeks']) * 7} days"
+    cur = conn.execute(build(filters), params)
+    return [c[0] for c in cur.description], [tuple(r) for r in cur]
+
+
+def run_sql(path, sql, params=()):
+    """Run one ad-hoc statement on a read-only connection. Returns (columns, rows as tuples)."""
+    conn = connect(path, readonly=True)
+    try:
+        cur = conn.execute(sql, params)
+        return [c[0] for c in cur.description or ()], [tuple(r) for r in cur]
+    finally:
+        conn.close()
+
+
+# ---- Command backends (same results as the SetTable versions in gym_core) ----
+
+def latest_e1rm(conn):
+    """{name: {"e1rm", "date"}} from the latest session with a weighted set, ordered by first appearance."""
+    result = {}
+    for name, best, date in conn.execute(
+            "SELECT name, best_e1rm, date FROM exercises WHERE best_e1rm > 0 ORDER BY date, position"):
+        result[name] = {"e1rm": round(best, 2), "date": date}
+    return result
+
+
+def weekly_volume(conn):
+    """Hard sets per ISO week and muscle group: [{"week", "week_start", <mg>: sets, ...}]."""
+    weeks = {}
+    for week, start in conn.execute(
+            "SELECT week, MIN(week_start) FROM sessions WHERE week IS NOT NULL GROUP BY week ORDER BY week"):
+        weeks[week] = {"week": week, "week_start": start}
+    for week, mg, n in conn.execute(
+            "SELECT s.week, e.muscle_group, SUM(e.n_sets) FROM exercises e JOIN sessions s ON s.date = e.date"
+            " WHERE s.week IS NOT NULL GROUP BY s.week, e.muscle_group"
+            " ORDER BY s.week, MIN(e.date || printf('%06d', e.position))"):
+        weeks[week][mg] = n
+    return list(weeks.values())
+
+
+def exercise_names(conn):
+    """Distinct logged exercise names."""
+    return [r[0] for r in conn.execute("SELECT DISTINCT name FROM exercises")]
+
+
+def progress_entries(conn, names):
+    """Per-session progress rows for the given exercise names, in date order."""
+    names = list(names)
+    if not names:
+        return []
+    marks = ",".join("?" * len(names))
+    return [{"date": date, "exercise": name, "e1rm": round(best, 2), "best_weight": weight,
+             "best_reps": reps, "num_sets": n}
+            for date, name, best, weight, reps, n in conn.execute(
+                "SELECT date, name, best_e1rm, best_weight, best_reps, n_sets FROM exercises"
+                f" WHERE name IN ({marks}) ORDER BY date, position", names)]
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Compact chart encoding for messaging delivery (`--optimize`, `--quality`, `--max-bytes`).
+
+The dashboards are mostly flat dark background with a handful of line colours,
+so they compress far better than a default 150-dpi truecolour PNG:
+
+    PNG   palette-quantized (FASTOCTREE, no dither) + zlib level 9
+    WEBP  lossy, quality 80 by default (method 6 with --optimize)
+    JPEG  quality 85 by default, optimized Huffman tables
+
+With max_bytes the encoder walks down a ladder until the file fits: palette
+sizes for PNG, a binary search over quality (steps of QUALITY_STEP) for
+WEBP/JPEG, keeping the best result that fits. If nothing fits, the smallest
+attempt is written and the result says so.
+
+save() returns {"format", "bytes", "quality", "colors", "attempts", "fits",
+"encode_ms"} for the caller's report.
+"""
+
+import io
+import os
+import time
+
+from PIL import Image
+
+DPI = 150
+
+FORMATS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG", ".webp": "WEBP"}
+DEFAULT_QUALITY = {"JPEG": 85, "WEBP": 80}
+QUALITY_MIN = 20
+QUALITY_STEP = 5
+PALETTE_LADDER = (256, 128, 64, 32, 16)
+
+
+def parse_size(text):
+    """'150000', '150k', '1.5M' -> bytes (1k = 1024)."""
+    s = str(text).strip().lower().rstrip("b")
+    scale = {"k": 1024, "m": 1024 * 1024}.get(s[-1:], 1)
+    if scale != 1:
+        s = s[:-1]
+    try:
+        n = int(float(s) * scale)
+    except ValueError:
+        raise ValueError(f"invalid size: {text!r}") from None
+    if n <= 0:
+        raise ValueError(f"size must be positive: {text!r}")
+    return n
+
+
+def format_size(n):
+    return f"{n / 1024:.1f} KB" if n < 1024 * 1024 else f"{n / (1024 * 1024):.2f} MB"
+
+
+def image_format(path):
+    fmt = FORMATS.get(os.path.splitext(str(path))[1].lower())
+    if fmt is None:
+        raise ValueError(f"unsupported chart format for --optimize/--quality/--max-bytes: {path}"
+                         f" (use {', '.join(sorted(FORMATS))})")
+    return fmt
+
+
+def from_figure(fig, **savefig_kwargs):
+    """Rasterize a matplotlib figure into a Pillow image (fast PNG round-trip, keeps bbox_inches)."""
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", pil_kwargs={"compress_level": 0}, **savefig_kwargs)
+    buf.seek(0)
+    image = Image.open(buf)
+    image.load()
+    return image
+
+
+def _encode(image, fmt, quality=None, colors=None, optimize=False):
+    buf = io.BytesIO()
+    if fmt == "PNG":
+        if colors:
+            image = image.quantize(colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        image.save(buf, "PNG", dpi=(DPI, DPI), compress_level=9)
+    elif fmt == "WEBP":
+        image.save(buf, "WEBP", quality=quality, method=6 if optimize else 4)
+    else:
+        image.save(buf, "JPEG", quality=quality, optimize=optimize, dpi=(DPI, DPI))
+    return buf.getvalue()
+
+
+def _fit_quality(image, fmt, top, max_bytes, optimize, attempts):
+    """Highest quality on the QUALITY_STEP grid in [QUALITY_MIN, top] whose encoding fits."""
+    data = _encode(image, fmt, quality=top, optimize=optimize)
+    attempts.append((top, data))
+    if len(data) <= max_bytes:
+        return top, data
+    grid = list(range(QUALITY_MIN, top, QUALITY_STEP))
+    best = None
+    lo, hi = 0, len(grid) - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        data = _encode(image, fmt, quality=grid[mid], optimize=optimize)
+        attempts.append((grid[mid], data))
+        if len(data) <= max_bytes:
+            best = (grid[mid], data)
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return best or min(attempts, key=lambda a: len(a[1]))
+
+
+def encode(image, fmt, optimize=False, quality=None, max_bytes=None):
+    """Encode image as fmt ("PNG" | "WEBP" | "JPEG"). Returns (bytes, info) — see module docstring."""
+    t0 = time.perf_counter()
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")  # charts are opaque; drop alpha before quantizing / JPEG
+    attempts = []
+    q = colors = None
+    if fmt == "PNG":
+        # None = truecolour; with a byte budget, fall through to smaller palettes
+        if max_bytes:
+            ladder = list(PALETTE_LADDER) if optimize else [None, *PALETTE_LADDER]
+        else:
+            ladder = [PALETTE_LADDER[0] if optimize else None]
+        for colors in ladder:
+            data = _encode(image, fmt, colors=colors)
+            attempts.append((colors, data))
+            if max_bytes is None or len(data) <= max_bytes:
+                break
+        else:
+            colors, data = min(attempts, key=lambda a: len(a[1]))
+    else:
+        top = max(1, min(100, quality or DEFAULT_QUALITY[fmt]))
+        if max_bytes:
+            q, data = _fit_quality(image, fmt, top, max_bytes, optimize, attempts)
+        else:
+            q, data = top, _encode(image, fmt, quality=top, optimize=optimize)
+            attempts.append((q, data))
+    return data, {
+        "format": fmt.lower(), "bytes": len(data), "quality": q, "colors": colors,
+        "attempts": len(attempts), "fits": max_bytes is None or len(data) <= max_bytes,
+        "encode_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+def save(image, path, optimize=False, quality=None, max_bytes=None):
+    """Encode image for path's extension and write it. Returns the encode info dict."""
+    data, info = encode(image, image_format(path), optimize=optimize, quality=quality, max_bytes=max_bytes)
+    with open(path, "wb") as f:
+        f.write(data)
+    return info
+
+
+def describe(info, max_bytes=None):
+    """One-line summary, e.g. 'webp 84.2 KB, quality 75, 3 tries, encoded in 412 ms'."""
+    parts = [f"{info['format']} {format_size(info['bytes'])}"]
+    if info["quality"] is not None:
+        parts.append(f"quality {info['quality']}")
+    if info["colors"] is not None:
+        parts.append(f"{info['colors']} colors")
+    if info["attempts"] > 1:
+        parts.append(f"{info['attempts']} tries")
+    parts.append(f"encoded in {info['encode_ms']:.0f} ms")
+    if not info["fits"] and max_bytes:
+        parts.append(f"over --max-bytes {format_size(max_bytes)}")
+    return ", ".join(parts)
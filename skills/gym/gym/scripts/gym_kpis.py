@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Rolling-window training KPIs over a session history.
+
+RollingKpis is built once from per-session day ordinals, per-session hard-set
+counts and per-lift e1RM series. After that, any inclusive day range is
+answered without rescanning the history:
+
+    session count, hard sets   per-day prefix sums, O(1)
+    best e1RM per lift         bisect + sparse max table, O(log n)
+
+The windows match gym_core._compute_kpis: adherence is measured against
+SESSIONS_PER_WEEK sessions per 7 days, and avg_e1rm is the mean of per-lift
+bests rounded to 0.1 kg.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import accumulate
+
+SESSIONS_PER_WEEK = 3
+
+
+class SparseMax:
+    """Range maximum over a fixed sequence: O(n log n) build, O(1) query."""
+
+    def __init__(self, values):
+        self.levels = [list(values)]
+        span = 1
+        while 2 * span <= len(values):
+            prev = self.levels[-1]
+            self.levels.append([max(prev[i], prev[i + span]) for i in range(len(prev) - span)])
+            span *= 2
+
+    def query(self, lo, hi):
+        """Max of values[lo:hi], or None for an empty range."""
+        if lo >= hi:
+            return None
+        k = (hi - lo).bit_length() - 1
+        row = self.levels[k]
+        return max(row[lo], row[hi - (1 << k)])
+
+
+class RollingKpis:
+    """KPI queries over inclusive day-ordinal ranges.
+
+    session_days/session_sets are aligned per session (any order);
+    lift_series is {lift: (day_ordinals, e1rm_values)}.
+    """
+
+    def __init__(self, session_days, session_sets, lift_series=None):
+        pairs = sorted(zip(session_days, session_sets))
+        self.first = pairs[0][0] if pairs else 0
+        self.last = pairs[-1][0] if pairs else None
+        span = self.last - self.first + 1 if pairs else 0
+        day_sessions, day_sets = [0] * span, [0] * span
+        for day, sets in pairs:
+            day_sessions[day - self.first] += 1
+            day_sets[day - self.first] += sets
+        self._sessions = [0, *accumulate(day_sessions)]
+        self._sets = [0, *accumulate(day_sets)]
+
+        self.lifts = {}
+        for lift, (days, values) in (lift_series or {}).items():
+            points = sorted(zip(days, values))
+            self.lifts[lift] = ([d for d, _ in points], SparseMax([v for _, v in points]))
+
+    def _range_sum(self, prefix, start, end):
+        n = len(prefix) - 1
+        lo = min(max(start - self.first, 0), n)
+        hi = min(max(end - self.first + 1, 0), n)
+        return prefix[hi] - prefix[lo] if hi > lo else 0
+
+    def session_count(self, start, end):
+        return self._range_sum(self._sessions, start, end)
+
+    def hard_sets(self, start, end):
+        return self._range_sum(self._sets, start, end)
+
+    def best(self, lift, start, end):
+        """Best e1RM of one lift within [start, end], or None."""
+        days, table = self.lifts[lift]
+        return table.query(bisect_left(days, start), bisect_right(days, end))
+
+    def window(self, start, end):
+        """KPIs for the inclusive day range [start, end]."""
+        days = end - start + 1
+        count = self.session_count(start, end)
+        bests = {lift: self.best(lift, start, end) for lift in self.lifts}
+        present = [v for v in bests.values() if v is not None]
+        return {
+            "start": date.fromordinal(start).isoformat(),
+            "end": date.fromordinal(end).isoformat(),
+            "days": days,
+            "sessions": count,
+            "adherence_pct": min(100, round(count / (days / 7 * SESSIONS_PER_WEEK) * 100)),
+            "hard_sets": self.hard_sets(start, end),
+            "avg_e1rm": round(sum(present) / len(present), 1) if present else 0,
+            "lifts": bests,
+        }
+
+    def compare(self, current, previous):
+        """Two windows ((start, end) each) and the change between them."""
+        cur, prev = self.window(*current), self.window(*previous)
+        has_prev = any(v is not None for v in prev["lifts"].values())
+        return {
+            "current": cur,
+            "previous": prev,
+            "change": {
+                "sessions": cur["sessions"] - prev["sessions"],
+                "hard_sets": cur["hard_sets"] - prev["hard_sets"],
+                "avg_e1rm": round(cur["avg_e1rm"] - prev["avg_e1rm"], 1) if has_prev else 0,
+            },
+        }
+
+    def trailing(self, days, end=None):
+        """(start, end) of the `days`-long window ending on `end` (default: latest session day)."""
+        end = self.last if end is None else end
+        return end - days + 1, end
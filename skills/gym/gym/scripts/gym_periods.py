@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Mesocycle periods from program.json and archived programs.
+
+Each program document (SKILL.md "Program Format") gives one mesocycle:
+`start_date`, `end_date`, `deload_week` (1-based week of the deload, or
+absent) and `days` (its A/B/C rotation, i.e. planned sessions per week).
+Past programs are kept as `programs/*.json` next to program.json.
+
+PeriodIndex sorts the mesocycles into disjoint day-ordinal intervals (a
+program that starts before the previous one ends cuts it short) and answers
+`--period` names by bisect:
+
+    all        no bounds
+    current    the mesocycle containing the day (the newest one stays open
+               past its end_date until a new program starts)
+    previous   the mesocycle before that
+    <name>     a program's name, mesocycle label or file stem
+
+report() computes per-mesocycle aggregates from a gym_kpis.RollingKpis built
+once over the whole history, so every mesocycle is one O(log n) range query.
+"""
+
+import json
+from bisect import bisect_right
+from datetime import date, datetime
+from pathlib import Path
+
+SESSIONS_PER_WEEK = 3  # without a `days` rotation, as in gym_kpis
+
+
+def _ordinal(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def program_mesocycle(program, source=None):
+    """One program document as a mesocycle dict, or None without valid start/end dates."""
+    if not isinstance(program, dict):
+        return None
+    start, end = _ordinal(program.get("start_date")), _ordinal(program.get("end_date"))
+    if start is None or end is None or end < start:
+        return None
+    deload = program.get("deload_week")
+    days = program.get("days")
+    label = program.get("mesocycle")
+    return {
+        "name": str(program.get("name") or (f"Mesocycle {label}" if label is not None else program["start_date"])),
+        "mesocycle": label,
+        "start": program["start_date"],
+        "end": program["end_date"],
+        "deload_week": deload if isinstance(deload, int) and not isinstance(deload, bool) and deload > 0 else None,
+        "sessions_per_week": len(days) if isinstance(days, dict) and days else SESSIONS_PER_WEEK,
+        "source": str(source) if source is not None else None,
+    }
+
+
+def load_programs(program_path, archive_dir=None):
+    """Mesocycles of archive_dir/*.json and program_path. Returns (mesocycles, warnings).
+
+    Missing files are not an error; unreadable or undated programs are
+    skipped with a warning.
+    """
+    paths = sorted(Path(archive_dir).glob("*.json")) if archive_dir and Path(archive_dir).is_dir() else []
+    if program_path and Path(program_path).is_file():
+        paths.append(Path(program_path))
+    mesocycles, warnings = [], []
+    for p in paths:
+        try:
+            program = json.loads(p.read_text())
+        except (OSError, ValueError) as e:
+            warnings.append(f"{p}: {e}")
+            continue
+        meso = program_mesocycle(program, p)
+        if meso is None:
+            warnings.append(f"{p}: no valid start_date/end_date")
+            continue
+        mesocycles.append(meso)
+    return mesocycles, warnings
+
+
+class PeriodIndex:
+    """Disjoint mesocycle intervals sorted by start, searchable by day ordinal."""
+
+    def __init__(self, mesocycles):
+        # Same start date: the later one (program.json comes after the archive) wins
+        by_start = {}
+        for m in mesocycles:
+            by_start[_ordinal(m["start"])] = m
+        starts = sorted(by_start)
+        ends = [_ordinal(by_start[s]["end"]) for s in starts]
+        for i in range(len(starts) - 1):
+            ends[i] = min(ends[i], starts[i + 1] - 1)
+        self.mesocycles = [by_start[s] for s in starts]
+        self.starts, self.ends = starts, ends
+
+    def __len__(self):
+        return len(self.mesocycles)
+
+    def _locate(self, day):
+        """(index of the mesocycle containing day or None, index of the last one starting on/before it)."""
+        i = bisect_right(self.starts, day) - 1
+        if i >= 0 and (day <= self.ends[i] or i == len(self.starts) - 1):
+            return i, i
+        return None, i
+
+    def find(self, day):
+        """Mesocycle containing a day ordinal, or None."""
+        i, _ = self._locate(day)
+        return None if i is None else self.mesocycles[i]
+
+    def bounds(self, i, day=None):
+        """(start, end) ordinals of mesocycle i; the newest one reaches at least to day."""
+        end = self.ends[i]
+        if day is not None and i == len(self.starts) - 1:
+            end = max(end, day)
+        return self.starts[i], end
+
+    def names(self):
+        return [m["name"] for m in self.mesocycles]
+
+    def lookup(self, name):
+        """Index of the mesocycle with this name, mesocycle label or file stem (case-insensitive), or None."""
+        key = str(name).strip().lower()
+        for i in range(len(self.mesocycles) - 1, -1, -1):
+            m = self.mesocycles[i]
+            labels = {m["name"], str(m["mesocycle"]) if m["mesocycle"] is not None else None,
+                      Path(m["source"]).stem if m["source"] else None}
+            if key in {l.lower() for l in labels if l}:
+                return i
+        return None
+
+    def resolve(self, period, day):
+        """Index of the mesocycle a --period names, as seen from day; None for "all" or no match.
+
+        "current" is None when day falls outside every mesocycle; "previous" when
+        there is nothing before it.
+        """
+        if period == "all":
+            return None
+        current, before = self._locate(day)
+        if period == "current":
+            return current
+        if period == "previous":
+            i = current - 1 if current is not None else before
+            return i if i >= 0 else None
+        return self.lookup(period)
+
+
+def _adherence(sessions, days, per_week):
+    return min(100, round(sessions / (days / 7 * per_week) * 100)) if days > 0 else 0
+
+
+def report(index, kpis, as_of, selected=None):
+    """Per-mesocycle aggregates as of a day ordinal (stats stop at as_of).
+
+    kpis is a gym_kpis.RollingKpis; selected limits the report to these
+    mesocycle indexes. Each entry is the mesocycle dict plus sessions,
+    adherence_pct (against its own sessions_per_week), hard_sets, avg_e1rm,
+    per-lift bests and, with a deload_week, the deload week's sessions and sets.
+    """
+    rows = []
+    for i in (range(len(index)) if selected is None else selected):
+        meso = index.mesocycles[i]
+        start, end = index.bounds(i, as_of)
+        last = min(end, as_of)
+        # start/end are the effective bounds (overlaps cut, the newest stays open); end_date as planned
+        row = dict(meso, start=date.fromordinal(start).isoformat(), end=date.fromordinal(end).isoformat(),
+                   end_date=meso["end"], complete=end <= as_of)
+        if last < start:
+            row.update(days=0, sessions=0, adherence_pct=0, hard_sets=0, avg_e1rm=0,
+                       lifts={lift: None for lift in kpis.lifts})
+        else:
+            stats = kpis.window(start, last)
+            row.update(days=stats["days"], sessions=stats["sessions"],
+                       adherence_pct=_adherence(stats["sessions"], stats["days"], meso["sessions_per_week"]),
+                       hard_sets=stats["hard_sets"], avg_e1rm=stats["avg_e1rm"], lifts=stats["lifts"])
+        if meso["deload_week"]:
+            d0 = start + (meso["deload_week"] - 1) * 7
+            d1 = min(d0 + 6, end)
+            row["deload"] = {"start": date.fromordinal(d0).isoformat(), "end": date.fromordinal(d1).isoformat(),
+                             "sessions": kpis.session_count(d0, d1) if d0 <= d1 else 0,
+                             "hard_sets": kpis.hard_sets(d0, d1) if d0 <= d1 else 0}
+        rows.append(row)
+    return rows
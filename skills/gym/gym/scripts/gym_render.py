@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""Fast Pillow renderer for the chart-e1rm dashboard (`--renderer fast`).
+
+Draws the same dashboard as the matplotlib path in gym_core.cmd_chart_e1rm
+from a precomputed spec, with a fixed layout instead of matplotlib's artist
+tree, text layout and autoscaling passes:
+
+    spec = {"orientation": "vertical" | "horizontal",
+            "series": [{"name", "label", "color", "dates", "values", "trend" (values or None)}],
+            "kpis": gym_core._dashboard_kpis(...) or None,
+            "goal_lines": [(color, (date, value), (date, value))],
+            "planned": [(color, (date, value), (date, value))],
+            "bands": ((cur_start, cur_end), (prev_start, prev_end)) or None}
+
+Geometry mirrors the matplotlib figure: the same canvas size at 150 dpi, axes
+rectangle, font sizes (points) and line widths. Text is anti-aliased by
+FreeType; the plot area (lines, markers, bands) is drawn at 2x and
+box-filtered down in place of Agg's anti-aliasing. The output is visually
+equivalent, not pixel-identical: tick placement is computed here rather than
+by matplotlib's locators.
+"""
+
+import importlib.util
+import math
+import os
+from datetime import datetime, timedelta
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+DPI = 150
+SCALE = 2  # supersampling factor
+
+BG = '#0d1117'
+TICK_C = '#999999'
+MUTED = '#555555'
+CURRENT_BAND = '#4FC3F7'
+PREV_BAND = '#FFA726'
+
+# (figure size in inches, axes rect [left, bottom, width, height] as figure fractions)
+LAYOUT = {
+    "vertical": ((1290 / 150, 2796 / 150), (0.12, 0.13, 0.82, 0.52)),
+    "horizontal": ((12, 6), (0.08, 0.15, 0.88, 0.75)),
+}
+
+FONT_FILES = {"regular": "DejaVuSans.ttf", "bold": "DejaVuSans-Bold.ttf", "mono": "DejaVuSansMono.ttf"}
+
+
+# ---- Fonts ----
+
+def _font_dir():
+    """matplotlib's bundled DejaVu fonts, located without importing matplotlib."""
+    spec = importlib.util.find_spec("matplotlib")
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return os.path.join(list(spec.submodule_search_locations)[0], "mpl-data", "fonts", "ttf")
+
+
+_FONTS = {}
+
+
+def font(size_pt, weight="regular"):
+    """Font at size_pt points (text is drawn at 1x; FreeType anti-aliases it)."""
+    px = max(1, round(size_pt * DPI / 72))
+    key = (px, weight)
+    if key not in _FONTS:
+        directory = _font_dir()
+        try:
+            _FONTS[key] = ImageFont.truetype(os.path.join(directory or "", FONT_FILES[weight]), px)
+        except OSError:
+            try:
+                _FONTS[key] = ImageFont.truetype(FONT_FILES[weight], px)
+            except OSError:
+                _FONTS[key] = ImageFont.load_default(px)
+    return _FONTS[key]
+
+
+# ---- Helpers ----
+
+def pt(points, scale=1):
+    """Points to pixels (on a canvas supersampled by `scale`)."""
+    return points * DPI / 72 * scale
+
+
+def rgba(color, alpha=1.0):
+    color = color.lstrip('#')
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4)) + (round(alpha * 255),)
+
+
+# matplotlib's va='center' centers the text's bounding box; Pillow's "m" anchor uses the font's
+# ascent/descent midline, which is close enough for single-line labels.
+ANCHORS = {("center", "center"): "mm", ("left", "center"): "lm", ("right", "center"): "rm",
+           ("center", "top"): "mt", ("left", "top"): "lt", ("right", "top"): "rt"}
+
+
+def over_bg(color, alpha):
+    """Opaque color of `color` at `alpha` over the background (Pillow text ignores fill alpha)."""
+    fg, bg = rgba(color)[:3], rgba(BG)[:3]
+    return tuple(round(f * alpha + b * (1 - alpha)) for f, b in zip(fg, bg))
+
+
+def text(draw, xy, s, size_pt, color, weight="regular", ha="center", va="center", alpha=1.0):
+    """Text outside the plot area, where the background is plain BG."""
+    draw.text(xy, s, font=font(size_pt, weight), fill=over_bg(color, alpha), anchor=ANCHORS[ha, va])
+
+
+def dashed(draw, points, color, width, alpha, dash=(3.7, 1.6)):
+    """Dashed polyline; the dash pattern scales with width like matplotlib's '--'."""
+    on, off = dash[0] * width, dash[1] * width
+    fill = rgba(color, alpha)
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        length = math.hypot(x1 - x0, y1 - y0)
+        if not length:
+            continue
+        ux, uy = (x1 - x0) / length, (y1 - y0) / length
+        t = 0.0
+        while t < length:
+            end = min(t + on, length)
+            draw.line([(x0 + ux * t, y0 + uy * t), (x0 + ux * end, y0 + uy * end)], fill=fill, width=round(width))
+            t = end + off
+
+
+def circle(draw, center, diameter, fill=None, outline=None, width=1):
+    r = diameter / 2
+    x, y = center
+    draw.ellipse([x - r, y - r, x + r, y + r], fill=fill, outline=outline, width=round(width))
+
+
+def diamond(draw, center, size, fill):
+    r = size / 2
+    x, y = center
+    draw.polygon([(x, y - r), (x + r, y), (x, y + r), (x - r, y)], fill=fill)
+
+
+# ---- Axes ----
+
+def nice_ticks(lo, hi, max_bins=9):
+    """Ticks like matplotlib's MaxNLocator(steps=[1, 2, 2.5, 5, 10]) within [lo, hi]."""
+    if hi <= lo:
+        return [lo]
+    raw = (hi - lo) / max_bins
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for step in (1, 2, 2.5, 5, 10):
+        step *= magnitude
+        if step >= raw:
+            break
+    first = math.ceil(lo / step - 1e-9)
+    return [i * step for i in range(first, int(math.floor(hi / step + 1e-9)) + 1)]
+
+
+def date_ticks(lo, hi, max_ticks):
+    """Calendar-aligned ticks (datetimes) between two ordinals: day-of-month steps, then months."""
+    start, end = datetime.fromordinal(math.ceil(lo)), datetime.fromordinal(math.floor(hi))
+    span = hi - lo
+    for days in (1, 2, 3, 7, 14):
+        if span / days <= max_ticks:
+            return [d for d in (start + timedelta(days=i) for i in range((end - start).days + 1))
+                    if (d.day - 1) % days == 0]
+    for months in (1, 2, 3, 4, 6, 12, 24, 60):
+        if span / (30.4 * months) <= max_ticks:
+            ticks, y, m = [], start.year, 1
+            while datetime(y, m, 1) <= end:
+                if datetime(y, m, 1) >= start and (m - 1) % min(months, 12) == 0 \
+                        and (months <= 12 or y % (months // 12) == 0):
+                    ticks.append(datetime(y, m, 1))
+                y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+            return ticks
+    return [start, end]
+
+
+class Axes:
+    """Data -> pixel transform for a plot rectangle with fixed (x0, x1, y0, y1) limits."""
+
+    def __init__(self, box, limits):
+        self.left, self.top, self.right, self.bottom = box
+        self.x0, self.x1, self.y0, self.y1 = limits
+
+    def x(self, value):
+        ordinal = value.toordinal() + (value.hour * 3600 + value.minute * 60) / 86400 \
+            if isinstance(value, datetime) else value.toordinal()
+        return self.left + (ordinal - self.x0) / (self.x1 - self.x0) * (self.right - self.left)
+
+    def y(self, value):
+        return self.bottom - (value - self.y0) / (self.y1 - self.y0) * (self.bottom - self.top)
+
+    def xy(self, point):
+        return self.x(point[0]), self.y(point[1])
+
+
+# ---- Dashboard ----
+
+def render_e1rm_dashboard(spec):
+    """Render the dashboard spec to an RGB image."""
+    orientation = spec["orientation"]
+    vertical = orientation == "vertical"
+    (fw, fh), (al, ab, aw, ah) = LAYOUT[orientation]
+    W, H = round(fw * DPI), round(fh * DPI)
+    image = Image.new("RGB", (W, H), BG)
+    draw = ImageDraw.Draw(image, "RGBA")
+
+    box = (round(al * W), round((1 - ab - ah) * H), round((al + aw) * W), round((1 - ab) * H))
+    left, top, right, bottom = box
+    xs, ys = [], []
+    for s in spec["series"]:
+        xs += [d.toordinal() for d in s["dates"]]
+        ys += list(s["values"])
+    for _, a, b in spec["goal_lines"] + spec["planned"]:
+        xs += [a[0].toordinal(), b[0].toordinal()]
+        ys += [a[1], b[1]]
+    if spec["bands"]:
+        xs += [d.toordinal() for band in spec["bands"] for d in band]
+    limits = _limits(xs or [datetime.now().toordinal()], ys or [0, 1])
+
+    # Everything clipped to the axes is drawn supersampled, then pasted in
+    plot = Image.new("RGB", ((right - left) * SCALE, (bottom - top) * SCALE), BG)
+    _draw_plot(ImageDraw.Draw(plot, "RGBA"), Axes((0, 0) + plot.size, limits), spec, vertical)
+    image.paste(plot.reduce(SCALE), box[:2])
+
+    ax = Axes(box, limits)
+    _draw_ticks(draw, ax, vertical)
+    _draw_badges(draw, ax, spec["series"], vertical)
+
+    # -- Labels below the axes --
+    ax_w, ax_h = right - left, bottom - top
+    text(draw, (left + 0.5 * ax_w, bottom + 0.06 * ax_h), 'e1RM (kg)', 18, '#ffffff', "mono", va="top", alpha=0.35)
+    text(draw, (left + 0.32 * ax_w, bottom + 0.10 * ax_h), 'last 14 days', 13, CURRENT_BAND,
+         ha="right", va="top", alpha=0.5)
+    text(draw, (left + 0.5 * ax_w, bottom + 0.10 * ax_h), ' vs ', 13, '#ffffff', va="top", alpha=0.35)
+    text(draw, (left + 0.68 * ax_w, bottom + 0.10 * ax_h), '14 days before', 13, PREV_BAND,
+         ha="left", va="top", alpha=0.5)
+
+    if vertical:
+        _draw_header(draw, W, H, spec)
+        return image
+    _draw_legend(draw, box, spec["series"])
+    return _tight(image)
+
+
+def _limits(xs, ys):
+    """Axis limits as matplotlib autoscales them: 5% margins, y from 0."""
+    x0, x1 = min(xs), max(xs)
+    pad = (x1 - x0) * 0.05 or 1
+    y0, y1 = min(ys), max(ys)
+    return x0 - pad, x1 + pad, 0, (y1 + (y1 - y0) * 0.05) or 1
+
+
+def _draw_plot(draw, ax, spec, vertical):
+    """Bands, grid, goal/planned lines and the data series, in matplotlib's zorder."""
+    scale = SCALE
+    if spec["bands"]:
+        for (start, end), color, alpha in zip(spec["bands"], (CURRENT_BAND, PREV_BAND), (0.07, 0.04)):
+            draw.rectangle([ax.x(start), ax.top, ax.x(end), ax.bottom], fill=rgba(color, alpha))
+
+    grid, grid_w = rgba('#ffffff', 0.06), round(pt(0.8, scale))
+    for value in nice_ticks(ax.y0, ax.y1):
+        draw.line([(ax.left, ax.y(value)), (ax.right, ax.y(value))], fill=grid, width=grid_w)
+    for d in _date_ticks(ax, vertical, scale):
+        draw.line([(ax.x(d), ax.top), (ax.x(d), ax.bottom)], fill=grid, width=grid_w)
+
+    for color, a, b in spec["goal_lines"]:
+        dashed(draw, [ax.xy(a), ax.xy(b)], color, pt(1.5, scale), 0.4)
+        diamond(draw, ax.xy(b), pt(8, scale), rgba(color, 0.6))
+
+    lw_planned = pt(3 if vertical else 2, scale)
+    for color, a, b in spec["planned"]:
+        dashed(draw, [ax.xy(a), ax.xy(b)], color, lw_planned, 0.5)
+
+    # Markers sit on every point and are wider than the line, so plain joints suffice
+    lw, ms = round(pt(6 if vertical else 3, scale)), pt(16 if vertical else 8, scale)
+    for s in spec["series"]:
+        # Optional EMA trend (chart-e1rm --trend): thinner and translucent, under the data
+        if s.get("trend") and len(s["trend"]) > 1:
+            draw.line([ax.xy(p) for p in zip(s["dates"], s["trend"])], fill=rgba(s["color"], 0.5),
+                      width=max(1, lw // 2), joint="curve")
+    for s in spec["series"]:
+        points = [ax.xy(p) for p in zip(s["dates"], s["values"])]
+        if len(points) > 1:
+            draw.line(points, fill=s["color"], width=lw)
+        for p in points:
+            circle(draw, p, ms, fill=s["color"])
+
+    for color, _, b in spec["planned"]:
+        circle(draw, ax.xy(b), pt(18 if vertical else 10, scale), outline=color, width=lw_planned)
+
+
+def _date_ticks(ax, vertical, scale=1):
+    label_w = font(15 if vertical else 11).getlength("Mmm 00") * 1.4 * scale
+    return date_ticks(ax.x0, ax.x1, max(2, int((ax.right - ax.left) // label_w)))
+
+
+def _draw_ticks(draw, ax, vertical):
+    label_pt = 15 if vertical else 11
+    tick_len, pad, width = pt(3.5), pt(3.5), round(pt(0.8))
+    for value in nice_ticks(ax.y0, ax.y1):
+        y = ax.y(value)
+        draw.line([(ax.left - tick_len, y), (ax.left, y)], fill=rgba(TICK_C), width=width)
+        label = f"{value:g}" if value == int(value) else f"{value:.1f}"
+        text(draw, (ax.left - tick_len - pad, y), label, label_pt, TICK_C, ha="right")
+    for d in _date_ticks(ax, vertical):
+        x = ax.x(d)
+        draw.line([(x, ax.bottom), (x, ax.bottom + tick_len)], fill=rgba(TICK_C), width=width)
+        text(draw, (x, ax.bottom + tick_len + pad), d.strftime('%b %d'), label_pt, TICK_C, va="top")
+
+
+def _draw_badges(draw, ax, series, vertical):
+    """Rounded value badge to the right of each series' last point (not clipped to the axes)."""
+    badge_pt = 14 if vertical else 10
+    badge_font = font(badge_pt, "bold")
+    half, bpad = pt(badge_pt) * 0.5, pt(badge_pt) * 0.3
+    for s in series:
+        if not s["values"]:
+            continue
+        x, y = ax.xy((s["dates"][-1], s["values"][-1]))
+        x += pt(20 if vertical else 16)
+        label = f" {s['values'][-1]:.0f} "
+        draw.rounded_rectangle([x - bpad, y - half - bpad, x + badge_font.getlength(label) + bpad, y + half + bpad],
+                               radius=bpad, fill=rgba(s["color"], 0.9))
+        draw.text((x, y), label, font=badge_font, fill="white", anchor="lm")
+
+
+def _draw_header(draw, W, H, spec):
+    """KPI numbers and the lift legend above the plot (figure-fraction positions)."""
+    def at(x, y):
+        return x * W, (1 - y) * H
+
+    kpis = spec["kpis"]
+    if kpis:
+        text(draw, at(0.30, 0.83), f"{kpis['adherence']}%", 60, kpis["adherence_color"], "bold")
+        text(draw, at(0.30, 0.805), "adherence", 17, MUTED)
+        text(draw, at(0.72, 0.83), f"{kpis['avg_e1rm']:.0f} kg", 60, '#ffffff', "bold")
+        text(draw, at(0.72, 0.805), "avg e1RM", 17, MUTED)
+        if kpis["show_delta"]:
+            arrow, change, color = kpis["adherence_delta"]
+            text(draw, at(0.30, 0.78), f"{arrow} {change}%", 27, color, "bold")
+            arrow, change, color = kpis["e1rm_delta"]
+            text(draw, at(0.72, 0.78), f"{arrow} {change:.1f} kg", 27, color, "bold")
+        else:
+            for cx in (0.30, 0.72):
+                text(draw, at(cx - 0.055, 0.78), "▲▼ no", 20, MUTED, ha="right")
+                text(draw, at(cx, 0.78), " past ", 20, PREV_BAND, "bold", alpha=0.7)
+                text(draw, at(cx + 0.055, 0.78), "data", 20, MUTED, ha="left")
+
+    # Legend: single row, evenly spaced, at most 8 lifts
+    items = spec["series"][:8]
+    spacing = 1.0 / (len(items) + 1)
+    for i, s in enumerate(items):
+        x = spacing * (i + 1)
+        text(draw, at(x - 0.02, 0.70), '●', 22, s["color"])
+        text(draw, at(x + 0.01, 0.70), s["label"], 17, s["color"], "bold", ha="left")
+
+
+def _draw_legend(draw, box, series):
+    """Horizontal layout: one-row legend (line sample + full lift name) centered below the axes."""
+    left, top, right, bottom = box
+    f = font(11)
+    sample, gap, marker = pt(22), pt(8), pt(8)
+    widths = [sample + gap + f.getlength(s["name"]) for s in series]
+    total = sum(widths) + pt(22) * max(len(series) - 1, 0)
+    x = (left + right) / 2 - total / 2
+    y = bottom + 0.12 * (bottom - top) + pt(14)
+    for s, w in zip(series, widths):
+        draw.line([(x, y), (x + sample, y)], fill=s["color"], width=round(pt(3)))
+        circle(draw, (x + sample / 2, y), marker, fill=s["color"])
+        draw.text((x + sample + gap, y), s["name"], font=f, fill="white", anchor="lm")
+        x += w + pt(22)
+
+
+def _tight(image, pad_in=0.1):
+    """Crop to the drawn content plus padding, like savefig(bbox_inches='tight')."""
+    bbox = ImageChops.difference(image, Image.new("RGB", image.size, BG)).getbbox()
+    if not bbox:
+        return image
+    pad = round(pad_in * DPI)
+    l, t, r, b = bbox
+    return image.crop((max(l - pad, 0), max(t - pad, 0), min(r + pad, image.width), min(b + pad, image.height)))
+
+
+FORMATS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG", ".webp": "WEBP"}
+
+
+def save(image, path):
+    """Write the image; format from the extension. PNG favours speed over size (compress_level 1)."""
+    ext = os.path.splitext(str(path))[1].lower()
+    # registered_extensions() loads every Pillow plugin, so only ask it for unusual formats
+    fmt = FORMATS.get(ext) or Image.registered_extensions().get(ext)
+    if fmt is None:
+        raise ValueError(f"unsupported chart format: {path}")
+    opts = {"compress_level": 1} if fmt == "PNG" else {}
+    image.save(path, fmt, dpi=(DPI, DPI), **opts)
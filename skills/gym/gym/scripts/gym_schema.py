@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""Session schema and its compiled validator, shared by gym_analytics.py and workout_live.py.
+
+SESSION describes the session document of SKILL.md ("Session Log Format")
+and the analysis block of references/analytics.md as plain data. A node is a
+dict with a "type" (object, list, str, int, number, bool, date, time, or a
+tuple of those) and optionally:
+
+    nullable  None is accepted
+    fields    object: {key: node}; keys not listed are accepted unchecked
+    required  object: keys that must be present
+    any_of    object: groups of keys of which at least one must be present
+    values    object: node every value must match (maps such as analysis.e1rm)
+    items     list: node every item must match
+    item      list: what an item is called in messages ("exercise", "set")
+    min       int/number: lower bound
+
+compile_node() turns a node into a closure check(value, field, where, errors)
+once: scalar fields become a type-set lookup by key (plus a test for bounds
+and date/time strings), lists of sets are one loop over every value, and
+message labels are only built when something fails. Errors are strings
+naming the field and where it sits, e.g.
+
+    Invalid reps in exercise 'OHP' set 2: weight (expected number >= 0)
+"""
+
+import json
+import re
+
+_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}\Z")
+_DAYS_IN_MONTH = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def is_time(t):
+    """True for an HH:MM string (hour 0-23, minute 0-59)."""
+    try:
+        h, m = t.split(":")
+        return 0 <= int(h) <= 23 and 0 <= int(m) <= 59
+    except (ValueError, AttributeError):
+        return False
+
+
+def is_date(d):
+    """True for a YYYY-MM-DD string naming a real calendar day."""
+    if not isinstance(d, str) or not _DATE_RE.match(d):
+        return False
+    y, m, day = int(d[:4]), int(d[5:7]), int(d[8:])
+    if not 1 <= m <= 12 or not 1 <= day <= _DAYS_IN_MONTH[m - 1]:
+        return False
+    return m != 2 or day < 29 or (y % 4 == 0 and (y % 100 != 0 or y % 400 == 0))
+
+
+# ---- Schema ----
+
+def _nullable(kind, **extra):
+    return {"type": kind, "nullable": True, **extra}
+
+
+TEXT = _nullable(("str", "number", "bool"))  # free text; older files have e.g. "day": 1
+TIME = _nullable("time")
+NUMBER = _nullable("number")
+TEXT_LIST = {"type": "list", "items": {"type": "str"}}
+
+SET = {"type": "object", "fields": {
+    "reps": _nullable("number", min=0),  # 8.0 from some JSON writers; e1RM math takes floats
+    "weight_kg": NUMBER,
+    "rpe": NUMBER,
+    "warmup": {"type": "bool"},
+}}
+
+# Plans may give ranges: {"reps": "8-10", "weight_kg": "100-120"}
+PLANNED_SET = {"type": "object", "fields": {
+    "reps": _nullable(("number", "str"), min=0),
+    "weight_kg": _nullable(("number", "str")),
+    "rpe": _nullable(("number", "str")),
+    "warmup": {"type": "bool"},
+}}
+
+EXERCISE = {"type": "object", "required": ("name",), "fields": {
+    "name": {"type": "str"},
+    "muscle_group": TEXT,
+    "sets": {"type": "list", "items": SET, "item": "set"},
+    "start_time": TIME,
+    "end_time": TIME,
+    "notes": TEXT,
+}}
+
+PLANNED_EXERCISE = {"type": "object", "required": ("name",), "fields": {
+    "name": {"type": "str"},
+    "muscle_group": TEXT,
+    "sets": {"type": "list", "items": PLANNED_SET, "item": "set"},
+    "sets_reps": TEXT,
+    "weight_kg": _nullable(("number", "str")),
+    "notes": TEXT,
+}}
+
+ANALYSIS = {"type": "object", "fields": {
+    "e1rm": {"type": "object", "values": {"type": "number", "min": 0}},
+    "e1rm_delta": {"type": "object", "values": {"type": "object"}},
+    "volume_sets": {"type": "object", "values": {"type": "int", "min": 0}},
+    "volume_week_total": {"type": "object", "values": {"type": "int", "min": 0}},
+    "goal_progress": {"type": "object", "values": {"type": "object"}},
+    "plan_adherence": _nullable("number", min=0),
+    "plan_adherence_detail": {"type": "object", "values": TEXT_LIST},
+    "strengths": TEXT_LIST,
+    "weaknesses": TEXT_LIST,
+    "next_session_adjustments": TEXT_LIST,
+    "computed": {"type": "object"},
+    "mesocycle_position": TEXT,
+    "notes": TEXT,
+}}
+
+ACTUAL = {"type": "list", "items": EXERCISE, "item": "exercise"}
+
+SESSION = {
+    "type": "object",
+    "required": ("date",),
+    "any_of": (("actual", "exercises"),),
+    "fields": {
+        "date": {"type": "date"},
+        "day": TEXT,
+        "start_time": TIME,
+        "end_time": TIME,
+        "duration_min": NUMBER,
+        "bodyweight_kg": NUMBER,
+        "notes": TEXT,
+        "planned": {"type": "list", "items": PLANNED_EXERCISE, "item": "planned exercise"},
+        "actual": ACTUAL,
+        "exercises": ACTUAL,  # legacy name of "actual"
+        "analysis": ANALYSIS,
+    },
+}
+
+
+# ---- Compiler ----
+
+# Plain types per scalar kind; date/time are checked by their predicate
+_TYPES = {"str": (str,), "int": (int,), "number": (int, float), "bool": (bool,)}
+_PREDICATES = {"date": is_date, "time": is_time}
+_EXPECTED = {"str": "string", "int": "integer", "number": "number", "bool": "true/false",
+             "date": "YYYY-MM-DD", "time": "HH:MM"}
+_NUMERIC = frozenset((int, float))
+
+
+def _shown(value):
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= 40 else text[:37] + "..."
+
+
+def _invalid(field, where, value, expected):
+    return f"Invalid {field or 'value'}{where}: {_shown(value)} (expected {expected})"
+
+
+def _scalar_test(node):
+    """(plain, test(value) -> bool, expected) for a scalar node, nullability and bounds folded in.
+
+    Values whose type is in plain pass outright; test decides the rest (bounded
+    numbers, date/time strings) and is False for any other type.
+    """
+    kinds = node["type"] if isinstance(node["type"], tuple) else (node["type"],)
+    lo = node.get("min")
+    expected = " or ".join(_EXPECTED[k] for k in kinds) + (f" >= {lo}" if lo is not None else "")
+    predicates = tuple(_PREDICATES[k] for k in kinds if k in _PREDICATES)
+    # type() identity, not isinstance: True is not an integer here
+    types = frozenset(t for k in kinds for t in _TYPES.get(k, ()))
+    if node.get("nullable"):
+        types |= {type(None)}
+
+    if len(predicates) == 1:
+        return types, predicates[0], expected
+    if predicates:
+        def test(value):
+            return any(p(value) for p in predicates)
+        return types, test, expected
+    if lo is None:
+        return types, _reject, expected
+
+    def test(value):
+        return type(value) in _NUMERIC and value >= lo
+    return types - _NUMERIC, test, expected
+
+
+def _reject(value):
+    return False
+
+
+def compile_node(node):
+    """Compile a schema node into check(value, field, where, errors)."""
+    kind = node["type"]
+    if kind == "object":
+        check = _compile_object(node)
+    elif kind == "list":
+        check = _compile_list(node)
+    else:
+        plain, test, expected = _scalar_test(node)
+
+        def check(value, field, where, errors):
+            if type(value) not in plain and not test(value):
+                errors.append(_invalid(field, where, value, expected))
+        return check
+    if not node.get("nullable"):
+        return check
+
+    def nullable(value, field, where, errors):
+        if value is not None:
+            check(value, field, where, errors)
+    return nullable
+
+
+def _scalar_fields(node):
+    return {key: _scalar_test(sub) for key, sub in node.get("fields", {}).items()
+            if sub["type"] not in ("object", "list")}
+
+
+def _compile_object(node):
+    # Scalar fields are tested inline; only objects and lists recurse
+    scalars = _scalar_fields(node)
+    nested = {key: compile_node(sub) for key, sub in node.get("fields", {}).items() if key not in scalars}
+    required = tuple(node.get("required", ()))
+    any_of = tuple((tuple(group), f"{group[0]} (or {', '.join(group[1:])})") for group in node.get("any_of", ()))
+    values = compile_node(node["values"]) if "values" in node else None
+
+    def check(value, field, where, errors):
+        if type(value) is not dict:
+            errors.append(_invalid(field, where, value, "object"))
+            return
+        for key in required:
+            if key not in value:
+                errors.append(f"Missing field: {key if field is None else f'{field}.{key}'}{where}")
+        for group, name in any_of:
+            for key in group:
+                if key in value:
+                    break
+            else:
+                errors.append(f"Missing field: {name if field is None else f'{field}.{name}'}{where}")
+        for key, item in value.items():
+            scalar = scalars.get(key)
+            if scalar is not None:
+                if type(item) not in scalar[0] and not scalar[1](item):
+                    errors.append(_invalid(key if field is None else f"{field}.{key}", where, item, scalar[2]))
+                continue
+            sub = nested.get(key)
+            if sub is not None:
+                sub(item, key if field is None else f"{field}.{key}", where, errors)
+            elif values is not None:
+                values(item, key if field is None else f"{field}.{key}", where, errors)
+    return check
+
+
+def _flat_scalars(node):
+    """Scalar tests of an object node with nothing but scalar fields (sets), else None."""
+    if node["type"] != "object" or any(k in node for k in ("required", "any_of", "values", "nullable")):
+        return None
+    scalars = _scalar_fields(node)
+    return scalars if len(scalars) == len(node.get("fields", {})) else None
+
+
+def _compile_list(node):
+    items = compile_node(node["items"]) if "items" in node else None
+    flat = _flat_scalars(node["items"]) if "items" in node else None
+    item = node.get("item")
+
+    def flat_valid(value):
+        # Sets: one type-set loop over every value, no per-set call or label
+        for entry in value:
+            if type(entry) is not dict:
+                return False
+            for key, v in entry.items():
+                scalar = flat.get(key)
+                if scalar is not None and type(v) not in scalar[0] and not scalar[1](v):
+                    return False
+        return True
+
+    def check(value, field, where, errors):
+        if type(value) is not list:
+            errors.append(_invalid(field, where, value, "list"))
+            return
+        if items is None:
+            return
+        if flat is not None:
+            if flat_valid(value):
+                return
+        else:
+            n = len(errors)
+            for entry in value:
+                items(entry, field, where, errors)
+            if len(errors) == n:
+                return
+            del errors[n:]
+        # Something failed: check again, naming each entry in the messages
+        for i, entry in enumerate(value):
+            if item is None:
+                items(entry, f"{field}[{i}]", where, errors)
+                continue
+            name = entry.get("name") if type(entry) is dict else None
+            ident = f"'{name}'" if isinstance(name, str) and name else str(i + 1)
+            items(entry, None, f"{where} {item} {ident}" if where else f" in {item} {ident}", errors)
+    return check
+
+
+# Compiled on first use: importing this module for is_time/is_date stays cheap
+_CHECKS = {}
+
+
+def _check(name):
+    check = _CHECKS.get(name)
+    if check is None:
+        node = {"session": SESSION, "exercise": EXERCISE, "planned": SESSION["fields"]["planned"]}[name]
+        check = _CHECKS[name] = compile_node(node)
+    return check
+
+
+def validate_session(data):
+    """Every schema error of a session document (list of strings, empty when valid)."""
+    errors = []
+    _check("session")(data, None, "", errors)
+    return errors
+
+
+def validate_exercise(exercise):
+    """Schema errors of one "actual" exercise entry, as logged by workout_live.py."""
+    errors = []
+    name = exercise.get("name") if isinstance(exercise, dict) else None
+    _check("exercise")(exercise, None, f" in exercise '{name}'" if isinstance(name, str) and name else "", errors)
+    return errors
+
+
+def validate_planned(planned):
+    """Schema errors of a session's "planned" list."""
+    errors = []
+    _check("planned")(planned, "planned", "", errors)
+    return errors
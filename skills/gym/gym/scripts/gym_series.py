@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Per-lift e1RM time series: incremental store, downsampling and EMA trend lines.
+
+Series are (day ordinals, values) NumPy arrays sorted by day, one point per
+session (see gym_core.SetTable.lift_series). Long histories are reduced
+to a bounded number of points before they are drawn (`--resolution`):
+
+    session   every point
+    weekly    the best point of each Monday-Sunday week
+    lttb      Largest-Triangle-Three-Buckets down to max_points, which keeps
+              the visual shape (peaks, drops) of the line
+    auto      every point up to max_points, else weekly, else weekly + lttb
+
+Every rule keeps the last point, so badges and planned-point links still
+start from the latest session. ema() is a time-aware exponential moving
+average (half-life in days, irregular session spacing), evaluated in closed
+form per block instead of point by point.
+
+SeriesStore keeps the series of several lifts and replaces the points of
+changed days only, so a long-running process (watch) does not rebuild them
+from the whole history after every logged session.
+"""
+
+import numpy as np
+
+RESOLUTIONS = ("auto", "session", "weekly", "lttb")
+MAX_POINTS = 150
+_EMA_BLOCK = 200.0  # time constants per closed-form block: exp(200) stays far inside float64
+
+
+def _arrays(days, values):
+    return np.asarray(days, dtype=np.int64), np.asarray(values, dtype=np.float64)
+
+
+def _keep_last(days, values, idx):
+    """Indexes idx (sorted) with the last point added if missing."""
+    if len(days) and (not len(idx) or idx[-1] != len(days) - 1):
+        idx = np.append(idx, len(days) - 1)
+    return days[idx], values[idx]
+
+
+def weekly_max(days, values):
+    """The best point of each Monday-Sunday week (at its own day), plus the last point."""
+    days, values = _arrays(days, values)
+    if not len(days):
+        return days, values
+    week = (days - 1) // 7  # ordinal 1 (0001-01-01) is a Monday
+    # Per week, the highest value; ties go to the earlier day
+    order = np.lexsort((days, -values, week))
+    _, first = np.unique(week[order], return_index=True)
+    return _keep_last(days, values, np.sort(order[first]))
+
+
+def lttb(days, values, max_points=MAX_POINTS):
+    """Largest-Triangle-Three-Buckets: max_points points (first and last kept) tracing the line's shape."""
+    days, values = _arrays(days, values)
+    n = len(days)
+    if max_points >= n or n < 3:
+        return days, values
+    if max_points < 3:
+        return _keep_last(days, values, np.array([0]))
+    x, y = days.astype(np.float64), values
+    # Bucket edges over the inner points; bucket i holds points [edges[i], edges[i + 1])
+    edges = (1 + np.arange(max_points - 1) * (n - 2) / (max_points - 2)).astype(np.int64)
+    edges[-1] = n - 1
+    # Mean of each bucket (the "next bucket" vertex), from prefix sums
+    cx, cy = np.concatenate(([0.0], np.cumsum(x))), np.concatenate(([0.0], np.cumsum(y)))
+    counts = np.diff(edges)
+    mean_x = np.append((cx[edges[1:]] - cx[edges[:-1]]) / counts, x[-1])
+    mean_y = np.append((cy[edges[1:]] - cy[edges[:-1]]) / counts, y[-1])
+
+    idx = np.empty(max_points, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for b in range(max_points - 2):
+        lo, hi = edges[b], edges[b + 1]
+        ax, ay, nx, ny = x[a], y[a], mean_x[b + 1], mean_y[b + 1]
+        area = np.abs((ax - nx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (ny - ay))
+        a = lo + int(np.argmax(area))
+        idx[b + 1] = a
+    return days[idx], values[idx]
+
+
+def downsample(days, values, resolution="auto", max_points=MAX_POINTS):
+    """(days, values) reduced by a RESOLUTIONS rule."""
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"unknown resolution: {resolution} (expected {', '.join(RESOLUTIONS)})")
+    days, values = _arrays(days, values)
+    if resolution == "session" or (resolution == "auto" and len(days) <= max_points):
+        return days, values
+    if resolution == "lttb":
+        return lttb(days, values, max_points)
+    days, values = weekly_max(days, values)
+    if resolution == "auto" and len(days) > max_points:
+        return lttb(days, values, max_points)
+    return days, values
+
+
+def ema(days, values, halflife):
+    """Exponential moving average with a half-life in days, for irregularly spaced points.
+
+    y[0] = x[0]; y[i] = d * y[i-1] + (1 - d) * x[i] with d = 0.5 ** (gap_days / halflife).
+    Unrolled, y[i] = exp(-t[i]) * (y[s] + sum over k in (s, i] of (1 - d[k]) * exp(t[k]) * x[k])
+    with t in time constants since the block start s: one cumsum per block.
+    """
+    days, values = _arrays(days, values)
+    out = np.empty_like(values)
+    if not len(values):
+        return out
+    t = (days - days[0]) * (np.log(2) / halflife)
+    gain = np.empty_like(values)
+    gain[0] = 1.0
+    gain[1:] = -np.expm1(-np.diff(t))  # 1 - d, accurate for small gaps
+    prev, start = 0.0, 0
+    while start < len(values):
+        end = int(np.searchsorted(t, t[start] + _EMA_BLOCK, side="right"))
+        rel = t[start:end] - t[start]
+        y0 = prev + gain[start] * (values[start] - prev)
+        acc = np.cumsum(gain[start + 1:end] * np.exp(rel[1:]) * values[start + 1:end])
+        out[start] = y0
+        out[start + 1:end] = np.exp(-rel[1:]) * (y0 + acc)
+        prev, start = out[end - 1], end
+    return out
+
+
+class SeriesStore:
+    """Per-lift (days, values) arrays, updated by replacing the points of changed days."""
+
+    def __init__(self):
+        self.lifts = {}
+
+    def replace(self, changed_days, points):
+        """Drop every point on changed_days, then merge points {lift: (days, values)} from those days' sessions."""
+        changed = np.unique(np.asarray(list(changed_days), dtype=np.int64))
+        empty = (np.empty(0, dtype=np.int64), np.empty(0))
+        for lift in set(self.lifts) | set(points):
+            days, values = self.lifts.get(lift, empty)
+            keep = ~np.isin(days, changed)
+            new_days, new_values = _arrays(*points.get(lift, empty))
+            days = np.concatenate((days[keep], new_days))
+            values = np.concatenate((values[keep], new_values))
+            order = np.argsort(days, kind="stable")
+            self.lifts[lift] = (days[order], values[order])
+
+    def series(self, lift, start=None, end=None):
+        """(days, values) of one lift within [start, end] (ordinals; None = unbounded)."""
+        days, values = self.lifts.get(lift, (np.empty(0, dtype=np.int64), np.empty(0)))
+        lo = 0 if start is None else int(np.searchsorted(days, start, side="left"))
+        hi = len(days) if end is None else int(np.searchsorted(days, end, side="right"))
+        return days[lo:hi], values[lo:hi]
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""Append-only NDJSON session store shared by gym_analytics.py and workout_live.py.
+
+A history dir may hold `sessions.ndjson` next to (or instead of) the
+per-day `YYYY-MM-DD.json` files. Each line is one complete session record;
+a later line for the same date supersedes earlier ones, so saving a session
+is a single append instead of a file rewrite.
+
+Records are kept in non-decreasing date order. Appending an older date
+rewrites the store, which means the newest sessions are always at the end
+of the file and can be read from the tail without parsing the whole history.
+`compact` drops superseded records; `migrate` folds day files into the store.
+
+Lines that fail to parse are never dropped silently: rewrites move them to
+`sessions.ndjson.rejects`.
+
+Every write goes through the durable-write helpers below: whole files are
+written to a temp file and renamed over the target (readers never see a
+half-written session), with fsync of the files and their directory when
+$GYM_FSYNC is set. Read-modify-write sequences hold `locked(dir)`, an advisory
+flock on `<dir>/.gym.lock`, so concurrent `log` / `done` invocations serialize.
+$GYM_COMPACT_JSON=1 saves day files without indentation.
+"""
+
+import contextlib
+import itertools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks on this platform; writes stay atomic
+    fcntl = None
+
+STORE_FILENAME = "sessions.ndjson"
+REJECTS_SUFFIX = ".rejects"
+TAIL_BLOCK = 64 * 1024
+LOCK_FILENAME = ".gym.lock"
+LOCK_TIMEOUT = 30.0
+FSYNC_ENV = "GYM_FSYNC"
+COMPACT_ENV = "GYM_COMPACT_JSON"
+
+
+# ---- Durable writes ----
+
+def env_flag(name):
+    """True if environment variable name is set to anything but "", 0, false or no."""
+    return os.environ.get(name, "").strip().lower() not in ("", "0", "false", "no")
+
+
+def dump_json(data, compact=None):
+    """A session/goals document as UTF-8 bytes: indented, or compact (default from $GYM_COMPACT_JSON)."""
+    if compact is None:
+        compact = env_flag(COMPACT_ENV)
+    if compact:
+        text = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    else:
+        text = json.dumps(data, indent=2, ensure_ascii=False)
+    return text.encode("utf-8")
+
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows: directories cannot be opened
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+_TMP_COUNTER = itertools.count()
+
+
+class WriteBatch:
+    """Atomic replacement of one or more files, fsynced together.
+
+    write() stages data in a temp file next to its target; commit() fsyncs the
+    temp files (when enabled), renames each over its target and fsyncs each
+    directory once. Leaving the `with` block on an exception discards the
+    staged files and leaves every target untouched.
+    """
+
+    def __init__(self, fsync=None):
+        self.fsync = env_flag(FSYNC_ENV) if fsync is None else fsync
+        self._staged = []
+
+    def write(self, path, data):
+        path = Path(path)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.{next(_TMP_COUNTER)}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        self._staged.append((tmp, path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def commit(self):
+        dirs = []
+        try:
+            while self._staged:
+                tmp, path = self._staged[0]
+                os.replace(tmp, path)
+                self._staged.pop(0)
+                if path.parent not in dirs:
+                    dirs.append(path.parent)
+        finally:
+            self.discard()  # whatever a failed rename left behind
+        if self.fsync:
+            for d in dirs:
+                _fsync_dir(d)
+
+    def discard(self):
+        for tmp, _ in self._staged:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+        self._staged = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+        return False
+
+
+def atomic_write(path, data, fsync=None):
+    """Replace path with data (bytes) via temp file + rename."""
+    with WriteBatch(fsync) as batch:
+        batch.write(path, data)
+
+
+_HELD = threading.local()
+
+
+@contextlib.contextmanager
+def locked(directory, timeout=LOCK_TIMEOUT):
+    """Hold the advisory lock of a history (or workspace) dir; reentrant within a thread.
+
+    Raises TimeoutError if another process holds it for longer than timeout seconds.
+    """
+    held = _HELD.__dict__.setdefault("locks", {})
+    os.makedirs(directory, exist_ok=True)
+    key = os.path.realpath(directory)
+    if fcntl is None or key in held:
+        held[key] = held.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            held[key] -= 1
+            if not held[key]:
+                del held[key]
+        return
+    fd = os.open(os.path.join(key, LOCK_FILENAME), os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"{os.path.join(key, LOCK_FILENAME)} is held by another process") from None
+                time.sleep(0.005)
+        held[key] = 1
+        try:
+            yield
+        finally:
+            del held[key]
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+# ---- Paths ----
+
+def store_path(history_dir):
+    """Path of the NDJSON store for a history dir."""
+    return Path(history_dir) / STORE_FILENAME
+
+
+def has_store(history_dir):
+    return store_path(history_dir).is_file()
+
+
+def encode(session):
+    """One session as a single NDJSON line (bytes, trailing newline included)."""
+    return (json.dumps(session, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _decode(line):
+    """Parse one line. Returns (session, None) or (None, error)."""
+    try:
+        data = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return None, str(e)
+    if not isinstance(data, dict) or "date" not in data:
+        return None, "missing date"
+    return data, None
+
+
+# ---- Reading ----
+
+def iter_records(history_dir):
+    """Stream the store front to back. Yields (lineno, raw_line, session, error)."""
+    path = store_path(history_dir)
+    if not path.is_file():
+        return
+    with open(path, "rb") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            session, error = _decode(line)
+            yield lineno, line, session, error
+
+
+def _iter_lines_reverse(path, block_size=TAIL_BLOCK):
+    """Yield (offset, line) newest first, reading fixed-size blocks from the end."""
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        rest = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + rest).split(b"\n")
+            rest = lines[0]
+            end = pos + len(lines[0])
+            tail = []
+            for line in lines[1:]:
+                tail.append((end + 1, line))
+                end += 1 + len(line)
+            for offset, line in reversed(tail):
+                if line.strip():
+                    yield offset, line
+        if rest.strip():
+            yield 0, rest
+
+
+def iter_records_reverse(history_dir, block_size=TAIL_BLOCK):
+    """Stream the store back to front. Yields (byte_offset, session, error)."""
+    path = store_path(history_dir)
+    if not path.is_file():
+        return
+    for offset, line in _iter_lines_reverse(path, block_size):
+        session, error = _decode(line)
+        yield offset, session, error
+
+
+def read_sessions(history_dir):
+    """All current sessions (latest record per date), sorted by date.
+
+    Returns (sessions, errors) where errors is a list of (location, message).
+    """
+    latest, errors = {}, []
+    for lineno, _, session, error in iter_records(history_dir):
+        if error is not None:
+            errors.append((f"{STORE_FILENAME}:{lineno}", error))
+        else:
+            latest[session["date"]] = session
+    return [latest[d] for d in sorted(latest)], errors
+
+
+def tail_sessions(history_dir, n=None, since=None, until=None):
+    """The newest n sessions by date within [since, until], reading only the end of the store.
+
+    Any bound may be None. Returns (sessions, errors) like read_sessions.
+    """
+    latest, errors = {}, []
+    if n is not None and n <= 0:
+        return [], errors
+    for offset, session, error in iter_records_reverse(history_dir):
+        if error is not None:
+            errors.append((f"{STORE_FILENAME}@{offset}", error))
+            continue
+        date = session["date"]
+        if until is not None and date > until:
+            continue
+        if since is not None and date < since:
+            break  # records are date-ordered: everything before this is older
+        latest.setdefault(date, session)
+        if n is not None and len(latest) >= n:
+            break
+    return [latest[d] for d in sorted(latest)], errors
+
+
+def get_session(history_dir, date):
+    """Latest record for one date, or None. Scans from the tail."""
+    for _, session, error in iter_records_reverse(history_dir):
+        if error is None and session["date"] == date:
+            return session
+    return None
+
+
+# ---- Writing ----
+
+def _last_date(path):
+    """Date of the last parseable record, or None."""
+    for _, line in _iter_lines_reverse(path):
+        session, error = _decode(line)
+        if error is None:
+            return session["date"]
+    return None
+
+
+def write_store(history_dir, sessions, rejected=(), fsync=None):
+    """Atomically replace the store with one record per session, sorted by date.
+
+    `rejected` raw lines are appended to the rejects file so rewrites never lose data.
+    """
+    path = store_path(history_dir)
+    with locked(path.parent):
+        if rejected:
+            with open(path.with_name(path.name + REJECTS_SUFFIX), "ab") as f:
+                for line in rejected:
+                    f.write(line.rstrip(b"\n") + b"\n")
+        data = b"".join(encode(s) for s in sorted(sessions, key=lambda s: s["date"]))
+        atomic_write(path, data, fsync)
+
+
+def append_session(history_dir, session, fsync=None):
+    """Save one session: append a record, or rewrite the store if the date is out of order."""
+    if "date" not in session:
+        raise ValueError("session has no date")
+    path = store_path(history_dir)
+    with locked(path.parent):
+        last = _last_date(path) if path.is_file() else None
+        if last is not None and session["date"] < last:
+            compact(history_dir, extra=[session], fsync=fsync)
+            return
+        with open(path, "ab") as f:
+            # Terminate a torn last line so this record does not get glued onto it
+            if f.tell() > 0:
+                with open(path, "rb") as r:
+                    r.seek(-1, os.SEEK_END)
+                    if r.read(1) != b"\n":
+                        f.write(b"\n")
+            f.write(encode(session))
+            if env_flag(FSYNC_ENV) if fsync is None else fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def compact(history_dir, extra=(), fsync=None):
+    """Rewrite the store keeping only the latest record per date (plus `extra` sessions).
+
+    Returns stats: records read, sessions kept, superseded and rejected lines.
+    """
+    with locked(history_dir):
+        latest, rejected, records = {}, [], 0
+        for _, line, session, error in iter_records(history_dir):
+            if error is not None:
+                rejected.append(line)
+                continue
+            records += 1
+            latest[session["date"]] = session
+        for session in extra:
+            records += 1
+            latest[session["date"]] = session
+        write_store(history_dir, latest.values(), rejected, fsync)
+    return {"records": records, "sessions": len(latest),
+            "superseded": records - len(latest), "rejected": len(rejected)}
+
+
+# ---- Day-file compatibility (workout_live.py paths) ----
+
+def load_day(path):
+    """Session for a day path: the file if it exists, else the store record for its date, else None."""
+    p = Path(path)
+    if p.exists():
+        return json.loads(p.read_text())
+    if has_store(p.parent):
+        return get_session(p.parent, p.stem)
+    return None
+
+
+def save_day(path, data, compact=None, fsync=None):
+    """Save a session for a day path.
+
+    An existing day file is replaced atomically (it overrides the store); otherwise
+    the session is appended to the store when the history dir has one. Callers
+    that loaded the session first should hold locked(path's dir) across both.
+    """
+    p = Path(path)
+    with locked(p.parent):
+        if not p.exists() and "date" in data and has_store(p.parent):
+            append_session(p.parent, data, fsync)
+            return str(store_path(p.parent))
+        atomic_write(p, dump_json(data, compact), fsync)
+    return str(p)
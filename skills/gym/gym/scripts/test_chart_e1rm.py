@@ -15,7 +15,7 @@ import matplotlib
 matplotlib.use('Agg')
 
 sys.path.insert(0, os.path.dirname(__file__))
-from gym_analytics import cmd_chart_e1rm, load_sessions
+from gym_core import cmd_chart_e1rm, load_sessions
 
 
 def _make_session(date, day, exercises):
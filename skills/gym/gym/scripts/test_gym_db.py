@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Tests for gym_db.py"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(__file__))
+import gym_core as ga
+import gym_db
+import gym_store
+
+
+def _set(weight, reps, rpe=None):
+    s = {"weight_kg": weight, "reps": reps}
+    if rpe is not None:
+        s["rpe"] = rpe
+    return s
+
+
+def _session(date, sets=((100, 5),), name="Squat", mg="legs", **kwargs):
+    s = {"date": date, "actual": [{"name": name, "muscle_group": mg, "sets": [_set(*st) for st in sets]}]}
+    s.update(kwargs)
+    return s
+
+
+def _age(path, seconds=60):
+    """Backdate a file so the racy-mtime check trusts it."""
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+class TestSync(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.d = Path(self.tmp.name)
+        self.conn = gym_db.connect(self.d / gym_db.DB_FILENAME)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def _write(self, session, seconds=60):
+        path = self.d / f"{session['date']}.json"
+        path.write_text(json.dumps(session))
+        _age(path, seconds)
+
+    def _sync(self, **kwargs):
+        return gym_db.sync(self.conn, self.d, ga._parse_session_file, ga._db_session_rows, **kwargs)
+
+    def _dates(self):
+        return [r[0] for r in self.conn.execute("SELECT date FROM sessions ORDER BY date")]
+
+    def test_rows_mirror_sessions(self):
+        self._write(_session("2026-01-05", [(100, 5, 8), (105, 3, 9)],
+                             planned=[{"name": "Squat", "sets_reps": "3x5"}, {"name": "OHP", "muscle_group": "shoulders",
+                                                                              "sets": [{"reps": 8}] * 2}]))
+        stats = self._sync()
+        self.assertEqual((stats["reparsed"], stats["sessions"]), (1, 1))
+        self.assertEqual(gym_db.table_counts(self.conn),
+                         {"sessions": 1, "exercises": 1, "sets": 2, "planned": 2, "goals": 0})
+        ex = self.conn.execute("SELECT * FROM exercises").fetchone()
+        self.assertEqual((ex["canonical"], ex["n_sets"], ex["best_weight"], ex["best_reps"]), ("squat", 2, 100, 5))
+        self.assertAlmostEqual(ex["best_e1rm"], 116.67, places=2)
+        self.assertEqual([tuple(r) for r in self.conn.execute("SELECT rpe, weight_kg FROM sets ORDER BY set_no")],
+                         [(8, 100), (9, 105)])
+        self.assertEqual([tuple(r) for r in self.conn.execute("SELECT muscle_group, n_sets FROM planned")],
+                         [("legs", 3), ("shoulders", 2)])
+        week = self.conn.execute("SELECT week, week_start FROM sessions").fetchone()
+        self.assertEqual(tuple(week), ("2026-W02", "2026-01-05"))
+
+    def test_incremental_by_mtime(self):
+        for date in ("2026-01-05", "2026-01-07", "2026-01-09"):
+            self._write(_session(date))
+        self.assertEqual(self._sync()["reparsed"], 3)
+        self.assertEqual(self._sync()["reparsed"], 0)
+
+        self._write(_session("2026-01-07", [(120, 5)]), seconds=30)
+        (self.d / "2026-01-09.json").unlink()
+        stats = self._sync()
+        self.assertEqual((stats["reparsed"], stats["removed"], stats["sessions"]), (1, 1, 2))
+        self.assertEqual(self._dates(), ["2026-01-05", "2026-01-07"])
+        self.assertEqual(self.conn.execute("SELECT MAX(weight_kg) FROM sets").fetchone()[0], 120)
+        self.assertEqual(gym_db.table_counts(self.conn)["sets"], 2)  # cascaded away with their sessions
+
+    def test_recent_files_are_reread(self):
+        self._write(_session("2026-01-05"), seconds=0)
+        self._sync()
+        self.assertEqual(self._sync()["reparsed"], 1)
+
+    def test_bad_file_reported_and_skipped(self):
+        (self.d / "2026-01-05.json").write_text("{not json")
+        stats = self._sync()
+        self.assertEqual((len(stats["errors"]), stats["sessions"]), (1, 0))
+
+    def test_store_merged_day_file_wins(self):
+        gym_store.append_session(self.d, _session("2026-01-05", [(80, 5)]))
+        gym_store.append_session(self.d, _session("2026-01-07", [(90, 5)]))
+        _age(gym_store.store_path(self.d))
+        self._write(_session("2026-01-07", [(95, 5)]))
+        stats = self._sync()
+        self.assertEqual((stats["store_sessions"], stats["sessions"]), (1, 2))
+        sources = dict(self.conn.execute("SELECT date, source FROM sessions"))
+        self.assertEqual(sources, {"2026-01-05": gym_store.STORE_FILENAME, "2026-01-07": "2026-01-07.json"})
+
+        # Removing the day file exposes the store record again
+        (self.d / "2026-01-07.json").unlink()
+        self._sync()
+        self.assertEqual(self.conn.execute("SELECT MAX(weight_kg) FROM sets").fetchone()[0], 90)
+
+        # Only changed store records are rewritten
+        gym_store.append_session(self.d, _session("2026-01-09"))
+        _age(gym_store.store_path(self.d), 30)
+        self.assertEqual(self._sync()["store_sessions"], 1)
+        self.assertEqual(self._dates(), ["2026-01-05", "2026-01-07", "2026-01-09"])
+
+    def test_goals(self):
+        goals = self.d / "goals.json"
+        goals.write_text(json.dumps([{"date_set": "2026-01-01", "target_date": "2026-03-30",
+                                      "goals": {"Squat": 150, "OHP": {"target": 70, "short": "OHP"}}}]))
+        _age(goals)
+        self._write(_session("2026-01-05", [(120, 5)], name="Back Squat"))
+        stats = self._sync(goals_path=goals, goal_rows=ga._db_goal_rows)
+        self.assertEqual(stats["goals"], 2)
+        cols, rows = gym_db.query(self.conn, "goals")
+        result = {r[cols.index("lift")]: r for r in rows}
+        self.assertEqual(result["Squat"][cols.index("best")], 140.0)
+        self.assertEqual(result["Squat"][cols.index("remaining")], 10.0)
+        self.assertIsNone(result["OHP"][cols.index("best")])
+        self.assertIsNone(self._sync(goals_path=goals, goal_rows=ga._db_goal_rows)["goals"])  # unchanged
+
+    def test_schema_version_upgrade_rebuilds(self):
+        self._write(_session("2026-01-05"))
+        self._sync()
+        self.conn.execute("UPDATE meta SET value = '0' WHERE key = 'schema_version'")
+        self.conn.commit()
+        self.conn.close()
+        self.conn = gym_db.connect(self.d / gym_db.DB_FILENAME)
+        self.assertEqual(gym_db.table_counts(self.conn)["sessions"], 0)
+        self.assertEqual(self._sync()["reparsed"], 1)
+
+
+class TestQueries(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.path = Path(cls.tmp.name) / gym_db.DB_FILENAME
+        cls.conn = gym_db.connect(cls.path)
+        sessions = [
+            _session("2026-01-05", [(100, 5, 7), (110, 3, 9)], planned=[{"name": "Squat", "sets_reps": "4x5"}]),
+            _session("2026-01-07", [(80, 8, 8)], name="Bench Press", mg="chest"),
+            _session("2026-01-12", [(105, 5, 8)], name="Back Squat"),
+            _session("2026-01-21", [(85, 6)], name="Flat Bench", mg="chest"),
+        ]
+        with cls.conn:
+            for s in sessions:
+                gym_db._insert_session(cls.conn, s, f"{s['date']}.json", ga._db_session_rows(s))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        cls.tmp.cleanup()
+
+    def _query(self, report, **filters):
+        if filters.get("exercise"):
+            filters.update(exercise_key=filters["exercise"].lower(),
+                           canonical=ga._DEFAULT_RESOLVER.canonical(filters["exercise"]))
+        cols, rows = gym_db.query(self.conn, report, **filters)
+        return [dict(zip(cols, r)) for r in rows]
+
+    def test_top_sets_filters(self):
+        rows = self._query("top-sets", exercise="squat", max_rpe=8)
+        self.assertEqual([(r["date"], r["weight_kg"]) for r in rows], [("2026-01-12", 105), ("2026-01-05", 100)])
+        rows = self._query("top-sets", limit=1)
+        self.assertEqual((rows[0]["exercise"], rows[0]["e1rm"]), ("Back Squat", 122.5))
+        self.assertEqual(len(self._query("top-sets", since="2026-01-07", until="2026-01-12")), 2)
+
+    def test_best_sets_one_per_canonical(self):
+        rows = self._query("best-sets")
+        self.assertEqual([(r["exercise"], r["e1rm"]) for r in rows], [("Back Squat", 122.5), ("Flat Bench", 102.0)])
+
+    def test_weekly_sets_vs_planned(self):
+        rows = self._query("weekly-sets", muscle_group="legs")
+        self.assertEqual([(r["week"], r["sets"], r["planned"]) for r in rows],
+                         [("2026-W02", 2, 4), ("2026-W03", 1, 0)])
+
+    def test_weeks_counts_back_from_latest(self):
+        rows = self._query("e1rm-history", exercise="bench", weeks=1)
+        self.assertEqual([r["date"] for r in rows], ["2026-01-21"])
+
+    def test_filter_validation(self):
+        with self.assertRaises(ValueError):
+            self._query("weekly-sets", max_rpe=8)
+        with self.assertRaises(ValueError):
+            self._query("e1rm-history")
+        with self.assertRaises(ValueError):
+            self._query("nope")
+
+    def test_run_sql_is_read_only(self):
+        self.conn.commit()
+        cols, rows = gym_db.run_sql(self.path, "SELECT COUNT(*) AS n FROM sets")
+        self.assertEqual((cols, rows), (["n"], [(5,)]))
+        with self.assertRaises(sqlite3.OperationalError):
+            gym_db.run_sql(self.path, "DELETE FROM sets")
+        with self.assertRaises(FileNotFoundError):
+            gym_db.run_sql(self.path.with_name("missing.sqlite"), "SELECT 1")
+
+    def test_backends_match_set_table(self):
+        sessions = [ga.make_record(json.loads(r[0])) for r in self.conn.execute("SELECT data FROM sessions ORDER BY date")]
+        table = ga.SetTable(sessions)
+        self.assertEqual(gym_db.latest_e1rm(self.conn), table.latest_e1rm())
+        self.assertEqual(gym_db.weekly_volume(self.conn), table.weekly_volume())
+        names = [n for n in gym_db.exercise_names(self.conn) if ga.normalize_match(n, "Squat")]
+        self.assertEqual(gym_db.progress_entries(self.conn, names), table.progress_entries("Squat"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Tests for gym_encode.py"""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import gym_encode
+from PIL import Image, ImageDraw
+
+
+def _chart(size=(600, 400), lines=12, seed=0):
+    """Dark background with anti-aliased-ish coloured polylines, like the dashboards."""
+    rng = random.Random(seed)
+    image = Image.new("RGBA", size, "#0d1117")
+    draw = ImageDraw.Draw(image)
+    for i in range(lines):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        points = [(x, rng.randrange(size[1])) for x in range(0, size[0], 20)]
+        draw.line(points, fill=color, width=2 + i % 3)
+    return image.resize((size[0] // 2, size[1] // 2), Image.LANCZOS).resize(size)
+
+
+class TestSizes(unittest.TestCase):
+
+    def test_parse_size(self):
+        self.assertEqual(gym_encode.parse_size("150000"), 150000)
+        self.assertEqual(gym_encode.parse_size("200k"), 200 * 1024)
+        self.assertEqual(gym_encode.parse_size("1.5M"), 1536 * 1024)
+        self.assertEqual(gym_encode.parse_size("64KB"), 64 * 1024)
+        for bad in ("", "abc", "0", "-5k"):
+            with self.assertRaises(ValueError):
+                gym_encode.parse_size(bad)
+
+    def test_image_format(self):
+        self.assertEqual(gym_encode.image_format("a/b.WEBP"), "WEBP")
+        self.assertEqual(gym_encode.image_format("c.jpeg"), "JPEG")
+        with self.assertRaises(ValueError):
+            gym_encode.image_format("c.svg")
+
+
+class TestEncode(unittest.TestCase):
+
+    def test_optimized_png_is_palette_and_smaller(self):
+        image = _chart()
+        plain, _ = gym_encode.encode(image, "PNG")
+        data, info = gym_encode.encode(image, "PNG", optimize=True)
+        self.assertLess(len(data), len(plain))
+        self.assertEqual(info["colors"], 256)
+        self.assertEqual(info["bytes"], len(data))
+        self.assertTrue(info["fits"])
+
+    def test_lossy_defaults(self):
+        for fmt, q in (("WEBP", 80), ("JPEG", 85)):
+            _, info = gym_encode.encode(_chart(), fmt)
+            self.assertEqual((info["format"], info["quality"], info["attempts"]), (fmt.lower(), q, 1))
+
+    def test_max_bytes_picks_highest_fitting_quality(self):
+        image = _chart()
+        full, _ = gym_encode.encode(image, "WEBP", quality=90)
+        budget = len(full) * 2 // 3
+        data, info = gym_encode.encode(image, "WEBP", quality=90, max_bytes=budget)
+        self.assertTrue(info["fits"])
+        self.assertLessEqual(len(data), budget)
+        self.assertLess(info["quality"], 90)
+        self.assertEqual(info["quality"] % gym_encode.QUALITY_STEP, 0)
+        # The next step up would not have fit
+        above, _ = gym_encode.encode(image, "WEBP", quality=info["quality"] + gym_encode.QUALITY_STEP)
+        self.assertGreater(len(above), budget)
+
+    def test_max_bytes_already_met_is_one_encode(self):
+        _, info = gym_encode.encode(_chart(), "JPEG", max_bytes=10 << 20)
+        self.assertEqual((info["quality"], info["attempts"]), (85, 1))
+
+    def test_png_ladder_steps_down_palette(self):
+        image = _chart()
+        p256, _ = gym_encode.encode(image, "PNG", optimize=True, max_bytes=1 << 30)
+        small = gym_encode._encode(image.convert("RGB"), "PNG", colors=16)
+        _, info = gym_encode.encode(image, "PNG", max_bytes=len(small))
+        self.assertTrue(info["fits"])
+        self.assertEqual(info["colors"], 16)
+        self.assertGreater(len(p256), len(small))
+
+    def test_unreachable_budget_keeps_smallest(self):
+        data, info = gym_encode.encode(_chart(), "JPEG", max_bytes=100)
+        self.assertFalse(info["fits"])
+        self.assertEqual(info["quality"], gym_encode.QUALITY_MIN)
+        self.assertIn("over --max-bytes 0.1 KB", gym_encode.describe(info, 100))
+
+
+class TestSave(unittest.TestCase):
+
+    def test_save_formats(self):
+        image = _chart()
+        with tempfile.TemporaryDirectory() as d:
+            for name, fmt in (("c.png", "PNG"), ("c.webp", "WEBP"), ("c.jpg", "JPEG")):
+                path = os.path.join(d, name)
+                info = gym_encode.save(image, path, optimize=True)
+                self.assertEqual(os.path.getsize(path), info["bytes"])
+                with Image.open(path) as saved:
+                    self.assertEqual((saved.format, saved.size), (fmt, image.size))
+            with self.assertRaises(ValueError):
+                gym_encode.save(image, os.path.join(d, "c.gif"))
+
+    def test_from_figure(self):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=(4, 2), dpi=50)
+        try:
+            image = gym_encode.from_figure(fig, dpi=50)
+        finally:
+            plt.close(fig)
+        self.assertEqual(image.size, (200, 100))
+
+    def test_describe(self):
+        info = {"format": "webp", "bytes": 86221, "quality": 75, "colors": None,
+                "attempts": 3, "fits": True, "encode_ms": 412.4}
+        self.assertEqual(gym_encode.describe(info), "webp 84.2 KB, quality 75, 3 tries, encoded in 412 ms")
+
+
+if __name__ == "__main__":
+    unittest.main()
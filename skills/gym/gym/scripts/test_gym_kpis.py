@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Tests for gym_kpis.py"""
+
+import os
+import random
+import sys
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(__file__))
+from gym_kpis import RollingKpis, SparseMax
+
+
+class TestSparseMax(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(1)
+        for n in (0, 1, 2, 3, 7, 8, 33):
+            values = [rng.uniform(0, 200) for _ in range(n)]
+            table = SparseMax(values)
+            for lo in range(n + 1):
+                for hi in range(lo, n + 1):
+                    expected = max(values[lo:hi]) if hi > lo else None
+                    self.assertEqual(table.query(lo, hi), expected)
+
+
+class TestRollingKpis(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.days, self.sets = [], []
+        day = date(2026, 1, 1).toordinal()
+        for _ in range(120):
+            day += rng.choice([1, 2, 3])
+            self.days.append(day)
+            self.sets.append(rng.randint(8, 25))
+        self.lift = ([d for d in self.days if d % 2], [rng.uniform(60, 140) for d in self.days if d % 2])
+        self.kpis = RollingKpis(self.days, self.sets, {"Squat": self.lift})
+
+    def _brute(self, start, end):
+        idx = [i for i, d in enumerate(self.days) if start <= d <= end]
+        best = [v for d, v in zip(*self.lift) if start <= d <= end]
+        return len(idx), sum(self.sets[i] for i in idx), max(best) if best else None
+
+    def test_windows_match_brute_force(self):
+        rng = random.Random(3)
+        for _ in range(300):
+            start = rng.randint(self.days[0] - 20, self.days[-1] + 5)
+            end = start + rng.randint(0, 60)
+            count, sets, best = self._brute(start, end)
+            self.assertEqual(self.kpis.session_count(start, end), count)
+            self.assertEqual(self.kpis.hard_sets(start, end), sets)
+            self.assertEqual(self.kpis.best("Squat", start, end), best)
+
+    def test_window_fields(self):
+        start, end = self.kpis.trailing(14)
+        self.assertEqual(end, self.days[-1])
+        w = self.kpis.window(start, end)
+        count, sets, best = self._brute(start, end)
+        self.assertEqual((w["days"], w["sessions"], w["hard_sets"]), (14, count, sets))
+        self.assertEqual(w["adherence_pct"], min(100, round(count / 6 * 100)))
+        self.assertEqual(w["avg_e1rm"], round(best, 1) if best else 0)
+        self.assertEqual(w["end"], date.fromordinal(end).isoformat())
+
+    def test_compare_change(self):
+        cur, prev = self.kpis.trailing(14), self.kpis.trailing(14, self.days[-1] - 14)
+        result = self.kpis.compare(cur, prev)
+        self.assertEqual(result["change"]["hard_sets"],
+                         result["current"]["hard_sets"] - result["previous"]["hard_sets"])
+
+    def test_compare_without_previous_lifts(self):
+        kpis = RollingKpis([10, 20], [5, 5], {"Squat": ([20], [100])})
+        result = kpis.compare((15, 20), (5, 14))
+        self.assertEqual(result["change"]["avg_e1rm"], 0)
+        self.assertEqual(result["change"]["sessions"], 0)
+
+    def test_empty_history(self):
+        kpis = RollingKpis([], [], {})
+        self.assertIsNone(kpis.last)
+        self.assertEqual(kpis.session_count(0, 100), 0)
+        self.assertEqual(kpis.hard_sets(0, 100), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Tests for gym_periods.py"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(__file__))
+from gym_kpis import RollingKpis
+from gym_periods import PeriodIndex, load_programs, program_mesocycle, report
+
+
+def _day(iso):
+    return date.fromisoformat(iso).toordinal()
+
+
+def _program(name, start, end, deload=None, days=("A", "B", "C")):
+    p = {"name": name, "start_date": start, "end_date": end, "days": {d: {} for d in days}}
+    if deload is not None:
+        p["deload_week"] = deload
+    return p
+
+
+MESO = [program_mesocycle(_program("Base", "2026-01-05", "2026-02-15", 6)),
+        program_mesocycle(_program("Build", "2026-02-16", "2026-03-29", 6, days=("A", "B"))),
+        program_mesocycle(_program("Peak", "2026-04-13", "2026-05-10"))]
+
+
+class TestProgramMesocycle(unittest.TestCase):
+
+    def test_fields(self):
+        m = program_mesocycle({"mesocycle": 2, "start_date": "2026-01-05", "end_date": "2026-02-15",
+                               "deload_week": 6, "days": {"A": {}, "B": {}}})
+        self.assertEqual((m["name"], m["deload_week"], m["sessions_per_week"]), ("Mesocycle 2", 6, 2))
+
+    def test_undated_or_reversed(self):
+        self.assertIsNone(program_mesocycle({"name": "x"}))
+        self.assertIsNone(program_mesocycle(_program("x", "2026-02-01", "2026-01-01")))
+        self.assertIsNone(program_mesocycle([]))
+
+
+class TestPeriodIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = PeriodIndex(list(reversed(MESO)))
+
+    def test_find(self):
+        self.assertEqual(self.index.find(_day("2026-01-05"))["name"], "Base")
+        self.assertEqual(self.index.find(_day("2026-02-16"))["name"], "Build")
+        self.assertIsNone(self.index.find(_day("2026-04-01")))  # gap between programs
+        self.assertIsNone(self.index.find(_day("2025-12-31")))
+        # The newest program stays current past its end_date
+        self.assertEqual(self.index.find(_day("2026-06-01"))["name"], "Peak")
+        self.assertEqual(self.index.bounds(2, _day("2026-06-01")), (_day("2026-04-13"), _day("2026-06-01")))
+
+    def test_resolve(self):
+        day = _day("2026-03-01")
+        self.assertEqual(self.index.resolve("current", day), 1)
+        self.assertEqual(self.index.resolve("previous", day), 0)
+        self.assertEqual(self.index.resolve("PEAK", day), 2)
+        self.assertIsNone(self.index.resolve("all", day))
+        self.assertIsNone(self.index.resolve("nope", day))
+        self.assertIsNone(self.index.resolve("previous", _day("2026-01-10")))
+        # In a gap there is no current mesocycle; previous is the one before the gap
+        gap = _day("2026-04-01")
+        self.assertEqual((self.index.resolve("current", gap), self.index.resolve("previous", gap)), (None, 1))
+
+    def test_overlap_cut_and_duplicate_start(self):
+        index = PeriodIndex([program_mesocycle(_program("Old", "2026-01-01", "2026-03-01")),
+                             program_mesocycle(_program("New", "2026-02-01", "2026-04-01")),
+                             program_mesocycle(_program("New v2", "2026-02-01", "2026-04-15"))])
+        self.assertEqual(index.names(), ["Old", "New v2"])
+        self.assertEqual(index.bounds(0), (_day("2026-01-01"), _day("2026-01-31")))
+
+
+class TestLoadPrograms(unittest.TestCase):
+
+    def test_archive_and_current(self):
+        with tempfile.TemporaryDirectory() as d:
+            archive = Path(d, "programs")
+            archive.mkdir()
+            (archive / "meso1.json").write_text(json.dumps(_program("Base", "2026-01-05", "2026-02-15")))
+            (archive / "broken.json").write_text("{")
+            (archive / "undated.json").write_text(json.dumps({"name": "x"}))
+            Path(d, "program.json").write_text(json.dumps(_program("Build", "2026-02-16", "2026-03-29")))
+            mesocycles, warnings = load_programs(os.path.join(d, "program.json"), archive)
+            self.assertEqual([m["name"] for m in mesocycles], ["Base", "Build"])
+            self.assertEqual(len(warnings), 2)
+            self.assertEqual(PeriodIndex(mesocycles).lookup("meso1"), 0)
+
+    def test_missing(self):
+        self.assertEqual(load_programs("/nonexistent/program.json", "/nonexistent/programs"), ([], []))
+
+
+class TestReport(unittest.TestCase):
+
+    def test_aggregates(self):
+        days = [_day(d) for d in ("2026-01-05", "2026-01-07", "2026-02-10", "2026-02-17", "2026-03-02")]
+        kpis = RollingKpis(days, [10, 12, 4, 15, 16], {"Squat": (days, [100, 102, 90, 105, 108])})
+        rows = report(PeriodIndex(MESO), kpis, _day("2026-03-02"))
+        base, build, peak = rows
+        self.assertEqual((base["sessions"], base["hard_sets"], base["avg_e1rm"]), (3, 26, 102))
+        self.assertTrue(base["complete"])
+        self.assertEqual(base["deload"], {"start": "2026-02-09", "end": "2026-02-15", "sessions": 1, "hard_sets": 4})
+        # Build is 15 days in, planned at 2 sessions/week
+        self.assertEqual((build["days"], build["sessions"], build["adherence_pct"]), (15, 2, 47))
+        self.assertFalse(build["complete"])
+        self.assertEqual((peak["sessions"], peak["lifts"]), (0, {"Squat": None}))
+        self.assertEqual([r["name"] for r in report(PeriodIndex(MESO), kpis, _day("2026-03-02"), [1])], ["Build"])
+
+
+if __name__ == "__main__":
+    unittest.main()
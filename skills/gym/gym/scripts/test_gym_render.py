@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Tests for gym_render.py"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(__file__))
+import gym_render
+from gym_render import date_ticks, nice_ticks
+from PIL import Image
+
+
+def _spec(orientation="vertical", n=30, kpis=True):
+    start = datetime(2026, 1, 5)
+    dates = [start + timedelta(days=2 * i) for i in range(n)]
+    series = [{"name": name, "label": name[:5], "color": color, "dates": dates,
+               "values": [base + i for i in range(n)]}
+              for name, color, base in (("Squat", "#4FC3F7", 100), ("Bench Press", "#EF5350", 70))]
+    latest = dates[-1]
+    return {
+        "orientation": orientation,
+        "series": series,
+        "kpis": {"adherence": 83, "adherence_color": "#FFA726", "avg_e1rm": 112.5, "show_delta": True,
+                 "adherence_delta": ("▲", 17, "#66BB6A"), "e1rm_delta": ("▼", 1.5, "#EF5350")} if kpis else None,
+        "goal_lines": [("#4FC3F7", (dates[0], 100), (latest + timedelta(weeks=8), 160))],
+        "planned": [("#EF5350", (latest, 99), (latest + timedelta(days=2), 102))],
+        "bands": ((latest - timedelta(days=13), latest), (latest - timedelta(days=27), latest - timedelta(days=14))),
+    }
+
+
+class TestTicks(unittest.TestCase):
+
+    def test_nice_ticks(self):
+        self.assertEqual(nice_ticks(0, 147), [0, 20, 40, 60, 80, 100, 120, 140])
+        self.assertEqual(nice_ticks(0, 9), [0, 1, 2, 3, 4, 5, 6, 7, 8, 9])
+        self.assertEqual(nice_ticks(0, 23), [0, 5, 10, 15, 20])
+        self.assertEqual(nice_ticks(0, 2.3), [0, 0.5, 1.0, 1.5, 2.0])
+
+    def test_date_ticks_are_calendar_aligned(self):
+        lo, hi = datetime(2026, 1, 3).toordinal(), datetime(2026, 2, 20).toordinal()
+        ticks = date_ticks(lo, hi, 8)
+        self.assertLessEqual(len(ticks), 8)
+        self.assertTrue(all((t.day - 1) % 7 == 0 for t in ticks))
+        long = date_ticks(datetime(2024, 1, 1).toordinal(), datetime(2026, 1, 1).toordinal(), 8)
+        self.assertTrue(all(t.day == 1 for t in long))
+        self.assertLessEqual(len(long), 9)
+
+
+class TestRender(unittest.TestCase):
+
+    def test_vertical_canvas_matches_matplotlib_figure(self):
+        image = gym_render.render_e1rm_dashboard(_spec())
+        self.assertEqual(image.size, (1290, 2796))
+        # Series colors reach the plot; the header is drawn above it
+        colors = {c for _, c in image.getcolors(1 << 20)}
+        self.assertIn((0x4F, 0xC3, 0xF7), colors)
+        self.assertIn((0xEF, 0x53, 0x50), colors)
+
+    def test_horizontal_is_cropped(self):
+        image = gym_render.render_e1rm_dashboard(_spec("horizontal", kpis=False))
+        self.assertLess(image.width, 1800)
+        self.assertLess(image.height, 900)
+
+    def test_empty_series(self):
+        spec = _spec()
+        spec.update(series=[], goal_lines=[], planned=[], bands=None)
+        self.assertEqual(gym_render.render_e1rm_dashboard(spec).size, (1290, 2796))
+
+    def test_save_formats(self):
+        image = gym_render.render_e1rm_dashboard(_spec("horizontal", n=5, kpis=False))
+        with tempfile.TemporaryDirectory() as d:
+            for name in ("c.png", "c.jpg"):
+                gym_render.save(image, os.path.join(d, name))
+                with Image.open(os.path.join(d, name)) as saved:
+                    self.assertEqual(saved.size, image.size)
+            with self.assertRaises(ValueError):
+                gym_render.save(image, os.path.join(d, "c.nope"))
+
+
+if __name__ == "__main__":
+    unittest.main()
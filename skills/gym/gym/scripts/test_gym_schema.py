@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Tests for gym_schema.py"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import gym_schema
+
+
+# The Session Log Format example from SKILL.md, plus an analysis block as `analyze` writes it
+DOC = {
+    "date": "2026-02-13",
+    "day": "B",
+    "start_time": "19:43",
+    "end_time": "20:55",
+    "planned": [{"name": "OHP", "muscle_group": "shoulders", "sets": [{"reps": 10, "weight_kg": 45}]},
+                {"name": "Squat", "sets_reps": "4x8-10", "weight_kg": "100-120",
+                 "sets": [{"reps": "8-10", "weight_kg": 100, "warmup": True}]}],
+    "actual": [{"name": "OHP", "muscle_group": "shoulders", "sets": [{"reps": 8, "weight_kg": 45, "rpe": 8.5}],
+                "end_time": "20:10"}],
+    "notes": "Free text",
+    "analysis": {"e1rm": {"OHP": 57.0}, "volume_sets": {"shoulders": 1}, "plan_adherence": 0.5,
+                 "e1rm_delta": {"OHP": {"previous": 55.0, "current": 57.0, "delta": 2.0, "trend": "↑"}},
+                 "strengths": ["OHP +2"], "computed": {"version": 1}},
+}
+
+
+class TestSessionSchema(unittest.TestCase):
+
+    def test_documented_session_is_valid(self):
+        self.assertEqual(gym_schema.validate_session(DOC), [])
+
+    def test_unknown_keys_and_nulls_accepted(self):
+        doc = {"date": "2026-02-13", "exercises": [{"name": "Dips", "sets": [{"reps": 12, "weight_kg": None}],
+                                                    "tempo": "3010"}],
+               "bodyweight_kg": None, "plan_adherence": "full", "mood": 4}
+        self.assertEqual(gym_schema.validate_session(doc), [])
+
+    def test_collects_every_error_with_location(self):
+        doc = {"start_time": "19:61", "planned": [{"sets_reps": "3x10"}, "x"],
+               "actual": [{"name": "OHP", "sets": [{"reps": 8}, {"reps": "eight", "weight_kg": "heavy"}]},
+                          {"sets": [{"reps": True}]}],
+               "analysis": {"e1rm": {"OHP": -1}, "strengths": "none"}}
+        self.assertEqual(gym_schema.validate_session(doc), [
+            "Missing field: date",
+            "Invalid start_time: 19:61 (expected HH:MM)",
+            "Missing field: name in planned exercise 1",
+            "Invalid value in planned exercise 2: x (expected object)",
+            "Invalid reps in exercise 'OHP' set 2: eight (expected number >= 0)",
+            "Invalid weight_kg in exercise 'OHP' set 2: heavy (expected number)",
+            "Missing field: name in exercise 2",
+            "Invalid reps in exercise 2 set 1: true (expected number >= 0)",
+            "Invalid analysis.e1rm.OHP: -1 (expected number >= 0)",
+            "Invalid analysis.strengths: none (expected list)",
+        ])
+
+    def test_set_values(self):
+        # Float reps (8.0 from some writers) and negative (assisted) weights are fine; text is not
+        sets = [{"reps": 8.0, "weight_kg": -20}, {"reps": 5, "weight_kg": 100.5, "rpe": None, "warmup": False}]
+        self.assertEqual(gym_schema.validate_exercise({"name": "Dips", "sets": sets}), [])
+        sets = [{"reps": -1}, {"reps": 5, "weight_kg": "100"}, {"reps": 5, "warmup": "yes"}, {"reps": 5, "rpe": "8"}]
+        self.assertEqual(gym_schema.validate_exercise({"name": "Dips", "sets": sets}), [
+            "Invalid reps in exercise 'Dips' set 1: -1 (expected number >= 0)",
+            "Invalid weight_kg in exercise 'Dips' set 2: 100 (expected number)",
+            "Invalid warmup in exercise 'Dips' set 3: yes (expected true/false)",
+            "Invalid rpe in exercise 'Dips' set 4: 8 (expected number)",
+        ])
+
+    def test_free_text_fields_take_any_scalar(self):
+        # Older history has numbers in day / notes; only lists and objects are rejected there
+        doc = {"date": "2026-02-13", "day": 1, "notes": 42, "planned": [{"name": "Squat", "sets_reps": 5}],
+               "actual": [{"name": "Squat", "muscle_group": None, "notes": True, "sets": []}]}
+        self.assertEqual(gym_schema.validate_session(doc), [])
+        self.assertEqual(gym_schema.validate_session(dict(doc, notes={"text": "x"})),
+                         ['Invalid notes: {"text": "x"} (expected string or number or true/false)'])
+
+    def test_actual_or_exercises_required(self):
+        self.assertEqual(gym_schema.validate_session({"date": "2026-02-13"}),
+                         ["Missing field: actual (or exercises)"])
+        self.assertEqual(gym_schema.validate_session([]), ["Invalid value: [] (expected object)"])
+
+    def test_dates(self):
+        self.assertTrue(gym_schema.is_date("2024-02-29"))
+        for bad in ("2023-02-29", "2026-1-5", "2026-13-01", "2026-04-31", 20260105, None):
+            self.assertFalse(gym_schema.is_date(bad), bad)
+        self.assertEqual(gym_schema.validate_session({"date": "2026-1-5", "actual": []}),
+                         ["Invalid date: 2026-1-5 (expected YYYY-MM-DD)"])
+
+    def test_long_values_truncated(self):
+        [error] = gym_schema.validate_session({"date": "2026-02-13", "actual": [], "day": list(range(50))})
+        self.assertTrue(error.startswith("Invalid day: [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11..."), error)
+        self.assertLess(len(error), 100)
+
+    def test_exercise_and_planned(self):
+        self.assertEqual(gym_schema.validate_exercise({"name": "OHP", "sets": [{"reps": 10, "weight_kg": 45}]}), [])
+        self.assertEqual(gym_schema.validate_exercise({"name": "OHP", "sets": {"reps": 10}}),
+                         ["Invalid sets in exercise 'OHP': {\"reps\": 10} (expected list)"])
+        self.assertEqual(gym_schema.validate_planned("x"), ["Invalid planned: x (expected list)"])
+
+
+class TestCompiler(unittest.TestCase):
+
+    def test_custom_node(self):
+        check = gym_schema.compile_node({"type": "object", "required": ("a",), "fields": {
+            "a": {"type": ("int", "str"), "min": 1},
+            "b": {"type": "list", "items": {"type": "number"}},
+        }})
+        errors = []
+        check({"a": 0, "b": [1, 2.5, "3"]}, "doc", "", errors)
+        self.assertEqual(errors, ["Invalid doc.a: 0 (expected integer or string >= 1)",
+                                  "Invalid doc.b[2]: 3 (expected number)"])
+        errors = []
+        check({"a": "x", "b": []}, None, "", errors)
+        self.assertEqual(errors, [])
+
+    def test_set_loop_matches_per_set_checks(self):
+        # The one-loop pass over a list of sets must flag exactly what checking each set would
+        base = [{"reps": 8, "weight_kg": 100.0}, {"reps": 6, "weight_kg": -20, "rpe": 8.5, "warmup": False}]
+        edits = [("reps", -2), ("reps", True), ("reps", 8.0), ("reps", "8-10"), ("reps", None),
+                 ("weight_kg", None), ("weight_kg", "heavy"), ("rpe", "hard"), ("warmup", 1),
+                 ("tempo", "3010"), ("tempo", [1])]
+        for node in (gym_schema.SET, gym_schema.PLANNED_SET):
+            check_list = gym_schema.compile_node({"type": "list", "items": node, "item": "set"})
+            check_set = gym_schema.compile_node(node)
+            for i in range(len(base)):
+                for key, value in edits:
+                    sets = [dict(st) for st in base]
+                    sets[i][key] = value
+                    for value_list in (sets, sets + ["x"]):
+                        expected = []
+                        for j, st in enumerate(value_list):
+                            check_set(st, None, f" in set {j + 1}", expected)
+                        errors = []
+                        check_list(value_list, "sets", "", errors)
+                        self.assertEqual(errors, expected, (node is gym_schema.SET, i, key, value))
+
+    def test_matches_legacy_checks_on_bench_history(self):
+        import gym_bench
+        result = gym_bench.bench_schema(sessions=300, repeat=1)
+        self.assertEqual(result["invalid_compiled"], result["invalid_legacy"])
+        self.assertEqual(result["invalid_compiled"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Tests for gym_series.py"""
+
+import math
+import os
+import sys
+import unittest
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+from gym_series import SeriesStore, downsample, ema, lttb, weekly_max
+
+
+def _day(iso):
+    return date.fromisoformat(iso).toordinal()
+
+
+def _series(n, seed=0, gap=2):
+    rng = np.random.default_rng(seed)
+    days = _day("2020-01-06") + np.cumsum(rng.integers(1, gap + 1, n))
+    return days, 100 + np.cumsum(rng.normal(0.2, 2.0, n))
+
+
+def _ema_loop(days, values, halflife):
+    out = [float(values[0])]
+    for i in range(1, len(values)):
+        d = 0.5 ** ((days[i] - days[i - 1]) / halflife)
+        out.append(d * out[-1] + (1 - d) * float(values[i]))
+    return out
+
+
+class TestWeeklyMax(unittest.TestCase):
+
+    def test_best_of_each_week_and_last(self):
+        # Mon 2026-01-05 .. Sun 01-11 is one week; 01-12 starts the next
+        days = [_day(d) for d in ("2026-01-05", "2026-01-07", "2026-01-11", "2026-01-12", "2026-01-14")]
+        d, v = weekly_max(days, [100, 105, 102, 108, 104])
+        self.assertEqual(list(d), [days[1], days[3], days[4]])
+        self.assertEqual(list(v), [105, 108, 104])
+
+    def test_empty(self):
+        d, v = weekly_max([], [])
+        self.assertEqual((len(d), len(v)), (0, 0))
+
+
+class TestLttb(unittest.TestCase):
+
+    def test_count_and_endpoints(self):
+        days, values = _series(1000)
+        d, v = lttb(days, values, 100)
+        self.assertEqual(len(d), 100)
+        self.assertEqual((d[0], d[-1], v[-1]), (days[0], days[-1], values[-1]))
+        self.assertTrue(np.all(np.diff(d) > 0))
+        self.assertTrue(np.isin(d, days).all())
+
+    def test_keeps_spike(self):
+        days, values = np.arange(1, 501), np.full(500, 100.0)
+        values[250] = 140.0
+        _, v = lttb(days, values, 20)
+        self.assertIn(140.0, v)
+
+    def test_short_series_unchanged(self):
+        days, values = _series(10)
+        d, v = lttb(days, values, 50)
+        self.assertEqual(list(d), list(days))
+
+
+class TestDownsample(unittest.TestCase):
+
+    def test_rules(self):
+        days, values = _series(2000)
+        self.assertEqual(len(downsample(days, values, "session")[0]), 2000)
+        self.assertEqual(len(downsample(days, values, "lttb", 120)[0]), 120)
+        weekly, _ = downsample(days, values, "weekly")
+        self.assertLess(len(weekly), 2000)
+        auto, _ = downsample(days, values, "auto", 120)
+        self.assertEqual((len(auto), auto[-1]), (120, days[-1]))
+        self.assertEqual(len(downsample(days[:50], values[:50], "auto", 120)[0]), 50)
+        with self.assertRaises(ValueError):
+            downsample(days, values, "daily")
+
+
+class TestEma(unittest.TestCase):
+
+    def test_matches_recurrence(self):
+        days, values = _series(500, gap=9)
+        np.testing.assert_allclose(ema(days, values, 14), _ema_loop(days, values, 14), rtol=1e-9)
+
+    def test_long_history_stays_finite(self):
+        # Thousands of half-lives: several closed-form blocks
+        days, values = _series(3000, gap=10)
+        out = ema(days, values, 3)
+        self.assertTrue(np.all(np.isfinite(out)))
+        np.testing.assert_allclose(out, _ema_loop(days, values, 3), rtol=1e-9)
+
+    def test_constant(self):
+        out = ema([1, 5, 6, 30], [100.0] * 4, 7)
+        self.assertTrue(all(math.isclose(x, 100.0) for x in out))
+
+
+class TestSeriesStore(unittest.TestCase):
+
+    def test_replace_changed_days(self):
+        store = SeriesStore()
+        store.replace([1, 3, 5], {"Squat": ([1, 3, 5], [100, 102, 104]), "Bench Press": ([3], [80])})
+        store.replace([3, 7], {"Squat": ([7], [106])})  # day 3 re-logged without squats
+        d, v = store.series("Squat")
+        self.assertEqual((list(d), list(v)), ([1, 5, 7], [100, 104, 106]))
+        self.assertEqual(len(store.series("Bench Press")[0]), 0)
+        d, _ = store.series("Squat", 2, 6)
+        self.assertEqual(list(d), [5])
+        self.assertEqual(len(store.series("Deadlift")[0]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
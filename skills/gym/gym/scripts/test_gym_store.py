@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""Tests for gym_store.py"""
+
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+import gym_store
+
+
+def _session(date, weight=100, **kwargs):
+    s = {"date": date, "actual": [{"name": "Squat", "sets": [{"reps": 5, "weight_kg": weight}]}]}
+    s.update(kwargs)
+    return s
+
+
+class TestAppendAndRead(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.d = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _lines(self):
+        return gym_store.store_path(self.d).read_bytes().splitlines()
+
+    def test_append_one_line_per_save(self):
+        gym_store.append_session(self.d, _session("2026-01-01"))
+        gym_store.append_session(self.d, _session("2026-01-03"))
+        self.assertEqual(len(self._lines()), 2)
+        sessions, errors = gym_store.read_sessions(self.d)
+        self.assertEqual([s["date"] for s in sessions], ["2026-01-01", "2026-01-03"])
+        self.assertEqual(errors, [])
+
+    def test_later_record_supersedes(self):
+        gym_store.append_session(self.d, _session("2026-01-01", 100))
+        gym_store.append_session(self.d, _session("2026-01-01", 105))
+        sessions, _ = gym_store.read_sessions(self.d)
+        self.assertEqual(len(sessions), 1)
+        self.assertEqual(sessions[0]["actual"][0]["sets"][0]["weight_kg"], 105)
+
+    def test_unicode_kept_on_one_line(self):
+        gym_store.append_session(self.d, _session("2026-01-01", notes="Тяжело\nно норм"))
+        self.assertEqual(len(self._lines()), 1)
+        self.assertEqual(gym_store.get_session(self.d, "2026-01-01")["notes"], "Тяжело\nно норм")
+
+    def test_out_of_order_append_keeps_dates_sorted(self):
+        for d in ("2026-01-01", "2026-01-05", "2026-01-03"):
+            gym_store.append_session(self.d, _session(d))
+        dates = [json.loads(l)["date"] for l in self._lines()]
+        self.assertEqual(dates, ["2026-01-01", "2026-01-03", "2026-01-05"])
+
+    def test_missing_date_rejected(self):
+        with self.assertRaises(ValueError):
+            gym_store.append_session(self.d, {"actual": []})
+
+    def test_torn_last_line_is_terminated(self):
+        gym_store.append_session(self.d, _session("2026-01-01"))
+        with open(gym_store.store_path(self.d), "ab") as f:
+            f.write(b'{"date": "2026-01-02", "act')
+        gym_store.append_session(self.d, _session("2026-01-03"))
+        sessions, errors = gym_store.read_sessions(self.d)
+        self.assertEqual([s["date"] for s in sessions], ["2026-01-01", "2026-01-03"])
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0][0].endswith(":2"))
+
+    def test_no_store(self):
+        self.assertFalse(gym_store.has_store(self.d))
+        self.assertEqual(gym_store.read_sessions(self.d), ([], []))
+        self.assertEqual(gym_store.tail_sessions(self.d, 3), ([], []))
+
+
+class TestTail(unittest.TestCase):
+
+    def test_tail_reads_only_end(self):
+        with tempfile.TemporaryDirectory() as d:
+            sessions = [_session(f"2025-{m:02d}-{day:02d}") for m in range(1, 13) for day in (1, 15)]
+            gym_store.write_store(d, sessions)
+            gym_store.append_session(d, _session("2025-12-15", 200))
+            tail, _ = gym_store.tail_sessions(d, 2)
+            self.assertEqual([s["date"] for s in tail], ["2025-12-01", "2025-12-15"])
+            self.assertEqual(tail[1]["actual"][0]["sets"][0]["weight_kg"], 200)
+
+    def test_small_blocks_match_forward_read(self):
+        with tempfile.TemporaryDirectory() as d:
+            for i in range(40):
+                gym_store.append_session(d, _session(f"2026-02-{i % 28 + 1:02d}" if i < 28 else "2026-02-28", i))
+            forward = [(s["date"], s["actual"]) for _, _, s, _ in gym_store.iter_records(d)]
+            backward = [(s["date"], s["actual"]) for _, s, _ in gym_store.iter_records_reverse(d, block_size=7)]
+            self.assertEqual(backward, forward[::-1])
+
+    def test_offsets_point_at_lines(self):
+        with tempfile.TemporaryDirectory() as d:
+            for day in (1, 2, 3):
+                gym_store.append_session(d, _session(f"2026-03-0{day}"))
+            raw = gym_store.store_path(d).read_bytes()
+            for offset, session, _ in gym_store.iter_records_reverse(d, block_size=5):
+                self.assertEqual(json.loads(raw[offset:].split(b"\n", 1)[0])["date"], session["date"])
+
+    def test_tail_date_range(self):
+        with tempfile.TemporaryDirectory() as d:
+            gym_store.write_store(d, [_session(f"2026-01-{day:02d}") for day in range(1, 31)])
+            sessions, _ = gym_store.tail_sessions(d, since="2026-01-10", until="2026-01-12")
+            self.assertEqual([s["date"] for s in sessions], ["2026-01-10", "2026-01-11", "2026-01-12"])
+            sessions, _ = gym_store.tail_sessions(d, 2, until="2026-01-05")
+            self.assertEqual([s["date"] for s in sessions], ["2026-01-04", "2026-01-05"])
+
+
+class TestCompact(unittest.TestCase):
+
+    def test_compact_drops_superseded_and_keeps_rejects(self):
+        with tempfile.TemporaryDirectory() as d:
+            for w in (100, 102, 105):
+                gym_store.append_session(d, _session("2026-01-01", w))
+            with open(gym_store.store_path(d), "ab") as f:
+                f.write(b"not json\n")
+            stats = gym_store.compact(d)
+            self.assertEqual(stats, {"records": 3, "sessions": 1, "superseded": 2, "rejected": 1})
+            sessions, errors = gym_store.read_sessions(d)
+            self.assertEqual(sessions[0]["actual"][0]["sets"][0]["weight_kg"], 105)
+            self.assertEqual(errors, [])
+            rejects = gym_store.store_path(d).with_name(gym_store.STORE_FILENAME + gym_store.REJECTS_SUFFIX)
+            self.assertEqual(rejects.read_bytes(), b"not json\n")
+
+    def test_compact_leaves_no_temp_files(self):
+        with tempfile.TemporaryDirectory() as d:
+            gym_store.append_session(d, _session("2026-01-01"))
+            gym_store.compact(d)
+            self.assertEqual(sorted(os.listdir(d)), [gym_store.LOCK_FILENAME, gym_store.STORE_FILENAME])
+
+
+class TestDayPaths(unittest.TestCase):
+
+    def test_existing_day_file_wins(self):
+        with tempfile.TemporaryDirectory() as d:
+            gym_store.append_session(d, _session("2026-01-01", 100))
+            day = os.path.join(d, "2026-01-01.json")
+            with open(day, "w") as f:
+                json.dump(_session("2026-01-01", 90), f)
+            gym_store.save_day(day, _session("2026-01-01", 95))
+            self.assertEqual(gym_store.load_day(day)["actual"][0]["sets"][0]["weight_kg"], 95)
+            self.assertEqual(gym_store.get_session(d, "2026-01-01")["actual"][0]["sets"][0]["weight_kg"], 100)
+
+    def test_store_used_when_no_day_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            gym_store.append_session(d, _session("2026-01-01"))
+            day = os.path.join(d, "2026-01-02.json")
+            self.assertIsNone(gym_store.load_day(day))
+            self.assertEqual(gym_store.save_day(day, _session("2026-01-02")), str(gym_store.store_path(d)))
+            self.assertFalse(os.path.exists(day))
+            self.assertEqual(gym_store.load_day(day)["date"], "2026-01-02")
+
+    def test_plain_layout_writes_day_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            day = os.path.join(d, "2026-01-02.json")
+            gym_store.save_day(day, _session("2026-01-02"))
+            self.assertTrue(os.path.exists(day))
+            self.assertFalse(gym_store.has_store(d))
+
+
+class TestDurableWrites(unittest.TestCase):
+
+    def test_atomic_write_replaces_and_cleans_up(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "2026-01-01.json")
+            gym_store.atomic_write(path, b"old")
+            gym_store.atomic_write(path, b"new", fsync=True)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), b"new")
+            self.assertEqual(os.listdir(d), ["2026-01-01.json"])
+
+    def test_failed_batch_leaves_targets_untouched(self):
+        with tempfile.TemporaryDirectory() as d:
+            a, b = os.path.join(d, "a.json"), os.path.join(d, "b.json")
+            gym_store.atomic_write(a, b"A")
+            with self.assertRaises(RuntimeError):
+                with gym_store.WriteBatch() as batch:
+                    batch.write(a, b"A2")
+                    batch.write(b, b"B2")
+                    raise RuntimeError("crash before commit")
+            self.assertEqual(sorted(os.listdir(d)), ["a.json"])
+            with open(a, "rb") as f:
+                self.assertEqual(f.read(), b"A")
+
+    def test_batch_fsyncs_each_dir_once(self):
+        with tempfile.TemporaryDirectory() as d:
+            with mock.patch.object(gym_store, "_fsync_dir") as fsync_dir:
+                with gym_store.WriteBatch(fsync=True) as batch:
+                    for i in range(5):
+                        batch.write(os.path.join(d, f"{i}.json"), b"{}")
+            fsync_dir.assert_called_once()
+            self.assertEqual(len(os.listdir(d)), 5)
+
+    def test_compact_json(self):
+        data = {"date": "2026-01-01", "notes": "Тяжело"}
+        self.assertEqual(gym_store.dump_json(data, compact=True), '{"date":"2026-01-01","notes":"Тяжело"}'.encode())
+        self.assertIn(b"\n  ", gym_store.dump_json(data, compact=False))
+        with mock.patch.dict(os.environ, {gym_store.COMPACT_ENV: "1"}):
+            self.assertNotIn(b"\n", gym_store.dump_json(data))
+        with tempfile.TemporaryDirectory() as d:
+            day = os.path.join(d, "2026-01-01.json")
+            gym_store.save_day(day, data, compact=True)
+            with open(day, "rb") as f:
+                self.assertNotIn(b"\n", f.read())
+
+    def test_lock_reentrant_and_exclusive(self):
+        with tempfile.TemporaryDirectory() as d:
+            with gym_store.locked(d):
+                with gym_store.locked(d):
+                    gym_store.append_session(d, _session("2026-01-01"))  # locks again inside
+                ctx = multiprocessing.get_context("spawn")
+                proc = ctx.Process(target=_try_lock, args=(d,))
+                proc.start()
+                proc.join(30)
+                self.assertEqual(proc.exitcode, 3)  # timed out while we hold it
+            proc = ctx.Process(target=_try_lock, args=(d,))
+            proc.start()
+            proc.join(30)
+            self.assertEqual(proc.exitcode, 0)
+
+
+def _try_lock(d):
+    try:
+        with gym_store.locked(d, timeout=0.2):
+            pass
+    except TimeoutError:
+        sys.exit(3)
+
+
+def _hammer_day(day, worker, rounds):
+    """Read-modify-write one day file under the lock, like `workout_live.py log`."""
+    for i in range(rounds):
+        with gym_store.locked(os.path.dirname(day)):
+            session = gym_store.load_day(day)
+            session["actual"].append({"name": f"w{worker}-{i}", "sets": [{"reps": 5, "weight_kg": 100}]})
+            gym_store.save_day(day, session)
+
+
+def _hammer_store(d, worker, rounds):
+    for i in range(rounds):
+        # Interleaved dates force some out-of-order appends, i.e. full rewrites under the lock
+        gym_store.append_session(d, _session(f"2026-{worker + 1:02d}-{i + 1:02d}", 100 + i))
+
+
+class TestConcurrentWriters(unittest.TestCase):
+    """Stress: several processes writing the same history at once lose nothing and never tear a file."""
+
+    WORKERS = 6
+    ROUNDS = 15
+
+    def _run(self, target, *args):
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=target, args=(*args, w, self.ROUNDS)) for w in range(self.WORKERS)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(120)
+        self.assertEqual([p.exitcode for p in procs], [0] * self.WORKERS)
+
+    def test_day_file_read_modify_write(self):
+        with tempfile.TemporaryDirectory() as d:
+            day = os.path.join(d, "2026-01-01.json")
+            gym_store.save_day(day, {"date": "2026-01-01", "actual": []})
+            self._run(_hammer_day, day)
+            with open(day) as f:
+                names = [ex["name"] for ex in json.load(f)["actual"]]
+            self.assertEqual(len(names), self.WORKERS * self.ROUNDS)
+            self.assertEqual(len(set(names)), len(names))
+            self.assertEqual(sorted(os.listdir(d)), [gym_store.LOCK_FILENAME, "2026-01-01.json"])
+
+    def test_store_appends_and_rewrites(self):
+        with tempfile.TemporaryDirectory() as d:
+            self._run(_hammer_store, d)
+            sessions, errors = gym_store.read_sessions(d)
+            self.assertEqual(errors, [])
+            self.assertEqual(len(sessions), self.WORKERS * self.ROUNDS)
+            dates = [json.loads(line)["date"] for line in gym_store.store_path(d).read_bytes().splitlines()]
+            self.assertEqual(dates, sorted(dates))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -255,6 +255,13 @@ class TestLogExercise(unittest.TestCase):
         self.assertEqual(len(session["actual"]), 1)
         self.assertEqual(len(session["actual"][0]["sets"]), 3)
 
+    def test_rejects_schema_errors(self):
+        session = {"date": "2026-02-13", "day": "B", "planned": [], "actual": []}
+        for bad in ('{"sets": [{"reps": 10}]}', '{"name": "OHP", "sets": [{"reps": "ten"}]}', '[1]'):
+            with self.assertRaises(SystemExit):
+                log_exercise(session, bad)
+        self.assertEqual(session["actual"], [])
+
 
 class TestDoneExercise(unittest.TestCase):
     """Test done_exercise — copy planned to actual."""
@@ -630,6 +637,48 @@ class TestInitAndNextDay(unittest.TestCase):
         session = json.load(open(session_file))
         self.assertEqual(session["day"], "B")
 
+    def test_store_layout_init_log_status(self):
+        """With sessions.ndjson in the history dir, the session path is virtual."""
+        import gym_store
+        gym_store.append_session(self.tmp, {"date": "2026-02-14", "actual": []})
+        session_file = os.path.join(self.tmp, "2026-02-15.json")
+        run = lambda *a: subprocess.run([sys.executable, self.script, *a], capture_output=True, text=True)
+        self.assertEqual(run("init", session_file, self.program_file, "A").returncode, 0)
+        result = run("log", session_file, '{"name": "Squat", "sets": [{"reps": 8, "weight_kg": 100}]}')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertFalse(os.path.exists(session_file))
+        session = gym_store.get_session(self.tmp, "2026-02-15")
+        self.assertEqual(session["actual"][0]["sets"][0]["reps"], 8)
+        self.assertNotEqual(run("init", session_file, self.program_file, "B").returncode, 0)
+        self.assertEqual(run("status", session_file).returncode, 0)
+
+    def test_log_invalid_exercise_not_saved(self):
+        session_file = os.path.join(self.tmp, "2026-02-15.json")
+        run = lambda *a: subprocess.run([sys.executable, self.script, *a], capture_output=True, text=True)
+        self.assertEqual(run("init", session_file, self.program_file, "A").returncode, 0)
+        result = run("log", session_file, '{"name": "Squat", "sets": [{"reps": 8, "weight_kg": "100kg"}], "end_time": "9pm"}')
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Invalid weight_kg in exercise 'Squat' set 1: 100kg", result.stderr)
+        self.assertIn("Invalid end_time in exercise 'Squat': 9pm", result.stderr)
+        with open(session_file) as f:
+            self.assertEqual(json.load(f)["actual"], [])
+
+    def test_concurrent_logs_all_land(self):
+        """Parallel `log` invocations on one session serialize on the history lock."""
+        session_file = os.path.join(self.tmp, "2026-02-15.json")
+        run = lambda *a: subprocess.run([sys.executable, self.script, *a], capture_output=True, text=True)
+        self.assertEqual(run("init", session_file, self.program_file, "A").returncode, 0)
+        names = [f"Curl {i}" for i in range(12)]
+        procs = [subprocess.Popen([sys.executable, self.script, "log", session_file,
+                                   json.dumps({"name": n, "sets": [{"reps": 10, "weight_kg": 15}]}), "--compact"],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.PIPE) for n in names]
+        self.assertEqual([p.wait(60) for p in procs], [0] * len(names))
+        with open(session_file) as f:
+            raw = f.read()
+        self.assertNotIn("\n", raw)  # --compact
+        self.assertEqual(sorted(ex["name"] for ex in json.loads(raw)["actual"]), sorted(names))
+        self.assertFalse([n for n in os.listdir(self.tmp) if n.endswith(".tmp")])
+
 
 class TestRemoveExercise(unittest.TestCase):
     """Test remove command."""
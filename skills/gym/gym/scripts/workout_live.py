@@ -11,6 +11,18 @@ Usage:
 Exercise JSON format:
     {"name": "OHP", "sets": [{"reps": 10, "weight_kg": 45}, ...]}
     or shorthand: {"name": "OHP", "reps": 10, "weight_kg": 45, "num_sets": 4}
+
+If the history dir has a sessions.ndjson store (gym_analytics.py migrate) and
+<session_file> does not exist, the session is read from and appended to the
+store instead (see gym_store.py).
+
+log/done/remove/init hold the history dir's lock from load to save, so
+concurrent invocations apply one after another instead of losing updates.
+Saves are atomic (temp file + rename); --compact (or GYM_COMPACT_JSON=1)
+writes the session without indentation, GYM_FSYNC=1 fsyncs it.
+
+`log` checks the exercise against the session schema (gym_schema.py) and
+refuses to save it, listing every problem, if it does not match.
 """
 
 import json
@@ -18,19 +30,22 @@ import sys
 from datetime import datetime
 from pathlib import Path
 
+import gym_schema
+import gym_store
+
 
 def load_session(path):
-    """Load session JSON file."""
-    p = Path(path)
-    if not p.exists():
+    """Load session JSON file (or its record in the history's sessions.ndjson store)."""
+    session = gym_store.load_day(path)
+    if session is None:
         print(f"❌ Session file not found: {path}", file=sys.stderr)
         sys.exit(1)
-    return json.loads(p.read_text())
+    return session
 
 
-def save_session(path, data):
-    """Save session JSON file."""
-    Path(path).write_text(json.dumps(data, indent=2, ensure_ascii=False))
+def save_session(path, data, compact=None):
+    """Save session JSON file (appended to sessions.ndjson if the history dir uses the store)."""
+    gym_store.save_day(path, data, compact=compact)
 
 
 def _find_by_name(items, exercise_name):
@@ -290,6 +305,9 @@ def log_exercise(session, exercise_json):
     except json.JSONDecodeError as e:
         print(f"❌ Invalid JSON: {e}", file=sys.stderr)
         sys.exit(1)
+    if not isinstance(ex_data, dict):
+        print("❌ Exercise must be a JSON object", file=sys.stderr)
+        sys.exit(1)
 
     # Support shorthand: {"name": "OHP", "reps": 10, "weight_kg": 45, "num_sets": 4}
     if "sets" not in ex_data and "reps" in ex_data:
@@ -303,6 +321,11 @@ def log_exercise(session, exercise_json):
                 s["weight_kg"] = weight
             ex_data["sets"].append(s)
 
+    errors = gym_schema.validate_exercise(ex_data)
+    if errors:
+        print("❌ " + "\n❌ ".join(errors), file=sys.stderr)
+        sys.exit(1)
+
     # Add muscle_group if not present but found in planned
     if "muscle_group" not in ex_data:
         planned = session.get("planned", [])
@@ -378,14 +401,32 @@ def done_exercise(session, exercise_name=None):
     return session
 
 
+MUTATING_COMMANDS = ("log", "done", "remove", "init")
+
+
 def main():
+    compact = None
+    if "--compact" in sys.argv:
+        sys.argv.remove("--compact")  # positional args below are read by index
+        compact = True
     if len(sys.argv) < 3:
         print(__doc__)
         sys.exit(2)
 
     command = sys.argv[1]
     session_file = sys.argv[2]
+    if command not in MUTATING_COMMANDS:
+        run_command(command, session_file)
+        return
+    try:
+        with gym_store.locked(Path(session_file).parent):
+            run_command(command, session_file, compact)
+    except TimeoutError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
 
+def run_command(command, session_file, compact=None):
     if command == "status":
         session = load_session(session_file)
         print(display_status(session))
@@ -397,7 +438,7 @@ def main():
         exercise_json = sys.argv[3]
         session = load_session(session_file)
         session = log_exercise(session, exercise_json)
-        save_session(session_file, session)
+        save_session(session_file, session, compact)
         print(display_status(session))
 
     elif command == "done":
@@ -405,7 +446,7 @@ def main():
         exercise_name = sys.argv[3] if len(sys.argv) > 3 else None
         session = load_session(session_file)
         session = done_exercise(session, exercise_name)
-        save_session(session_file, session)
+        save_session(session_file, session, compact)
         print(display_status(session))
 
     elif command == "remove":
@@ -420,7 +461,7 @@ def main():
             print(f"❌ Exercise not found: {exercise_name}", file=sys.stderr)
             sys.exit(1)
         session["actual"] = [a for a in session["actual"] if a is not target]
-        save_session(session_file, session)
+        save_session(session_file, session, compact)
         print(display_status(session))
 
     elif command == "lifts":
@@ -447,8 +488,8 @@ def main():
             print(f"❌ Day '{day}' not found in program. Available: {list(program['days'].keys())}", file=sys.stderr)
             sys.exit(1)
 
-        if Path(session_file).exists():
-            existing = json.loads(Path(session_file).read_text())
+        existing = gym_store.load_day(session_file)
+        if existing is not None:
             if existing.get("actual"):
                 print(f"⚠️ Session file exists with {len(existing['actual'])} logged exercises. Use --force to overwrite.", file=sys.stderr)
                 if "--force" not in sys.argv:
@@ -464,7 +505,7 @@ def main():
             "actual": []
         }
 
-        save_session(session_file, session)
+        save_session(session_file, session, compact)
         print(display_status(session))
 
     else: